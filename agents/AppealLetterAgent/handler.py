@@ -1,15 +1,29 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from base_agent import BaseAgent
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable
 import json
+import time
 import logging
 from datetime import datetime, timedelta
 
+from clinical_notes import prepare_notes
+
+from letter_stream import (
+    SKIP_LINE_PREFIXES, AppealLetterStreamFormatter, LetterStreamPublisher,
+    chunk_text, create_letter_publisher
+)
+
 logger = logging.getLogger(__name__)
 
+# Clinical notes are compressed to this many (estimated) tokens before prompting; 0 = no limit
+NOTES_TOKEN_BUDGET = int(os.environ.get('APPEAL_NOTES_TOKEN_BUDGET', '1500'))
+# Management endpoint of the stack's appeal letter WebSocket API (https://{api}.execute-api.{region}.amazonaws.com/{stage})
+STREAM_ENDPOINT = os.environ.get('APPEAL_STREAM_ENDPOINT')
+
 class AppealLetterAgent(BaseAgent):
     """
     AI-powered appeal letter generation for denied claims
@@ -19,6 +33,10 @@ class AppealLetterAgent(BaseAgent):
     - Supporting documentation references
     - Regulatory compliance
     - Success probability assessment
+    
+    With event['stream'] = {'connectionId'} the letter is streamed to that
+    client of the appeal letter WebSocket API (APPEAL_STREAM_ENDPOINT) as it is
+    generated, followed by the full result.
     """
     
     def validate_input(self, event: Dict[str, Any]) -> Optional[str]:
@@ -34,6 +52,12 @@ class AppealLetterAgent(BaseAgent):
         if not appeal_data.get('denialReason'):
             return "Missing denial reason"
         
+        stream = event.get('stream')
+        if stream is not None and not isinstance(stream, dict):
+            return "stream must be an object"
+        if stream and 'endpoint' in stream:
+            return "stream.endpoint is not accepted; letters stream to the configured WebSocket API"
+        
         return None
     
     def execute_production_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
@@ -42,31 +66,47 @@ class AppealLetterAgent(BaseAgent):
         appeal_data = event.get('appealData', {})
         claim_id = appeal_data.get('claimId')
         
-        # Build letter generation prompt
-        prompt = self._build_appeal_letter_prompt(appeal_data)
-        
-        # Generate letter using Nova Pro
-        letter_text = self.invoke_nova_pro(prompt, max_tokens=3000, temperature=0.3)
+        # Build letter generation prompt around notes trimmed to the token budget
+        clinical_notes, notes_metrics = prepare_notes(appeal_data.get('clinicalNotes', ''), 'appeal', NOTES_TOKEN_BUDGET)
+        prompt = self._build_appeal_letter_prompt(appeal_data, clinical_notes)
+        llm_start = time.perf_counter()
         
-        # Clean and format the letter
-        formatted_letter = self._format_appeal_letter(letter_text)
-        
-        # Calculate appeal deadline
-        appeal_deadline = self._calculate_appeal_deadline(appeal_data)
-        
-        # Store appeal record
-        appeal_record = self._store_appeal_record(claim_id, appeal_data, formatted_letter)
+        publisher = self._create_publisher(event, claim_id)
+        try:
+            if publisher:
+                # Stream the letter to the client as Nova Pro generates it
+                chunks = self.invoke_nova_pro_stream(prompt, max_tokens=3000, temperature=0.3)
+                formatted_letter = self._stream_appeal_letter(chunks, publisher)
+            else:
+                # Generate letter using Nova Pro
+                letter_text = self.invoke_nova_pro(prompt, max_tokens=3000, temperature=0.3)
+                
+                # Clean and format the letter
+                formatted_letter = self._format_appeal_letter(letter_text)
+            
+            # Calculate appeal deadline
+            appeal_deadline = self._calculate_appeal_deadline(appeal_data)
+            
+            # Store appeal record
+            appeal_record = self._store_appeal_record(claim_id, appeal_data, formatted_letter)
+            
+            result = {
+                'success': True,
+                'claim_id': claim_id,
+                'appeal_letter': formatted_letter,
+                'appeal_deadline': appeal_deadline.isoformat(),
+                'supporting_documents_needed': self._identify_supporting_documents(appeal_data),
+                'success_probability': self._estimate_success_probability(appeal_data),
+                'model_used': self.bedrock_model_id,
+                'appeal_id': appeal_record.get('appeal_id'),
+                'prompt': dict(notes_metrics, llm_ms=int((time.perf_counter() - llm_start) * 1000))
+            }
+        except Exception as e:
+            if publisher:
+                publisher.fail(str(e))
+            raise
         
-        return {
-            'success': True,
-            'claim_id': claim_id,
-            'appeal_letter': formatted_letter,
-            'appeal_deadline': appeal_deadline.isoformat(),
-            'supporting_documents_needed': self._identify_supporting_documents(appeal_data),
-            'success_probability': self._estimate_success_probability(appeal_data),
-            'model_used': self.bedrock_model_id,
-            'appeal_id': appeal_record.get('appeal_id')
-        }
+        return self._complete_stream(publisher, result)
     
     def execute_development_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Return mock appeal letter for development"""
@@ -103,7 +143,11 @@ Medical Billing Department
             denial_reason=appeal_data.get('denialReason', 'medical necessity')
         )
         
-        return {
+        publisher = self._create_publisher(event, claim_id)
+        if publisher:
+            mock_letter = self._stream_appeal_letter(chunk_text(mock_letter), publisher)
+        
+        result = {
             'success': True,
             'claim_id': claim_id,
             'appeal_letter': mock_letter,
@@ -117,8 +161,38 @@ Medical Billing Department
             'development_mode': True,
             'appeal_id': f'APPEAL-DEV-{claim_id}'
         }
+        return self._complete_stream(publisher, result)
+    
+    def _create_publisher(self, event: Dict[str, Any], claim_id: str) -> Optional[LetterStreamPublisher]:
+        """Stream publisher when the caller asked for a streamed letter"""
+        
+        stream = event.get('stream')
+        if not stream:
+            return None
+        return create_letter_publisher(stream, stream.get('streamId') or claim_id, STREAM_ENDPOINT,
+                                       self.development_mode)
+    
+    def _stream_appeal_letter(self, chunks: Iterable[str], publisher: LetterStreamPublisher) -> str:
+        """Format model chunks as they arrive and publish the letter text incrementally"""
+        
+        formatter = AppealLetterStreamFormatter()
+        parts = []
+        for text in formatter.format(chunks):
+            parts.append(text)
+            publisher.write(text)
+        publisher.flush()
+        return ''.join(parts)
     
-    def _build_appeal_letter_prompt(self, appeal_data: Dict[str, Any]) -> str:
+    def _complete_stream(self, publisher: Optional[LetterStreamPublisher],
+                         result: Dict[str, Any]) -> Dict[str, Any]:
+        """Send the final result to the stream and attach delivery metrics"""
+        
+        if publisher:
+            publisher.complete(result)
+            result['stream'] = publisher.get_metrics()
+        return result
+    
+    def _build_appeal_letter_prompt(self, appeal_data: Dict[str, Any], clinical_notes: Optional[str] = None) -> str:
         """Build prompt for Nova Pro appeal letter generation"""
         
         claim_id = appeal_data.get('claimId')
@@ -127,7 +201,8 @@ Medical Billing Department
         denial_code = appeal_data.get('denialCode', '')
         payer_name = appeal_data.get('payerName', '')
         service_details = appeal_data.get('serviceDetails', {})
-        clinical_notes = appeal_data.get('clinicalNotes', '')
+        if clinical_notes is None:
+            clinical_notes = appeal_data.get('clinicalNotes', '')
         
         prompt = f"""You are an expert medical billing and appeals specialist. Write a professional, compelling appeal letter for a denied medical claim. The letter should be formal, well-structured, and persuasive.
 
@@ -175,7 +250,7 @@ Generate a complete, ready-to-send appeal letter that maximizes the chance of re
         
         for line in lines:
             # Skip lines that look like instructions or metadata
-            if line.startswith(('```', 'Here is', 'This letter', 'Note:')):
+            if line.startswith(SKIP_LINE_PREFIXES):
                 continue
             formatted_lines.append(line)
         
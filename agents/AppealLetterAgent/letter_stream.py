@@ -0,0 +1,228 @@
+# Appeal Letter Streaming - Muni AI RCM Platform
+# Incremental letter formatting and delivery of partial letter text to the UI
+
+import json
+import time
+import logging
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Lines the model adds around the letter itself (shared with _format_appeal_letter)
+SKIP_LINE_PREFIXES = ('```', 'Here is', 'This letter', 'Note:')
+
+
+class AppealLetterStreamFormatter:
+    """
+    _format_appeal_letter applied to a stream of chunks. A line is held back
+    only until its start rules out every skip prefix, then streams as it
+    arrives; skipped lines are dropped whole. Leading and trailing whitespace
+    of the letter is held back so the concatenated output equals
+    _format_appeal_letter(''.join(chunks)).
+    """
+
+    def __init__(self, skip_prefixes: Iterable[str] = SKIP_LINE_PREFIXES):
+        self.skip_prefixes = tuple(skip_prefixes)
+        self._line = ''          # start of the current line while keep/skip is undecided
+        self._keep: Optional[bool] = None
+        self._kept_lines = 0
+        self._started = False    # first non-whitespace character emitted
+        self._whitespace = ''    # trailing whitespace, emitted only if more text follows
+
+    def feed(self, chunk: str) -> str:
+        """Formatted text that can be emitted for this chunk (may be empty)"""
+        out: List[str] = []
+        pieces = chunk.split('\n')
+        for index, piece in enumerate(pieces):
+            if piece:
+                self._text(piece, out)
+            if index < len(pieces) - 1:
+                self._end_line(out)
+        return ''.join(out)
+
+    def close(self) -> str:
+        """Flush the final line; trailing whitespace is dropped"""
+        out: List[str] = []
+        self._end_line(out)
+        self._whitespace = ''
+        return ''.join(out)
+
+    def format(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Formatted text for each chunk, skipping chunks that produce nothing"""
+        for chunk in chunks:
+            text = self.feed(chunk)
+            if text:
+                yield text
+        text = self.close()
+        if text:
+            yield text
+
+    def _text(self, text: str, out: List[str]):
+        if self._keep is None:
+            self._line += text
+            line = self._line
+            if line.startswith(self.skip_prefixes):
+                self._keep = False
+            elif not any(prefix.startswith(line) for prefix in self.skip_prefixes):
+                self._start_kept_line(out)
+                self._line = ''
+                self._write(line, out)
+        elif self._keep:
+            self._write(text, out)
+
+    def _end_line(self, out: List[str]):
+        if self._keep is None:
+            line = self._line
+            if not line.startswith(self.skip_prefixes):
+                self._start_kept_line(out)
+                self._write(line, out)
+        self._line = ''
+        self._keep = None
+
+    def _start_kept_line(self, out: List[str]):
+        self._keep = True
+        if self._kept_lines:
+            self._write('\n', out)
+        self._kept_lines += 1
+
+    def _write(self, text: str, out: List[str]):
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._started = True
+        body = text.rstrip()
+        if body:
+            out.append(self._whitespace + body)
+            self._whitespace = text[len(body):]
+        else:
+            self._whitespace += text
+
+
+class LetterStreamPublisher:
+    """
+    Sends partial letter text to the client as it is generated. Model chunks
+    are coalesced into messages of at least min_chars (or whatever arrived
+    within max_delay_seconds); the first text goes out immediately so the UI
+    shows it at time-to-first-token. A client that went away stops delivery
+    but not generation.
+
+    Messages: {'type': 'delta', 'streamId', 'seq', 'text'}, then one
+    {'type': 'complete', 'streamId', 'seq', 'result'} or {'type': 'error', ...}.
+    """
+
+    def __init__(self, stream_id: str, min_chars: int = 64, max_delay_seconds: float = 0.1):
+        self.stream_id = stream_id
+        self.min_chars = min_chars
+        self.max_delay_seconds = max_delay_seconds
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._last_send = 0.0
+        self._seq = 0
+        self._started = time.perf_counter()
+        self._connected = True
+        self._metrics = {'messages': 0, 'chars': 0, 'first_text_ms': None, 'disconnected': False}
+
+    def write(self, text: str):
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered += len(text)
+        now = time.perf_counter()
+        if (self._metrics['first_text_ms'] is None or self._buffered >= self.min_chars
+                or now - self._last_send >= self.max_delay_seconds):
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        text = ''.join(self._buffer)
+        self._buffer, self._buffered = [], 0
+        if self._metrics['first_text_ms'] is None:
+            self._metrics['first_text_ms'] = round((time.perf_counter() - self._started) * 1000, 1)
+        self._metrics['chars'] += len(text)
+        self._publish({'type': 'delta', 'text': text})
+        self._last_send = time.perf_counter()
+
+    def complete(self, result: Dict[str, Any]):
+        self.flush()
+        self._publish({'type': 'complete', 'result': result})
+
+    def fail(self, error: str):
+        self.flush()
+        self._publish({'type': 'error', 'error': error})
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self._metrics)
+        metrics['total_ms'] = round((time.perf_counter() - self._started) * 1000, 1)
+        return metrics
+
+    def _publish(self, message: Dict[str, Any]):
+        if not self._connected:
+            return
+        self._seq += 1
+        message = {'streamId': self.stream_id, 'seq': self._seq, **message}
+        try:
+            self.send(message)
+            self._metrics['messages'] += 1
+        except Exception as e:
+            logger.warning(f"Letter stream {self.stream_id} delivery stopped: {str(e)}")
+            self._connected = False
+            self._metrics['disconnected'] = True
+
+    def send(self, message: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class WebSocketLetterPublisher(LetterStreamPublisher):
+    """Posts each message to an API Gateway WebSocket connection"""
+
+    def __init__(self, stream_id: str, endpoint: str, connection_id: str, **options):
+        super().__init__(stream_id, **options)
+        self.connection_id = connection_id
+        self._client = get_client('apigatewaymanagementapi', endpoint_url=endpoint)
+
+    def send(self, message: Dict[str, Any]):
+        self._client.post_to_connection(
+            ConnectionId=self.connection_id,
+            Data=json.dumps(message, default=str).encode('utf-8')
+        )
+
+
+class InMemoryLetterPublisher(LetterStreamPublisher):
+    """Keeps the messages (development mode and local checks)"""
+
+    def __init__(self, stream_id: str, **options):
+        super().__init__(stream_id, **options)
+        self.messages: List[Dict[str, Any]] = []
+
+    def send(self, message: Dict[str, Any]):
+        self.messages.append(message)
+
+    def text(self) -> str:
+        return ''.join(message['text'] for message in self.messages if message['type'] == 'delta')
+
+
+def create_letter_publisher(stream: Dict[str, Any], stream_id: str, endpoint: Optional[str] = None,
+                            development_mode: bool = False) -> LetterStreamPublisher:
+    """
+    Publisher for an event's `stream` settings. A {'connectionId'} of a client
+    on the configured WebSocket API (endpoint, from the stack - never from the
+    event) streams to that client; development mode keeps messages in memory.
+    """
+    options = {key: stream[key] for key in ('min_chars', 'max_delay_seconds') if key in stream}
+    if development_mode:
+        return InMemoryLetterPublisher(stream_id, **options)
+    if not endpoint:
+        raise ValueError("Letter streaming is not configured (APPEAL_STREAM_ENDPOINT)")
+    if not stream.get('connectionId'):
+        raise ValueError("stream requires connectionId")
+    return WebSocketLetterPublisher(stream_id, endpoint, stream['connectionId'], **options)
+
+
+def chunk_text(text: str, chunk_chars: int = 12) -> Iterator[str]:
+    """Split text into model-sized chunks (mock streams in development mode)"""
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
@@ -2,24 +2,118 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from base_agent import BaseAgent
-from typing import Dict, Any, Optional
+from base_agent import BaseAgent, LLMThrottledError
+from throttle import AdaptiveConcurrencyLimiter, backoff_delay
+from schema_validator import check_contract, compile_validator, get_input_validator
+from clinical_notes import prepare_notes
+from code_sets import get_code_sets, encode_date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, List, Iterator
 import json
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Batch mode configuration
+BATCH_MAX_ENCOUNTERS = int(os.environ.get('CODING_BATCH_MAX_ENCOUNTERS', '500'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('CODING_BATCH_MAX_CONCURRENCY', '8'))
+BATCH_INITIAL_CONCURRENCY = int(os.environ.get('CODING_BATCH_INITIAL_CONCURRENCY', '4'))
+BATCH_MAX_ATTEMPTS = int(os.environ.get('CODING_BATCH_MAX_ATTEMPTS', '4'))
+
+# schemas/coding-agent.json request contract, compiled at cold start
+INPUT_CONTRACT = get_input_validator('coding-agent')
+
+# Output mode: 'text' parses JSON out of free text; 'structured' (opt-in) has Nova
+# Pro record codes through a Converse tool call constrained by CODING_TOOL_SCHEMA
+OUTPUT_MODE = os.environ.get('CODING_OUTPUT_MODE', 'text').lower()
+# Follow-up calls that re-request only the code entries that failed validation
+REPAIR_ATTEMPTS = int(os.environ.get('CODING_REPAIR_ATTEMPTS', '1'))
+# Clinical notes are compressed to this many (estimated) tokens before prompting; 0 = no limit
+NOTES_TOKEN_BUDGET = int(os.environ.get('CODING_NOTES_TOKEN_BUDGET', '2000'))
+
+# CPT Category I-III and HCPCS Level II (e.g. 99214, 0001T, G0439)
+CPT_CODE_PATTERN = r'^([0-9]{4}[0-9A-Z]|[A-Z][0-9]{4})$'
+ICD_CODE_PATTERN = r'^[A-Z][0-9]{2}(\.[0-9A-Z]{1,4})?$'
+
+def _code_entry_schema(code_pattern: str) -> Dict[str, Any]:
+    return {
+        'type': 'object',
+        'properties': {
+            'code': {'type': 'string', 'pattern': code_pattern},
+            'description': {'type': 'string'},
+            'confidence': {'type': 'number', 'minimum': 0, 'maximum': 1},
+            'reasoning': {'type': 'string'}
+        },
+        'required': ['code', 'description', 'confidence']
+    }
+
+CODE_ENTRY_SCHEMAS = {
+    'cpt_codes': _code_entry_schema(CPT_CODE_PATTERN),
+    'icd_codes': _code_entry_schema(ICD_CODE_PATTERN)
+}
+CODE_ENTRY_VALIDATORS = {name: compile_validator(schema, name=name) for name, schema in CODE_ENTRY_SCHEMAS.items()}
+# Billable leaves offered when the model returns an ICD-10-CM category header
+CODE_SET_SUGGESTIONS = 5
+
+CODING_TOOL_NAME = 'record_medical_codes'
+CODING_TOOL_DESCRIPTION = 'Record the CPT and ICD-10 codes supported by the clinical documentation'
+CODING_TOOL_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'cpt_codes': {'type': 'array', 'items': CODE_ENTRY_SCHEMAS['cpt_codes']},
+        'icd_codes': {'type': 'array', 'items': CODE_ENTRY_SCHEMAS['icd_codes']},
+        'coding_notes': {'type': 'string'},
+        'documentation_gaps': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['cpt_codes', 'icd_codes']
+}
+
 class CodingAgent(BaseAgent):
     """
     AI-powered medical coding using AWS Bedrock Nova Pro
     
     Converts clinical documentation into appropriate CPT and ICD-10 codes
     for claim submission. Replaces manual coding processes with AI accuracy.
+    
+    Batch mode: an event with an `encounters` list codes every encounter in one
+    invocation, fanning out to Bedrock under an adaptive concurrency limit.
+    
+    Structured output (CODING_OUTPUT_MODE=structured): codes come back as the
+    input of a forced tool call and are validated entry by entry; only the
+    entries that fail validation are sent back to the model for correction.
+    
+    Code sets (CODE_SETS_PATH): every returned code is checked against the
+    CPT/HCPCS/ICD-10-CM index for the date of service, and its description
+    is replaced with the canonical text. Unknown, inactive and non-billable
+    codes count as failed entries.
     """
     
     def validate_input(self, event: Dict[str, Any]) -> Optional[str]:
         """Validate required input fields"""
         
+        if 'encounters' in event:
+            encounters = event.get('encounters')
+            if not isinstance(encounters, list) or not encounters:
+                return "encounters must be a non-empty list"
+            if len(encounters) > BATCH_MAX_ENCOUNTERS:
+                return f"Batch too large: {len(encounters)} encounters (max {BATCH_MAX_ENCOUNTERS})"
+            # Individual encounters are validated per item so one bad record
+            # does not fail the whole batch
+            return None
+        
+        return self._validate_encounter(event)
+    
+    def _validate_encounter(self, event: Dict[str, Any], path: str = '') -> Optional[str]:
+        """Validate a single encounter"""
+        
+        if not isinstance(event, dict):
+            return "Encounter must be an object"
+        
+        contract_error = check_contract(INPUT_CONTRACT, event, path)
+        if contract_error:
+            return contract_error
+        
         # Check for required clinical data
         clinical_notes = event.get('clinicalNotes') or event.get('chartNotes')
         if not clinical_notes:
@@ -34,20 +128,37 @@ class CodingAgent(BaseAgent):
     def execute_production_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Execute AI-powered medical coding"""
         
+        if 'encounters' in event:
+            return self._execute_batch(event['encounters'], self._code_encounter)
+        
+        return self._code_encounter(event)
+    
+    def _code_encounter(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Code one encounter with a single Nova Pro call"""
+        
         # Extract input data
         patient_data = event.get('patientData', {})
         encounter_data = event.get('encounterData', {})
         clinical_notes = event.get('clinicalNotes') or event.get('chartNotes', '')
         claim_id = event.get('claimId')
+        service_date = self._service_date(encounter_data)
         
-        # Build Nova Pro prompt
-        prompt = self._build_coding_prompt(patient_data, encounter_data, clinical_notes)
-        
-        # Invoke Nova Pro
-        response_text = self.invoke_nova_pro(prompt, max_tokens=2000, temperature=0.1)
+        # Drop boilerplate and copied-forward text, trim to the token budget
+        clinical_notes, notes_metrics = prepare_notes(clinical_notes, 'coding', NOTES_TOKEN_BUDGET)
+        llm_start = time.perf_counter()
         
-        # Parse response
-        coding_result = self._parse_coding_response(response_text)
+        if OUTPUT_MODE == 'structured':
+            coding_result = self._code_structured(patient_data, encounter_data, clinical_notes, service_date)
+        else:
+            # Build Nova Pro prompt
+            prompt = self._build_coding_prompt(patient_data, encounter_data, clinical_notes)
+            
+            # Invoke Nova Pro
+            response_text = self.invoke_nova_pro(prompt, max_tokens=2000, temperature=0.1)
+            
+            # Parse response
+            coding_result = self._parse_coding_response(response_text, service_date)
+            coding_result['output'] = {'mode': 'text'}
         
         # Add metadata
         coding_result.update({
@@ -55,7 +166,8 @@ class CodingAgent(BaseAgent):
             'patient_id': patient_data.get('id'),
             'model_used': self.bedrock_model_id,
             'confidence_threshold': 0.85,
-            'requires_review': self._requires_manual_review(coding_result)
+            'requires_review': self._requires_manual_review(coding_result),
+            'prompt': dict(notes_metrics, llm_ms=int((time.perf_counter() - llm_start) * 1000))
         })
         
         return coding_result
@@ -63,6 +175,14 @@ class CodingAgent(BaseAgent):
     def execute_development_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Return realistic mock coding data for development"""
         
+        if 'encounters' in event:
+            return self._execute_batch(event['encounters'], self._mock_coding_result)
+        
+        return self._mock_coding_result(event)
+    
+    def _mock_coding_result(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Mock coding result for one encounter"""
+        
         patient_data = event.get('patientData', {})
         encounter_data = event.get('encounterData', {})
         
@@ -104,12 +224,271 @@ class CodingAgent(BaseAgent):
             'overall_confidence': 0.89
         }
     
-    def _build_coding_prompt(self, patient_data: Dict, encounter_data: Dict, clinical_notes: str) -> str:
-        """Build comprehensive prompt for Nova Pro medical coding"""
+    def code_encounters(self, encounters: List[Dict[str, Any]], code_fn=None,
+                        limiter: Optional[AdaptiveConcurrencyLimiter] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Code encounters concurrently, yielding each item's result as soon as it
+        completes (not in input order). Failures are reported per item.
+        """
+        code_fn = code_fn or self._code_encounter
+        limiter = limiter or AdaptiveConcurrencyLimiter(
+            initial_limit=BATCH_INITIAL_CONCURRENCY, max_limit=BATCH_MAX_CONCURRENCY
+        )
         
-        prompt = f"""You are an expert medical coder certified in CPT and ICD-10 coding. Analyze the following clinical documentation and provide accurate medical codes.
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY) as executor:
+            futures = [
+                executor.submit(self._code_batch_item, index, encounter, code_fn, limiter)
+                for index, encounter in enumerate(encounters)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+    
+    def _execute_batch(self, encounters: List[Dict[str, Any]], code_fn) -> Dict[str, Any]:
+        """Run a batch and summarize per-item outcomes"""
+        
+        start = time.perf_counter()
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=BATCH_INITIAL_CONCURRENCY, max_limit=BATCH_MAX_CONCURRENCY
+        )
+        
+        results = []
+        for item in self.code_encounters(encounters, code_fn, limiter):
+            logger.info(f"Encounter {item['index']} coded: success={item['success']}, attempts={item['attempts']}")
+            results.append(item)
+        results.sort(key=lambda item: item['index'])
+        
+        succeeded = sum(1 for item in results if item['success'])
+        return {
+            'success': succeeded > 0,
+            'batch': True,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'elapsed_ms': int((time.perf_counter() - start) * 1000),
+            'concurrency': limiter.get_metrics(),
+            'results': results
+        }
+    
+    def _code_batch_item(self, index: int, encounter: Dict[str, Any], code_fn,
+                         limiter: AdaptiveConcurrencyLimiter) -> Dict[str, Any]:
+        """Code one batch item, retrying with jittered backoff while throttled"""
+        
+        item = {
+            'index': index,
+            'claim_id': encounter.get('claimId') if isinstance(encounter, dict) else None,
+            'success': False,
+            'attempts': 0
+        }
+        
+        validation_error = self._validate_encounter(encounter, f'encounters[{index}]')
+        if validation_error:
+            item['error'] = validation_error
+            return item
+        
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            item['attempts'] = attempt + 1
+            try:
+                with limiter.slot():
+                    result = code_fn(encounter)
+                limiter.record_success()
+                item['success'] = bool(result.get('success', True))
+                item['result'] = result
+                if not item['success']:
+                    item['error'] = result.get('error', 'Coding failed')
+                return item
+            except LLMThrottledError as e:
+                limiter.record_throttle()
+                item['error'] = str(e)
+                if attempt + 1 < BATCH_MAX_ATTEMPTS:
+                    time.sleep(backoff_delay(attempt))
+            except Exception as e:
+                logger.error(f"Encounter {index} coding failed: {str(e)}")
+                item['error'] = str(e)
+                return item
+        
+        return item
+    
+    def _code_structured(self, patient_data: Dict, encounter_data: Dict, clinical_notes: str,
+                         service_date: Optional[int] = None) -> Dict[str, Any]:
+        """Code one encounter through a schema-constrained tool call, repairing only malformed entries"""
+        
+        prompt = self._build_structured_prompt(patient_data, encounter_data, clinical_notes)
+        response = self.invoke_nova_pro_tool(
+            prompt, CODING_TOOL_NAME, CODING_TOOL_DESCRIPTION, CODING_TOOL_SCHEMA,
+            max_tokens=2000, temperature=0.1
+        )
+        usage = [response['usage']]
+        output = response['input']
+        
+        if output is None:
+            # The model answered in text despite the forced tool choice
+            coding_result = self._parse_coding_response(response['text'], service_date)
+            coding_result['output'] = {'mode': 'structured', 'tool_call': False, 'repairs': 0,
+                                       'usage': self._sum_usage(usage)}
+            return coding_result
+        
+        coding_result = {
+            'success': True,
+            'cpt_codes': [],
+            'icd_codes': [],
+            'coding_notes': output.get('coding_notes', ''),
+            'documentation_gaps': output.get('documentation_gaps', [])
+        }
+        malformed = self._accept_code_entries(output, coding_result, list(CODE_ENTRY_SCHEMAS), service_date)
+        
+        repairs = 0
+        while malformed and repairs < REPAIR_ATTEMPTS:
+            repairs += 1
+            logger.info(f"Re-requesting {sum(len(entries) for entries in malformed.values())} malformed code entries")
+            repair = self.invoke_nova_pro_tool(
+                self._build_repair_prompt(clinical_notes, coding_result, malformed),
+                CODING_TOOL_NAME, CODING_TOOL_DESCRIPTION, self._repair_tool_schema(malformed),
+                max_tokens=800, temperature=0.1
+            )
+            usage.append(repair['usage'])
+            malformed = self._accept_code_entries(repair['input'] or {}, coding_result, list(malformed), service_date)
+        
+        if malformed:
+            coding_result['malformed_entries'] = [
+                dict(entry, list=name) for name, entries in malformed.items() for entry in entries
+            ]
+        
+        coding_result = self._finalize_coding_result(coding_result)
+        coding_result['output'] = {'mode': 'structured', 'tool_call': True, 'repairs': repairs,
+                                   'usage': self._sum_usage(usage)}
+        return coding_result
+    
+    def _accept_code_entries(self, output: Dict[str, Any], coding_result: Dict[str, Any],
+                             list_names: List[str], service_date: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Move valid entries of the named code lists into coding_result; return
+        the malformed ones ({list name: [{'entry', 'errors'}]})
+        """
+        malformed = {}
+        for name in list_names:
+            entries = output.get(name)
+            if not isinstance(entries, list):
+                malformed[name] = [{'entry': entries, 'errors': [f"{name}: expected an array of codes"]}]
+                continue
+            
+            accepted = {entry['code'] for entry in coding_result[name]}
+            for index, entry in enumerate(entries):
+                errors = CODE_ENTRY_VALIDATORS[name](entry, f"{name}[{index}]")
+                if not errors:
+                    errors = self._check_code_set(name, entry, service_date, f"{name}[{index}]", coding_result)
+                if errors:
+                    malformed.setdefault(name, []).append({'entry': entry, 'errors': errors})
+                elif entry['code'] not in accepted:
+                    accepted.add(entry['code'])
+                    coding_result[name].append(entry)
+        return malformed
+    
+    def _service_date(self, encounter_data: Dict) -> int:
+        """Date of service as YYYYMMDD for code-set checks; today when missing or unreadable"""
+        
+        try:
+            return encode_date(encounter_data.get('dateOfService'))
+        except ValueError:
+            logger.warning(f"Unreadable date of service {encounter_data.get('dateOfService')!r}; checking codes as of today")
+            return encode_date(None)
+    
+    def _check_code_set(self, name: str, entry: Dict[str, Any], service_date: Optional[int], path: str,
+                        coding_result: Dict[str, Any]) -> List[str]:
+        """
+        Check one code against the code-set index (no-op when CODE_SETS_PATH
+        is unset). A valid code takes the canonical code and description; an
+        unknown, inactive or non-billable one returns its errors.
+        """
+        code_sets = get_code_sets()
+        if code_sets is None:
+            return []
+        
+        code = str(entry['code'])
+        if name == 'icd_codes':
+            system = 'ICD10CM'
+        else:
+            system = 'HCPCS' if code[:1].isalpha() else 'CPT'
+        check = code_sets.validate(system, code, service_date, suggestions=CODE_SET_SUGGESTIONS)
+        stats = coding_result.setdefault('code_sets', {'checked': 0, 'descriptions_replaced': 0, 'rejected': 0})
+        stats['checked'] += 1
+        
+        if check['status'] != 'valid':
+            stats['rejected'] += 1
+            error = f"{path}.code: {check['message']}"
+            if check.get('suggestions'):
+                error += f" (billable codes: {', '.join(check['suggestions'])})"
+            return [error]
+        
+        canonical = check['entry']
+        entry['code'] = canonical['code']
+        if entry.get('description') != canonical['description']:
+            stats['descriptions_replaced'] += 1
+            entry['description'] = canonical['description']
+        return []
+    
+    def _screen_code_sets(self, result: Dict[str, Any], service_date: Optional[int]):
+        """Text mode: move codes that fail the code-set check into malformed_entries"""
+        
+        for name in CODE_ENTRY_SCHEMAS:
+            entries = result.get(name)
+            if not isinstance(entries, list):
+                continue
+            kept = []
+            for index, entry in enumerate(entries):
+                errors = []
+                if isinstance(entry, dict) and entry.get('code'):
+                    errors = self._check_code_set(name, entry, service_date, f"{name}[{index}]", result)
+                if errors:
+                    result.setdefault('malformed_entries', []).append({'entry': entry, 'errors': errors, 'list': name})
+                else:
+                    kept.append(entry)
+            result[name] = kept
+    
+    def _repair_tool_schema(self, malformed: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Tool schema limited to the code lists that need correcting"""
+        
+        return {
+            'type': 'object',
+            'properties': {name: CODING_TOOL_SCHEMA['properties'][name] for name in malformed},
+            'required': list(malformed)
+        }
+    
+    def _build_repair_prompt(self, clinical_notes: str, coding_result: Dict[str, Any],
+                             malformed: Dict[str, List[Dict[str, Any]]]) -> str:
+        """Ask for corrected versions of the malformed entries only"""
+        
+        accepted = ', '.join(entry['code'] for name in malformed for entry in coding_result[name]) or 'None'
+        problems = []
+        for name, entries in malformed.items():
+            for item in entries:
+                problems.append(f"{name}: {json.dumps(item['entry'], default=str)}")
+                problems.extend(f"  - {error}" for error in item['errors'])
+        problem_text = '\n'.join(problems)
+        
+        return f"""You are an expert medical coder certified in CPT and ICD-10 coding. Some code entries you recorded for this encounter were malformed. Record corrected versions of these entries only, using the {CODING_TOOL_NAME} tool. Do not repeat codes that were already accepted; omit an entry if the documentation does not support any code for it.
 
-PATIENT INFORMATION:
+CLINICAL DOCUMENTATION:
+{clinical_notes}
+
+ACCEPTED CODES: {accepted}
+
+MALFORMED ENTRIES:
+{problem_text}"""
+    
+    def _sum_usage(self, usages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Token usage summed over the calls made for one encounter"""
+        
+        totals = {'inputTokens': 0, 'outputTokens': 0, 'totalTokens': 0}
+        for usage in usages:
+            for key in totals:
+                totals[key] += int(usage.get(key, 0) or 0)
+        totals['calls'] = len(usages)
+        return totals
+    
+    def _encounter_context(self, patient_data: Dict, encounter_data: Dict, clinical_notes: str) -> str:
+        """Patient, encounter and documentation sections shared by the coding prompts"""
+        
+        return f"""PATIENT INFORMATION:
 Age: {patient_data.get('age', 'Not provided')}
 Gender: {patient_data.get('gender', 'Not provided')}
 Insurance: {patient_data.get('insurance', 'Not provided')}
@@ -121,7 +500,29 @@ Provider: {encounter_data.get('provider', 'Not provided')}
 Place of Service: {encounter_data.get('placeOfService', 'Office')}
 
 CLINICAL DOCUMENTATION:
-{clinical_notes}
+{clinical_notes}"""
+    
+    def _build_structured_prompt(self, patient_data: Dict, encounter_data: Dict, clinical_notes: str) -> str:
+        """Coding prompt for structured output; the tool schema replaces the example JSON"""
+        
+        return f"""You are an expert medical coder certified in CPT and ICD-10 coding. Analyze the following clinical documentation and record accurate medical codes with the {CODING_TOOL_NAME} tool.
+
+{self._encounter_context(patient_data, encounter_data, clinical_notes)}
+
+CODING REQUIREMENTS:
+1. The most specific CPT codes for all procedures, services, and evaluations performed
+2. The most specific ICD-10 codes for all diagnoses, both primary and secondary
+3. A confidence score (0.0-1.0) and brief reasoning for each code, based on documentation quality
+4. Missing documentation that could improve coding accuracy in documentation_gaps
+
+Ensure medical necessity is supported by the documentation, follow current CMS guidelines, and include preventive care codes when applicable."""
+    
+    def _build_coding_prompt(self, patient_data: Dict, encounter_data: Dict, clinical_notes: str) -> str:
+        """Build comprehensive prompt for Nova Pro medical coding"""
+        
+        prompt = f"""You are an expert medical coder certified in CPT and ICD-10 coding. Analyze the following clinical documentation and provide accurate medical codes.
+
+{self._encounter_context(patient_data, encounter_data, clinical_notes)}
 
 CODING REQUIREMENTS:
 1. Provide the most specific and appropriate CPT codes for all procedures, services, and evaluations performed
@@ -162,34 +563,14 @@ Please respond in the following JSON format only:
         
         return prompt
     
-    def _parse_coding_response(self, response_text: str) -> Dict[str, Any]:
+    def _parse_coding_response(self, response_text: str, service_date: Optional[int] = None) -> Dict[str, Any]:
         """Parse and validate Nova Pro coding response"""
         
         try:
             result = self.extract_json_from_text(response_text)
-            
-            # Validate response structure
-            if not result.get('success'):
-                return {'success': False, 'error': 'AI coding failed', 'requires_review': True}
-            
-            # Ensure required fields exist
-            cpt_codes = result.get('cpt_codes', [])
-            icd_codes = result.get('icd_codes', [])
-            
-            if not cpt_codes and not icd_codes:
-                return {'success': False, 'error': 'No codes generated', 'requires_review': True}
-            
-            # Calculate overall confidence
-            all_confidences = []
-            for code_list in [cpt_codes, icd_codes]:
-                for code in code_list:
-                    if 'confidence' in code:
-                        all_confidences.append(code['confidence'])
-            
-            overall_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0.0
-            
-            result['overall_confidence'] = overall_confidence
-            return result
+            if result.get('success'):
+                self._screen_code_sets(result, service_date)
+            return self._finalize_coding_result(result)
             
         except Exception as e:
             logger.error(f"Failed to parse coding response: {str(e)}")
@@ -200,6 +581,35 @@ Please respond in the following JSON format only:
                 'raw_response': response_text[:500]  # First 500 chars for debugging
             }
     
+    def _finalize_coding_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Check a coding result has codes and add its overall confidence"""
+        
+        # Validate response structure
+        if not result.get('success'):
+            return {'success': False, 'error': 'AI coding failed', 'requires_review': True}
+        
+        # Ensure required fields exist
+        cpt_codes = result.get('cpt_codes', [])
+        icd_codes = result.get('icd_codes', [])
+        
+        if not cpt_codes and not icd_codes:
+            failure = {'success': False, 'error': 'No codes generated', 'requires_review': True}
+            if result.get('malformed_entries'):
+                failure['malformed_entries'] = result['malformed_entries']
+            return failure
+        
+        # Calculate overall confidence
+        all_confidences = []
+        for code_list in [cpt_codes, icd_codes]:
+            for code in code_list:
+                if 'confidence' in code:
+                    all_confidences.append(code['confidence'])
+        
+        overall_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0.0
+        
+        result['overall_confidence'] = overall_confidence
+        return result
+    
     def _requires_manual_review(self, coding_result: Dict[str, Any]) -> bool:
         """Determine if coding result requires manual review"""
         
@@ -215,6 +625,10 @@ Please respond in the following JSON format only:
         if coding_result.get('documentation_gaps'):
             return True
         
+        # Entries still malformed after repair need a coder's eye
+        if coding_result.get('malformed_entries'):
+            return True
+        
         # Check individual code confidences
         for code_list in [coding_result.get('cpt_codes', []), coding_result.get('icd_codes', [])]:
             for code in code_list:
@@ -0,0 +1,353 @@
+# CARC/RARC Rule Engine - Muni AI RCM Platform
+# Deterministic denial classification for standard adjustment codes
+
+import os
+import re
+import json
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Category -> default action, appeal likelihood, prevention tips and review flag
+CATEGORY_DEFAULTS = {
+    'coding_error': ('recode_and_resubmit', 0.70, [
+        'Validate CPT/HCPCS, modifier and ICD-10 combinations before submission',
+        'Check code validity for the date of service'
+    ], False),
+    'authorization_required': ('obtain_authorization', 0.45, [
+        'Verify prior authorization requirements at scheduling',
+        'Record authorization numbers on the claim'
+    ], True),
+    'eligibility_issue': ('verify_eligibility', 0.30, [
+        'Run a real-time eligibility check before the visit',
+        'Confirm member ID, name and date of birth match the payer record'
+    ], True),
+    'medical_necessity': ('appeal_with_documentation', 0.55, [
+        'Ensure diagnosis codes support medical necessity for each procedure',
+        'Review applicable LCD/NCD coverage criteria before ordering'
+    ], True),
+    'documentation_insufficient': ('appeal_with_documentation', 0.65, [
+        'Respond to payer record requests before the deadline',
+        'Attach supporting clinical documentation for high-risk services'
+    ], True),
+    'billing_error': ('correct_and_resubmit', 0.85, [
+        'Run claim scrubber edits for required fields',
+        'Verify provider identifiers (NPI, taxonomy) on every claim'
+    ], False),
+    'duplicate_claim': ('verify_original_claim_status', 0.10, [
+        'Check claim status before resubmitting',
+        'Use frequency code 7 for corrected claims instead of resubmitting'
+    ], False),
+    'timely_filing': ('appeal_with_proof_of_timely_filing', 0.20, [
+        'Track payer filing deadlines per claim',
+        'Keep clearinghouse acceptance reports as proof of timely filing'
+    ], True),
+    'coordination_of_benefits': ('update_coordination_of_benefits', 0.60, [
+        'Collect all active coverage at registration',
+        'Bill the primary payer first and attach its remittance to secondary claims'
+    ], False),
+    'patient_responsibility': ('bill_patient', 0.02, [
+        'Estimate and collect patient responsibility at time of service'
+    ], False),
+    'contractual_adjustment': ('write_off', 0.05, [
+        'Load contracted fee schedules to flag expected adjustments'
+    ], False),
+    'non_covered_service': ('review_coverage_and_bill_patient', 0.20, [
+        'Verify benefit coverage for the service before it is rendered',
+        'Obtain a signed ABN/waiver when coverage is doubtful'
+    ], True),
+    'bundling': ('review_bundling_and_modifiers', 0.40, [
+        'Run NCCI PTP edits before submission',
+        'Apply modifiers 59/XE/XS/XP/XU only when documentation supports a distinct service'
+    ], False),
+    'provider_enrollment': ('update_provider_enrollment', 0.35, [
+        'Keep payer enrollment and credentialing current for every rendering provider',
+        'Verify network status before scheduling'
+    ], True)
+}
+
+# Published CARC/RARC lists -> (category, confidence); see load_code_lists
+CODE_LISTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'carc_rarc_codes.json')
+
+# Group code -> (category, confidence) for CARCs the lists give no category (or
+# do not list yet). CO and OA have none: the provider's liability depends on the
+# reason, so those codes go to the LLM unless a remark code settles them.
+GROUP_CODE_DEFAULTS = {
+    'PR': ('patient_responsibility', 0.85),
+    'PI': ('contractual_adjustment', 0.80),
+    'CR': ('contractual_adjustment', 0.80)
+}
+
+# CARCs that never reach a real denial queue on their own
+INFORMATIONAL_CATEGORIES = {'patient_responsibility', 'contractual_adjustment'}
+
+# RARCs that change the corrective action rather than the category
+RARC_ACTIONS = {
+    'MA130': ('correct_and_resubmit', 0.0)  # no appeal rights - submit a new claim
+}
+
+GROUP_CODE_PATTERN = re.compile(r'\b(CO|PR|OA|PI|CR)\s*-?\s*([A-Z]?\d{1,3})\b')
+RARC_PATTERN = re.compile(r'\b(MA\d{1,3}|M\d{1,3}|N\d{1,4})\b')
+BARE_CARC_PATTERN = re.compile(r'^\s*([A-Z]?\d{1,3})\s*$')
+
+
+class CARCRuleEngine:
+    """
+    Compiled CARC/RARC/group-code rule table.
+
+    Built from the published code lists; payer overrides are merged into a
+    per-payer table once at construction, so classification is a handful of
+    dict lookups. Returns None (and counts an escalation) when the denial is
+    free text, or its codes are unlisted, ambiguous without a remark code or
+    disagree, so the caller can fall back to the LLM.
+    """
+
+    def __init__(self, payer_overrides: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+                 code_lists: Optional[Dict[str, Any]] = None):
+        self._code_lists = code_lists if code_lists is not None else load_code_lists()
+        self._known = set(self._code_lists['carc']) | set(self._code_lists['rarc'])
+        self._base = self._compile({})
+        self._payer_tables = {
+            payer.lower(): self._compile(overrides)
+            for payer, overrides in (payer_overrides or {}).items()
+        }
+        self._lock = threading.Lock()
+        self._metrics = {
+            'rule_hits': 0,
+            'llm_escalations': 0,
+            'payer_override_hits': 0,
+            'rule_time_us': 0.0,
+            'escalation_reasons': {}
+        }
+
+    def classify(self, denial_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Classify a denial from its codes, or return None to escalate to the LLM"""
+        start = time.perf_counter()
+        result, reason = self._classify(denial_data)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+
+        with self._lock:
+            self._metrics['rule_time_us'] += elapsed_us
+            if result:
+                self._metrics['rule_hits'] += 1
+                if result.get('payer_override'):
+                    self._metrics['payer_override_hits'] += 1
+            else:
+                self._metrics['llm_escalations'] += 1
+                reasons = self._metrics['escalation_reasons']
+                reasons[reason] = reasons.get(reason, 0) + 1
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Rule-path vs LLM-path counts and hit rate"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['escalation_reasons'] = dict(self._metrics['escalation_reasons'])
+        total = metrics['rule_hits'] + metrics['llm_escalations']
+        metrics['rule_hit_rate'] = metrics['rule_hits'] / total if total else 0.0
+        metrics['avg_rule_time_us'] = round(metrics.pop('rule_time_us') / total, 2) if total else 0.0
+        return metrics
+
+    def _classify(self, denial_data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+        carcs, rarcs = self._extract_codes(denial_data)
+        if not carcs and not rarcs:
+            return None, 'no_codes'
+
+        table = self._table_for(denial_data)
+
+        # (label, rule, decisive): generic CARCs and group-code defaults only
+        # decide the category when nothing more specific is present
+        matches = []
+        for group, code in carcs:
+            label = f"{group}-{code}" if group else code
+            rule = self._lookup(table, label if group else None, code)
+            decisive = rule is not None and code not in table['generic']
+            if rule is None:
+                rule = table['group_defaults'].get(group)
+                if rule is None and code not in self._known:
+                    return None, 'unknown_carc'
+            matches.append((label, rule, decisive))
+
+        rarc_matches = [(rarc, table['rarc'][rarc]) for rarc in rarcs if rarc in table['rarc']]
+
+        # Informational adjustments (deductible, contractual) ride along with
+        # real denials; classify on the denial codes when there are any
+        ruled = [match for match in matches if match[1] is not None]
+        actionable = [match for match in ruled if match[1]['category'] not in INFORMATIONAL_CATEGORIES]
+        candidates = actionable or ruled
+
+        categories = {rule['category'] for _, rule, decisive in candidates if decisive}
+        if len(categories) > 1:
+            return None, 'conflicting_codes'
+
+        if categories:
+            label, rule, _ = next(match for match in candidates if match[2])
+        elif rarc_matches:
+            # Only generic CARCs (e.g. CO-16): the remark code carries the meaning
+            label, rule = rarc_matches[0]
+            if len({rule['category'] for _, rule in rarc_matches}) > 1:
+                return None, 'conflicting_codes'
+        elif candidates:
+            label, rule, _ = candidates[0]
+            if rule['confidence'] < 0.75:
+                return None, 'generic_code'
+        elif matches or any(rarc in self._known for rarc in rarcs):
+            # Listed codes that carry no category (CO-95, alert remark codes)
+            return None, 'ambiguous_code'
+        else:
+            return None, 'unknown_rarc'
+
+        return self._result(label, rule, [m[0] for m in matches], [r[0] for r in rarc_matches],
+                            table), 'rule'
+
+    def _result(self, label: str, rule: Dict[str, Any], carcs: List[str], rarcs: List[str],
+                table: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            'category': rule['category'],
+            'suggested_action': rule['suggested_action'],
+            'confidence': rule['confidence'],
+            'appeal_likelihood': rule['appeal_likelihood'],
+            'prevention_tips': list(rule['prevention_tips']),
+            'requires_review': rule['requires_review'],
+            'reasoning': f"Matched rule {rule.get('rule_name', label)} ({', '.join(carcs + rarcs)})",
+            'matched_codes': {'carc': carcs, 'rarc': rarcs},
+            'classification_source': 'rules',
+            'payer_override': rule['payer_override']
+        }
+
+        for rarc in rarcs:
+            if rarc in table['rarc_actions']:
+                result['suggested_action'], result['appeal_likelihood'] = table['rarc_actions'][rarc]
+                break
+
+        return result
+
+    def _lookup(self, table: Dict[str, Any], group_key: Optional[str], code: str) -> Optional[Dict[str, Any]]:
+        if group_key and group_key in table['carc']:
+            return table['carc'][group_key]
+        return table['carc'].get(code)
+
+    def _table_for(self, denial_data: Dict[str, Any]) -> Dict[str, Any]:
+        for key in (denial_data.get('payerId'), denial_data.get('payerName')):
+            if key:
+                payer_table = self._payer_tables.get(str(key).lower())
+                if payer_table:
+                    return payer_table
+        return self._base
+
+    def _extract_codes(self, denial_data: Dict[str, Any]) -> Tuple[List[Tuple[str, str]], List[str]]:
+        denial_code = str(denial_data.get('denialCode') or '').upper()
+        text = f"{denial_code} {str(denial_data.get('denialReason') or '').upper()}"
+
+        carcs = list(dict.fromkeys(GROUP_CODE_PATTERN.findall(text)))
+        rarcs = list(dict.fromkeys(RARC_PATTERN.findall(text)))
+
+        # A bare code ("45", "B7") is only trusted in the denialCode field -
+        # numbers in free text are usually amounts or dates
+        if not carcs:
+            bare = BARE_CARC_PATTERN.match(denial_code)
+            if bare and bare.group(1) not in rarcs:
+                carcs = [('', bare.group(1))]
+
+        return carcs, rarcs
+
+    def _compile(self, overrides: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Build lookup dicts with category defaults resolved up front"""
+
+        def build(category: str, confidence: float, override: Dict[str, Any]) -> Dict[str, Any]:
+            category = override.get('category', category)
+            action, likelihood, tips, review = CATEGORY_DEFAULTS.get(
+                category, ('manual_review', 0.5, [], True)
+            )
+            return {
+                'category': category,
+                'confidence': override.get('confidence', confidence),
+                'suggested_action': override.get('suggested_action', action),
+                'appeal_likelihood': override.get('appeal_likelihood', likelihood),
+                'prevention_tips': override.get('prevention_tips', tips),
+                'requires_review': override.get('requires_review', review),
+                'payer_override': bool(override)
+            }
+
+        # Group-specific entries ("PR-96") take precedence over code-only entries ("96");
+        # listed codes without a category are left out
+        code_lists = self._code_lists
+        carc = {code: build(rule[0], rule[1], overrides.get(code, {}))
+                for code, rule in {**code_lists['carc'], **code_lists['carc_group']}.items() if rule}
+        rarc = {code: build(rule[0], rule[1], overrides.get(code, {}))
+                for code, rule in code_lists['rarc'].items() if rule}
+
+        # Override-only codes extend the table
+        for code, override in overrides.items():
+            if 'category' not in override:
+                continue
+            target = rarc if RARC_PATTERN.fullmatch(code) else carc
+            if code not in target:
+                target[code] = build(override['category'], override.get('confidence', 0.9), override)
+
+        group_defaults = {
+            group: dict(build(category, confidence, {}), rule_name=f"{group} group default")
+            for group, (category, confidence) in GROUP_CODE_DEFAULTS.items()
+        }
+
+        return {
+            'carc': carc,
+            'rarc': rarc,
+            'rarc_actions': dict(RARC_ACTIONS),
+            'generic': set(code_lists['generic_carcs']),
+            'group_defaults': group_defaults
+        }
+
+
+def load_code_lists(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load the published CARC/RARC lists (CODE_LISTS_PATH unless given):
+    {"carc": {"50": ["medical_necessity", 0.95], "95": null}, "carc_group": {"PR-96": [...]},
+     "rarc": {"N30": ["eligibility_issue", 0.88], "N1": null}, "generic_carcs": ["16", ...]}
+    null marks a listed code with no category of its own.
+    """
+    path = path or CODE_LISTS_PATH
+    try:
+        with open(path) as f:
+            code_lists = json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load CARC/RARC code lists from {path}: {str(e)}; denials will escalate to the LLM")
+        code_lists = {}
+    return {
+        'carc': code_lists.get('carc') or {},
+        'carc_group': code_lists.get('carc_group') or {},
+        'rarc': code_lists.get('rarc') or {},
+        'generic_carcs': code_lists.get('generic_carcs') or []
+    }
+
+
+def load_payer_overrides(path: Optional[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Load payer overrides from JSON:
+    {"<payer id or name>": {"CO-16": {"category": "...", "suggested_action": "..."}}}
+    """
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load denial rule overrides from {path}: {str(e)}")
+        return {}
+
+
+_engine: Optional[CARCRuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine(overrides_path: Optional[str] = None, code_lists_path: Optional[str] = None) -> CARCRuleEngine:
+    """Return the process-wide rule engine, compiling it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = CARCRuleEngine(load_payer_overrides(overrides_path), load_code_lists(code_lists_path))
+    return _engine
@@ -1,15 +1,49 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from base_agent import BaseAgent
-from typing import Dict, Any, Optional
+from base_agent import BaseAgent, LLMThrottledError
+from carc_rules import CARCRuleEngine, get_rule_engine
+from denial_dispatch import failed_record_ids, unwrap_batch_event
+from throttle import AdaptiveConcurrencyLimiter, backoff_delay
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, List, Tuple
 import json
+import time
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Batch mode configuration (batches arrive from ERAParserAgent via EventBridge/SQS)
+BATCH_MAX_DENIALS = int(os.environ.get('DENIAL_BATCH_MAX_DENIALS', '500'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('DENIAL_BATCH_MAX_CONCURRENCY', '8'))
+BATCH_INITIAL_CONCURRENCY = int(os.environ.get('DENIAL_BATCH_INITIAL_CONCURRENCY', '4'))
+BATCH_MAX_ATTEMPTS = int(os.environ.get('DENIAL_BATCH_MAX_ATTEMPTS', '4'))
+
+# One statement per batch (execute_values); denials.claim_id references claims.id,
+# so the payer's claim number is resolved through claims.claim_id
+UPSERT_DENIAL_SQL = """
+    INSERT INTO denials (
+        claim_id, denial_date, denial_reason_code, 
+        denial_reason_description, denial_category,
+        ai_suggested_action, ai_prevention_tips,
+        created_at, updated_at
+    )
+    SELECT c.id, COALESCE(v.denial_date::date, CURRENT_DATE), LEFT(v.reason_code, 10),
+           v.reason_description, v.category, v.suggested_action, v.prevention_tips::jsonb,
+           v.stored_at, v.stored_at
+    FROM (VALUES %s) AS v (claim_id, denial_date, reason_code, reason_description,
+                           category, suggested_action, prevention_tips, stored_at)
+    JOIN claims c ON c.claim_id = v.claim_id
+    ON CONFLICT (claim_id) DO UPDATE SET
+        denial_category = EXCLUDED.denial_category,
+        ai_suggested_action = EXCLUDED.ai_suggested_action,
+        ai_prevention_tips = EXCLUDED.ai_prevention_tips,
+        updated_at = EXCLUDED.updated_at
+"""
+
 class DenialClassifierAgent(BaseAgent):
     """
     AI-powered denial classification and analysis
@@ -19,15 +53,72 @@ class DenialClassifierAgent(BaseAgent):
     - Suggests corrective actions
     - Estimates appeal success probability
     - Identifies prevention strategies
+    
+    Standard CARC/RARC denials are classified by a compiled rule table; only
+    free-text, unknown or conflicting denials are escalated to Nova Pro.
+    
+    Batch mode: a `denials` list (sent by ERAParserAgent as an EventBridge
+    event or SQS message) is classified in one invocation - rule hits inline,
+    LLM escalations concurrently under an adaptive limit - and stored with a
+    single pooled connection.
     """
     
+    def __init__(self):
+        super().__init__()
+        self.rule_engine: CARCRuleEngine = get_rule_engine(
+            os.environ.get('DENIAL_RULE_OVERRIDES_PATH'), os.environ.get('DENIAL_CODE_LISTS_PATH')
+        )
+        self._batch_results: Optional[List[Dict[str, Any]]] = None
+    
+    def lambda_handler(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        """
+        Accept EventBridge/SQS denial batches as well as direct invokes
+        
+        SQS: messages with a failed denial are returned as batchItemFailures
+        (the event source mapping sets ReportBatchItemFailures) so only they
+        are redelivered. EventBridge: any failure raises so Lambda retries
+        the async invoke. Stored rows are upserts, so redelivery is safe.
+        """
+        batch_event = unwrap_batch_event(event)
+        self._batch_results = None
+        response = super().lambda_handler(batch_event, context)
+        
+        source = batch_event.get('source')
+        if source not in ('sqs', 'eventbridge'):
+            return response
+        
+        failed = failed_record_ids(batch_event, self._batch_results)
+        if source == 'eventbridge' and failed:
+            raise Exception(f"Denial batch {batch_event['batchIds'][0]} failed; retrying event")
+        if failed:
+            logger.warning(f"Returning {len(failed)} of {len(batch_event['recordIds'])} denial batch message(s) for redelivery")
+        response['batchItemFailures'] = [{'itemIdentifier': record_id} for record_id in failed]
+        return response
+    
     def validate_input(self, event: Dict[str, Any]) -> Optional[str]:
         """Validate denial data input"""
         
-        denial_data = event.get('denialData')
+        if 'denials' in event:
+            denials = event.get('denials')
+            if not isinstance(denials, list) or not denials:
+                return "denials must be a non-empty list"
+            if len(denials) > BATCH_MAX_DENIALS:
+                return f"Batch too large: {len(denials)} denials (max {BATCH_MAX_DENIALS})"
+            # Individual denials are validated per item so one bad record
+            # does not fail the whole batch
+            return None
+        
+        return self._validate_denial(event.get('denialData'))
+    
+    def _validate_denial(self, denial_data: Any) -> Optional[str]:
+        """Validate a single denial"""
+        
         if not denial_data:
             return "Missing required field: denialData"
         
+        if not isinstance(denial_data, dict):
+            return "denialData must be an object"
+        
         if not denial_data.get('denialReason'):
             return "Missing denial reason"
         
@@ -37,11 +128,30 @@ class DenialClassifierAgent(BaseAgent):
         return None
     
     def execute_production_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze denial using Nova Pro"""
+        """Analyze denial with the CARC/RARC rules, falling back to Nova Pro"""
+        
+        if 'denials' in event:
+            return self._execute_batch(event['denials'], self._analyze_denial, store=True)
         
         denial_data = event.get('denialData', {})
         claim_id = denial_data.get('claimId')
         
+        analysis_result = self._analyze_denial(denial_data)
+        
+        # Store denial record in database
+        self._store_denial_record(claim_id, denial_data, analysis_result)
+        
+        return self._denial_result(claim_id, analysis_result)
+    
+    def _analyze_denial(self, denial_data: Dict[str, Any]) -> Dict[str, Any]:
+        """CARC/RARC rules first, Nova Pro when the rules escalate"""
+        
+        analysis_result = self.rule_engine.classify(denial_data)
+        if analysis_result is None:
+            analysis_result = self._analyze_with_llm(denial_data)
+        return analysis_result
+    
+    def _analyze_with_llm(self, denial_data: Dict[str, Any]) -> Dict[str, Any]:
         # Build analysis prompt
         prompt = self._build_denial_analysis_prompt(denial_data)
         
@@ -50,10 +160,10 @@ class DenialClassifierAgent(BaseAgent):
         
         # Parse response
         analysis_result = self._parse_denial_analysis(response_text)
-        
-        # Store denial record in database
-        self._store_denial_record(claim_id, denial_data, analysis_result)
-        
+        analysis_result['classification_source'] = 'llm'
+        return analysis_result
+    
+    def _denial_result(self, claim_id: str, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
         return {
             'success': True,
             'claim_id': claim_id,
@@ -63,14 +173,29 @@ class DenialClassifierAgent(BaseAgent):
             'confidence': analysis_result.get('confidence'),
             'prevention_tips': analysis_result.get('prevention_tips', []),
             'requires_review': analysis_result.get('requires_review', False),
-            'model_used': self.bedrock_model_id
+            'classification_source': analysis_result['classification_source'],
+            'matched_codes': analysis_result.get('matched_codes'),
+            'model_used': self.bedrock_model_id if analysis_result['classification_source'] == 'llm' else 'carc_rule_engine'
         }
     
+    def get_classification_metrics(self) -> Dict[str, Any]:
+        """Rule-path vs LLM-path hit rates"""
+        return self.rule_engine.get_metrics()
+    
     def execute_development_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Return mock denial analysis for development"""
         
-        denial_data = event.get('denialData', {})
-        claim_id = denial_data.get('claimId')
+        if 'denials' in event:
+            batch = self._execute_batch(event['denials'], None, store=False)
+            for item in batch['results']:
+                if item['success']:
+                    item['result'] = self._mock_denial_result(item['claim_id'])
+            return batch
+        
+        return self._mock_denial_result(event.get('denialData', {}).get('claimId'))
+    
+    def _mock_denial_result(self, claim_id: Optional[str]) -> Dict[str, Any]:
+        """Mock denial analysis for one denial"""
         
         return {
             'success': True,
@@ -163,39 +288,143 @@ Respond in JSON format:
                 'error': f"Analysis parsing failed: {str(e)}"
             }
     
+    def _execute_batch(self, denials: List[Dict[str, Any]], analyze_fn, store: bool) -> Dict[str, Any]:
+        """
+        Classify a batch: rules inline, escalations to Nova Pro concurrently
+        (the Bedrock client is shared), then one transaction for every row
+        """
+        
+        start = time.perf_counter()
+        results: List[Dict[str, Any]] = []
+        escalations: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        
+        for index, denial_data in enumerate(denials):
+            item = {
+                'index': index,
+                'claim_id': denial_data.get('claimId') if isinstance(denial_data, dict) else None,
+                'success': False,
+                'attempts': 0
+            }
+            results.append(item)
+            
+            validation_error = self._validate_denial(denial_data)
+            if validation_error:
+                item['error'] = validation_error
+                continue
+            if analyze_fn is None:
+                item['success'] = True
+                continue
+            
+            analysis_result = self.rule_engine.classify(denial_data)
+            if analysis_result is None:
+                escalations.append((item, denial_data))
+            else:
+                item.update(success=True, analysis=analysis_result)
+        
+        rule_classified = sum(1 for item in results if item.get('analysis'))
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=BATCH_INITIAL_CONCURRENCY, max_limit=BATCH_MAX_CONCURRENCY
+        )
+        if escalations:
+            self.get_bedrock_client()
+            with ThreadPoolExecutor(max_workers=min(BATCH_MAX_CONCURRENCY, len(escalations))) as executor:
+                futures = [executor.submit(self._analyze_batch_item, item, denial_data, limiter)
+                           for item, denial_data in escalations]
+                for future in as_completed(futures):
+                    future.result()
+        
+        classified = [(item, denials[item['index']]) for item in results if item.get('analysis')]
+        store_error = None
+        if store and classified:
+            try:
+                self._store_denial_records([
+                    (item['claim_id'], denial_data, item['analysis']) for item, denial_data in classified
+                ])
+            except Exception as e:
+                logger.error(f"Failed to store {len(classified)} denial record(s): {str(e)}")
+                store_error = f"Failed to store denial record: {str(e)}"
+        for item, _ in classified:
+            item['result'] = self._denial_result(item['claim_id'], item.pop('analysis'))
+            if store_error:
+                item.update(success=False, error=store_error)
+        
+        # Read back by lambda_handler to report per-message failures
+        self._batch_results = results
+        succeeded = sum(1 for item in results if item['success'])
+        return {
+            'success': succeeded > 0,
+            'batch': True,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'rule_classified': rule_classified,
+            'llm_escalations': len(escalations),
+            'elapsed_ms': int((time.perf_counter() - start) * 1000),
+            'concurrency': limiter.get_metrics(),
+            'results': results
+        }
+    
+    def _analyze_batch_item(self, item: Dict[str, Any], denial_data: Dict[str, Any],
+                            limiter: AdaptiveConcurrencyLimiter):
+        """Escalate one denial to Nova Pro, retrying with jittered backoff while throttled"""
+        
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            item['attempts'] = attempt + 1
+            try:
+                with limiter.slot():
+                    analysis_result = self._analyze_with_llm(denial_data)
+                limiter.record_success()
+                item.update(success=True, analysis=analysis_result)
+                item.pop('error', None)
+                return
+            except LLMThrottledError as e:
+                limiter.record_throttle()
+                item['error'] = str(e)
+                if attempt + 1 < BATCH_MAX_ATTEMPTS:
+                    time.sleep(backoff_delay(attempt))
+            except Exception as e:
+                logger.error(f"Denial {item['claim_id']} classification failed: {str(e)}")
+                item['error'] = str(e)
+                return
+    
     def _store_denial_record(self, claim_id: str, denial_data: Dict[str, Any], analysis_result: Dict[str, Any]):
         """Store denial analysis in database for tracking and learning"""
         
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        INSERT INTO denials (
-                            claim_id, denial_date, denial_reason_code, 
-                            denial_reason_description, denial_category,
-                            ai_suggested_action, ai_prevention_tips,
-                            created_at
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (claim_id) DO UPDATE SET
-                            denial_category = EXCLUDED.denial_category,
-                            ai_suggested_action = EXCLUDED.ai_suggested_action,
-                            ai_prevention_tips = EXCLUDED.ai_prevention_tips,
-                            updated_at = %s
-                    """, (
-                        claim_id,
-                        denial_data.get('denialDate'),
-                        denial_data.get('denialCode'),
-                        denial_data.get('denialReason'),
-                        analysis_result.get('category'),
-                        analysis_result.get('suggested_action'),
-                        json.dumps(analysis_result.get('prevention_tips', [])),
-                        datetime.utcnow(),
-                        datetime.utcnow()
-                    ))
-                    conn.commit()
-                    
+            self._store_denial_records([(claim_id, denial_data, analysis_result)])
         except Exception as e:
             logger.warning(f"Failed to store denial record: {str(e)}")
+    
+    def _store_denial_records(self, records: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> int:
+        """
+        Upsert denial analyses in one statement and transaction on a pooled
+        connection. Returns the rows written; raises if the write fails.
+        """
+        from psycopg2.extras import execute_values
+        
+        # A claim may appear twice in a batch; ON CONFLICT cannot touch a row twice
+        latest = {claim_id: (denial_data, analysis_result) for claim_id, denial_data, analysis_result in records}
+        now = datetime.utcnow()
+        rows = [(
+            claim_id,
+            denial_data.get('denialDate'),
+            denial_data.get('denialCode'),
+            denial_data.get('denialReason'),
+            analysis_result.get('category'),
+            analysis_result.get('suggested_action'),
+            json.dumps(analysis_result.get('prevention_tips', [])),
+            now
+        ) for claim_id, (denial_data, analysis_result) in latest.items()]
+        
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, UPSERT_DENIAL_SQL, rows, page_size=len(rows))
+                written = cur.rowcount
+            conn.commit()
+        
+        if written < len(rows):
+            logger.warning(f"{len(rows) - written} denial(s) reference claims not in the claims table")
+        return written
 
 # Lambda handler entry point
 agent = DenialClassifierAgent()
@@ -0,0 +1,203 @@
+# ERA Bulk Loader - Muni AI RCM Platform
+# Streams parsed 835 claims into Postgres with COPY and set-based updates
+
+import json
+import time
+import logging
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGING_COLUMNS = (
+    'patient_control_number', 'claim_status', 'new_status', 'billed_amount',
+    'allowed_amount', 'paid_amount', 'patient_responsibility',
+    'contractual_adjustment', 'other_adjustments', 'adjustment_reason_codes'
+)
+
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE era_claim_staging (
+        patient_control_number VARCHAR(100),
+        claim_status VARCHAR(50),
+        new_status VARCHAR(50),
+        billed_amount DECIMAL(10,2),
+        allowed_amount DECIMAL(10,2),
+        paid_amount DECIMAL(10,2),
+        patient_responsibility DECIMAL(10,2),
+        contractual_adjustment DECIMAL(10,2),
+        other_adjustments DECIMAL(10,2),
+        adjustment_reason_codes JSONB
+    ) ON COMMIT DROP
+"""
+
+UPSERT_REMITTANCE_SQL = """
+    INSERT INTO remittance_advice (
+        era_id, payer_id, payer_name, check_number, check_date,
+        total_paid_amount, status, raw_era_data, created_at
+    ) VALUES (%s, %s, %s, %s, %s, %s, 'processing', %s, NOW())
+    ON CONFLICT (era_id) DO UPDATE SET
+        total_paid_amount = EXCLUDED.total_paid_amount,
+        status = 'processing',
+        raw_era_data = EXCLUDED.raw_era_data,
+        updated_at = NOW()
+    RETURNING id
+"""
+
+INSERT_DETAILS_SQL = """
+    INSERT INTO era_claim_details (
+        remittance_advice_id, claim_id, patient_control_number,
+        billed_amount, allowed_amount, paid_amount, patient_responsibility,
+        contractual_adjustment, other_adjustments, adjustment_reason_codes,
+        claim_status
+    )
+    SELECT %s, c.id, s.patient_control_number,
+           s.billed_amount, s.allowed_amount, s.paid_amount, s.patient_responsibility,
+           s.contractual_adjustment, s.other_adjustments, s.adjustment_reason_codes,
+           s.claim_status
+    FROM era_claim_staging s
+    LEFT JOIN claims c ON c.claim_id = s.patient_control_number
+"""
+
+UPDATE_CLAIMS_SQL = """
+    UPDATE claims c
+    SET status = s.new_status::claim_status,
+        paid_amount = s.paid_amount,
+        patient_responsibility = s.patient_responsibility,
+        adjustment_amount = s.contractual_adjustment + s.other_adjustments,
+        updated_at = NOW()
+    FROM era_claim_staging s
+    WHERE c.claim_id = s.patient_control_number
+      AND s.new_status IS NOT NULL
+"""
+
+# ERA claim status -> claims.status; reversals leave the claim untouched
+CLAIM_STATUS_MAP = {
+    'paid': 'paid',
+    'denied': 'denied'
+}
+
+
+def _copy_value(value: Any) -> str:
+    """Render one value in COPY text format"""
+    if value is None:
+        return '\\N'
+    text = value if isinstance(value, str) else str(value)
+    if '\\' in text or '\t' in text or '\n' in text or '\r' in text:
+        text = (text.replace('\\', '\\\\').replace('\t', '\\t')
+                    .replace('\n', '\\n').replace('\r', '\\r'))
+    return text
+
+
+class _CopyStream:
+    """File-like adapter that renders claim records into COPY rows on demand"""
+
+    def __init__(self, claims: Iterable[Dict[str, Any]]):
+        self._rows = self._render(claims)
+        self._buffer = ''
+        self.row_count = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += row
+
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def _render(self, claims: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        for claim in claims:
+            self.row_count += 1
+            adjustment_codes = claim.get('adjustment_codes')
+            values = (
+                claim.get('claim_id'),
+                claim.get('status'),
+                CLAIM_STATUS_MAP.get(claim.get('status')),
+                claim.get('charged_amount'),
+                claim.get('allowed_amount'),
+                claim.get('paid_amount'),
+                claim.get('patient_responsibility'),
+                claim.get('contractual_adjustment', 0.0),
+                claim.get('other_adjustments', 0.0),
+                json.dumps(adjustment_codes) if adjustment_codes else None
+            )
+            yield '\t'.join(_copy_value(value) for value in values) + '\n'
+
+
+class ERABulkLoader:
+    """
+    Persist one remittance in a single transaction:
+    1. Upsert the remittance_advice row
+    2. COPY the claim stream into a temp staging table
+    3. Replace era_claim_details for the remittance with one INSERT ... SELECT
+    4. Apply claims status/amount changes with one UPDATE ... FROM
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def load(self, era_header: Dict[str, Any], claims: Iterable[Dict[str, Any]],
+             era_id: Optional[str] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        era_id = era_id or self._era_id(era_header)
+        copy_stream = _CopyStream(claims)
+
+        try:
+            with self._conn.cursor() as cur:
+                cur.execute(UPSERT_REMITTANCE_SQL, (
+                    era_id,
+                    era_header.get('payer', {}).get('id'),
+                    era_header.get('payer', {}).get('name'),
+                    era_header.get('check_number'),
+                    era_header.get('payment_date'),
+                    era_header.get('total_payment'),
+                    json.dumps({key: value for key, value in era_header.items()
+                                if key != 'claim_details'}, default=str)
+                ))
+                remittance_id = cur.fetchone()[0]
+
+                cur.execute(CREATE_STAGING_SQL)
+                cur.copy_expert(
+                    f"COPY era_claim_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN",
+                    copy_stream
+                )
+
+                cur.execute("DELETE FROM era_claim_details WHERE remittance_advice_id = %s",
+                            (remittance_id,))
+                cur.execute(INSERT_DETAILS_SQL, (remittance_id,))
+                details_inserted = cur.rowcount
+
+                cur.execute(UPDATE_CLAIMS_SQL)
+                claims_updated = cur.rowcount
+
+                cur.execute("""
+                    UPDATE remittance_advice
+                    SET status = 'processed', processed_at = NOW()
+                    WHERE id = %s
+                """, (remittance_id,))
+
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+
+        elapsed = time.perf_counter() - start
+        rows = copy_stream.row_count
+        stats = {
+            'era_id': era_id,
+            'rows_staged': rows,
+            'details_inserted': details_inserted,
+            'claims_updated': claims_updated,
+            'elapsed_ms': int(elapsed * 1000),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else None
+        }
+        logger.info(f"ERA bulk load complete: {stats}")
+        return stats
+
+    def _era_id(self, era_header: Dict[str, Any]) -> str:
+        payer_id = era_header.get('payer', {}).get('id') or 'UNKNOWN'
+        check_number = era_header.get('check_number') or 'NOCHECK'
+        return f"{payer_id}-{check_number}"
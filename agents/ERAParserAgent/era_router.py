@@ -0,0 +1,190 @@
+# ERA Claim Router - Muni AI RCM Platform
+# Classifies each 835 claim once as it streams and fans it out to sinks
+
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PAYMENT = 'payment'
+PARTIAL_PAYMENT = 'partial_payment'
+DENIAL = 'denial'
+REVERSAL = 'reversal'
+CLASSIFICATIONS = (PAYMENT, PARTIAL_PAYMENT, DENIAL, REVERSAL)
+
+# Classification -> claims.status; reversals leave the claim untouched (see era_loader)
+STATUS_UPDATES = {
+    PAYMENT: 'paid',
+    PARTIAL_PAYMENT: 'paid',
+    DENIAL: 'denied'
+}
+
+Sink = Callable[[Dict[str, Any]], None]
+
+
+def _patient_owes(claim: Dict[str, Any]) -> bool:
+    if (claim.get('patient_responsibility') or 0) > 0:
+        return True
+    return any(adjustment.get('group_code') == 'PR' and (adjustment.get('amount') or 0) > 0
+               for adjustment in claim.get('adjustments') or ())
+
+
+def classify_claim(claim: Dict[str, Any]) -> Optional[str]:
+    """
+    reversal (CLP02 22), denial (denied or carrying a denial reason),
+    partial_payment (paid, but a service line was paid nothing or the payer
+    took PI reductions), payment (including zero-pay claims left entirely to
+    the patient), or None for claims with nothing to route
+    """
+    status = claim.get('status')
+    if status == 'reversed':
+        return REVERSAL
+    if status == 'denied' or claim.get('denial_reason'):
+        return DENIAL
+    if status != 'paid':
+        return None
+    if (claim.get('paid_amount') or 0) <= 0:
+        return PAYMENT if _patient_owes(claim) else None
+
+    for line in claim.get('service_lines') or ():
+        if (line.get('paid_amount') or 0) <= 0 and (line.get('charged_amount') or 0) > 0:
+            return PARTIAL_PAYMENT
+    for adjustment in claim.get('adjustments') or ():
+        if adjustment.get('group_code') == 'PI' and (adjustment.get('amount') or 0) > 0:
+            return PARTIAL_PAYMENT
+    return PAYMENT
+
+
+class ERAClaimRouter:
+    """
+    Single pass over an ERA's claims: each CLP record is classified once and
+    its payment/denial/reversal record handed straight to the sinks
+    registered for that classification. Remittance-level defaults and the
+    processing timestamp are resolved once per file rather than per row.
+
+    route() is a pass-through generator, so it can feed the bulk loader while
+    records are routed; nothing is buffered beyond what the sinks keep.
+    """
+
+    def __init__(self, era_data: Dict[str, Any], processed_at: Optional[str] = None):
+        self.processed_at = processed_at or datetime.utcnow().isoformat()
+        self.payment_date = era_data.get('payment_date') or self.processed_at
+        self.payer_name = (era_data.get('payer') or {}).get('name') or 'Unknown'
+        self.check_number = era_data.get('check_number') or 'EFT'
+        self.payment_method = era_data.get('payment_method') or 'electronic'
+
+        self.counts = dict.fromkeys(CLASSIFICATIONS, 0)
+        self.counts['unrouted'] = 0
+        self._sinks: Dict[str, List[Sink]] = {classification: [] for classification in CLASSIFICATIONS}
+        self._claim_sinks: List[Callable[[Dict[str, Any], Optional[str]], None]] = []
+        self._update_sinks: List[Sink] = []
+
+    def add_sink(self, classifications: Union[str, Tuple[str, ...]], sink: Sink) -> 'ERAClaimRouter':
+        """Receive the record built for every claim with one of these classifications"""
+        for classification in (classifications,) if isinstance(classifications, str) else classifications:
+            self._sinks[classification].append(sink)
+        return self
+
+    def add_claim_sink(self, sink: Callable[[Dict[str, Any], Optional[str]], None]) -> 'ERAClaimRouter':
+        """Receive every raw claim with its classification (None when unrouted)"""
+        self._claim_sinks.append(sink)
+        return self
+
+    def add_update_sink(self, sink: Sink) -> 'ERAClaimRouter':
+        """Receive a claims.status update for every paid/partially paid/denied claim"""
+        self._update_sinks.append(sink)
+        return self
+
+    def route(self, claims: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        builders = {
+            PAYMENT: self._payment_record,
+            PARTIAL_PAYMENT: self._payment_record,
+            DENIAL: self._denial_record,
+            REVERSAL: self._reversal_record
+        }
+        counts = self.counts
+
+        for claim in claims:
+            classification = classify_claim(claim)
+            if classification is None:
+                counts['unrouted'] += 1
+            else:
+                counts[classification] += 1
+                record = builders[classification](claim, classification)
+                for sink in self._sinks[classification]:
+                    sink(record)
+                if self._update_sinks and classification in STATUS_UPDATES:
+                    update = self._status_update(record, classification)
+                    for sink in self._update_sinks:
+                        sink(update)
+
+            for sink in self._claim_sinks:
+                sink(claim, classification)
+            yield claim
+
+    def run(self, claims: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Route every claim when nothing downstream consumes the claim stream"""
+        for _ in self.route(claims):
+            pass
+        return self.counts
+
+    def _payment_record(self, claim: Dict[str, Any], classification: str) -> Dict[str, Any]:
+        record = {
+            'claim_id': claim['claim_id'],
+            'paid_amount': claim['paid_amount'],
+            'patient_responsibility': claim.get('patient_responsibility', 0.00),
+            'payment_date': claim.get('payment_date') or self.payment_date,
+            'payer_name': claim.get('payer_name') or self.payer_name,
+            'check_number': claim.get('check_number') or self.check_number,
+            'payment_method': self.payment_method,
+            'payment_type': 'partial' if classification == PARTIAL_PAYMENT else 'full'
+        }
+        if (claim.get('paid_amount') or 0) <= 0:
+            record['payment_type'] = 'patient_responsibility'
+        if classification == PARTIAL_PAYMENT:
+            record['charged_amount'] = claim.get('charged_amount', 0.00)
+            record['adjustment_codes'] = claim.get('adjustment_codes') or []
+            record['unpaid_lines'] = [
+                line.get('procedure_code') for line in claim.get('service_lines') or ()
+                if (line.get('paid_amount') or 0) <= 0 and (line.get('charged_amount') or 0) > 0
+            ]
+        return record
+
+    def _denial_record(self, claim: Dict[str, Any], classification: str) -> Dict[str, Any]:
+        return {
+            'claim_id': claim['claim_id'],
+            'denial_reason': claim.get('denial_reason') or 'Unspecified',
+            'adjustment_codes': claim.get('adjustment_codes') or [],
+            'denied_amount': claim.get('charged_amount', 0.00),
+            'denial_date': claim.get('payment_date') or self.payment_date,
+            'payer_name': claim.get('payer_name') or self.payer_name,
+            'appeal_eligible': True,
+            'priority': 'medium'
+        }
+
+    def _reversal_record(self, claim: Dict[str, Any], classification: str) -> Dict[str, Any]:
+        return {
+            'claim_id': claim['claim_id'],
+            'reversed_amount': claim.get('paid_amount', 0.00),
+            'payer_claim_control_number': claim.get('payer_claim_control_number'),
+            'reversal_date': claim.get('payment_date') or self.payment_date,
+            'payer_name': claim.get('payer_name') or self.payer_name
+        }
+
+    def _status_update(self, record: Dict[str, Any], classification: str) -> Dict[str, Any]:
+        if classification == DENIAL:
+            return {
+                'claim_id': record['claim_id'],
+                'new_status': 'denied',
+                'denial_reason': record['denial_reason'],
+                'denial_date': record['denial_date'],
+                'updated_at': self.processed_at
+            }
+        return {
+            'claim_id': record['claim_id'],
+            'new_status': STATUS_UPDATES[classification],
+            'paid_amount': record['paid_amount'],
+            'payment_date': record['payment_date'],
+            'updated_at': self.processed_at
+        }
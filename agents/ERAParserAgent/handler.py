@@ -1,13 +1,36 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
 import json
-import boto3
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from aws_clients import get_client, prewarm, should_prewarm
+from db_pool import ConnectionPool, get_pool
+from secrets_cache import get_secrets_cache, is_db_auth_error
+from era_loader import ERABulkLoader
+from era_columns import ERAClaimColumns
+from era_router import ERAClaimRouter, PAYMENT, PARTIAL_PAYMENT, DENIAL, REVERSAL
+from denial_dispatch import DenialBatchDispatcher, create_denial_dispatcher
+from schema_validator import check_contract, get_input_validator
+from serialization import encode, encode_object
+from x12_835 import ERA835Parser
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Load production dependencies during the Lambda init phase, not the first invocation
+if should_prewarm(os.environ.get('DEVELOPMENT_MODE', 'false').lower() == 'true'):
+    prewarm(('s3', 'secretsmanager'), modules=('psycopg2',))
+
+# schemas/era-parser-agent.json request contract, compiled at cold start
+INPUT_CONTRACT = get_input_validator('era-parser-agent')
+
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     ERAParserAgent: Parse 835 ERA files and extract payment/denial information
@@ -24,6 +47,16 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     - summary: High-level summary of the ERA
     """
     
+    contract_error = check_contract(INPUT_CONTRACT, event)
+    if contract_error:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'error': 'Invalid request',
+                'message': contract_error
+            })
+        }
+    
     try:
         # Extract input data
         era_file_url = event.get('eraFileUrl', '')
@@ -33,21 +66,48 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         logger.info(f"Processing ERA file from {source}: {era_file_url}")
         
         # Download and parse ERA file
-        if not event.get('development_mode', True):
+        development_mode = event.get('development_mode', True)
+        if not development_mode:
             era_data = download_and_parse_era(era_file_url)
         else:
             # Development mode - use mock data
             era_data = generate_mock_era_data(claim_ids)
         
-        # Process payments and denials
-        payments = extract_payments(era_data)
-        denials = extract_denials(era_data)
+        # Classify each claim once as it streams, routing records to sinks
+        payments = []
+        denials = []
+        reversals = []
+        claim_updates = []
+        columns = ERAClaimColumns()
+        router = ERAClaimRouter(era_data)
+        router.add_sink((PAYMENT, PARTIAL_PAYMENT), payments.append)
+        router.add_sink(DENIAL, denials.append)
+        router.add_sink(REVERSAL, reversals.append)
+        router.add_update_sink(claim_updates.append)
+        router.add_claim_sink(lambda claim, classification: columns.append(
+            claim, is_payment=classification in (PAYMENT, PARTIAL_PAYMENT), is_denial=classification == DENIAL
+        ))
+        claims = router.route(era_data.get('claim_details', []))
         
-        # Update claim statuses
-        claim_updates = update_claim_statuses(payments, denials)
+        if not development_mode:
+            # Bulk-load the claim stream while it is routed
+            persistence = persist_era_results(era_data, claims)
+        else:
+            for _ in claims:
+                pass
+            persistence = None
         
         # Generate summary
-        summary = generate_era_summary(payments, denials)
+        summary = generate_era_summary(payments, denials, columns, era_data.get('total_payment'))
+        summary['classification_counts'] = router.counts
+        
+        # Denials go out to DenialClassifierAgent only once the ERA is committed
+        dispatcher = create_denial_dispatcher(development_mode, context={
+            'source': 'ERAParserAgent',
+            'eraFileUrl': era_file_url,
+            'payerName': router.payer_name
+        })
+        follow_up = trigger_follow_up_processing(dispatcher, denials)
         
         # Store results
         result = {
@@ -56,27 +116,30 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             'source': source,
             'payments': payments,
             'denials': denials,
+            'reversals': reversals,
             'claim_updates': claim_updates,
             'summary': summary,
-            'timestamp': datetime.utcnow().isoformat(),
-            'processed_claims': len(claim_ids)
+            'timestamp': router.processed_at,
+            'processed_claims': len(claim_ids),
+            'persistence': persistence,
+            'follow_up': follow_up
         }
         
+        # Encoded once for both the run record and the response body
+        encoded_result = encode(result)
+        
         # Store in RDS
         store_agent_run({
             'agent_name': 'ERAParserAgent',
             'input_data': event,
-            'output_data': result,
+            'output_data': encoded_result,
             'timestamp': datetime.utcnow().isoformat(),
             'status': 'completed'
         })
         
-        # Trigger follow-up agents if needed
-        trigger_follow_up_processing(denials)
-        
         return {
             'statusCode': 200,
-            'body': json.dumps(result)
+            'body': encoded_result.text
         }
         
     except Exception as e:
@@ -99,23 +162,37 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         }
 
 def download_and_parse_era(era_file_url: str) -> Dict:
-    """Download ERA file from S3 and parse X12 835 format"""
+    """
+    Stream an X12 835 ERA file from S3 and parse it.
     
-    # Extract S3 bucket and key from URL
-    s3 = boto3.client('s3')
+    The returned dict carries the remittance header; `claim_details` is a
+    generator that yields one claim payment record per CLP loop, so the file
+    is never held in memory as a whole.
+    """
     
-    # In production, implement X12 835 parsing
-    # For now, return placeholder structure
-    return {
-        'transaction_set': '835',
-        'version': '005010X221A1',
-        'payer': {
-            'name': 'Sample Insurance Co',
-            'id': 'SAMPLE001'
-        },
-        'payment_details': [],
-        'claim_details': []
-    }
+    bucket, key = _parse_s3_url(era_file_url)
+    
+    s3 = get_client('s3')
+    s3_object = s3.get_object(Bucket=bucket, Key=key)
+    
+    parser = ERA835Parser(s3_object['Body'])
+    
+    era_data = dict(parser.header)
+    era_data['claim_details'] = parser.claims()
+    return era_data
+
+def _parse_s3_url(era_file_url: str) -> Tuple[str, str]:
+    """Accept s3://bucket/key and https://bucket.s3.<region>.amazonaws.com/key URLs"""
+    
+    parsed = urlparse(era_file_url)
+    
+    if parsed.scheme == 's3':
+        return parsed.netloc, parsed.path.lstrip('/')
+    
+    if parsed.scheme in ('http', 'https') and '.s3' in parsed.netloc:
+        return parsed.netloc.split('.s3')[0], parsed.path.lstrip('/')
+    
+    raise ValueError(f"Unsupported ERA file URL: {era_file_url}")
 
 def generate_mock_era_data(claim_ids: List[str]) -> Dict:
     """Generate mock ERA data for development"""
@@ -154,105 +231,102 @@ def generate_mock_era_data(claim_ids: List[str]) -> Dict:
         'development_mode': True
     }
 
-def extract_payments(era_data: Dict) -> List[Dict]:
-    """Extract payment information from ERA data"""
-    
-    payments = []
-    for claim in era_data.get('claim_details', []):
-        if claim.get('status') == 'paid' and claim.get('paid_amount', 0) > 0:
-            payments.append({
-                'claim_id': claim['claim_id'],
-                'paid_amount': claim['paid_amount'],
-                'patient_responsibility': claim.get('patient_responsibility', 0.00),
-                'payment_date': era_data.get('payment_date', datetime.utcnow().isoformat()),
-                'payer_name': era_data.get('payer', {}).get('name', 'Unknown'),
-                'check_number': era_data.get('check_number', 'EFT'),
-                'payment_method': 'electronic'
-            })
+def persist_era_results(era_data: Dict, claims: Iterable[Dict]) -> Dict:
+    """
+    Persist the remittance and its claims in one transaction: COPY into a
+    staging table, then set-based era_claim_details inserts and claims updates
+    """
     
-    return payments
+    with get_db_pool().connection() as conn:
+        return ERABulkLoader(conn).load(era_data, claims)
 
-def extract_denials(era_data: Dict) -> List[Dict]:
-    """Extract denial information from ERA data"""
-    
-    denials = []
-    for claim in era_data.get('claim_details', []):
-        if claim.get('status') == 'denied' or claim.get('denial_reason'):
-            denials.append({
-                'claim_id': claim['claim_id'],
-                'denial_reason': claim.get('denial_reason', 'Unspecified'),
-                'adjustment_codes': claim.get('adjustment_codes', []),
-                'denied_amount': claim.get('charged_amount', 0.00),
-                'denial_date': era_data.get('payment_date', datetime.utcnow().isoformat()),
-                'payer_name': era_data.get('payer', {}).get('name', 'Unknown'),
-                'appeal_eligible': True,
-                'priority': 'medium'
-            })
+def get_db_pool() -> ConnectionPool:
+    """Shared Postgres pool for this Lambda container"""
     
-    return denials
+    host = os.environ.get('DB_HOST')
+    database = os.environ.get('DB_NAME', 'muni_rcm')
+    return get_pool(
+        (host, database, 'muni-ai-rcm-ERAParserAgent'),
+        lambda: _connect_db(host, database)
+    )
 
-def update_claim_statuses(payments: List[Dict], denials: List[Dict]) -> List[Dict]:
-    """Update claim statuses based on payments and denials"""
+def _connect_db(host: str, database: str):
+    """Open a new database connection using cached Secrets Manager credentials"""
     
-    updates = []
+    import psycopg2
     
-    # Process payments
-    for payment in payments:
-        updates.append({
-            'claim_id': payment['claim_id'],
-            'new_status': 'paid',
-            'paid_amount': payment['paid_amount'],
-            'payment_date': payment['payment_date'],
-            'updated_at': datetime.utcnow().isoformat()
-        })
+    secret_arn = os.environ.get('DB_SECRET_ARN')
+    if not secret_arn:
+        raise Exception("DB_SECRET_ARN environment variable not set")
     
-    # Process denials
-    for denial in denials:
-        updates.append({
-            'claim_id': denial['claim_id'],
-            'new_status': 'denied',
-            'denial_reason': denial['denial_reason'],
-            'denial_date': denial['denial_date'],
-            'updated_at': datetime.utcnow().isoformat()
-        })
+    def connect(credentials: Dict):
+        return psycopg2.connect(
+            host=host,
+            database=database,
+            user=credentials['username'],
+            password=credentials['password'],
+            port=5432,
+            connect_timeout=10,
+            application_name='muni-ai-rcm-ERAParserAgent'
+        )
     
-    return updates
+    return get_secrets_cache().call_with_secret(secret_arn, connect, is_db_auth_error)
 
-def generate_era_summary(payments: List[Dict], denials: List[Dict]) -> Dict:
-    """Generate high-level summary of the ERA"""
+def generate_era_summary(payments: Iterable[Dict], denials: Iterable[Dict],
+                         columns: Optional[ERAClaimColumns] = None,
+                         total_payment: Optional[float] = None) -> Dict:
+    """
+    Generate high-level summary of the ERA. With the claim columns collected
+    while routing, totals, reconciliation against the remittance total and
+    the per-CARC breakdown come from vectorized passes over those columns.
+    """
+    
+    if columns is not None:
+        summary = columns.summary(total_payment)
+        summary['carc_breakdown'] = columns.carc_breakdown()
+        summary['generated_at'] = datetime.utcnow().isoformat()
+        return summary
+    
+    total_paid = 0.0
+    payment_count = 0
+    for payment in payments:
+        total_paid += payment['paid_amount']
+        payment_count += 1
     
-    total_paid = sum(p['paid_amount'] for p in payments)
-    total_denied = len(denials)
-    total_claims = len(payments) + total_denied
+    total_denied = sum(1 for _ in denials)
+    total_claims = payment_count + total_denied
     
     return {
         'total_claims_processed': total_claims,
-        'total_payments': len(payments),
+        'total_payments': payment_count,
         'total_denials': total_denied,
         'total_paid_amount': total_paid,
-        'average_payment': total_paid / max(len(payments), 1),
+        'average_payment': total_paid / max(payment_count, 1),
         'denial_rate': (total_denied / max(total_claims, 1)) * 100,
         'requires_follow_up': total_denied > 0,
         'generated_at': datetime.utcnow().isoformat()
     }
 
-def trigger_follow_up_processing(denials: List[Dict]) -> None:
-    """Trigger follow-up agents for denials"""
-    
-    if not denials:
-        return
+def trigger_follow_up_processing(dispatcher: Optional[DenialBatchDispatcher], denials: List[Dict]) -> Optional[Dict[str, Any]]:
+    """Send the persisted denials to DenialClassifierAgent in batches and return dispatch metrics"""
     
-    # In production, trigger DenialClassifierAgent via EventBridge
-    logger.info(f"Would trigger DenialClassifierAgent for {len(denials)} denials")
+    if dispatcher is None:
+        if denials:
+            logger.info(f"Denial dispatch disabled; {len(denials)} denials not sent to DenialClassifierAgent")
+        return None
     
-    # TODO: Implement EventBridge integration
-    # eventbridge = boto3.client('events')
-    # eventbridge.put_events(...)
+    for denial in denials:
+        dispatcher.add(denial)
+    metrics = dispatcher.close()
+    logger.info(f"Dispatched {metrics['denials']} denials to DenialClassifierAgent in {metrics['batches']} batches")
+    if metrics['failed_batches']:
+        logger.error(f"{metrics['failed_batches']} denial batches failed to dispatch")
+    return metrics
 
 def store_agent_run(run_data: Dict) -> None:
     """Store agent execution data in RDS"""
     
-    logger.info(f"Agent run data: {json.dumps(run_data, default=str)}")
+    logger.info(f"Agent run data: {encode_object(run_data)}")
     
     # TODO: Implement RDS connection
     # rds_client = boto3.client('rds-data')
@@ -0,0 +1,289 @@
+# X12 835 Parser - Muni AI RCM Platform
+# Streams claim payment (CLP) loops out of an 835 remittance one at a time
+
+import logging
+from typing import Dict, Any, Iterator, List, Optional
+
+from x12_segments import X12SegmentReader
+
+logger = logging.getLogger(__name__)
+
+# CLP02 claim status codes
+DENIED_STATUS_CODES = {'4'}
+REVERSAL_STATUS_CODES = {'22'}
+
+# Segments that close the current claim loop
+CLAIM_LOOP_TERMINATORS = {'CLP', 'LX', 'SE', 'PLB', 'GE', 'IEA'}
+
+
+def _amount(value: str) -> float:
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _date(value: str) -> Optional[str]:
+    """CCYYMMDD -> ISO date"""
+    if len(value) == 8 and value.isdigit():
+        return f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+    return None
+
+
+def _element(segment: List[str], index: int) -> str:
+    return segment[index] if len(segment) > index else ''
+
+
+class ERA835Parser:
+    """
+    Segment-level streaming parser for X12 835 remittance advice.
+
+    `header` holds the financial information (BPR), trace number (TRN) and
+    payer/payee (N1) of the first transaction set. `claims()` yields one dict
+    per CLP loop; only the claim currently being assembled is held in memory.
+    """
+
+    def __init__(self, stream, chunk_size: Optional[int] = None):
+        reader_args = {'chunk_size': chunk_size} if chunk_size else {}
+        self._reader = X12SegmentReader(stream, **reader_args)
+        self._segments = iter(self._reader)
+        self._lookahead: Optional[List[str]] = None
+        self._transaction: Dict[str, Any] = self._new_transaction()
+        self._header: Optional[Dict[str, Any]] = None
+        self.claim_count = 0
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        """Header of the first transaction set (reads up to the first claim)"""
+        self._ensure_header()
+        return self._header
+
+    @property
+    def segment_count(self) -> int:
+        return self._reader.segment_count
+
+    @property
+    def bytes_read(self) -> int:
+        return self._reader.bytes_read
+
+    def claims(self) -> Iterator[Dict[str, Any]]:
+        """Yield claim payment records one CLP loop at a time"""
+        self._ensure_header()
+
+        claim = None
+        service = None
+
+        for segment in self._pending_segments():
+            segment_id = segment[0]
+
+            if segment_id in CLAIM_LOOP_TERMINATORS and claim is not None:
+                yield self._finish_claim(claim)
+                claim = None
+                service = None
+
+            if segment_id == 'CLP':
+                claim = self._start_claim(segment)
+            elif claim is not None:
+                if segment_id == 'CAS':
+                    self._apply_adjustments(service or claim, segment, claim)
+                elif segment_id == 'SVC':
+                    service = self._start_service(segment)
+                    claim['service_lines'].append(service)
+                elif segment_id == 'AMT':
+                    self._apply_amount(service or claim, segment)
+                elif segment_id == 'DTM':
+                    self._apply_date(service or claim, segment)
+                elif segment_id == 'MOA':
+                    # MOA03-MOA07 are claim-level remark codes
+                    claim['remark_codes'].extend(code for code in segment[3:8] if code)
+                elif segment_id == 'LQ' and service is not None:
+                    service['remark_codes'].append(_element(segment, 2))
+            else:
+                # Between claims: a new transaction set may change payer/check info
+                self._apply_transaction_segment(segment)
+
+        if claim is not None:
+            yield self._finish_claim(claim)
+
+    def _ensure_header(self):
+        if self._header is None:
+            self._read_until_claim()
+            self._header = self._transaction_header()
+
+    def _pending_segments(self) -> Iterator[List[str]]:
+        if self._lookahead is not None:
+            segment, self._lookahead = self._lookahead, None
+            yield segment
+        yield from self._segments
+
+    def _read_until_claim(self):
+        for segment in self._segments:
+            if segment[0] == 'CLP':
+                self._lookahead = segment
+                return
+            self._apply_transaction_segment(segment)
+
+    def _new_transaction(self) -> Dict[str, Any]:
+        return {
+            'version': None,
+            'payer': {'name': None, 'id': None},
+            'payee': {'name': None, 'npi': None},
+            'payment_date': None,
+            'check_number': None,
+            'total_payment': 0.0,
+            'payment_method': None
+        }
+
+    def _apply_transaction_segment(self, segment: List[str]):
+        segment_id = segment[0]
+        transaction = self._transaction
+
+        if segment_id == 'GS':
+            transaction['version'] = _element(segment, 8) or transaction['version']
+        elif segment_id == 'ST':
+            version = transaction['version']
+            self._transaction = transaction = self._new_transaction()
+            transaction['version'] = _element(segment, 3) or version
+        elif segment_id == 'BPR':
+            transaction['total_payment'] = _amount(_element(segment, 2))
+            transaction['payment_method'] = _element(segment, 4)
+            transaction['payment_date'] = _date(_element(segment, 16))
+        elif segment_id == 'TRN':
+            transaction['check_number'] = _element(segment, 2)
+        elif segment_id == 'DTM' and _element(segment, 1) == '405' and not transaction['payment_date']:
+            transaction['payment_date'] = _date(_element(segment, 2))
+        elif segment_id == 'N1':
+            entity = _element(segment, 1)
+            if entity == 'PR':
+                transaction['payer']['name'] = _element(segment, 2)
+            elif entity == 'PE':
+                transaction['payee']['name'] = _element(segment, 2)
+                transaction['payee']['npi'] = _element(segment, 4)
+        elif segment_id == 'REF' and _element(segment, 1) == '2U':
+            transaction['payer']['id'] = _element(segment, 2)
+
+    def _transaction_header(self) -> Dict[str, Any]:
+        transaction = self._transaction
+        return {
+            'transaction_set': '835',
+            'version': transaction['version'],
+            'payer': dict(transaction['payer']),
+            'payee': dict(transaction['payee']),
+            'payment_date': transaction['payment_date'],
+            'check_number': transaction['check_number'],
+            'total_payment': transaction['total_payment'],
+            'payment_method': 'check' if transaction['payment_method'] == 'CHK' else 'electronic'
+        }
+
+    def _start_claim(self, segment: List[str]) -> Dict[str, Any]:
+        transaction = self._transaction
+        return {
+            'claim_id': _element(segment, 1),
+            'claim_status_code': _element(segment, 2),
+            'charged_amount': _amount(_element(segment, 3)),
+            'paid_amount': _amount(_element(segment, 4)),
+            'patient_responsibility': _amount(_element(segment, 5)),
+            'payer_claim_control_number': _element(segment, 7),
+            'service_date': None,
+            'allowed_amount': None,
+            'contractual_adjustment': 0.0,
+            'other_adjustments': 0.0,
+            'adjustments': [],
+            'remark_codes': [],
+            'service_lines': [],
+            'payer_name': transaction['payer']['name'],
+            'check_number': transaction['check_number'],
+            'payment_date': transaction['payment_date']
+        }
+
+    def _start_service(self, segment: List[str]) -> Dict[str, Any]:
+        procedure = self._reader.split_components(_element(segment, 1))
+        return {
+            'procedure_code': procedure[1] if len(procedure) > 1 else procedure[0],
+            'modifiers': [modifier for modifier in procedure[2:] if modifier],
+            'charged_amount': _amount(_element(segment, 2)),
+            'paid_amount': _amount(_element(segment, 3)),
+            'units': _amount(_element(segment, 5)) or 1.0,
+            'allowed_amount': None,
+            'service_date': None,
+            'adjustments': [],
+            'remark_codes': []
+        }
+
+    def _apply_adjustments(self, target: Dict[str, Any], segment: List[str], claim: Dict[str, Any]):
+        """CAS carries up to six reason/amount/quantity triplets for one group code"""
+        group_code = _element(segment, 1)
+        for index in range(2, min(len(segment), 20), 3):
+            reason_code = segment[index]
+            if not reason_code:
+                continue
+            amount = _amount(_element(segment, index + 1))
+            target['adjustments'].append({
+                'group_code': group_code,
+                'reason_code': reason_code,
+                'amount': amount
+            })
+            if target is not claim:
+                claim['adjustments'].append(target['adjustments'][-1])
+
+            if group_code == 'CO':
+                claim['contractual_adjustment'] += amount
+            elif group_code != 'PR':
+                claim['other_adjustments'] += amount
+
+    def _apply_amount(self, target: Dict[str, Any], segment: List[str]):
+        qualifier = _element(segment, 1)
+        # AU = claim coverage amount, B6 = service line allowed amount
+        if qualifier in ('AU', 'B6'):
+            target['allowed_amount'] = _amount(_element(segment, 2))
+
+    def _apply_date(self, target: Dict[str, Any], segment: List[str]):
+        qualifier = _element(segment, 1)
+        if qualifier in ('472', '150', '232'):
+            target['service_date'] = _date(_element(segment, 2))
+
+    @staticmethod
+    def _patient_owes(claim: Dict[str, Any]) -> bool:
+        """Whether part of the charge was assigned to the patient (CLP05 or a PR adjustment)"""
+        if claim['patient_responsibility'] > 0:
+            return True
+        return any(adjustment['group_code'] == 'PR' and adjustment['amount'] > 0
+                   for adjustment in claim['adjustments'])
+
+    def _finish_claim(self, claim: Dict[str, Any]) -> Dict[str, Any]:
+        self.claim_count += 1
+
+        status_code = claim['claim_status_code']
+        if status_code in REVERSAL_STATUS_CODES:
+            status = 'reversed'
+        elif status_code in DENIED_STATUS_CODES:
+            status = 'denied'
+        elif claim['paid_amount'] <= 0 and not self._patient_owes(claim):
+            status = 'denied'
+        else:
+            # Includes zero-pay claims whose balance went to deductible/coinsurance
+            status = 'paid'
+        claim['status'] = status
+
+        if claim['allowed_amount'] is None and claim['service_lines']:
+            allowed = [line['allowed_amount'] for line in claim['service_lines']
+                       if line['allowed_amount'] is not None]
+            if allowed:
+                claim['allowed_amount'] = round(sum(allowed), 2)
+
+        claim['contractual_adjustment'] = round(claim['contractual_adjustment'], 2)
+        claim['other_adjustments'] = round(claim['other_adjustments'], 2)
+
+        codes = [f"{adj['group_code']}-{adj['reason_code']}" for adj in claim['adjustments']]
+        claim['adjustment_codes'] = list(dict.fromkeys(codes)) or None
+
+        if status == 'denied':
+            reasons = claim['adjustment_codes'] or []
+            claim['denial_reason'] = (
+                f"Claim adjusted: {', '.join(reasons + claim['remark_codes'])}"
+                if reasons or claim['remark_codes'] else 'Unspecified'
+            )
+        else:
+            claim['denial_reason'] = None
+
+        return claim
@@ -0,0 +1,173 @@
+# Eligibility Batch - Muni AI RCM Platform
+# Overnight eligibility sweeps: one 270 interchange per payer, concurrent submission, streaming 271 parsing
+
+import time
+import itertools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Iterator, Callable, Tuple
+
+from throttle import backoff_delay
+from x12_270 import build_270_interchange, service_type_code
+from x12_271 import EligibilityResponseParser
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Interchange control numbers only need to be unique per sender per day
+_control_numbers = itertools.count(int(time.time()) % 100000 * 1000)
+_control_lock = threading.Lock()
+
+
+class ClearinghouseError(Exception):
+    """Raised when a 270 interchange could not be submitted"""
+    pass
+
+
+def next_control_number() -> int:
+    with _control_lock:
+        return next(_control_numbers) % 1000000000
+
+
+class ClearinghouseClient:
+    """
+    Submits 270 interchanges over one keep-alive requests.Session and returns
+    the 271 body as a stream, so large responses are parsed as they arrive.
+    Retries 429/5xx and connection errors with jittered backoff.
+    """
+
+    def __init__(self, api_url: str, account_key: str, max_in_flight: int = 4,
+                 connect_timeout: float = 5.0, read_timeout: float = 120.0, max_attempts: int = 3):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.api_url = api_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max_attempts
+
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/edi-x12',
+            'Authorization': f'Bearer {account_key}'
+        })
+
+    def submit_270(self, interchange: str):
+        """POST one 270 interchange; returns a file-like 271 stream (close it when done)"""
+        body = interchange.encode('latin-1', errors='replace')
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            try:
+                response = self.session.post(
+                    f'{self.api_url}/eligibility/270', data=body, timeout=self.timeout, stream=True
+                )
+            except self._requests.exceptions.RequestException as e:
+                last_error = f"{type(e).__name__}: {str(e)}"
+            else:
+                if response.status_code < 400:
+                    response.raw.decode_content = True
+                    return response.raw
+                last_error = f"HTTP {response.status_code}"
+                response.close()
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+
+            if attempt + 1 < self.max_attempts:
+                time.sleep(backoff_delay(attempt))
+
+        raise ClearinghouseError(f"270 submission failed: {last_error}")
+
+    def close(self):
+        self.session.close()
+
+
+def group_inquiries(patients: List[Dict[str, Any]], provider_info: Dict[str, Any],
+                    default_service_type: str, default_date_of_service: str) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    """
+    Group patients by (payer id, provider NPI); each inquiry keeps its batch
+    index so results can be matched back. Patients must already be validated.
+    """
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for index, patient in enumerate(patients):
+        insurance = patient['insuranceInfo']
+        provider = patient.get('providerInfo') or provider_info
+        inquiry = {
+            'index': index,
+            'member_id': insurance['memberId'],
+            'first_name': insurance.get('firstName', ''),
+            'last_name': insurance.get('lastName', ''),
+            'date_of_birth': insurance.get('dateOfBirth', ''),
+            'date_of_service': patient.get('dateOfService') or default_date_of_service,
+            'service_type_codes': [service_type_code(patient.get('serviceType') or default_service_type)],
+            'payer': {'id': insurance['payerId'], 'name': insurance.get('payerName', '')},
+            'provider': {'npi': provider.get('npi', ''), 'name': provider.get('name', '')}
+        }
+        groups.setdefault((insurance['payerId'], inquiry['provider']['npi']), []).append(inquiry)
+    return groups
+
+
+def check_eligibility_batch(groups: Dict[Tuple[str, str], List[Dict[str, Any]]],
+                            submit_270: Callable[[str], Any], max_concurrency: int = 4,
+                            subscribers_per_interchange: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Submit each payer group as one or more 270 interchanges, at most
+    max_concurrency in flight, and yield one 271 result per inquiry as its
+    interchange completes. Each result carries the inquiry `index`; inquiries
+    the clearinghouse did not answer come back with status 'unknown'.
+    """
+    chunks = []
+    for inquiries in groups.values():
+        for start in range(0, len(inquiries), subscribers_per_interchange):
+            chunks.append(inquiries[start:start + subscribers_per_interchange])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(chunks)))) as executor:
+        futures = [executor.submit(_check_interchange, chunk, submit_270) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def _check_interchange(inquiries: List[Dict[str, Any]], submit_270: Callable[[str], Any]) -> List[Dict[str, Any]]:
+    control_number = next_control_number()
+    by_trace = {}
+    for position, inquiry in enumerate(inquiries):
+        inquiry['trace_number'] = f"{control_number}-{position}"
+        by_trace[inquiry['trace_number']] = inquiry
+
+    interchange = build_270_interchange(
+        inquiries[0]['payer'], inquiries[0]['provider'], inquiries, control_number
+    )
+
+    results = []
+    try:
+        stream = submit_270(interchange)
+        try:
+            for result in EligibilityResponseParser(stream).results():
+                inquiry = by_trace.pop(result.get('trace_number'), None)
+                if inquiry is None:
+                    logger.warning(f"271 result with unknown trace number {result.get('trace_number')}")
+                    continue
+                result['index'] = inquiry['index']
+                results.append(result)
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+        error = 'No 271 response for inquiry'
+    except Exception as e:
+        logger.error(f"Eligibility interchange {control_number} failed: {str(e)}")
+        error = str(e)
+
+    for inquiry in by_trace.values():
+        results.append({
+            'index': inquiry['index'],
+            'trace_number': inquiry['trace_number'],
+            'eligibility_status': 'unknown',
+            'reason': error,
+            'response_code': '004'
+        })
+    return results
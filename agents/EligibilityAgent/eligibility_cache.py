@@ -0,0 +1,241 @@
+# Eligibility Cache - Muni AI RCM Platform
+# 271 response cache keyed on member, payer, service types and date of service
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Iterable, Tuple
+
+from x12_270 import service_type_code
+
+logger = logging.getLogger(__name__)
+
+# Results that are worth re-checking immediately are never cached
+UNCACHEABLE_STATUSES = {'unknown', 'error'}
+
+
+def make_eligibility_key(member_id: str, payer_id: str, service_type_codes: Iterable[str],
+                         date_of_service: str) -> str:
+    """Stable cache key; member ids are hashed so no PHI lands in the key column"""
+    codes = ','.join(sorted({str(code).strip().lower() for code in service_type_codes if code}))
+    canonical = '|'.join([
+        str(member_id).strip().upper(),
+        str(payer_id).strip().upper(),
+        codes,
+        str(date_of_service).strip()
+    ])
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def load_payer_ttls(path: Optional[str]) -> Dict[str, float]:
+    """
+    Load per-payer TTLs (seconds) from JSON: {"default": 14400, "payers": {"60054": 3600}}.
+    A TTL of 0 disables caching for that payer.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load eligibility payer TTLs from {path}: {str(e)}")
+        return {}
+
+    ttls = {str(payer).upper(): float(ttl) for payer, ttl in config.get('payers', {}).items()}
+    if 'default' in config:
+        ttls['default'] = float(config['default'])
+    return ttls
+
+
+class PostgresEligibilityStore:
+    """Persistent tier backed by the eligibility_checks table"""
+
+    def __init__(self, connection_factory: Callable):
+        self._connection_factory = connection_factory
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._connection_factory() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT coverage_details, EXTRACT(EPOCH FROM expires_at)
+                    FROM eligibility_checks
+                    WHERE cache_key = %s AND expires_at > NOW()
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                """, (key,))
+                row = cur.fetchone()
+        if not row:
+            return None
+        details = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+        return details, float(row[1])
+
+    def put(self, key: str, entry: Dict[str, Any], payer_id: str, service_type_codes: Iterable[str],
+            date_of_service: str, expires_at: float):
+        response = entry['response']
+        # The column holds X12 EQ01 codes, not agent service types like 'medical_care'
+        codes = list(dict.fromkeys(service_type_code(code) for code in service_type_codes))
+        with self._connection_factory() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO eligibility_checks (
+                        check_date, service_type_codes, status, is_eligible,
+                        coverage_details, cache_key, payer_id, date_of_service, expires_at
+                    ) VALUES (CURRENT_DATE, %s, %s, %s, %s, %s, %s, %s, TO_TIMESTAMP(%s))
+                """, (
+                    codes[:10],
+                    response.get('eligibility_status'),
+                    response.get('eligibility_status') == 'active',
+                    json.dumps(entry, default=str),
+                    key,
+                    payer_id,
+                    date_of_service,
+                    expires_at
+                ))
+            conn.commit()
+
+
+class EligibilityCache:
+    """
+    Cache for parsed 271 responses:
+    - In-process LRU tier so front-desk re-checks on a warm container return instantly
+    - Optional eligibility_checks tier shared across containers
+    - Per-payer TTLs; force_refresh bypasses lookups but still stores the new result
+    Store failures are logged and treated as misses.
+    """
+
+    def __init__(self, store=None, max_entries: int = 5000, default_ttl_seconds: float = 14400.0,
+                 payer_ttls: Optional[Dict[str, float]] = None):
+        self.store = store
+        self.max_entries = max_entries
+        self.payer_ttls = dict(payer_ttls or {})
+        self.default_ttl_seconds = self.payer_ttls.pop('default', default_ttl_seconds)
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {
+            'memory_hits': 0,
+            'store_hits': 0,
+            'misses': 0,
+            'forced_refreshes': 0,
+            'puts': 0,
+            'skipped': 0,
+            'store_errors': 0
+        }
+
+    def ttl_for(self, payer_id: str) -> float:
+        return self.payer_ttls.get(str(payer_id).upper(), self.default_ttl_seconds)
+
+    def get(self, key: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the cached entry ({'response', 'checked_at'}) and where it came from"""
+        if force_refresh:
+            self._count('forced_refreshes')
+            return None
+
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                if cached[1] > now:
+                    self._entries.move_to_end(key)
+                    self._metrics['memory_hits'] += 1
+                    return dict(cached[0], source='memory', expires_at=cached[1])
+                del self._entries[key]
+
+        if self.store is not None:
+            try:
+                stored = self.store.get(key)
+            except Exception as e:
+                logger.warning(f"Eligibility cache store lookup failed: {str(e)}")
+                stored = None
+                self._count('store_errors')
+
+            if stored and stored[1] > now:
+                self._remember(key, stored[0], stored[1])
+                self._count('store_hits')
+                return dict(stored[0], source='database', expires_at=stored[1])
+
+        self._count('misses')
+        return None
+
+    def put(self, key: str, response: Dict[str, Any], payer_id: str,
+            service_type_codes: Iterable[str], date_of_service: str) -> bool:
+        """Cache a parsed 271 response; returns False when the payer or status is not cacheable"""
+        ttl = self.ttl_for(payer_id)
+        if ttl <= 0 or response.get('eligibility_status') in UNCACHEABLE_STATUSES:
+            self._count('skipped')
+            return False
+
+        entry = {'response': response, 'checked_at': time.time()}
+        expires_at = entry['checked_at'] + ttl
+        self._remember(key, entry, expires_at)
+        self._count('puts')
+
+        if self.store is not None:
+            try:
+                self.store.put(key, entry, payer_id, service_type_codes, date_of_service, expires_at)
+            except Exception as e:
+                logger.warning(f"Eligibility cache store write failed: {str(e)}")
+                self._count('store_errors')
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['memory_entries'] = len(self._entries)
+        hits = metrics['memory_hits'] + metrics['store_hits']
+        lookups = hits + metrics['misses']
+        metrics['hit_rate'] = hits / lookups if lookups else 0.0
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, entry: Dict[str, Any], expires_at: float):
+        with self._lock:
+            self._entries[key] = (entry, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+
+_cache: Optional[EligibilityCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_eligibility_cache(connection_factory: Optional[Callable] = None) -> Optional[EligibilityCache]:
+    """
+    Return the process-wide eligibility cache, creating it on first use.
+    ELIGIBILITY_CACHE_BACKEND: 'memory', 'postgres' or 'none'
+    """
+    global _cache
+
+    backend = os.environ.get('ELIGIBILITY_CACHE_BACKEND', 'memory')
+    if backend == 'none':
+        return None
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            store = None
+            if backend == 'postgres':
+                if connection_factory is None:
+                    raise ValueError("Postgres eligibility cache requires a connection factory")
+                store = PostgresEligibilityStore(connection_factory)
+
+            _cache = EligibilityCache(
+                store,
+                max_entries=int(os.environ.get('ELIGIBILITY_CACHE_MAX_ENTRIES', '5000')),
+                default_ttl_seconds=float(os.environ.get('ELIGIBILITY_CACHE_TTL_SECONDS', '14400')),
+                payer_ttls=load_payer_ttls(os.environ.get('ELIGIBILITY_PAYER_TTLS_PATH'))
+            )
+    return _cache
+
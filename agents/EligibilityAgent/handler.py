@@ -1,13 +1,44 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import io
 import json
-import boto3
+import time
 import logging
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from db_pool import ConnectionPool, get_pool
+from secrets_cache import get_secrets_cache, is_db_auth_error
+from eligibility_cache import get_eligibility_cache, make_eligibility_key
+from eligibility_batch import ClearinghouseClient, check_eligibility_batch, group_inquiries, next_control_number
+from x12_270 import build_270_interchange, service_type_code
+from x12_271 import EligibilityResponseParser
+from fee_schedule import get_fee_schedule
+from patient_estimates import estimate_encounters
+from schema_validator import check_contract, get_input_validator
+from serialization import encode, encode_object
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+CLEARINGHOUSE_SECRET_ID = 'muni-rcm/claim-md-credentials'
+
+# Batch eligibility sweep configuration
+BATCH_MAX_PATIENTS = int(os.environ.get('ELIGIBILITY_BATCH_MAX_PATIENTS', '5000'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('ELIGIBILITY_BATCH_MAX_CONCURRENCY', '4'))
+SUBSCRIBERS_PER_INTERCHANGE = int(os.environ.get('ELIGIBILITY_SUBSCRIBERS_PER_INTERCHANGE', '500'))
+
+# schemas/eligibility-agent.json request contract (also applied to each sweep patient), compiled at cold start
+INPUT_CONTRACT = get_input_validator('eligibility-agent')
+
+_clearinghouse_client: Optional[ClearinghouseClient] = None
+_clearinghouse_lock = threading.Lock()
+
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     EligibilityAgent: Check patient insurance eligibility via 270/271 transactions
@@ -23,58 +54,117 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     - coverage_details: Deductible, copay, coinsurance information
     - benefits: Covered services and limitations
     - authorization_required: Whether prior auth is needed
+    - eligibility_source: memory/database cache, clearinghouse or mock
+    
+    Repeat checks for the same member, payer, service type and date of service
+    are answered from the 271 cache until the payer's TTL expires; pass
+    forceRefresh to always go to the clearinghouse.
+    
+    Batch mode: an event with a `patients` list (each with patientId,
+    insuranceInfo and optional serviceType/dateOfService/providerInfo) runs an
+    eligibility sweep - see check_eligibility_sweep.
     """
     
+    if 'patients' in event:
+        return check_eligibility_sweep(event)
+    
+    contract_error = check_contract(INPUT_CONTRACT, event)
+    if contract_error:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'success': False,
+                'error': 'Invalid request',
+                'message': contract_error
+            })
+        }
+    
     try:
         # Extract input data
         patient_id = event.get('patientId', '')
         insurance_info = event.get('insuranceInfo', {})
         service_type = event.get('serviceType', 'medical_care')
         provider_info = event.get('providerInfo', {})
+        date_of_service = event.get('dateOfService') or datetime.utcnow().date().isoformat()
+        force_refresh = bool(event.get('forceRefresh', False))
+        development_mode = event.get('development_mode', True)
+        procedures = event.get('procedures')
+        locality = event.get('locality') or provider_info.get('locality')
         
         logger.info(f"Checking eligibility for patient: {patient_id}")
         
-        # Generate 270 transaction
-        x270_request = generate_270_transaction(
-            patient_id, insurance_info, service_type, provider_info
-        )
+        # Mock 271s are never cached: they would be served to later production checks
+        cache = None if development_mode else get_eligibility_cache(lambda: get_db_pool().connection())
+        payer_id = insurance_info.get('payerId', '')
+        cache_key = None
+        if cache and insurance_info.get('memberId') and payer_id:
+            cache_key = make_eligibility_key(
+                insurance_info['memberId'], payer_id, [service_type], date_of_service
+            )
         
-        # Submit eligibility inquiry
-        if not event.get('development_mode', True):
-            eligibility_response = submit_270_inquiry(x270_request)
+        cached = cache.get(cache_key, force_refresh) if cache_key else None
+        if cached:
+            eligibility_data = cached['response']
+            eligibility_source = cached['source']
+            checked_at = cached['checked_at']
+            logger.info(f"Eligibility served from {eligibility_source} cache for patient: {patient_id}")
         else:
-            # Development mode - return mock data
-            eligibility_response = generate_mock_eligibility_response(
-                patient_id, insurance_info, service_type
+            # Generate 270 transaction
+            x270_request = generate_270_transaction(
+                patient_id, insurance_info, service_type, provider_info, date_of_service
             )
-        
-        # Parse 271 response
-        eligibility_data = parse_271_response(eligibility_response)
+            
+            # Submit eligibility inquiry
+            if not development_mode:
+                eligibility_response = submit_270_inquiry(x270_request)
+                eligibility_source = 'clearinghouse'
+            else:
+                # Development mode - return mock data
+                eligibility_response = generate_mock_eligibility_response(
+                    patient_id, insurance_info, service_type
+                )
+                eligibility_source = 'mock'
+            
+            # Parse 271 response
+            eligibility_data = parse_271_response(eligibility_response, x270_request['inquiry_id'])
+            checked_at = datetime.utcnow().timestamp()
+            
+            if cache_key:
+                cache.put(cache_key, eligibility_data, payer_id, [service_type], date_of_service)
         
         # Enhance with additional logic
-        enhanced_data = enhance_eligibility_data(eligibility_data, service_type)
+        enhanced_data = enhance_eligibility_data(
+            eligibility_data, service_type, procedures=procedures, payer_id=payer_id, locality=locality
+        )
         
         result = {
             'success': True,
             'patient_id': patient_id,
             'eligibility_check_id': f"EC_{int(datetime.utcnow().timestamp())}",
             'timestamp': datetime.utcnow().isoformat(),
+            'eligibility_source': eligibility_source,
+            'checked_at': datetime.utcfromtimestamp(checked_at).isoformat(),
+            'date_of_service': date_of_service,
             **enhanced_data
         }
         
+        # Encoded once for both the run record and the response body
+        encoded_result = encode(result)
+        
         # Store result
         store_agent_run({
             'agent_name': 'EligibilityAgent',
             'input_data': event,
-            'output_data': result,
+            'output_data': encoded_result,
             'timestamp': datetime.utcnow().isoformat(),
             'patient_id': patient_id,
-            'status': 'completed'
+            'status': 'completed',
+            'cache_metrics': cache.get_metrics() if cache else None
         })
         
         return {
             'statusCode': 200,
-            'body': json.dumps(result)
+            'body': encoded_result.text
         }
         
     except Exception as e:
@@ -97,8 +187,191 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             })
         }
 
+def check_eligibility_sweep(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Verify many patients at once (e.g. the next day's schedule). Cached 271s
+    are reused; everyone else is packed into one 270 interchange per payer,
+    interchanges are submitted concurrently and the 271s are parsed as they
+    stream back. Per-patient results keep the order of `patients`.
+    """
+    
+    try:
+        patients = event.get('patients')
+        if not isinstance(patients, list) or not patients:
+            raise ValueError("patients must be a non-empty list")
+        if len(patients) > BATCH_MAX_PATIENTS:
+            raise ValueError(f"Batch too large: {len(patients)} patients (max {BATCH_MAX_PATIENTS})")
+        
+        start = time.perf_counter()
+        service_type = event.get('serviceType', 'medical_care')
+        provider_info = event.get('providerInfo', {})
+        date_of_service = event.get('dateOfService') or datetime.utcnow().date().isoformat()
+        force_refresh = bool(event.get('forceRefresh', False))
+        development_mode = event.get('development_mode', True)
+        
+        logger.info(f"Eligibility sweep for {len(patients)} patients")
+        
+        cache = None if development_mode else get_eligibility_cache(lambda: get_db_pool().connection())
+        results: List[Optional[Dict[str, Any]]] = [None] * len(patients)
+        pending = []
+        
+        for index, patient in enumerate(patients):
+            error = _validate_sweep_patient(patient, f'patients[{index}]')
+            if error:
+                results[index] = {'index': index, 'patient_id': patient.get('patientId') if isinstance(patient, dict) else None,
+                                  'success': False, 'error': error}
+                continue
+            
+            if cache:
+                cached = cache.get(_sweep_cache_key(patient, service_type, date_of_service), force_refresh)
+                if cached:
+                    results[index] = _sweep_result(index, patient, cached['response'], cached['source'], service_type)
+                    continue
+            pending.append(index)
+        
+        locality = event.get('locality') or provider_info.get('locality')
+        interchanges = 0
+        if pending and development_mode:
+            for index in pending:
+                patient = patients[index]
+                response = generate_mock_eligibility_response(
+                    patient['patientId'], patient['insuranceInfo'], patient.get('serviceType') or service_type
+                )
+                results[index] = _sweep_result(index, patient, response, 'mock', service_type)
+        elif pending:
+            groups = group_inquiries([patients[index] for index in pending], provider_info,
+                                     service_type, date_of_service)
+            interchanges = sum(-(-len(inquiries) // SUBSCRIBERS_PER_INTERCHANGE) for inquiries in groups.values())
+            client = get_clearinghouse_client()
+            
+            for result in check_eligibility_batch(groups, client.submit_270,
+                                                  BATCH_MAX_CONCURRENCY, SUBSCRIBERS_PER_INTERCHANGE):
+                index = pending[result.pop('index')]
+                patient = patients[index]
+                if cache:
+                    cache.put(_sweep_cache_key(patient, service_type, date_of_service), result,
+                              patient['insuranceInfo']['payerId'], [patient.get('serviceType') or service_type],
+                              patient.get('dateOfService') or date_of_service)
+                results[index] = _sweep_result(index, patient, result, 'clearinghouse', service_type)
+        
+        # Price the whole schedule in one vectorized pass rather than per patient
+        active = [index for index, item in enumerate(results)
+                  if item['success'] and item.get('eligibility_status') == 'active']
+        if active:
+            estimates = estimate_encounters([{
+                'payer_id': patients[index]['insuranceInfo']['payerId'],
+                'service_type': patients[index].get('serviceType') or service_type,
+                'locality': patients[index].get('locality') or locality,
+                'procedures': patients[index].get('procedures'),
+                'eligibility': results[index]
+            } for index in active], get_fee_schedule())
+            for index, estimate in zip(active, estimates):
+                results[index]['estimated_patient_cost'] = estimate
+        
+        elapsed = time.perf_counter() - start
+        statuses = [item.get('eligibility_status') for item in results if item['success']]
+        summary = {
+            'total': len(results),
+            'active': statuses.count('active'),
+            'inactive': statuses.count('inactive'),
+            'unknown': statuses.count('unknown'),
+            'invalid': sum(1 for item in results if not item['success']),
+            'cache_hits': len(patients) - len(pending) - sum(1 for item in results if not item['success']),
+            'interchanges': interchanges,
+            'elapsed_ms': int(elapsed * 1000),
+            'patients_per_second': round(len(results) / elapsed, 1) if elapsed > 0 else None
+        }
+        
+        encoded_summary = encode(summary)
+        store_agent_run({
+            'agent_name': 'EligibilityAgent',
+            'input_data': {'patients': len(patients), 'dateOfService': date_of_service},
+            'output_data': encoded_summary,
+            'timestamp': datetime.utcnow().isoformat(),
+            'status': 'completed',
+            'cache_metrics': cache.get_metrics() if cache else None
+        })
+        
+        return {
+            'statusCode': 200,
+            'body': encode_object({
+                'success': True,
+                'batch': True,
+                'timestamp': datetime.utcnow().isoformat(),
+                'summary': encoded_summary,
+                'results': results
+            })
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in EligibilityAgent sweep: {str(e)}")
+        
+        store_agent_run({
+            'agent_name': 'EligibilityAgent',
+            'input_data': {'patients': len(event.get('patients') or [])},
+            'error': str(e),
+            'timestamp': datetime.utcnow().isoformat(),
+            'status': 'failed'
+        })
+        
+        return {
+            'statusCode': 400 if isinstance(e, ValueError) else 500,
+            'body': json.dumps({
+                'success': False,
+                'error': 'Failed to run eligibility sweep',
+                'message': str(e)
+            })
+        }
+
+def _validate_sweep_patient(patient: Any, path: str = '') -> Optional[str]:
+    """Per-patient validation so one bad record does not fail the sweep"""
+    
+    if not isinstance(patient, dict):
+        return "Patient must be an object"
+    contract_error = check_contract(INPUT_CONTRACT, patient, path)
+    if contract_error:
+        return contract_error
+    insurance_info = patient.get('insuranceInfo') or {}
+    for field in ('memberId', 'payerId'):
+        if not insurance_info.get(field):
+            return f"Missing insuranceInfo.{field}"
+    return None
+
+def _sweep_cache_key(patient: Dict[str, Any], service_type: str, date_of_service: str) -> str:
+    insurance_info = patient['insuranceInfo']
+    return make_eligibility_key(
+        insurance_info['memberId'], insurance_info['payerId'],
+        [patient.get('serviceType') or service_type], patient.get('dateOfService') or date_of_service
+    )
+
+def _sweep_result(index: int, patient: Dict[str, Any], eligibility_data: Dict[str, Any],
+                  source: str, service_type: str) -> Dict[str, Any]:
+    return {
+        'index': index,
+        'patient_id': patient.get('patientId'),
+        'success': True,
+        'eligibility_source': source,
+        **enhance_eligibility_data(eligibility_data, patient.get('serviceType') or service_type, estimate=False)
+    }
+
+def get_clearinghouse_client() -> ClearinghouseClient:
+    """Process-wide clearinghouse client; ELIGIBILITY_CLEARINGHOUSE_URL overrides the secret's api_url"""
+    
+    global _clearinghouse_client
+    if _clearinghouse_client is None:
+        with _clearinghouse_lock:
+            if _clearinghouse_client is None:
+                config = get_secrets_cache().get_json(CLEARINGHOUSE_SECRET_ID)
+                _clearinghouse_client = ClearinghouseClient(
+                    os.environ.get('ELIGIBILITY_CLEARINGHOUSE_URL') or config.get('api_url', 'https://api.claim.md'),
+                    config.get('account_key'),
+                    max_in_flight=BATCH_MAX_CONCURRENCY
+                )
+    return _clearinghouse_client
+
 def generate_270_transaction(patient_id: str, insurance_info: Dict, 
-                           service_type: str, provider_info: Dict) -> Dict:
+                           service_type: str, provider_info: Dict,
+                           date_of_service: Optional[str] = None) -> Dict:
     """Generate X12 270 eligibility inquiry transaction"""
     
     return {
@@ -122,23 +395,31 @@ def generate_270_transaction(patient_id: str, insurance_info: Dict,
             'tax_id': provider_info.get('taxId', '')
         },
         'service_type_codes': [service_type],
+        'date_of_service': date_of_service or datetime.utcnow().date().isoformat(),
         'generated_at': datetime.utcnow().isoformat()
     }
 
-def submit_270_inquiry(x270_request: Dict) -> Dict:
-    """Submit 270 inquiry to clearinghouse/payer"""
+def submit_270_inquiry(x270_request: Dict) -> Any:
+    """Submit a single-subscriber 270 to the clearinghouse; returns the 271 response stream"""
     
-    # In production, submit to clearinghouse or directly to payer
     logger.info(f"Submitting 270 inquiry: {x270_request['inquiry_id']}")
     
-    # TODO: Implement actual 270/271 submission
-    # This would typically go through a clearinghouse like Claim.MD
-    
-    return {
-        'submission_successful': True,
-        'inquiry_id': x270_request['inquiry_id'],
-        'submitted_at': datetime.utcnow().isoformat()
-    }
+    patient = x270_request['patient']
+    interchange = build_270_interchange(
+        x270_request['payer'],
+        x270_request['provider'],
+        [{
+            'trace_number': x270_request['inquiry_id'],
+            'member_id': patient['member_id'],
+            'first_name': patient['first_name'],
+            'last_name': patient['last_name'],
+            'date_of_birth': patient['date_of_birth'],
+            'date_of_service': x270_request['date_of_service'],
+            'service_type_codes': [service_type_code(code) for code in x270_request['service_type_codes']]
+        }],
+        next_control_number()
+    )
+    return get_clearinghouse_client().submit_270(interchange)
 
 def generate_mock_eligibility_response(patient_id: str, insurance_info: Dict, 
                                      service_type: str) -> Dict:
@@ -188,16 +469,47 @@ def generate_mock_eligibility_response(patient_id: str, insurance_info: Dict,
             'development_mode': True
         }
 
-def parse_271_response(response_data: Dict) -> Dict:
-    """Parse X12 271 eligibility response"""
+def parse_271_response(response_data: Any, trace_number: Optional[str] = None) -> Dict:
+    """
+    Parse an X12 271 eligibility response (text, bytes or stream) into the
+    eligibility structure enhance_eligibility_data expects. Multi-subscriber
+    responses return the loop echoing `trace_number` (or the first loop).
+    Mock responses (dicts) pass through unchanged.
+    """
     
-    # In production, this would parse actual 271 transactions
-    # For now, pass through the mock data
+    if isinstance(response_data, dict):
+        return response_data
+    
+    if isinstance(response_data, str):
+        response_data = response_data.encode('latin-1', errors='replace')
+    stream = io.BytesIO(response_data) if isinstance(response_data, bytes) else response_data
+    
+    selected = None
+    try:
+        for result in EligibilityResponseParser(stream).results():
+            if selected is None or result.get('trace_number') == trace_number:
+                selected = result
+            if trace_number and result.get('trace_number') == trace_number:
+                break
+    finally:
+        if hasattr(stream, 'close'):
+            stream.close()
     
-    return response_data
+    if selected is None:
+        return {
+            'eligibility_status': 'unknown',
+            'reason': 'No subscriber information in 271 response',
+            'response_code': '004'
+        }
+    return selected
 
-def enhance_eligibility_data(eligibility_data: Dict, service_type: str) -> Dict:
-    """Enhance eligibility data with additional business logic"""
+def enhance_eligibility_data(eligibility_data: Dict, service_type: str,
+                             procedures: Optional[List[Dict]] = None, payer_id: Optional[str] = None,
+                             locality: Optional[str] = None, estimate: bool = True) -> Dict:
+    """
+    Enhance eligibility data with additional business logic. Pass
+    estimate=False when the caller prices many patients together.
+    """
     
     enhanced = eligibility_data.copy()
     
@@ -255,51 +567,66 @@ def enhance_eligibility_data(eligibility_data: Dict, service_type: str) -> Dict:
         enhanced['verification_status'] = 'unknown'
     
     # Add estimated patient responsibility
-    if eligibility_data.get('eligibility_status') == 'active':
-        estimated_cost = estimate_patient_responsibility(eligibility_data, service_type)
+    if estimate and eligibility_data.get('eligibility_status') == 'active':
+        estimated_cost = estimate_patient_responsibility(
+            eligibility_data, service_type, procedures=procedures, payer_id=payer_id, locality=locality
+        )
         enhanced['estimated_patient_cost'] = estimated_cost
     
     return enhanced
 
-def estimate_patient_responsibility(eligibility_data: Dict, service_type: str) -> Dict:
-    """Estimate patient's financial responsibility"""
+def estimate_patient_responsibility(eligibility_data: Dict, service_type: str,
+                                    procedures: Optional[List[Dict]] = None, payer_id: Optional[str] = None,
+                                    locality: Optional[str] = None) -> Dict:
+    """
+    Estimate patient's financial responsibility, pricing procedures from the
+    payer fee schedule (FEE_SCHEDULE_PATH) when one is loaded
+    """
     
-    # Mock service costs
-    service_costs = {
-        'office_visit': 200.00,
-        'specialist': 350.00,
-        'imaging': 800.00,
-        'surgery': 5000.00,
-        'emergency': 1200.00
-    }
+    return estimate_encounters([{
+        'payer_id': payer_id,
+        'service_type': service_type,
+        'locality': locality,
+        'procedures': procedures,
+        'eligibility': eligibility_data
+    }], get_fee_schedule())[0]
+
+def get_db_pool() -> ConnectionPool:
+    """Shared Postgres pool for this Lambda container"""
     
-    estimated_charge = service_costs.get(service_type, 250.00)
+    host = os.environ.get('DB_HOST')
+    database = os.environ.get('DB_NAME', 'muni_rcm')
+    return get_pool(
+        (host, database, 'muni-ai-rcm-EligibilityAgent'),
+        lambda: _connect_db(host, database)
+    )
+
+def _connect_db(host: str, database: str):
+    """Open a new database connection using cached Secrets Manager credentials"""
     
-    # Calculate patient responsibility
-    copay = eligibility_data.get('copay', {}).get(service_type, 0.00)
-    deductible_remaining = eligibility_data.get('deductible', {}).get('remaining', 0.00)
-    coinsurance_rate = eligibility_data.get('coinsurance', 0.00) / 100
+    import psycopg2
     
-    # Simple calculation
-    if copay > 0:
-        patient_cost = copay
-    else:
-        deductible_portion = min(estimated_charge, deductible_remaining)
-        coinsurance_portion = (estimated_charge - deductible_portion) * coinsurance_rate
-        patient_cost = deductible_portion + coinsurance_portion
+    secret_arn = os.environ.get('DB_SECRET_ARN')
+    if not secret_arn:
+        raise Exception("DB_SECRET_ARN environment variable not set")
     
-    return {
-        'estimated_charge': estimated_charge,
-        'patient_responsibility': round(patient_cost, 2),
-        'insurance_portion': round(estimated_charge - patient_cost, 2),
-        'calculation_method': 'estimated',
-        'disclaimer': 'Estimate only - actual costs may vary'
-    }
+    def connect(credentials: Dict):
+        return psycopg2.connect(
+            host=host,
+            database=database,
+            user=credentials['username'],
+            password=credentials['password'],
+            port=5432,
+            connect_timeout=10,
+            application_name='muni-ai-rcm-EligibilityAgent'
+        )
+    
+    return get_secrets_cache().call_with_secret(secret_arn, connect, is_db_auth_error)
 
 def store_agent_run(run_data: Dict) -> None:
     """Store agent execution data in RDS"""
     
-    logger.info(f"Agent run data: {json.dumps(run_data, default=str)}")
+    logger.info(f"Agent run data: {encode_object(run_data)}")
     
     # TODO: Implement RDS connection
     # rds_client = boto3.client('rds-data')
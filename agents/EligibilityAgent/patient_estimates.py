@@ -0,0 +1,221 @@
+# Patient Estimates - Muni AI RCM Platform
+# Patient-responsibility estimates for one encounter or a whole day's schedule in one call
+
+import math
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from fee_schedule import FeeSchedule
+
+logger = logging.getLogger(__name__)
+
+# Used when no fee schedule is loaded or the procedure is not in it
+DEFAULT_CHARGES = {
+    'office_visit': 200.00,
+    'specialist': 350.00,
+    'imaging': 800.00,
+    'surgery': 5000.00,
+    'emergency': 1200.00
+}
+DEFAULT_CHARGE = 250.00
+
+# Representative procedure priced when only a service type is known
+REPRESENTATIVE_PROCEDURES = {
+    'office_visit': '99213',
+    'specialist': '99243',
+    'imaging': '70553',
+    'emergency': '99284',
+    'preventive': '99396',
+    'urgent_care': 'S9083'
+}
+
+# Below this many lines the NumPy import and array setup cost more than they save
+VECTORIZE_MIN_LINES = 256
+
+DISCLAIMER = 'Estimate only - actual costs may vary'
+
+# Stand-in for "no out-of-pocket limit reported", in cents
+NO_LIMIT = 1 << 53
+
+
+def estimate_encounters(encounters: List[Dict[str, Any]],
+                        fee_schedule: Optional[FeeSchedule] = None) -> List[Dict[str, Any]]:
+    """
+    Estimate patient responsibility for many encounters in one pass.
+
+    Each encounter has payer_id, service_type, eligibility (the parsed 271:
+    deductible, coinsurance, copay, out_of_pocket_max) and optionally
+    locality and procedures ([{'code', 'modifier', 'units', 'charge'}]).
+    Lines are priced from the fee schedule, then the copay (once per
+    encounter), remaining deductible, coinsurance and out-of-pocket cap are
+    applied in line order - across the whole schedule at once with NumPy
+    when it is installed, line by line otherwise. Both work in integer cents
+    with coinsurance rounded per line, so they give identical results.
+    """
+    columns = _price_lines(encounters, fee_schedule)
+
+    if len(columns['allowed']) >= VECTORIZE_MIN_LINES:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy is not None:
+            responsibility = _apply_benefits_numpy(numpy, columns)
+        else:
+            responsibility = _apply_benefits(columns)
+    else:
+        responsibility = _apply_benefits(columns)
+
+    return _summarize(encounters, columns, responsibility)
+
+
+def _price_lines(encounters: List[Dict[str, Any]], fee_schedule: Optional[FeeSchedule]) -> Dict[str, list]:
+    """Flatten encounters into per-line columns plus per-encounter benefit columns"""
+    columns = {
+        'encounter': [], 'allowed': [], 'first': [], 'priced_by': [], 'procedure': [],
+        'copay': [], 'deductible': [], 'coinsurance': [], 'out_of_pocket': []
+    }
+
+    for index, encounter in enumerate(encounters):
+        eligibility = encounter.get('eligibility') or {}
+        service_type = encounter.get('service_type') or ''
+        copay, deductible, coinsurance, out_of_pocket = _benefits(eligibility, service_type)
+
+        lines = encounter.get('procedures') or [{'code': REPRESENTATIVE_PROCEDURES.get(service_type), 'service_type': True}]
+        for position, line in enumerate(lines):
+            allowed, priced_by = _price(line, encounter, service_type, fee_schedule)
+            columns['encounter'].append(index)
+            columns['allowed'].append(round(allowed * 100))
+            columns['first'].append(position == 0)
+            columns['priced_by'].append(priced_by)
+            columns['procedure'].append(None if line.get('service_type') else line.get('code'))
+            columns['copay'].append(copay)
+            columns['deductible'].append(deductible)
+            columns['coinsurance'].append(coinsurance)
+            columns['out_of_pocket'].append(out_of_pocket)
+
+    return columns
+
+
+def _benefits(eligibility: Dict[str, Any], service_type: str) -> Tuple[int, int, float, int]:
+    """Copay, remaining deductible and remaining out-of-pocket in cents; coinsurance as a rate"""
+    remaining_oop = (eligibility.get('out_of_pocket_max') or {}).get('remaining')
+    return (
+        round(float((eligibility.get('copay') or {}).get(service_type) or 0.0) * 100),
+        round(float((eligibility.get('deductible') or {}).get('remaining') or 0.0) * 100),
+        float(eligibility.get('coinsurance') or 0.0) / 100,
+        round(float(remaining_oop) * 100) if remaining_oop is not None else NO_LIMIT
+    )
+
+
+def _price(line: Dict[str, Any], encounter: Dict[str, Any], service_type: str,
+           fee_schedule: Optional[FeeSchedule]) -> Tuple[float, str]:
+    units = float(line.get('units') or 1)
+    code = line.get('code')
+    if fee_schedule is not None and code:
+        amount = fee_schedule.lookup(encounter.get('payer_id'), code, line.get('modifier'), encounter.get('locality'))
+        if amount is not None:
+            return amount * units, 'fee_schedule'
+    if line.get('charge') is not None:
+        return float(line['charge']), 'charge'
+    if line.get('service_type') or not code:
+        return DEFAULT_CHARGES.get(service_type, DEFAULT_CHARGE), 'default'
+    return 0.0, 'unpriced'
+
+
+def _apply_benefits(columns: Dict[str, list]) -> List[int]:
+    """Line-by-line: copay on the first line, then deductible, coinsurance and the OOP cap"""
+    responsibility = []
+    deductible_used = out_of_pocket_used = 0
+
+    for allowed, first, copay, deductible, coinsurance, out_of_pocket in zip(
+            columns['allowed'], columns['first'], columns['copay'], columns['deductible'],
+            columns['coinsurance'], columns['out_of_pocket']):
+        if first:
+            deductible_used = out_of_pocket_used = 0
+
+        if first and copay > 0:
+            patient = min(copay, allowed)
+        else:
+            deductible_portion = max(0, min(allowed, deductible - deductible_used))
+            deductible_used += deductible_portion
+            patient = deductible_portion + math.floor((allowed - deductible_portion) * coinsurance + 0.5)
+
+        patient = max(0, min(patient, out_of_pocket - out_of_pocket_used))
+        out_of_pocket_used += patient
+        responsibility.append(patient)
+
+    return responsibility
+
+
+def _apply_benefits_numpy(np, columns: Dict[str, list]) -> List[int]:
+    """Same rules as _apply_benefits, expressed as per-encounter running totals over whole columns"""
+    allowed = np.asarray(columns['allowed'], dtype=np.int64)
+    first = np.asarray(columns['first'], dtype=bool)
+    copay = np.asarray(columns['copay'], dtype=np.int64)
+    deductible = np.asarray(columns['deductible'], dtype=np.int64)
+    coinsurance = np.asarray(columns['coinsurance'], dtype=np.float64)
+    out_of_pocket = np.asarray(columns['out_of_pocket'], dtype=np.int64)
+
+    starts = np.flatnonzero(first)
+    counts = np.diff(np.append(starts, len(allowed)))
+
+    def running_total(values):
+        # Cumulative sum restarted at every encounter's first line
+        totals = np.cumsum(values)
+        return totals - np.repeat((totals - values)[starts], counts)
+
+    copay_line = first & (copay > 0)
+    subject = np.where(copay_line, 0, allowed)
+
+    subject_total = running_total(subject)
+    deductible_portion = (np.minimum(subject_total, deductible)
+                          - np.minimum(subject_total - subject, deductible))
+    patient = (np.where(copay_line, np.minimum(copay, allowed), 0) + deductible_portion
+               + np.floor((subject - deductible_portion) * coinsurance + 0.5).astype(np.int64))
+
+    patient_total = running_total(patient)
+    patient = np.minimum(patient_total, out_of_pocket) - np.minimum(patient_total - patient, out_of_pocket)
+    return np.maximum(patient, 0).tolist()
+
+
+def _summarize(encounters: List[Dict[str, Any]], columns: Dict[str, list],
+               responsibility: List[float]) -> List[Dict[str, Any]]:
+    results = [{
+        'estimated_charge': 0,
+        'patient_responsibility': 0,
+        'insurance_portion': 0,
+        'calculation_method': 'fee_schedule',
+        'lines': [],
+        'unpriced_procedures': [],
+        'disclaimer': DISCLAIMER
+    } for _ in encounters]
+
+    for index, allowed, patient, priced_by, procedure in zip(
+            columns['encounter'], columns['allowed'], responsibility,
+            columns['priced_by'], columns['procedure']):
+        result = results[index]
+        result['estimated_charge'] += allowed
+        result['patient_responsibility'] += patient
+        if priced_by != 'fee_schedule':
+            result['calculation_method'] = 'estimated'
+        if priced_by == 'unpriced':
+            result['unpriced_procedures'].append(procedure)
+        if procedure:
+            result['lines'].append({
+                'procedure_code': procedure,
+                'allowed_amount': allowed / 100,
+                'patient_responsibility': patient / 100,
+                'priced_by': priced_by
+            })
+
+    for result in results:
+        result['insurance_portion'] = (result['estimated_charge'] - result['patient_responsibility']) / 100
+        result['estimated_charge'] /= 100
+        result['patient_responsibility'] /= 100
+        if not result['lines']:
+            del result['lines']
+        if not result['unpriced_procedures']:
+            del result['unpriced_procedures']
+    return results
+
@@ -0,0 +1,111 @@
+# X12 270 Builder - Muni AI RCM Platform
+# Packs many subscriber inquiries into one 005010X279A1 270 interchange
+
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+VERSION = '005010X279A1'
+
+# Agent service types -> X12 service type codes (EQ01 / EB03)
+SERVICE_TYPE_CODES = {
+    'medical_care': '1',
+    'surgery': '2',
+    'imaging': '4',
+    'emergency': '86',
+    'urgent_care': 'UC',
+    'pharmacy': '88',
+    'office_visit': '98',
+    'specialist': '98',
+    'preventive': 'BZ',
+    'mental_health': 'MH',
+    'health_benefit_plan': '30'
+}
+DEFAULT_SERVICE_TYPE_CODE = '30'
+
+# Clearinghouses commonly reject transaction sets with more subscriber loops than this
+MAX_SUBSCRIBERS_PER_TRANSACTION = 99
+
+# Characters reserved as delimiters in the interchanges we generate
+_RESERVED = str.maketrans('', '', '*~:^')
+
+
+def service_type_code(service_type: str) -> str:
+    """Map an agent service type (or a raw X12 code) to an EQ01 service type code"""
+    if service_type in SERVICE_TYPE_CODES:
+        return SERVICE_TYPE_CODES[service_type]
+    if service_type and len(service_type) <= 2 and service_type.isalnum():
+        return service_type.upper()
+    return DEFAULT_SERVICE_TYPE_CODE
+
+
+def _clean(value: Any, upper: bool = True) -> str:
+    text = str(value or '').translate(_RESERVED).strip()
+    return text.upper() if upper else text
+
+
+def _x12_date(value: Optional[str]) -> str:
+    """ISO (YYYY-MM-DD) or CCYYMMDD -> CCYYMMDD"""
+    return (value or '').replace('-', '')[:8]
+
+
+def build_270_interchange(payer: Dict[str, str], provider: Dict[str, str],
+                          inquiries: List[Dict[str, Any]], control_number: int,
+                          sender_id: str = 'MUNIRCM', receiver_id: str = 'CLEARINGHOUSE',
+                          now: Optional[datetime] = None) -> str:
+    """
+    Build one 270 interchange for a payer/provider pair.
+
+    Each inquiry needs trace_number, member_id, first_name, last_name and
+    date_of_service; date_of_birth and service_type_codes are optional. The
+    trace number is echoed in the 271 TRN segment to match results to patients.
+    Subscribers are split across transaction sets of MAX_SUBSCRIBERS_PER_TRANSACTION.
+    """
+    now = now or datetime.utcnow()
+    date8, time4 = now.strftime('%Y%m%d'), now.strftime('%H%M')
+
+    segments = [
+        f"ISA*00*          *00*          *ZZ*{_clean(sender_id)[:15]:<15}*ZZ*{_clean(receiver_id)[:15]:<15}"
+        f"*{date8[2:]}*{time4}*^*00501*{control_number:09d}*0*P*:",
+        f"GS*HS*{_clean(sender_id)}*{_clean(receiver_id)}*{date8}*{time4}*{control_number}*X*{VERSION}"
+    ]
+
+    payer_segment = f"NM1*PR*2*{_clean(payer.get('name')) or 'PAYER'}*****PI*{_clean(payer.get('id'))}"
+    provider_segment = f"NM1*1P*2*{_clean(provider.get('name')) or 'PROVIDER'}*****XX*{_clean(provider.get('npi'))}"
+
+    transaction_count = 0
+    for start in range(0, len(inquiries), MAX_SUBSCRIBERS_PER_TRANSACTION):
+        transaction_count += 1
+        st_control = f"{transaction_count:04d}"
+        body = [
+            f"ST*270*{st_control}*{VERSION}",
+            f"BHT*0022*13*{control_number}-{transaction_count}*{date8}*{time4}",
+            "HL*1**20*1",
+            payer_segment,
+            "HL*2*1*21*1",
+            provider_segment
+        ]
+
+        hl = 2
+        for inquiry in inquiries[start:start + MAX_SUBSCRIBERS_PER_TRANSACTION]:
+            hl += 1
+            body.append(f"HL*{hl}*2*22*0")
+            body.append(f"TRN*1*{_clean(inquiry['trace_number'])}*9{_clean(sender_id)[:9]}")
+            body.append(
+                f"NM1*IL*1*{_clean(inquiry.get('last_name'))}*{_clean(inquiry.get('first_name'))}"
+                f"****MI*{_clean(inquiry.get('member_id'))}"
+            )
+            if inquiry.get('date_of_birth'):
+                body.append(f"DMG*D8*{_x12_date(inquiry['date_of_birth'])}")
+            body.append(f"DTP*291*D8*{_x12_date(inquiry['date_of_service'])}")
+            for code in inquiry.get('service_type_codes') or [DEFAULT_SERVICE_TYPE_CODE]:
+                body.append(f"EQ*{_clean(code)}")
+
+        body.append(f"SE*{len(body) + 1}*{st_control}")
+        segments.extend(body)
+
+    segments.append(f"GE*{transaction_count}*{control_number}")
+    segments.append(f"IEA*1*{control_number:09d}")
+    return '~\n'.join(segments) + '~\n'
@@ -0,0 +1,307 @@
+# X12 271 Parser - Muni AI RCM Platform
+# Streams per-subscriber eligibility results out of a 271 response
+
+import logging
+from typing import Dict, Any, Iterator, List, Optional
+
+from x12_segments import X12SegmentReader
+from x12_270 import SERVICE_TYPE_CODES
+
+logger = logging.getLogger(__name__)
+
+# EB01 eligibility/benefit information codes
+ACTIVE_CODES = {'1', '2', '3', '4', '5'}
+INACTIVE_CODES = {'6', '7', '8'}
+
+# HL03 levels that start a subscriber/dependent loop
+SUBSCRIBER_LEVELS = {'22', '23'}
+LOOP_TERMINATORS = {'HL', 'SE', 'GE', 'IEA'}
+
+# EB04 insurance type codes
+PLAN_TYPES = {
+    'PR': 'PPO',
+    'HM': 'HMO',
+    'HN': 'HMO',
+    'EP': 'EPO',
+    'PS': 'POS',
+    'HS': 'HSA',
+    'MA': 'Medicare Part A',
+    'MB': 'Medicare Part B',
+    'MC': 'Medicaid'
+}
+
+# AAA03 reject reason codes
+REJECT_REASONS = {
+    '15': 'Required application data missing',
+    '42': 'Unable to respond at current time',
+    '43': 'Invalid/missing provider identification',
+    '58': 'Invalid/missing date of birth',
+    '72': 'Invalid/missing subscriber ID',
+    '73': 'Invalid/missing subscriber name',
+    '75': 'Subscriber not found',
+    '76': 'Duplicate subscriber ID'
+}
+
+# EB03 codes -> names used in copay/covered_services (first name wins for shared codes)
+SERVICE_TYPE_NAMES: Dict[str, str] = {}
+for _name, _code in SERVICE_TYPE_CODES.items():
+    SERVICE_TYPE_NAMES.setdefault(_code, _name)
+
+
+def _amount(value: str) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _date(value: str) -> Optional[str]:
+    """CCYYMMDD (or the start of a CCYYMMDD-CCYYMMDD range) -> ISO date"""
+    value = value[:8]
+    if len(value) == 8 and value.isdigit():
+        return f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+    return None
+
+
+def _pad(segment: List[str], length: int) -> List[str]:
+    """Pad a segment with empty elements so fixed positions can be indexed directly"""
+    if len(segment) < length:
+        segment.extend([''] * (length - len(segment)))
+    return segment
+
+
+# Subscriber-loop segments -> handler method; anything else inside the loop
+# (LS/LE 2120 loops, PER, III, ...) is skipped without further inspection
+SEGMENT_HANDLERS = {
+    'EB': '_on_benefit',
+    'DTP': '_on_date',
+    'MSG': '_on_message',
+    'REF': '_on_reference',
+    'TRN': '_on_trace',
+    'NM1': '_on_name',
+    'AAA': '_on_rejection'
+}
+
+# EB01 -> handler method for the benefit amounts the estimator uses
+BENEFIT_HANDLERS = {
+    'A': '_on_coinsurance',
+    'B': '_on_copay',
+    'C': '_on_deductible',
+    'G': '_on_out_of_pocket'
+}
+BENEFIT_HANDLERS.update({code: '_on_active_coverage' for code in ACTIVE_CODES})
+
+EB_PADDING = [''] * 13
+
+# EB12 / DTP qualifiers and REF qualifiers we keep
+OUT_OF_NETWORK = 'N'
+EFFECTIVE_DATE_QUALIFIERS = {'346', '356', '291'}
+TERMINATION_DATE_QUALIFIERS = {'347', '357'}
+GROUP_REFERENCE_QUALIFIERS = {'18', '1L', '6P'}
+
+
+class EligibilityResponseParser:
+    """
+    Segment-level streaming parser for X12 271 eligibility responses.
+
+    `results()` yields one dict per subscriber/dependent loop, shaped like the
+    single-inquiry eligibility response (eligibility_status, deductible,
+    copay, coinsurance, out_of_pocket_max, ...) plus the echoed trace_number.
+    Only the subscriber currently being assembled is held in memory.
+
+    Segments are routed through dispatch tables compiled once per parser
+    (segment id -> handler, EB01 -> benefit handler), so each segment costs
+    one dict lookup instead of a chain of comparisons.
+    """
+
+    def __init__(self, stream, chunk_size: Optional[int] = None):
+        reader_args = {'chunk_size': chunk_size} if chunk_size else {}
+        self._reader = X12SegmentReader(stream, **reader_args)
+        self._segment_handlers = {segment_id: getattr(self, name) for segment_id, name in SEGMENT_HANDLERS.items()}
+        self._benefit_handlers = {code: getattr(self, name) for code, name in BENEFIT_HANDLERS.items()}
+        # Out-of-network amounts never feed the estimate; only coverage is recorded
+        self._out_of_network_handlers = {code: self._on_active_coverage for code in ACTIVE_CODES}
+        self.result_count = 0
+
+    @property
+    def segment_count(self) -> int:
+        return self._reader.segment_count
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """Yield eligibility results one subscriber loop at a time"""
+        handlers = self._segment_handlers
+        payer = {'id': None, 'name': None}
+        subscriber = None
+        source_rejection = None
+
+        for segment in self._reader:
+            segment_id = segment[0]
+
+            if subscriber is not None:
+                handler = handlers.get(segment_id)
+                if handler is not None:
+                    handler(subscriber, segment)
+                    continue
+                if segment_id not in LOOP_TERMINATORS:
+                    continue
+                yield self._finish(subscriber)
+                subscriber = None
+
+            # Envelope and payer/receiver levels
+            if segment_id == 'HL':
+                level = _pad(segment, 4)[3]
+                if level in SUBSCRIBER_LEVELS:
+                    subscriber = self._start(payer, source_rejection)
+                elif level == '20':
+                    payer = {'id': None, 'name': None}
+                    source_rejection = None
+            elif segment_id == 'NM1' and _pad(segment, 10)[1] == 'PR':
+                payer = {'id': segment[9], 'name': segment[3]}
+            elif segment_id == 'AAA':
+                # Payer/receiver level rejection applies to every subscriber below it
+                source_rejection = _pad(segment, 4)[3]
+            elif segment_id == 'ST':
+                source_rejection = None
+
+        if subscriber is not None:
+            yield self._finish(subscriber)
+
+    def _start(self, payer: Dict[str, Any], source_rejection: Optional[str]) -> Dict[str, Any]:
+        return {
+            'trace_number': None,
+            'member_id': None,
+            'first_name': None,
+            'last_name': None,
+            'payer': dict(payer),
+            'benefit_codes': set(),
+            'effective_date': None,
+            'termination_date': None,
+            'plan_type': None,
+            'group_number': None,
+            'deductible': {},
+            'copay': {},
+            'coinsurance': None,
+            'out_of_pocket_max': {},
+            'authorization_required': False,
+            'covered_services': [],
+            'messages': [],
+            'reject_reason_code': source_rejection
+        }
+
+    # Subscriber-loop segment handlers
+
+    def _on_benefit(self, subscriber: Dict[str, Any], segment: List[str]):
+        # EB is the bulk of a large payer response - pad inline rather than via _pad
+        if len(segment) < 13:
+            segment.extend(EB_PADDING[len(segment):])
+        code = segment[1]
+        subscriber['benefit_codes'].add(code)
+
+        if segment[11] == 'Y':
+            subscriber['authorization_required'] = True
+
+        handlers = self._out_of_network_handlers if segment[12] == OUT_OF_NETWORK else self._benefit_handlers
+        handler = handlers.get(code)
+        if handler is not None:
+            handler(subscriber, segment)
+
+    def _on_date(self, subscriber: Dict[str, Any], segment: List[str]):
+        _pad(segment, 4)
+        qualifier = segment[1]
+        if qualifier in EFFECTIVE_DATE_QUALIFIERS:
+            if not subscriber['effective_date']:
+                subscriber['effective_date'] = _date(segment[3])
+        elif qualifier in TERMINATION_DATE_QUALIFIERS:
+            subscriber['termination_date'] = _date(segment[3])
+
+    def _on_message(self, subscriber: Dict[str, Any], segment: List[str]):
+        if len(segment) > 1:
+            subscriber['messages'].append(segment[1])
+
+    def _on_reference(self, subscriber: Dict[str, Any], segment: List[str]):
+        if _pad(segment, 3)[1] in GROUP_REFERENCE_QUALIFIERS:
+            subscriber['group_number'] = segment[2]
+
+    def _on_trace(self, subscriber: Dict[str, Any], segment: List[str]):
+        # TRN01 2 = referenced (echoed) transaction trace; 1 = payer-assigned
+        if _pad(segment, 3)[1] == '2':
+            subscriber['trace_number'] = segment[2]
+
+    def _on_name(self, subscriber: Dict[str, Any], segment: List[str]):
+        if _pad(segment, 10)[1] in ('IL', '03'):
+            subscriber['member_id'] = segment[9] or subscriber['member_id']
+            subscriber['last_name'] = segment[3]
+            subscriber['first_name'] = segment[4]
+
+    def _on_rejection(self, subscriber: Dict[str, Any], segment: List[str]):
+        subscriber['reject_reason_code'] = _pad(segment, 4)[3]
+
+    # EB01 benefit handlers (segments are padded to EB12)
+
+    def _on_active_coverage(self, subscriber: Dict[str, Any], segment: List[str]):
+        if not subscriber['plan_type'] and segment[4]:
+            subscriber['plan_type'] = PLAN_TYPES.get(segment[4], segment[4])
+        covered = subscriber['covered_services']
+        for service_code in self._reader.split_repetitions(segment[3]):
+            name = SERVICE_TYPE_NAMES.get(service_code, service_code)
+            if name not in covered:
+                covered.append(name)
+
+    def _on_deductible(self, subscriber: Dict[str, Any], segment: List[str]):
+        self._apply_accumulator(subscriber['deductible'], segment)
+
+    def _on_out_of_pocket(self, subscriber: Dict[str, Any], segment: List[str]):
+        self._apply_accumulator(subscriber['out_of_pocket_max'], segment)
+
+    def _on_copay(self, subscriber: Dict[str, Any], segment: List[str]):
+        if not self._is_estimate_benefit(segment):
+            return
+        amount = _amount(segment[7])
+        if amount is None:
+            return
+        copay = subscriber['copay']
+        for service_code in self._reader.split_repetitions(segment[3]) or ['30']:
+            copay[SERVICE_TYPE_NAMES.get(service_code, service_code)] = amount
+
+    def _on_coinsurance(self, subscriber: Dict[str, Any], segment: List[str]):
+        if subscriber['coinsurance'] is not None or not self._is_estimate_benefit(segment):
+            return
+        percent = _amount(segment[8])
+        if percent is not None:
+            subscriber['coinsurance'] = round(percent * 100, 2)
+
+    def _apply_accumulator(self, target: Dict[str, float], segment: List[str]):
+        if not self._is_estimate_benefit(segment):
+            return
+        amount = _amount(segment[7])
+        if amount is not None:
+            # EB06 29 = remaining; any other time period is the plan amount
+            target['remaining' if segment[6] == '29' else 'individual'] = amount
+
+    def _is_estimate_benefit(self, segment: List[str]) -> bool:
+        """Only individual amounts feed the estimate (out-of-network ones never get here)"""
+        return segment[2] in ('', 'IND')
+
+    def _finish(self, subscriber: Dict[str, Any]) -> Dict[str, Any]:
+        self.result_count += 1
+        codes = subscriber.pop('benefit_codes')
+        reject_code = subscriber['reject_reason_code']
+
+        if reject_code:
+            status, response_code = 'unknown', '004'
+            subscriber['reason'] = REJECT_REASONS.get(reject_code, f'Rejected by payer ({reject_code})')
+        elif not codes.isdisjoint(ACTIVE_CODES):
+            status, response_code = 'active', '001'
+        elif not codes.isdisjoint(INACTIVE_CODES):
+            status, response_code = 'inactive', '003'
+            subscriber['reason'] = 'Coverage terminated'
+        else:
+            status, response_code = 'unknown', '004'
+            subscriber['reason'] = 'Unable to verify coverage'
+
+        if subscriber['coinsurance'] is None:
+            subscriber['coinsurance'] = 0.0
+
+        subscriber['eligibility_status'] = status
+        subscriber['response_code'] = response_code
+        return subscriber
@@ -0,0 +1,260 @@
+# Claim MD Client - Muni AI RCM Platform
+# Keep-alive HTTP client for concurrent, idempotent Claim MD submissions
+
+import json
+import math
+import time
+import hashlib
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, Iterable, Iterator, Tuple
+
+from throttle import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# 409: a request with the same Idempotency-Key is still in progress (e.g. the one
+# that timed out); retrying returns its outcome once it completes
+RETRYABLE_STATUS_CODES = {409, 429, 500, 502, 503, 504}
+# Claim-level problems; anything else non-retryable (401, 403, 404...) is an error
+VALIDATION_STATUS_CODES = {400, 422}
+
+# One client per (api_url, account_key) so warm invocations reuse open connections
+_clients: Dict[tuple, 'ClaimMDClient'] = {}
+_clients_lock = threading.Lock()
+
+
+class ClaimMDSubmissionError(Exception):
+    """Raised when a claim could not be submitted after all retries"""
+    pass
+
+
+class ClaimMDAuthError(ClaimMDSubmissionError):
+    """Raised on 401/403 - the account key is invalid or was rotated"""
+    pass
+
+
+def idempotency_key(payload: Dict[str, Any]) -> str:
+    """Deterministic key so retries and re-invocations never double-submit a claim"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    claim_id = payload.get('claim', {}).get('id') or ''
+    return f"{claim_id}-{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]}"
+
+
+def latency_summary(samples: Iterable[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p90/p95/p99 and max of latency samples (ms)"""
+    ordered = sorted(samples)
+    summary = {}
+    for percent in (50, 90, 95, 99):
+        index = max(0, math.ceil(percent / 100.0 * len(ordered)) - 1)
+        summary[f'p{percent}'] = round(ordered[index], 1) if ordered else None
+    summary['max'] = round(ordered[-1], 1) if ordered else None
+    return summary
+
+
+class ClaimMDClient:
+    """
+    Claim MD API client built on one keep-alive requests.Session:
+    - Connection pool sized to the in-flight limit (no per-claim TLS handshake)
+    - Idempotency-Key header on every submission
+    - Jittered exponential backoff on 409 (same key in progress), 429/5xx and
+      connection errors, honoring Retry-After
+    - Throughput and latency percentiles via get_metrics()
+    """
+
+    def __init__(self, api_url: str, account_key: str, max_in_flight: int = 8,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_attempts: int = 4, backoff_base_seconds: float = 0.5,
+                 backoff_max_seconds: float = 20.0, latency_samples: int = 10000):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.api_url = api_url.rstrip('/')
+        self.max_in_flight = max_in_flight
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {account_key}',
+            'X-API-Version': '2024-01'
+        })
+
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=latency_samples)
+        self._metrics = {
+            'submitted': 0,
+            'accepted': 0,
+            'rejected': 0,
+            'failed': 0,
+            'attempts': 0,
+            'retries': 0,
+            'busy_seconds': 0.0
+        }
+
+    def submit(self, payload: Dict[str, Any], key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Submit one claim. Returns the submission result ('submitted' or
+        'rejected' with validation errors); raises ClaimMDSubmissionError when
+        retries are exhausted or the error is not retryable.
+        """
+        key = key or idempotency_key(payload)
+        body = json.dumps(payload, default=str)
+        start = time.perf_counter()
+        last_error = None
+
+        try:
+            for attempt in range(self.max_attempts):
+                if attempt:
+                    self._count('retries')
+                self._count('attempts')
+
+                retry_after = None
+                try:
+                    response = self.session.post(
+                        f'{self.api_url}/claims/submit',
+                        data=body,
+                        headers={'Idempotency-Key': key},
+                        timeout=self.timeout
+                    )
+                except self._requests.exceptions.RequestException as e:
+                    last_error = f"{type(e).__name__}: {str(e)}"
+                else:
+                    if response.status_code < 400:
+                        self._count('accepted')
+                        return self._submitted(response.json(), key)
+
+                    if response.status_code in VALIDATION_STATUS_CODES:
+                        self._count('rejected')
+                        return self._rejected(response, key)
+
+                    if response.status_code in (401, 403):
+                        self._count('failed')
+                        raise ClaimMDAuthError(f"Claim MD rejected credentials: HTTP {response.status_code}")
+
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        self._count('failed')
+                        raise ClaimMDSubmissionError(
+                            f"Claim MD returned HTTP {response.status_code}: {response.text[:200]}"
+                        )
+
+                    last_error = f"HTTP {response.status_code}"
+                    retry_after = self._retry_after(response)
+
+                if attempt + 1 < self.max_attempts:
+                    delay = backoff_delay(attempt, self.backoff_base_seconds, self.backoff_max_seconds)
+                    time.sleep(min(self.backoff_max_seconds, max(delay, retry_after or 0.0)))
+
+            self._count('failed')
+            raise ClaimMDSubmissionError(
+                f"Claim MD submission failed after {self.max_attempts} attempts: {last_error}"
+            )
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._metrics['submitted'] += 1
+                self._latencies_ms.append(elapsed_ms)
+
+    def submit_many(self, submissions: Iterable[Tuple[Any, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """
+        Submit (ref, payload) pairs with at most max_in_flight requests open,
+        yielding one result per claim as it completes. Failures are reported
+        per claim with status 'failed'. Each result carries `ref` and `latency_ms`.
+        """
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                futures = [
+                    executor.submit(self._submit_timed, ref, payload)
+                    for ref, payload in submissions
+                ]
+                for future in as_completed(futures):
+                    yield future.result()
+        finally:
+            self._count('busy_seconds', time.perf_counter() - start)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Submission counts, throughput and end-to-end latency percentiles (ms)"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            latencies = list(self._latencies_ms)
+
+        busy = metrics.pop('busy_seconds')
+        metrics['claims_per_second'] = round(metrics['submitted'] / busy, 1) if busy > 0 else None
+        metrics['latency_ms'] = latency_summary(latencies)
+        return metrics
+
+    def close(self):
+        self.session.close()
+
+    def _submit_timed(self, ref: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = self.submit(payload)
+        except Exception as e:
+            logger.error(f"Claim MD submission failed for {ref}: {str(e)}")
+            result = {'status': 'failed', 'error': str(e), 'auth_error': isinstance(e, ClaimMDAuthError)}
+        result['ref'] = ref
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def _submitted(self, result: Dict[str, Any], key: str) -> Dict[str, Any]:
+        return {
+            'status': 'submitted',
+            'batch_id': result.get('batch_id'),
+            'claim_id': result.get('claim_id'),
+            'tracking_number': result.get('tracking_number'),
+            'validation_status': result.get('validation_status'),
+            'submission_id': result.get('submission_id'),
+            'idempotency_key': key
+        }
+
+    def _rejected(self, response, key: str) -> Dict[str, Any]:
+        try:
+            errors = response.json().get('errors', [])
+        except ValueError:
+            errors = [response.text[:500]]
+        logger.warning(f"Claim MD rejected submission {key}: HTTP {response.status_code}")
+        return {
+            'status': 'rejected',
+            'error': 'Claim MD validation failed',
+            'http_status': response.status_code,
+            'validation_errors': errors,
+            'needs_rework': True,
+            'idempotency_key': key
+        }
+
+    def _retry_after(self, response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    def _count(self, metric: str, amount=1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+
+def get_claim_md_client(api_url: str, account_key: str, **client_options) -> ClaimMDClient:
+    """Return the process-wide client for an endpoint/account, creating it on first use"""
+    key = (api_url, account_key)
+    client = _clients.get(key)
+    if client:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if not client:
+            client = ClaimMDClient(api_url, account_key, **client_options)
+            _clients[key] = client
+        return client
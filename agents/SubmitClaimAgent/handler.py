@@ -1,17 +1,36 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from base_agent import BaseAgent
-from typing import Dict, Any, Optional
-import json
+from claim_md_client import ClaimMDClient, ClaimMDAuthError, get_claim_md_client, latency_summary
+from ncci_edits import get_ncci_edits, scrub_claim
+from schema_validator import check_contract, get_input_validator
+from typing import Dict, Any, Optional, List, Tuple
+import time
 import logging
-import boto3
-import requests
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+CLAIM_MD_SECRET_ID = 'muni-rcm/claim-md-credentials'
+
+# Batch submission configuration
+BATCH_MAX_CLAIMS = int(os.environ.get('CLAIM_MD_BATCH_MAX_CLAIMS', '1000'))
+MAX_IN_FLIGHT = int(os.environ.get('CLAIM_MD_MAX_IN_FLIGHT', '8'))
+MAX_ATTEMPTS = int(os.environ.get('CLAIM_MD_MAX_ATTEMPTS', '4'))
+
+# NCCI PTP/MUE pre-submission checks (NCCI_EDITS_PATH): enforce holds back claims
+# with edit errors, report submits them with the findings attached, off skips the check
+NCCI_EDIT_MODE = os.environ.get('NCCI_EDIT_MODE', 'enforce').lower()
+# Modifier appended to column 2 lines of modifier-allowed edits (e.g. 59, XU); unset only flags them
+NCCI_AUTO_MODIFIER = os.environ.get('NCCI_AUTO_MODIFIER', '').strip().upper() or None
+
+# schemas/submit-claim-agent.json: the request contract, and claimData alone for batch items
+INPUT_CONTRACT = get_input_validator('submit-claim-agent')
+CLAIM_CONTRACT = get_input_validator('submit-claim-agent', '/input/properties/claimData')
+
 class SubmitClaimAgent(BaseAgent):
     """
     Submit claims to Claim MD for X12 EDI generation and payer submission
@@ -21,14 +40,48 @@ class SubmitClaimAgent(BaseAgent):
     - Payer-specific formatting requirements  
     - Claim submission to clearinghouses/payers
     - Status tracking and notifications
+    
+    Batch mode: an event with a `claims` list submits every claim concurrently
+    over one keep-alive session, with per-claim results.
+    
+    Before submission, service lines are checked against NCCI procedure-to-
+    procedure edits and MUEs, so bundling conflicts and unit overages are
+    caught here instead of coming back as rejections.
     """
     
+    aws_services = ('secretsmanager',)
+    prewarm_modules = ('psycopg2', 'requests')
+    
     def validate_input(self, event: Dict[str, Any]) -> Optional[str]:
         """Validate required claim submission fields"""
         
-        claim_data = event.get('claimData')
+        if 'claims' in event:
+            claims = event.get('claims')
+            if not isinstance(claims, list) or not claims:
+                return "claims must be a non-empty list"
+            if len(claims) > BATCH_MAX_CLAIMS:
+                return f"Batch too large: {len(claims)} claims (max {BATCH_MAX_CLAIMS})"
+            # Individual claims are validated per item
+            return None
+        
+        # The whole-request contract already covers claimData
+        contract_error = check_contract(INPUT_CONTRACT, event)
+        if contract_error:
+            return contract_error
+        return self._validate_claim(event.get('claimData'), contract=None)
+    
+    def _validate_claim(self, claim_data: Optional[Dict[str, Any]], path: str = 'claimData',
+                        contract=CLAIM_CONTRACT) -> Optional[str]:
+        """Validate a single claim"""
+        
         if not claim_data:
             return "Missing required field: claimData"
+        if not isinstance(claim_data, dict):
+            return "claimData must be an object"
+        
+        contract_error = check_contract(contract, claim_data, path)
+        if contract_error:
+            return contract_error
         
         # Check for essential claim fields
         required_fields = ['claimId', 'patientId', 'providerId', 'serviceDate']
@@ -46,9 +99,23 @@ class SubmitClaimAgent(BaseAgent):
     def execute_production_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Submit claim to Claim MD production API"""
         
+        if 'claims' in event:
+            return self._submit_batch(event['claims'])
+        
         claim_data = event.get('claimData', {})
         claim_id = claim_data.get('claimId')
         
+        # NCCI edits: hold back claims that would be rejected, add allowed modifiers
+        claim_data, ncci = self._scrub_claim(claim_data)
+        if self._ncci_blocks(ncci):
+            return {
+                'success': False,
+                'claim_id': claim_id,
+                'submission_status': 'invalid',
+                'error': self._ncci_error(ncci),
+                'ncci': ncci
+            }
+        
         # Get Claim MD credentials
         claim_md_config = self._get_claim_md_config()
         
@@ -61,22 +128,50 @@ class SubmitClaimAgent(BaseAgent):
         # Update local claim record
         self._update_claim_record(claim_id, submission_result)
         
-        return {
-            'success': True,
+        submission_status = submission_result.get('status', 'submitted')
+        result = {
+            'success': submission_status == 'submitted',
             'claim_id': claim_id,
             'claimmd_batch_id': submission_result.get('batch_id'),
             'claimmd_claim_id': submission_result.get('claim_id'),
-            'submission_status': submission_result.get('status', 'submitted'),
+            'submission_status': submission_status,
             'tracking_number': submission_result.get('tracking_number'),
             'expected_response_time': '24-48 hours',
             'submitted_at': datetime.utcnow().isoformat()
         }
+        if submission_status == 'rejected':
+            result['error'] = submission_result.get('error')
+            result['validation_errors'] = submission_result.get('validation_errors')
+            result['needs_rework'] = True
+        if ncci:
+            result['ncci'] = ncci
+        return result
     
     def execute_development_mode(self, event: Dict[str, Any]) -> Dict[str, Any]:
         """Return mock submission result for development"""
         
-        claim_data = event.get('claimData', {})
-        claim_id = claim_data.get('claimId')
+        if 'claims' in event:
+            results = [
+                dict(self._mock_submission(claim_data), index=index)
+                for index, claim_data in enumerate(event['claims'])
+            ]
+            return {
+                'success': True,
+                'batch': True,
+                'total': len(results),
+                'submitted': len(results),
+                'rejected': 0,
+                'failed': 0,
+                'development_mode': True,
+                'results': results
+            }
+        
+        return self._mock_submission(event.get('claimData', {}))
+    
+    def _mock_submission(self, claim_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Mock submission result for one claim"""
+        
+        claim_id = (claim_data or {}).get('claimId')
         
         return {
             'success': True,
@@ -91,15 +186,137 @@ class SubmitClaimAgent(BaseAgent):
             'message': 'Claim processed in development mode - no actual submission'
         }
     
+    def _submit_batch(self, claims: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Submit many claims concurrently and report per-claim outcomes"""
+        
+        start = time.perf_counter()
+        client = self._get_claim_md_client(self._get_claim_md_config())
+        
+        results = []
+        submissions = []
+        ncci_reports = {}
+        for index, claim_data in enumerate(claims):
+            validation_error = self._validate_claim(claim_data, f'claims[{index}]')
+            if validation_error:
+                results.append({
+                    'index': index,
+                    'claim_id': claim_data.get('claimId') if isinstance(claim_data, dict) else None,
+                    'success': False,
+                    'submission_status': 'invalid',
+                    'error': validation_error
+                })
+                continue
+            
+            claim_data, ncci = self._scrub_claim(claim_data)
+            if ncci:
+                ncci_reports[index] = ncci
+            if self._ncci_blocks(ncci):
+                results.append({
+                    'index': index,
+                    'claim_id': claim_data.get('claimId'),
+                    'success': False,
+                    'submission_status': 'invalid',
+                    'error': self._ncci_error(ncci),
+                    'ncci': ncci
+                })
+            else:
+                submissions.append((index, self._prepare_claim_md_payload(claim_data)))
+        scrub_ms = int((time.perf_counter() - start) * 1000)
+        
+        for submission_result in client.submit_many(submissions):
+            index = submission_result.pop('ref')
+            claim_id = claims[index].get('claimId')
+            if submission_result['status'] != 'failed':
+                self._update_claim_record(claim_id, submission_result)
+            
+            results.append({
+                'index': index,
+                'claim_id': claim_id,
+                'success': submission_result['status'] == 'submitted',
+                'submission_status': submission_result['status'],
+                'claimmd_batch_id': submission_result.get('batch_id'),
+                'claimmd_claim_id': submission_result.get('claim_id'),
+                'tracking_number': submission_result.get('tracking_number'),
+                'validation_errors': submission_result.get('validation_errors'),
+                'error': submission_result.get('error'),
+                'auth_error': submission_result.get('auth_error', False),
+                'latency_ms': submission_result.get('latency_ms'),
+                'ncci': ncci_reports.get(index)
+            })
+        
+        if any(item.get('auth_error') for item in results):
+            # Rotated account key: drop it so the next batch fetches the new one
+            self.get_secrets_cache().invalidate(CLAIM_MD_SECRET_ID)
+        
+        results.sort(key=lambda item: item['index'])
+        statuses = [item['submission_status'] for item in results]
+        elapsed = time.perf_counter() - start
+        
+        return {
+            'success': 'submitted' in statuses,
+            'batch': True,
+            'total': len(results),
+            'submitted': statuses.count('submitted'),
+            'rejected': statuses.count('rejected'),
+            'failed': len(results) - statuses.count('submitted') - statuses.count('rejected'),
+            'elapsed_ms': int(elapsed * 1000),
+            'claims_per_second': round(len(submissions) / elapsed, 1) if elapsed > 0 else None,
+            'latency_ms': latency_summary(item['latency_ms'] for item in results if item.get('latency_ms') is not None),
+            'claim_md_client_metrics': client.get_metrics(),
+            'ncci': {
+                'checked': len(ncci_reports),
+                'blocked': sum(1 for report in ncci_reports.values() if report['status'] == 'blocked'),
+                'modified': sum(1 for report in ncci_reports.values() if report['status'] == 'modified'),
+                'scrub_ms': scrub_ms
+            },
+            'submitted_at': datetime.utcnow().isoformat(),
+            'results': results
+        }
+    
+    def _scrub_claim(self, claim_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Check a claim against the NCCI edits; returns the claim (with any
+        auto-applied modifiers) and the NCCI report, or None when off or
+        no NCCI_EDITS_PATH is configured
+        """
+        
+        if NCCI_EDIT_MODE == 'off':
+            return claim_data, None
+        edits = get_ncci_edits()
+        if edits is None:
+            return claim_data, None
+        
+        services, report = scrub_claim(claim_data, edits, NCCI_AUTO_MODIFIER)
+        if any('modifier_applied' in issue for issue in report['issues']):
+            claim_data = dict(claim_data, services=services)
+        if report['issues']:
+            logger.info(f"NCCI edits for claim {claim_data.get('claimId')}: {report['status']}, "
+                        f"{len(report['issues'])} issues")
+        return claim_data, report
+    
+    def _ncci_blocks(self, ncci: Optional[Dict[str, Any]]) -> bool:
+        return bool(ncci) and ncci['status'] == 'blocked' and NCCI_EDIT_MODE == 'enforce'
+    
+    def _ncci_error(self, ncci: Dict[str, Any]) -> str:
+        errors = [issue['message'] for issue in ncci['issues'] if issue['severity'] == 'error']
+        return f"NCCI edits failed: {'; '.join(errors)}"
+    
+    def _get_claim_md_client(self, config: Dict[str, str]) -> ClaimMDClient:
+        """Shared keep-alive Claim MD client for the configured account"""
+        
+        # CLAIM_MD_API_URL overrides the secret (e.g. to point at a local stub)
+        return get_claim_md_client(
+            os.environ.get('CLAIM_MD_API_URL') or config.get('api_url', 'https://api.claim.md'),
+            config.get('account_key'),
+            max_in_flight=MAX_IN_FLIGHT,
+            max_attempts=MAX_ATTEMPTS
+        )
+    
     def _get_claim_md_config(self) -> Dict[str, str]:
-        """Get Claim MD API configuration from Secrets Manager"""
+        """Get Claim MD API configuration from the shared secrets cache"""
         
         try:
-            secrets_client = boto3.client('secretsmanager', region_name=self.aws_region)
-            response = secrets_client.get_secret_value(
-                SecretId='muni-rcm/claim-md-credentials'
-            )
-            return json.loads(response['SecretString'])
+            return self.get_secrets_cache().get_json(CLAIM_MD_SECRET_ID)
         except Exception as e:
             logger.error(f"Failed to get Claim MD credentials: {str(e)}")
             raise Exception("Claim MD configuration not available")
@@ -180,51 +397,15 @@ class SubmitClaimAgent(BaseAgent):
     def _submit_to_claim_md(self, payload: Dict[str, Any], config: Dict[str, str]) -> Dict[str, Any]:
         """Submit claim to Claim MD API"""
         
-        api_url = config.get('api_url', 'https://api.claim.md')
-        account_key = config.get('account_key')
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {account_key}',
-            'X-API-Version': '2024-01'
-        }
-        
         try:
-            response = requests.post(
-                f'{api_url}/claims/submit',
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                'status': 'submitted',
-                'batch_id': result.get('batch_id'),
-                'claim_id': result.get('claim_id'),
-                'tracking_number': result.get('tracking_number'),
-                'validation_status': result.get('validation_status'),
-                'submission_id': result.get('submission_id')
-            }
-            
-        except requests.exceptions.RequestException as e:
+            try:
+                return self._get_claim_md_client(config).submit(payload)
+            except ClaimMDAuthError:
+                # The account key may have been rotated - refetch it and retry once
+                self.get_secrets_cache().invalidate(CLAIM_MD_SECRET_ID)
+                return self._get_claim_md_client(self._get_claim_md_config()).submit(payload)
+        except Exception as e:
             logger.error(f"Claim MD API error: {str(e)}")
-            
-            # Check for validation errors
-            if hasattr(e, 'response') and e.response:
-                try:
-                    error_data = e.response.json()
-                    return {
-                        'status': 'rejected',
-                        'error': 'Claim MD validation failed',
-                        'validation_errors': error_data.get('errors', []),
-                        'needs_rework': True
-                    }
-                except:
-                    pass
-            
             raise Exception(f"Claim MD submission failed: {str(e)}")
     
     def _update_claim_record(self, claim_id: str, submission_result: Dict[str, Any]):
@@ -0,0 +1,438 @@
+# NCCI Edits - Muni AI RCM Platform
+# Pair-indexed NCCI procedure-to-procedure (PTP) and MUE checks for claims before submission
+
+import os
+import csv
+import json
+import mmap
+import struct
+import threading
+import logging
+from array import array
+from typing import Dict, Any, Optional, Iterable, List, Tuple
+
+from fee_schedule import encode_procedure
+from code_sets import encode_date, format_date
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'MUNINC01'
+SNAPSHOT_HEADER = struct.Struct('<8sQQQ')  # magic, capacity, rows, metadata length
+
+# CMS publishes separate tables for practitioner, hospital outpatient and DME services
+SETTINGS = {'practitioner': 0, 'outpatient': 1, 'dme': 2}
+CLAIM_TYPE_SETTINGS = {'professional': 'practitioner', 'institutional': 'outpatient', 'dme': 'dme'}
+
+# Key layout (55 bits, stored +1 so 0 marks an empty slot):
+# kind (1 bit: PTP / MUE) | setting (2) | column 1 procedure (26) | column 2 procedure (26, 0 for MUE)
+PROCEDURE_BITS = 26
+KIND_SHIFT = 2 * PROCEDURE_BITS + 2
+KIND_PTP, KIND_MUE = 0, 1
+
+# PTP modifier indicators
+MODIFIER_NOT_ALLOWED, MODIFIER_ALLOWED, MODIFIER_NOT_APPLICABLE = 0, 1, 9
+# MUE adjudication indicators: 1 = per line, 2 = per day (absolute), 3 = per day (clinical)
+MAI_LINE, MAI_DATE_ABSOLUTE, MAI_DATE_CLINICAL = 1, 2, 3
+
+OPEN_ENDED = 99991231
+
+# NCCI-associated modifiers that bypass an edit with modifier indicator 1
+BYPASS_MODIFIERS = frozenset(['24', '25', '27', '57', '58', '59', '78', '79', '91', 'XE', 'XP', 'XS', 'XU'])
+# Anatomic modifiers bypass only when the two lines name different sites
+ANATOMIC_MODIFIERS = frozenset(['E1', 'E2', 'E3', 'E4', 'FA', 'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8',
+                                'F9', 'LC', 'LD', 'LM', 'LT', 'RC', 'RI', 'RT', 'TA', 'T1', 'T2', 'T3', 'T4',
+                                'T5', 'T6', 'T7', 'T8', 'T9'])
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+_MAX_LOAD_FACTOR = 0.5
+
+
+def _pack(kind: int, setting: int, column1: int, column2: int) -> int:
+    return (((kind << 2 | setting) << PROCEDURE_BITS | column1) << PROCEDURE_BITS | column2) + 1
+
+
+def _setting_id(setting: str) -> int:
+    try:
+        return SETTINGS[(setting or 'practitioner').lower()]
+    except KeyError:
+        raise ValueError(f"Unknown NCCI setting: {setting!r}")
+
+
+def read_ptp_file(path: str) -> Iterable[Tuple[str, str, Any, Any, Any]]:
+    """
+    (column1, column2, effective_date, deletion_date, modifier_indicator)
+    rows of a CMS PTP edit file exported as tab- or comma-delimited text.
+    Header and footnote lines are skipped.
+    """
+    with open(path, newline='', encoding='latin-1') as f:
+        delimiter = '\t' if '\t' in f.read(4096) else ','
+        f.seek(0)
+        for fields in csv.reader(f, delimiter=delimiter):
+            if len(fields) < 6 or len(fields[0].strip()) != 5 or len(fields[1].strip()) != 5:
+                continue
+            # Column 1, Column 2, existed prior to 1996, effective, deletion, modifier indicator, rationale
+            yield fields[0], fields[1], fields[3], fields[4], fields[5]
+
+
+def read_mue_file(path: str) -> Iterable[Tuple[str, Any, Any]]:
+    """
+    (code, mue_value, mai) rows of a CMS MUE table exported as tab- or
+    comma-delimited text; the MAI column reads e.g. "3 Date of Service Edit: Clinical"
+    """
+    with open(path, newline='', encoding='latin-1') as f:
+        delimiter = '\t' if '\t' in f.read(4096) else ','
+        f.seek(0)
+        for fields in csv.reader(f, delimiter=delimiter):
+            if len(fields) < 3 or len(fields[0].strip()) != 5 or not fields[1].strip().isdigit():
+                continue
+            yield fields[0], fields[1], fields[2].strip()[:1]
+
+
+class NCCIEdits:
+    """
+    NCCI procedure-to-procedure edits and medically unlikely edits (MUEs)
+    in one open-addressing hash table (FeeSchedule's layout): PTP rows are
+    keyed on (setting, column 1, column 2) with the effective date,
+    deletion date and modifier indicator packed into the value; MUE rows on
+    (setting, code) with the unit limit and adjudication indicator. Checking
+    a claim with N lines is N*(N-1) O(1) probes, whatever the table size.
+
+    A pair deleted and later re-added has one row per version; lookups pick
+    the version in effect on the date of service.
+    """
+
+    def __init__(self, keys, values, rows: int, metadata: Dict[str, Any],
+                 source: str = 'memory', _mmap: Optional[mmap.mmap] = None):
+        self._keys = keys
+        self._values = values
+        self._capacity = len(keys)
+        self._shift = 64 - (self._capacity.bit_length() - 1)
+        self._metadata = metadata
+        self._mmap = _mmap
+        self.rows = rows
+        self.source = source
+
+    @classmethod
+    def from_rows(cls, ptp_rows: Iterable[Tuple[str, str, str, Any, Any, Any]] = (),
+                  mue_rows: Iterable[Tuple[str, str, Any, Any]] = (), source: str = 'memory') -> 'NCCIEdits':
+        """
+        Build from PTP rows (setting, column1, column2, effective_date,
+        deletion_date, modifier_indicator) and MUE rows (setting, code,
+        mue_value, mai). The deletion date is the last date of service the
+        edit applies to; blank or '*' means still active.
+        """
+        entries: Dict[Tuple[int, int], int] = {}
+        counts = {'ptp': 0, 'mue': 0}
+        skipped = 0
+
+        for setting, column1, column2, effective_date, deletion_date, indicator in ptp_rows:
+            try:
+                key = _pack(KIND_PTP, _setting_id(setting), encode_procedure(column1), encode_procedure(column2))
+                effective = encode_date(effective_date, default=0)
+                # CMS files mark "no deletion date" with '*'
+                deletion = encode_date(str(deletion_date or '').strip(' *') or None, default=OPEN_ENDED)
+                indicator = int(indicator)
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            # Later rows for the same pair and effective date win
+            entries[(key, effective)] = effective << 32 | deletion << 4 | indicator
+
+        for setting, code, mue_value, mai in mue_rows:
+            try:
+                key = _pack(KIND_MUE, _setting_id(setting), encode_procedure(code), 0)
+                value = int(mue_value) << 8 | int(mai or MAI_LINE)
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            entries[(key, 0)] = value
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} invalid NCCI rows from {source}")
+
+        capacity = 16
+        while capacity * _MAX_LOAD_FACTOR < len(entries):
+            capacity *= 2
+        keys = array('Q', bytes(8 * capacity))
+        values = array('Q', bytes(8 * capacity))
+        shift = 64 - (capacity.bit_length() - 1)
+        mask = capacity - 1
+
+        for (key, _), value in entries.items():
+            counts['mue' if (key - 1) >> KIND_SHIFT == KIND_MUE else 'ptp'] += 1
+            slot = ((key * _HASH_MULTIPLIER) & _MASK64) >> shift
+            while keys[slot]:
+                slot = (slot + 1) & mask
+            keys[slot] = key
+            values[slot] = value
+
+        return cls(keys, values, len(entries), counts, source)
+
+    @classmethod
+    def from_files(cls, ptp_paths: Dict[str, List[str]], mue_paths: Dict[str, List[str]]) -> 'NCCIEdits':
+        """Build from CMS PTP and MUE files, by setting ({'practitioner': [paths], ...})"""
+        ptp_rows = ((setting,) + row for setting, paths in ptp_paths.items() for path in paths
+                    for row in read_ptp_file(path))
+        mue_rows = ((setting,) + row for setting, paths in mue_paths.items() for path in paths
+                    for row in read_mue_file(path))
+        return cls.from_rows(ptp_rows, mue_rows, source='cms')
+
+    @classmethod
+    def open(cls, path: str) -> 'NCCIEdits':
+        """Memory-map a snapshot written by save()"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, capacity, rows, metadata_length = SNAPSHOT_HEADER.unpack_from(mapped, 0)
+        if magic != SNAPSHOT_MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not an NCCI edits snapshot")
+
+        offset = SNAPSHOT_HEADER.size
+        metadata = json.loads(mapped[offset:offset + metadata_length].decode('utf-8'))
+        offset += metadata_length + (-metadata_length % 8)
+
+        view = memoryview(mapped)
+        keys = view[offset:offset + 8 * capacity].cast('Q')
+        values = view[offset + 8 * capacity:offset + 16 * capacity].cast('Q')
+        return cls(keys, values, rows, metadata, source=path, _mmap=mapped)
+
+    def save(self, path: str):
+        """Write a snapshot that open() can memory-map"""
+        metadata = json.dumps(self._metadata).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self._capacity, self.rows, len(metadata)))
+            f.write(metadata)
+            f.write(b'\0' * (-len(metadata) % 8))
+            f.write(array('Q', self._keys).tobytes())
+            f.write(array('Q', self._values).tobytes())
+        os.replace(tmp_path, path)
+
+    def ptp(self, column1: str, column2: str, service_date: Any = None,
+            setting: str = 'practitioner') -> Optional[Dict[str, Any]]:
+        """The PTP edit of column2 into column1 in effect on service_date (default today), or None"""
+        on = encode_date(service_date)
+        try:
+            key = _pack(KIND_PTP, _setting_id(setting), encode_procedure(column1), encode_procedure(column2))
+        except (ValueError, AttributeError):
+            return None
+        value = self._get(key, on)
+        if value is None:
+            return None
+        return {
+            'column1': column1.strip().upper(),
+            'column2': column2.strip().upper(),
+            'modifier_indicator': value & 0xF,
+            'effective_date': format_date(value >> 32) if value >> 32 else None,
+            'deletion_date': format_date((value >> 4) & 0xFFFFFFF)
+        }
+
+    def mue(self, code: str, setting: str = 'practitioner') -> Optional[Dict[str, int]]:
+        """Unit limit per line or date of service for a code, or None when it has no MUE"""
+        try:
+            value = self._get(_pack(KIND_MUE, _setting_id(setting), encode_procedure(code), 0), 0)
+        except (ValueError, AttributeError):
+            return None
+        if value is None:
+            return None
+        return {'units': value >> 8, 'mai': value & 0xFF}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'ptp_rows': self._metadata.get('ptp', 0),
+            'mue_rows': self._metadata.get('mue', 0),
+            'capacity': self._capacity,
+            'load_factor': round(self.rows / self._capacity, 3),
+            'index_bytes': 16 * self._capacity,
+            'memory_mapped': self._mmap is not None,
+            'source': self.source
+        }
+
+    def close(self):
+        if self._mmap is not None:
+            self._keys.release()
+            self._values.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _ptp_indicator(self, setting: int, column1: int, column2: int, on: int) -> Optional[int]:
+        value = self._get(_pack(KIND_PTP, setting, column1, column2), on)
+        if value is None:
+            return None
+        return value & 0xF
+
+    def _get(self, key: int, on: int) -> Optional[int]:
+        """
+        Value for key; for PTP keys the version in effect on the date
+        (effective <= on <= deletion), since a pair can have several rows
+        """
+        keys = self._keys
+        mask = self._capacity - 1
+        slot = ((key * _HASH_MULTIPLIER) & _MASK64) >> self._shift
+        while True:
+            stored = keys[slot]
+            if not stored:
+                return None
+            if stored == key:
+                value = self._values[slot]
+                if not on or value >> 32 <= on <= (value >> 4) & 0xFFFFFFF:
+                    return value
+            slot = (slot + 1) & mask
+
+
+def _modifiers(service: Dict[str, Any]) -> List[str]:
+    modifiers = service.get('modifiers') or []
+    if isinstance(modifiers, str):
+        modifiers = [modifiers]
+    return [str(modifier).strip().upper() for modifier in modifiers if modifier]
+
+
+def _bypasses(first: List[str], second: List[str]) -> bool:
+    """Whether the lines' modifiers bypass an edit that allows modifiers"""
+    if BYPASS_MODIFIERS.intersection(first) or BYPASS_MODIFIERS.intersection(second):
+        return True
+    first_sites = ANATOMIC_MODIFIERS.intersection(first)
+    second_sites = ANATOMIC_MODIFIERS.intersection(second)
+    return bool(first_sites and second_sites and first_sites != second_sites)
+
+
+def _is_evaluation_and_management(code: str) -> bool:
+    return code.isdigit() and '99202' <= code <= '99499'
+
+
+def scrub_claim(claim_data: Dict[str, Any], edits: 'NCCIEdits',
+                auto_modifier: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Check a claim's service lines against NCCI PTP edits and MUEs.
+
+    Every pair of lines on the same date of service is looked up in both
+    orders. A column 2 line in an active edit is an error, unless the edit
+    allows modifiers (indicator 1) and the lines carry a bypassing one. With
+    auto_modifier (e.g. '59' or 'XU') such lines get that modifier appended
+    instead - an E/M code gets 25 - and the change is reported as a warning
+    for documentation review. MUE unit limits are checked per line (MAI 1)
+    or per code and date (MAI 2/3).
+
+    Returns the service lines (copies where modifiers were added) and a
+    report: {'status': clean | modified | blocked, 'issues', 'lines', 'pairs_checked'}.
+    """
+    setting = SETTINGS[CLAIM_TYPE_SETTINGS.get(str(claim_data.get('claimType', 'professional')).lower(),
+                                               'practitioner')]
+    services = list(claim_data.get('services') or [])
+    claim_date = claim_data.get('serviceDate')
+
+    issues = []
+    lines = []
+    for index, service in enumerate(services):
+        code = str(service.get('procedureCode') or '').strip().upper()
+        try:
+            procedure = encode_procedure(code)
+            on = encode_date(service.get('serviceDate') or claim_date)
+        except (ValueError, AttributeError):
+            procedure, on = None, None
+        lines.append({'index': index, 'code': code, 'procedure': procedure, 'date': on,
+                      'modifiers': _modifiers(service)})
+
+    by_date: Dict[int, List[Dict[str, Any]]] = {}
+    for line in lines:
+        if line['procedure'] is not None:
+            by_date.setdefault(line['date'], []).append(line)
+
+    pairs_checked = 0
+    modified = set()
+    for on, day_lines in by_date.items():
+        for column1 in day_lines:
+            for column2 in day_lines:
+                if column1 is column2 or column1['procedure'] == column2['procedure']:
+                    continue
+                pairs_checked += 1
+                indicator = edits._ptp_indicator(setting, column1['procedure'], column2['procedure'], on)
+                if indicator is None or indicator == MODIFIER_NOT_APPLICABLE:
+                    continue
+
+                issue = {'type': 'ptp', 'line': column2['index'] + 1, 'code': column2['code'],
+                         'column1_line': column1['index'] + 1, 'column1_code': column1['code'],
+                         'modifier_indicator': indicator}
+                if indicator == MODIFIER_NOT_ALLOWED:
+                    issues.append(dict(issue, severity='error', message=(
+                        f"{column2['code']} is bundled into {column1['code']} and no modifier is allowed; "
+                        f"remove line {column2['index'] + 1}")))
+                elif not _bypasses(column1['modifiers'], column2['modifiers']):
+                    if auto_modifier:
+                        modifier = '25' if _is_evaluation_and_management(column2['code']) else auto_modifier
+                        column2['modifiers'].append(modifier)
+                        modified.add(column2['index'])
+                        issues.append(dict(issue, severity='warning', modifier_applied=modifier, message=(
+                            f"Added modifier {modifier} to {column2['code']} (bundled into {column1['code']}); "
+                            f"documentation must support a distinct service")))
+                    else:
+                        issues.append(dict(issue, severity='error', message=(
+                            f"{column2['code']} is bundled into {column1['code']}; an NCCI modifier is required "
+                            f"if the service was distinct")))
+
+    units_by_day: Dict[Tuple[int, int], int] = {}
+    for line in lines:
+        if line['procedure'] is None:
+            continue
+        value = edits._get(_pack(KIND_MUE, setting, line['procedure'], 0), 0)
+        if value is None:
+            continue
+        limit, mai = value >> 8, value & 0xFF
+        try:
+            units = int(float(services[line['index']].get('units', 1) or 1))
+        except (TypeError, ValueError):
+            units = 1
+        if mai == MAI_LINE:
+            if units > limit:
+                issues.append({'type': 'mue', 'severity': 'error', 'line': line['index'] + 1, 'code': line['code'],
+                               'units': units, 'mue': limit, 'mai': mai,
+                               'message': f"{units} units of {line['code']} exceed the MUE of {limit} per line"})
+            continue
+        key = (line['procedure'], line['date'])
+        units_by_day[key] = units_by_day.get(key, 0) + units
+        if units_by_day[key] > limit >= units_by_day[key] - units:
+            issues.append({'type': 'mue', 'severity': 'error', 'line': line['index'] + 1, 'code': line['code'],
+                           'units': units_by_day[key], 'mue': limit, 'mai': mai,
+                           'message': f"{units_by_day[key]} units of {line['code']} on one date exceed the MUE "
+                                      f"of {limit}{' (absolute)' if mai == MAI_DATE_ABSOLUTE else ''}"})
+
+    scrubbed = [dict(service, modifiers=lines[index]['modifiers']) if index in modified else service
+                for index, service in enumerate(services)]
+    if any(issue['severity'] == 'error' for issue in issues):
+        status = 'blocked'
+    else:
+        status = 'modified' if modified else 'clean'
+    return scrubbed, {'status': status, 'issues': issues, 'lines': len(services), 'pairs_checked': pairs_checked}
+
+
+_edits: Optional[NCCIEdits] = None
+_edits_lock = threading.Lock()
+_edits_loaded = False
+
+
+def get_ncci_edits() -> Optional[NCCIEdits]:
+    """
+    Return the process-wide NCCI index from NCCI_EDITS_PATH (a snapshot
+    from save(), memory-mapped), or None when unset
+    """
+    global _edits, _edits_loaded
+    if _edits_loaded:
+        return _edits
+
+    with _edits_lock:
+        if not _edits_loaded:
+            path = os.environ.get('NCCI_EDITS_PATH')
+            if path:
+                try:
+                    _edits = NCCIEdits.open(path)
+                    logger.info(f"Loaded NCCI edits: {_edits.get_stats()}")
+                except Exception as e:
+                    logger.error(f"Could not load NCCI edits from {path}: {str(e)}")
+            _edits_loaded = True
+    return _edits
@@ -0,0 +1,54 @@
+# AWS Clients - Muni AI RCM Platform
+# Process-wide boto3 clients created on first use (or pre-warmed during Lambda init)
+
+import os
+import importlib
+import threading
+import logging
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[tuple, Any] = {}
+# boto3's default session is not thread-safe during client creation
+_clients_lock = threading.Lock()
+
+
+def get_client(service: str, region: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """Return a shared boto3 client, importing boto3 only when first needed"""
+    region = region or os.environ.get('AWS_REGION', 'us-east-1')
+    key = (service, region, endpoint_url)
+
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                import boto3
+                client = boto3.client(service, region_name=region, endpoint_url=endpoint_url)
+                _clients[key] = client
+    return client
+
+
+def should_prewarm(development_mode: bool) -> bool:
+    """Pre-create clients only for production code running in a Lambda init phase"""
+    return not development_mode and 'AWS_LAMBDA_FUNCTION_NAME' in os.environ
+
+
+def prewarm(services: Iterable[str] = (), modules: Iterable[str] = (),
+            region: Optional[str] = None):
+    """
+    Import heavy modules and create clients up front so the first invocation
+    does not pay for them. Failures are logged; the lazy path retries later.
+    """
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning(f"Failed to pre-import {module}: {str(e)}")
+
+    for service in services:
+        try:
+            get_client(service, region)
+        except Exception as e:
+            logger.warning(f"Failed to pre-create {service} client: {str(e)}")
@@ -3,18 +3,35 @@
 
 import json
 import os
-import boto3
-import psycopg2
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 from contextlib import contextmanager
 from abc import ABC, abstractmethod
 import uuid
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from db_pool import ConnectionPool, get_pool
+from run_ledger import RunLedger, get_run_ledger
+from llm_cache import LLMResponseCache, get_llm_cache, make_cache_key
+from throttle import is_throttling_error
+from aws_clients import get_client, prewarm, should_prewarm
+from secrets_cache import SecretsCache, get_secrets_cache, is_db_auth_error
+from serialization import dumps, encode, encode_object
+from llm_json import extract_json_object
+
 logger = logging.getLogger(__name__)
+_logging_configured = False
+
+def configure_logging():
+    """Configure root logging on first invocation instead of at import"""
+    global _logging_configured
+    if not _logging_configured:
+        logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+        _logging_configured = True
+
+class LLMThrottledError(Exception):
+    """Raised when Bedrock rejects a call for rate/capacity reasons (safe to retry)"""
+    pass
 
 class BaseAgent(ABC):
     """
@@ -24,8 +41,16 @@ class BaseAgent(ABC):
     - Agent run tracking
     - Error handling and logging
     - Development mode support
+    
+    boto3 and psycopg2 are imported lazily; in production on Lambda the
+    modules in `prewarm_modules` and clients in `aws_services` are loaded
+    during the init phase instead of the first invocation.
     """
     
+    # AWS services and heavy modules this agent uses in production mode
+    aws_services = ('bedrock-runtime', 'secretsmanager')
+    prewarm_modules = ('psycopg2',)
+    
     def __init__(self):
         self.development_mode = os.environ.get('DEVELOPMENT_MODE', 'false').lower() == 'true'
         self.aws_region = os.environ.get('AWS_REGION', 'us-east-1')
@@ -34,17 +59,21 @@ class BaseAgent(ABC):
         
         # Initialize AWS clients
         self.bedrock_client = None
-        self.secrets_client = None
-        self.db_credentials = None
+        self.run_ledger = None
+        self.llm_cache = None
         
         # Agent metadata
         self.agent_name = self.__class__.__name__
         self.agent_version = "1.0.0"
         
+        if should_prewarm(self.development_mode):
+            prewarm(self.aws_services, modules=self.prewarm_modules, region=self.aws_region)
+        
     def lambda_handler(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         """
         Main Lambda handler - orchestrates agent execution
         """
+        configure_logging()
         run_id = str(uuid.uuid4())
         start_time = datetime.utcnow()
         
@@ -71,16 +100,18 @@ class BaseAgent(ABC):
             end_time = datetime.utcnow()
             execution_time = int((end_time - start_time).total_seconds() * 1000)
             
-            self._store_agent_run_completion(run_id, result, end_time, execution_time)
+            # Encoded once: the same text goes into the response body and the run ledger
+            encoded_result = encode(result)
+            self._store_agent_run_completion(run_id, encoded_result, end_time, execution_time)
             
             return {
                 'statusCode': 200,
-                'body': json.dumps({
+                'body': encode_object({
                     'success': True,
                     'run_id': run_id,
                     'agent': self.agent_name,
                     'execution_time_ms': execution_time,
-                    'result': result
+                    'result': encoded_result
                 })
             }
             
@@ -93,6 +124,10 @@ class BaseAgent(ABC):
             self._store_agent_run_error(run_id, str(e), end_time, execution_time)
             
             return self._create_error_response(500, f"{self.agent_name} execution failed", run_id)
+        
+        finally:
+            # Start and completion/error for this run go out in one round trip
+            self._flush_run_ledger()
     
     @abstractmethod
     def validate_input(self, event: Dict[str, Any]) -> Optional[str]:
@@ -112,24 +147,37 @@ class BaseAgent(ABC):
     def get_bedrock_client(self):
         """Get or create Bedrock client"""
         if not self.bedrock_client:
-            self.bedrock_client = boto3.client('bedrock-runtime', region_name=self.aws_region)
+            self.bedrock_client = get_client('bedrock-runtime', self.aws_region)
         return self.bedrock_client
     
-    def invoke_nova_pro(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1) -> str:
+    def invoke_nova_pro(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1,
+                        use_cache: bool = True) -> str:
         """
-        Invoke Nova Pro model with the given prompt
+        Invoke Nova Pro model with the given prompt; identical prompts with the
+        same generation config are served from the LLM response cache
         """
+        generation_config = {
+            "maxTokenCount": max_tokens,
+            "temperature": temperature,
+            "topP": 0.9,
+            "stopSequences": []
+        }
+        
+        cache = self.get_llm_cache() if use_cache else None
+        cache_key = None
+        if cache:
+            cache_key = make_cache_key(self.bedrock_model_id, prompt, generation_config)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {self.agent_name}")
+                return cached
+        
         try:
             bedrock = self.get_bedrock_client()
             
             request_body = {
                 "inputText": prompt,
-                "textGenerationConfig": {
-                    "maxTokenCount": max_tokens,
-                    "temperature": temperature,
-                    "topP": 0.9,
-                    "stopSequences": []
-                }
+                "textGenerationConfig": generation_config
             }
             
             response = bedrock.invoke_model(
@@ -138,131 +186,284 @@ class BaseAgent(ABC):
             )
             
             result = json.loads(response['body'].read())
-            return result.get('results', [{}])[0].get('outputText', '')
+            output_text = result.get('results', [{}])[0].get('outputText', '')
             
         except Exception as e:
+            if is_throttling_error(e):
+                logger.warning(f"Nova Pro invocation throttled: {str(e)}")
+                raise LLMThrottledError(f"LLM inference throttled: {str(e)}")
             logger.error(f"Nova Pro invocation failed: {str(e)}")
             raise Exception(f"LLM inference failed: {str(e)}")
+        
+        # Never cache empty completions - they are usually a transient failure
+        if cache and output_text:
+            cache.put(cache_key, output_text, model_id=self.bedrock_model_id)
+        return output_text
     
-    @contextmanager
-    def get_db_connection(self):
+    def invoke_nova_pro_stream(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1,
+                               use_cache: bool = True) -> Iterator[str]:
         """
-        Get database connection with automatic cleanup
+        Invoke Nova Pro with a response stream, yielding text chunks as they are
+        generated. A cached completion is yielded as a single chunk; a completed
+        stream is cached like invoke_nova_pro's output.
         """
-        conn = None
+        generation_config = {
+            "maxTokenCount": max_tokens,
+            "temperature": temperature,
+            "topP": 0.9,
+            "stopSequences": []
+        }
+        
+        cache = self.get_llm_cache() if use_cache else None
+        cache_key = None
+        if cache:
+            cache_key = make_cache_key(self.bedrock_model_id, prompt, generation_config)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {self.agent_name}")
+                yield cached
+                return
+        
+        chunks = []
         try:
-            if not self.db_credentials:
-                self._load_db_credentials()
+            bedrock = self.get_bedrock_client()
             
-            conn = psycopg2.connect(
-                host=os.environ.get('DB_HOST'),
-                database=os.environ.get('DB_NAME', 'muni_rcm'),
-                user=self.db_credentials['username'],
-                password=self.db_credentials['password'],
-                port=5432,
-                connect_timeout=10,
-                application_name=f'muni-ai-rcm-{self.agent_name}'
+            response = bedrock.invoke_model_with_response_stream(
+                modelId=self.bedrock_model_id,
+                body=json.dumps({
+                    "inputText": prompt,
+                    "textGenerationConfig": generation_config
+                })
             )
             
-            yield conn
+            for event in response['body']:
+                text = self._stream_event_text(event)
+                if text:
+                    chunks.append(text)
+                    yield text
+        
+        except LLMThrottledError:
+            raise
+        except Exception as e:
+            if is_throttling_error(e):
+                logger.warning(f"Nova Pro stream throttled: {str(e)}")
+                raise LLMThrottledError(f"LLM inference throttled: {str(e)}")
+            logger.error(f"Nova Pro stream failed: {str(e)}")
+            raise Exception(f"LLM inference failed: {str(e)}")
+        
+        output_text = ''.join(chunks)
+        if cache and output_text:
+            cache.put(cache_key, output_text, model_id=self.bedrock_model_id)
+    
+    def _stream_event_text(self, event: Dict[str, Any]) -> str:
+        """Text carried by one response-stream event; error events raise"""
+        chunk = event.get('chunk')
+        if chunk is None:
+            for key, error in event.items():
+                if key.endswith('Exception'):
+                    message = error.get('message', key) if isinstance(error, dict) else str(error)
+                    if key == 'throttlingException':
+                        raise LLMThrottledError(f"LLM inference throttled: {message}")
+                    raise Exception(f"{key}: {message}")
+            return ''
+        
+        payload = json.loads(chunk['bytes'])
+        if 'outputText' in payload:
+            return payload['outputText'] or ''
+        # Messages-API stream events
+        return payload.get('contentBlockDelta', {}).get('delta', {}).get('text', '')
+    
+    def invoke_nova_pro_tool(self, prompt: str, tool_name: str, tool_description: str,
+                             input_schema: Dict[str, Any], max_tokens: int = 2000,
+                             temperature: float = 0.1, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Invoke Nova Pro through the Converse API, forcing a call to a single
+        tool whose input schema is the structure we want back. Returns
+        {'input': tool input dict (None if the model answered in text),
+        'text', 'usage', 'stop_reason', 'cached'}.
+        """
+        inference_config = {"maxTokens": max_tokens, "temperature": temperature, "topP": 0.9}
+        tool_spec = {"name": tool_name, "description": tool_description, "inputSchema": {"json": input_schema}}
+        
+        cache = self.get_llm_cache() if use_cache else None
+        cache_key = None
+        if cache:
+            cache_key = make_cache_key(self.bedrock_model_id, prompt, dict(inference_config, tool=tool_spec))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {self.agent_name}")
+                return dict(json.loads(cached), usage={}, cached=True)
+        
+        try:
+            bedrock = self.get_bedrock_client()
             
+            response = bedrock.converse(
+                modelId=self.bedrock_model_id,
+                messages=[{"role": "user", "content": [{"text": prompt}]}],
+                inferenceConfig=inference_config,
+                toolConfig={
+                    "tools": [{"toolSpec": tool_spec}],
+                    "toolChoice": {"tool": {"name": tool_name}}
+                }
+            )
+        
+        except Exception as e:
+            if is_throttling_error(e):
+                logger.warning(f"Nova Pro tool call throttled: {str(e)}")
+                raise LLMThrottledError(f"LLM inference throttled: {str(e)}")
+            logger.error(f"Nova Pro tool call failed: {str(e)}")
+            raise Exception(f"LLM inference failed: {str(e)}")
+        
+        tool_input = None
+        text_parts = []
+        for block in response.get('output', {}).get('message', {}).get('content', []):
+            if 'toolUse' in block and block['toolUse'].get('name') == tool_name and tool_input is None:
+                tool_input = block['toolUse'].get('input')
+            elif 'text' in block:
+                text_parts.append(block['text'])
+        
+        output = {'input': tool_input, 'text': ''.join(text_parts), 'stop_reason': response.get('stopReason')}
+        if cache and tool_input:
+            cache.put(cache_key, json.dumps(output), model_id=self.bedrock_model_id)
+        return dict(output, usage=response.get('usage', {}), cached=False)
+    
+    def get_llm_cache(self) -> Optional[LLMResponseCache]:
+        """Get the process-wide LLM response cache (None when disabled)"""
+        if not self.llm_cache:
+            self.llm_cache = get_llm_cache(
+                os.environ.get('LLM_CACHE_BACKEND', 'memory').lower(),
+                connection_factory=self.get_db_connection,
+                ttl_seconds=float(os.environ.get('LLM_CACHE_TTL_SECONDS', '86400')),
+                max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '256')),
+                max_rows=int(os.environ.get('LLM_CACHE_MAX_ROWS', '10000')),
+                sqlite_path=os.environ.get('LLM_CACHE_SQLITE_PATH', '/tmp/muni-rcm-llm-cache.sqlite3')
+            )
+        return self.llm_cache
+    
+    def get_llm_cache_metrics(self) -> Dict[str, Any]:
+        """Hit/miss metrics for the LLM response cache"""
+        cache = self.get_llm_cache()
+        return cache.get_metrics() if cache else {}
+    
+    @contextmanager
+    def get_db_connection(self):
+        """
+        Borrow a pooled database connection; the pool is module-level
+        so warm invocations skip the TCP/TLS/auth handshake
+        """
+        try:
+            with self._get_db_pool().connection() as conn:
+                yield conn
         except Exception as e:
             logger.error(f"Database connection failed: {str(e)}")
-            if conn:
-                conn.rollback()
             raise
-        finally:
-            if conn:
-                conn.close()
     
-    def _load_db_credentials(self):
-        """Load database credentials from Secrets Manager"""
-        if not self.secrets_client:
-            self.secrets_client = boto3.client('secretsmanager', region_name=self.aws_region)
+    def _get_db_pool(self) -> ConnectionPool:
+        """Get or create the shared connection pool for this agent"""
+        host = os.environ.get('DB_HOST')
+        database = os.environ.get('DB_NAME', 'muni_rcm')
+        application_name = f'muni-ai-rcm-{self.agent_name}'
+        
+        return get_pool(
+            (host, database, application_name),
+            lambda: self._connect_db(host, database, application_name),
+            max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '2')),
+            max_lifetime_seconds=float(os.environ.get('DB_POOL_MAX_LIFETIME_SECONDS', '1800')),
+            health_check_after_seconds=float(os.environ.get('DB_POOL_HEALTH_CHECK_SECONDS', '30'))
+        )
+    
+    def _connect_db(self, host: str, database: str, application_name: str):
+        """
+        Open a new physical connection (called by the pool on a miss).
+        Credentials come from the shared secrets cache; a rejected password
+        refetches the secret once in case it was rotated.
+        """
+        import psycopg2
         
         if not self.db_secret_arn:
             raise Exception("DB_SECRET_ARN environment variable not set")
         
-        try:
-            response = self.secrets_client.get_secret_value(SecretId=self.db_secret_arn)
-            self.db_credentials = json.loads(response['SecretString'])
-        except Exception as e:
-            logger.error(f"Failed to load database credentials: {str(e)}")
-            raise
+        def connect(credentials: Dict[str, Any]):
+            return psycopg2.connect(
+                host=host,
+                database=database,
+                user=credentials['username'],
+                password=credentials['password'],
+                port=5432,
+                connect_timeout=10,
+                application_name=application_name
+            )
+        
+        return self.get_secrets_cache().call_with_secret(self.db_secret_arn, connect, is_db_auth_error)
+    
+    def get_db_pool_metrics(self) -> Dict[str, Any]:
+        """Pool hit/miss/wait metrics for this agent's connection pool"""
+        return self._get_db_pool().get_metrics()
+    
+    def get_secrets_cache(self) -> SecretsCache:
+        """Process-wide Secrets Manager cache shared by all agents"""
+        return get_secrets_cache()
+    
+    def get_run_ledger(self) -> RunLedger:
+        """Get the process-wide run ledger for this agent"""
+        if not self.run_ledger:
+            self.run_ledger = get_run_ledger(
+                self.agent_name, self.agent_version, self.get_db_connection,
+                flush_interval_seconds=float(os.environ.get('RUN_LEDGER_FLUSH_SECONDS', '5'))
+            )
+            self.run_ledger.start_background_flusher()
+        return self.run_ledger
     
     def _store_agent_run_start(self, run_id: str, input_data: Dict[str, Any], start_time: datetime):
-        """Store agent run start in database"""
+        """Buffer agent run start in the run ledger"""
         if self.development_mode:
             logger.info(f"Agent run started - Run ID: {run_id}")
             return
         
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        INSERT INTO agent_runs (
-                            run_id, agent_name, agent_version, input_data, 
-                            status, start_time, created_at
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        run_id, self.agent_name, self.agent_version,
-                        json.dumps(input_data), 'running', start_time, start_time
-                    ))
-                    conn.commit()
+            self.get_run_ledger().record_start(run_id, input_data, start_time)
         except Exception as e:
             logger.warning(f"Failed to store agent run start: {str(e)}")
     
-    def _store_agent_run_completion(self, run_id: str, output_data: Dict[str, Any], 
+    def _store_agent_run_completion(self, run_id: str, output_data: Any, 
                                   end_time: datetime, execution_time_ms: int):
-        """Store successful agent run completion"""
+        """Buffer successful agent run completion in the run ledger"""
         if self.development_mode:
             logger.info(f"Agent run completed - Run ID: {run_id}, Time: {execution_time_ms}ms")
             return
         
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        UPDATE agent_runs 
-                        SET output_data = %s, status = %s, end_time = %s,
-                            execution_time_ms = %s, updated_at = %s
-                        WHERE run_id = %s
-                    """, (
-                        json.dumps(output_data), 'completed', end_time,
-                        execution_time_ms, end_time, run_id
-                    ))
-                    conn.commit()
+            self.get_run_ledger().record_completion(run_id, output_data, end_time, execution_time_ms)
         except Exception as e:
             logger.warning(f"Failed to store agent run completion: {str(e)}")
     
     def _store_agent_run_error(self, run_id: str, error_message: str, 
                              end_time: datetime, execution_time_ms: int):
-        """Store failed agent run"""
+        """Buffer failed agent run in the run ledger"""
         if self.development_mode:
             logger.info(f"Agent run failed - Run ID: {run_id}, Error: {error_message}")
             return
         
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        UPDATE agent_runs 
-                        SET error_message = %s, status = %s, end_time = %s,
-                            execution_time_ms = %s, updated_at = %s
-                        WHERE run_id = %s
-                    """, (
-                        error_message, 'failed', end_time,
-                        execution_time_ms, end_time, run_id
-                    ))
-                    conn.commit()
+            self.get_run_ledger().record_error(run_id, error_message, end_time, execution_time_ms)
         except Exception as e:
             logger.warning(f"Failed to store agent run error: {str(e)}")
     
+    def _flush_run_ledger(self):
+        """Write buffered runs once at the end of the invocation"""
+        if self.development_mode or not self.run_ledger:
+            return
+        
+        try:
+            self.run_ledger.flush()
+        except Exception as e:
+            logger.warning(f"Failed to flush run ledger: {str(e)}")
+    
     def _create_error_response(self, status_code: int, message: str, run_id: str) -> Dict[str, Any]:
         """Create standardized error response"""
         return {
             'statusCode': status_code,
-            'body': json.dumps({
+            'body': dumps({
                 'success': False,
                 'error': message,
                 'run_id': run_id,
@@ -273,38 +474,7 @@ class BaseAgent(ABC):
     
     def extract_json_from_text(self, text: str) -> Dict[str, Any]:
         """
-        Extract JSON from LLM response text that may contain extra formatting
+        Extract the JSON object from LLM response text that may contain code
+        fences, leading chatter or trailing prose
         """
-        try:
-            # Try direct JSON parsing first
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # Look for JSON in code blocks
-            lines = text.split('\n')
-            json_lines = []
-            in_json = False
-            
-            for line in lines:
-                if '```json' in line.lower() or '```' in line and in_json:
-                    in_json = not in_json
-                    continue
-                if in_json or (line.strip().startswith('{') and line.strip().endswith('}')):
-                    json_lines.append(line)
-            
-            if json_lines:
-                try:
-                    return json.loads('\n'.join(json_lines))
-                except json.JSONDecodeError:
-                    pass
-            
-            # Last resort: look for anything that looks like JSON
-            start_brace = text.find('{')
-            end_brace = text.rfind('}')
-            
-            if start_brace != -1 and end_brace != -1:
-                try:
-                    return json.loads(text[start_brace:end_brace + 1])
-                except json.JSONDecodeError:
-                    pass
-            
-            raise ValueError("No valid JSON found in response")
\ No newline at end of file
+        return extract_json_object(text)
\ No newline at end of file
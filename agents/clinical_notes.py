@@ -0,0 +1,252 @@
+# Clinical Notes Compression - Muni AI RCM Platform
+# Section detection, de-duplication and token budgeting of clinical notes before prompting
+
+import os
+import re
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough Nova/Titan token estimate; only used for budgeting and reporting
+CHARS_PER_TOKEN = 4
+
+# Canonical section -> header spellings seen in EHR exports and dictated notes
+SECTION_HEADERS = {
+    'chief_complaint': ('chief complaint', 'cc', 'reason for visit', 'reason for consultation'),
+    'hpi': ('history of present illness', 'hpi', 'interval history', 'history'),
+    'ros': ('review of systems', 'ros'),
+    'past_history': ('past medical history', 'pmh', 'past surgical history', 'psh', 'past history'),
+    'medications': ('medications', 'current medications', 'meds', 'home medications'),
+    'allergies': ('allergies', 'drug allergies'),
+    'social_history': ('social history', 'family history', 'social and family history'),
+    'exam': ('physical exam', 'physical examination', 'exam', 'examination', 'vital signs', 'vitals'),
+    'results': ('labs', 'laboratory', 'results', 'imaging', 'diagnostic results', 'data reviewed', 'studies'),
+    'diagnosis': ('diagnosis', 'diagnoses', 'preoperative diagnosis', 'postoperative diagnosis',
+                  'pre-operative diagnosis', 'post-operative diagnosis'),
+    'procedure': ('procedure', 'procedures', 'procedure performed', 'procedures performed', 'operation',
+                  'operative procedure', 'description of procedure', 'procedure in detail', 'technique',
+                  'operative findings', 'findings', 'indications', 'indication'),
+    'procedure_details': ('anesthesia', 'estimated blood loss', 'ebl', 'specimens', 'drains', 'implants',
+                          'complications', 'fluids', 'condition'),
+    'assessment': ('assessment', 'impression', 'assessment and plan', 'a/p', 'a&p', 'medical decision making', 'mdm'),
+    'plan': ('plan', 'disposition', 'follow-up', 'follow up', 'recommendations', 'orders'),
+    'time': ('time', 'total time', 'time spent'),
+    'attestation': ('attestation', 'disclaimer', 'signature', 'electronically signed')
+}
+
+# Section weights by prompt purpose: higher is kept first when trimming, 0 is always dropped
+SECTION_PRIORITIES = {
+    'coding': {
+        'procedure': 10, 'diagnosis': 10, 'assessment': 9, 'chief_complaint': 8, 'time': 8, 'plan': 7,
+        'hpi': 7, 'note': 6, 'procedure_details': 6, 'results': 5, 'exam': 5, 'other': 4, 'ros': 3,
+        'past_history': 2, 'medications': 2, 'allergies': 1, 'social_history': 1, 'attestation': 0
+    },
+    'appeal': {
+        'assessment': 10, 'diagnosis': 10, 'procedure': 9, 'hpi': 9, 'results': 8, 'plan': 8,
+        'chief_complaint': 7, 'note': 7, 'exam': 6, 'past_history': 6, 'medications': 5, 'procedure_details': 4,
+        'other': 4, 'time': 3, 'ros': 2, 'allergies': 1, 'social_history': 1, 'attestation': 0
+    }
+}
+
+# Lines that carry no clinical content
+BOILERPLATE_PATTERNS = re.compile('|'.join([
+    r'electronically signed',
+    r'dictated but not (read|reviewed)',
+    r'(this|the) (note|document|report) (was|has been|is) (generated|created|prepared|transcribed)',
+    r'voice recognition|dictation software|speech recognition',
+    r'please excuse',
+    r'confidential(ity)? (notice|information)',
+    r'intended (only )?for the (use of the )?(individual|addressee)',
+    r'copyright|all rights reserved',
+    r'^page \d+( of \d+)?$',
+    r'^(-{3,}|={3,}|_{3,})$'
+]), re.IGNORECASE)
+
+_HEADER_LOOKUP = {alias: section for section, aliases in SECTION_HEADERS.items() for alias in aliases}
+_HEADER_LINE = re.compile(r'^\s*(?P<header>[A-Za-z][A-Za-z0-9 /&\-]{0,48}?)\s*:\s*(?P<rest>.*)$')
+_CAPS_HEADER_LINE = re.compile(r'^\s*(?P<header>[A-Z][A-Z0-9 /&\-]{2,48})\s*$')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9(])')
+_NORMALIZE = re.compile(r'[^a-z0-9]+')
+
+# Sentences shorter than this ("Denies.", "Normal.") repeat legitimately and are never de-duplicated
+MIN_DUPLICATE_CHARS = 24
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def is_compression_enabled() -> bool:
+    return os.environ.get('CLINICAL_NOTES_COMPRESSION', 'on').lower() not in ('off', 'false', '0')
+
+
+def _section_for_header(header: str) -> Optional[str]:
+    return _HEADER_LOOKUP.get(' '.join(header.lower().split()))
+
+
+def detect_sections(text: str) -> List[Dict[str, Any]]:
+    """
+    Split notes into sections at recognized headers ("HPI:", "ASSESSMENT AND
+    PLAN", ...). Text before the first header is the 'note' section; an
+    unknown all-caps "HEADER:" alone on its line starts an 'other' section.
+    Each section is {'section', 'header', 'lines'}.
+    """
+    sections = [{'section': 'note', 'header': None, 'lines': []}]
+    for line in text.splitlines():
+        header, rest = None, ''
+        match = _HEADER_LINE.match(line)
+        if match:
+            section = _section_for_header(match.group('header'))
+            if section is None and not match.group('rest').strip() and match.group('header').isupper():
+                # "OPERATIVE NOTE:" on its own line; "HEENT: normal" stays in its section
+                section = 'other'
+            if section:
+                header, rest = match.group('header').strip(), match.group('rest').strip()
+        else:
+            match = _CAPS_HEADER_LINE.match(line)
+            if match:
+                section = _section_for_header(match.group('header'))
+                if section:
+                    header = match.group('header').strip()
+
+        if header:
+            sections.append({'section': section, 'header': header, 'lines': [rest] if rest else []})
+        elif line.strip():
+            sections[-1]['lines'].append(line.strip())
+
+    return [section for section in sections if section['lines'] or section['header']]
+
+
+def _deduplicate(sections: List[Dict[str, Any]], metrics: Dict[str, Any]):
+    """Drop boilerplate lines and sentences already seen earlier in the note (copied-forward text)"""
+    seen = set()
+    for section in sections:
+        kept_lines = []
+        for line in section['lines']:
+            if BOILERPLATE_PATTERNS.search(line):
+                metrics['boilerplate_lines'] += 1
+                continue
+            kept = []
+            for sentence in _SENTENCE_SPLIT.split(line):
+                key = _NORMALIZE.sub(' ', sentence.lower()).strip()
+                if len(key) >= MIN_DUPLICATE_CHARS:
+                    if key in seen:
+                        metrics['duplicate_sentences'] += 1
+                        continue
+                    seen.add(key)
+                kept.append(sentence)
+            if kept:
+                kept_lines.append(' '.join(kept))
+        section['lines'] = kept_lines
+
+
+def _render(section: Dict[str, Any], lines: List[str]) -> str:
+    body = '\n'.join(lines)
+    if section['header']:
+        return f"{section['header']}: {body}" if body else f"{section['header']}:"
+    return body
+
+
+def _truncate(section: Dict[str, Any], budget_tokens: int) -> Optional[str]:
+    """Leading sentences of a section that fit the budget, or None if not even one does"""
+    lines = []
+    used = estimate_tokens(_render(section, []))
+    for line in section['lines']:
+        kept = []
+        for sentence in _SENTENCE_SPLIT.split(line):
+            cost = estimate_tokens(sentence) + 1
+            if used + cost > budget_tokens:
+                if kept:
+                    lines.append(' '.join(kept))
+                return _render(section, lines + ['[...]']) if lines else None
+            kept.append(sentence)
+            used += cost
+        lines.append(' '.join(kept))
+    return _render(section, lines)
+
+
+def compress_notes(text: str, purpose: str = 'coding',
+                   token_budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Compress clinical notes for a prompt: detect sections, drop boilerplate
+    and copied-forward sentences, then - when over token_budget (0/None: no
+    limit) - keep whole sections by their priority for purpose and fill the
+    remaining budget with the leading sentences of those that did not fit. Sections keep their
+    original order. Returns the compressed text and per-request metrics.
+    """
+    start = time.perf_counter()
+    priorities = SECTION_PRIORITIES.get(purpose, SECTION_PRIORITIES['coding'])
+    metrics = {
+        'purpose': purpose,
+        'tokens_before': estimate_tokens(text or ''),
+        'tokens_after': 0,
+        'token_budget': token_budget or None,
+        'sections': 0,
+        'boilerplate_lines': 0,
+        'duplicate_sentences': 0,
+        'trimmed_sections': [],
+        'omitted_sections': []
+    }
+    if not text:
+        metrics['compress_ms'] = 0.0
+        return text or '', metrics
+
+    sections = detect_sections(text)
+    metrics['sections'] = len(sections)
+    _deduplicate(sections, metrics)
+
+    rendered = {}
+    for index, section in enumerate(sections):
+        if priorities.get(section['section'], 4) == 0:
+            metrics['omitted_sections'].append(section['header'] or section['section'])
+        elif section['lines']:
+            rendered[index] = _render(section, section['lines'])
+
+    total = sum(estimate_tokens(block) + 1 for block in rendered.values())
+    if token_budget and total > token_budget:
+        ranked = sorted(rendered, key=lambda index: (-priorities.get(sections[index]['section'], 4), index))
+        kept, used, skipped = {}, 0, []
+        # Whole sections first, by priority, so one long section cannot crowd out short important ones
+        for index in ranked:
+            cost = estimate_tokens(rendered[index]) + 1
+            if used + cost <= token_budget:
+                kept[index] = rendered[index]
+                used += cost
+            else:
+                skipped.append(index)
+        # Then the leading sentences of what did not fit, while budget remains
+        for index in skipped:
+            name = sections[index]['header'] or sections[index]['section']
+            truncated = _truncate(sections[index], token_budget - used - 1) if token_budget - used > 8 else None
+            if truncated:
+                kept[index] = truncated
+                used += estimate_tokens(truncated) + 1
+                metrics['trimmed_sections'].append(name)
+            else:
+                metrics['omitted_sections'].append(name)
+        rendered = kept
+
+    if not (metrics['boilerplate_lines'] or metrics['duplicate_sentences'] or metrics['trimmed_sections']
+            or metrics['omitted_sections']):
+        # Nothing removed: keep the author's layout
+        compressed = text
+    else:
+        compressed = '\n\n'.join(rendered[index] for index in sorted(rendered))
+    metrics['tokens_after'] = estimate_tokens(compressed)
+    metrics['compress_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return compressed, metrics
+
+
+def prepare_notes(text: str, purpose: str, token_budget: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+    """compress_notes when CLINICAL_NOTES_COMPRESSION is on; otherwise the notes unchanged with token counts"""
+    if is_compression_enabled():
+        compressed, metrics = compress_notes(text, purpose, token_budget)
+        logger.info(f"Clinical notes for {purpose}: {metrics['tokens_before']} -> {metrics['tokens_after']} tokens "
+                    f"({metrics['compress_ms']} ms)")
+        return compressed, metrics
+
+    tokens = estimate_tokens(text or '')
+    return text, {'purpose': purpose, 'tokens_before': tokens, 'tokens_after': tokens, 'compressed': False}
@@ -0,0 +1,429 @@
+# Code Sets - Muni AI RCM Platform
+# Memory-mapped CPT/HCPCS/ICD-10-CM index with effective dates, prefix and billable-leaf lookups
+
+import os
+import csv
+import json
+import mmap
+import struct
+import bisect
+import threading
+import logging
+from array import array
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Any, Optional, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'MUNICS01'
+SNAPSHOT_HEADER = struct.Struct('<8sQQQ')  # magic, rows, metadata length, descriptions length
+
+# System byte of the key; codes sort by system, then code
+CODE_SYSTEMS = {'CPT': 1, 'HCPCS': 2, 'ICD10CM': 3}
+_SYSTEM_NAMES = {value: name for name, value in CODE_SYSTEMS.items()}
+SYSTEM_ALIASES = {'CPT': 'CPT', 'HCPCS': 'HCPCS', 'ICD10CM': 'ICD10CM', 'ICD10': 'ICD10CM', 'ICD': 'ICD10CM'}
+MAX_CODE_LENGTH = 7
+
+# Record layout: effective date, termination date (YYYYMMDD), description offset, length, flags
+RECORD_FIELDS = 5
+FLAG_BILLABLE = 1
+OPEN_ENDED = 99991231
+
+# Results of validate()
+VALID, UNKNOWN, INACTIVE, NOT_BILLABLE = 'valid', 'unknown', 'inactive', 'not_billable'
+
+
+@lru_cache(maxsize=64)
+def normalize_system(system: str) -> str:
+    """'ICD-10-CM', 'icd10', 'CPT' ... -> a CODE_SYSTEMS name"""
+    name = SYSTEM_ALIASES.get((system or '').upper().replace('-', '').replace('_', '').replace(' ', ''))
+    if name is None:
+        raise ValueError(f"Unknown code system: {system!r}")
+    return name
+
+
+def normalize_code(code: str) -> str:
+    """Upper-case code without the ICD-10 dot ('e11.9' -> 'E119')"""
+    return (code or '').strip().upper().replace('.', '')
+
+
+def format_code(system: str, code: str) -> str:
+    """Display form of a stored code: ICD-10-CM gets its dot after the category ('E119' -> 'E11.9')"""
+    if system == 'ICD10CM' and len(code) > 3:
+        return f"{code[:3]}.{code[3:]}"
+    return code
+
+
+def encode_date(value: Any, default: Optional[int] = None) -> int:
+    """YYYY-MM-DD, YYYYMMDD, MM/DD/YYYY, date or None -> YYYYMMDD int (None: default, else today)"""
+    if value is None or value == '':
+        if default is not None:
+            return default
+        value = date.today()
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    if isinstance(value, int) and 10000101 <= value <= OPEN_ENDED:
+        # Already YYYYMMDD (e.g. from an earlier encode_date)
+        return value
+    return _parse_date(str(value).strip())
+
+
+# Claims in a batch share a handful of service dates; strptime costs ~10 µs
+@lru_cache(maxsize=4096)
+def _parse_date(text: str) -> int:
+    for pattern in ('%Y-%m-%d', '%Y%m%d', '%m/%d/%Y'):
+        try:
+            return encode_date(datetime.strptime(text[:10], pattern).date())
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {text!r}")
+
+
+@lru_cache(maxsize=4096)
+def format_date(value: int) -> Optional[str]:
+    if value >= OPEN_ENDED:
+        return None
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+def _key(system_id: int, code: str, pad: int = 0) -> int:
+    encoded = code.encode('ascii')
+    return int.from_bytes(bytes([system_id]) + encoded + bytes([pad]) * (MAX_CODE_LENGTH - len(encoded)), 'big')
+
+
+# Code vocabularies are ~100k codes and model output repeats them, so keys are memoized
+@lru_cache(maxsize=65536)
+def _code_key(system: str, code: str) -> int:
+    """Key of a caller's (system, code); ValueError for unknown systems and non-ASCII codes"""
+    return _key(CODE_SYSTEMS[normalize_system(system)], normalize_code(code))
+
+
+def _decode_key(key: int) -> Tuple[int, str]:
+    raw = key.to_bytes(8, 'big')
+    return raw[0], raw[1:].rstrip(b'\0').decode('ascii')
+
+
+def read_csv_rows(path: str) -> Iterator[Tuple[str, str, str, Any, Any, Any]]:
+    """
+    Rows of a CSV with code_system, code, description, billable,
+    effective_date and termination_date columns (dates may be blank)
+    """
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield (row.get('code_system'), row.get('code'), row.get('description'), row.get('billable', '1'),
+                   row.get('effective_date'), row.get('termination_date'))
+
+
+def read_icd10cm_order_file(path: str, effective_date: Any,
+                            termination_date: Any = None) -> Iterator[Tuple[str, str, str, Any, Any, Any]]:
+    """
+    Rows of the CMS ICD-10-CM order file (icd10cm_order_YYYY.txt): fixed
+    width order number, code, billable flag (1 = valid for HIPAA
+    transactions), short and long description. The file has no dates, so
+    the fiscal year's effective (and termination) dates are supplied.
+    """
+    with open(path, encoding='latin-1') as f:
+        for line in f:
+            if len(line) < 16:
+                continue
+            yield ('ICD10CM', line[6:13].strip(), line[77:].strip() or line[16:76].strip(), line[14] == '1',
+                   effective_date, termination_date)
+
+
+class CodeSetIndex:
+    """
+    CPT, HCPCS Level II and ICD-10-CM codes with their effective dates,
+    canonical descriptions and billable flags.
+
+    Codes are 64-bit keys (system byte + code bytes, big-endian) in one
+    sorted array, so an exact code or a prefix is a bisect over the array
+    and a prefix's codes are one contiguous run. Each key may have several
+    versions (revised descriptions, deleted and reinstated codes), sorted by
+    effective date. Snapshots written by save() are memory-mapped by open(),
+    so a cold start reads a small header and pays no parse cost.
+    """
+
+    def __init__(self, keys, records, descriptions, metadata: Dict[str, Any],
+                 source: str = 'memory', _mmap: Optional[mmap.mmap] = None):
+        self._keys = keys
+        self._records = records
+        self._descriptions = descriptions
+        self._metadata = metadata
+        self._mmap = _mmap
+        self.rows = len(keys)
+        self.source = source
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str, Any, Any, Any]], source: str = 'memory') -> 'CodeSetIndex':
+        """
+        Build from (code_system, code, description, billable, effective_date,
+        termination_date); blank dates mean always/still effective. A later
+        row with the same code and effective date replaces an earlier one.
+        """
+        entries: Dict[Tuple[int, int], Tuple[int, str, bool]] = {}
+        counts = {system: 0 for system in CODE_SYSTEMS}
+        skipped = 0
+
+        for system, code, description, billable, effective_date, termination_date in rows:
+            try:
+                system = normalize_system(system)
+                code = normalize_code(code)
+                if not code or len(code) > MAX_CODE_LENGTH or not code.isalnum() or not code.isascii():
+                    raise ValueError(f"Invalid code: {code!r}")
+                key = _key(CODE_SYSTEMS[system], code)
+                effective = encode_date(effective_date, default=0)
+                termination = encode_date(termination_date, default=OPEN_ENDED)
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            billable = str(billable).strip().lower() not in ('0', 'n', 'no', 'false')
+            entries[(key, effective)] = (termination, ' '.join((description or '').split()), billable)
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} invalid code set rows from {source}")
+
+        keys = array('Q')
+        records = array('I')
+        blob = bytearray()
+        offsets: Dict[str, Tuple[int, int]] = {}
+        for (key, effective), (termination, description, billable) in sorted(entries.items()):
+            if description not in offsets:
+                encoded = description.encode('utf-8')
+                offsets[description] = (len(blob), len(encoded))
+                blob += encoded
+            offset, length = offsets[description]
+            keys.append(key)
+            records.extend((effective, termination, offset, length, FLAG_BILLABLE if billable else 0))
+            counts[_SYSTEM_NAMES[key >> 56]] += 1
+
+        return cls(keys, records, bytes(blob), {'systems': counts}, source)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'CodeSetIndex':
+        """Load a CSV in the read_csv_rows() layout"""
+        return cls.from_rows(read_csv_rows(path), source=path)
+
+    @classmethod
+    def open(cls, path: str) -> 'CodeSetIndex':
+        """Memory-map a snapshot written by save()"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, rows, metadata_length, descriptions_length = SNAPSHOT_HEADER.unpack_from(mapped, 0)
+        if magic != SNAPSHOT_MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a code set snapshot")
+
+        offset = SNAPSHOT_HEADER.size
+        metadata = json.loads(mapped[offset:offset + metadata_length].decode('utf-8'))
+        offset += metadata_length + (-metadata_length % 8)
+
+        view = memoryview(mapped)
+        keys = view[offset:offset + 8 * rows].cast('Q')
+        offset += 8 * rows
+        records_length = 4 * RECORD_FIELDS * rows
+        records = view[offset:offset + records_length].cast('I')
+        offset += records_length + (-records_length % 8)
+        descriptions = view[offset:offset + descriptions_length]
+        return cls(keys, records, descriptions, metadata, source=path, _mmap=mapped)
+
+    def save(self, path: str):
+        """Write a snapshot that open() can memory-map"""
+        metadata = json.dumps(self._metadata).encode('utf-8')
+        records = array('I', self._records).tobytes()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.rows, len(metadata), len(self._descriptions)))
+            f.write(metadata)
+            f.write(b'\0' * (-len(metadata) % 8))
+            f.write(array('Q', self._keys).tobytes())
+            f.write(records)
+            f.write(b'\0' * (-len(records) % 8))
+            f.write(bytes(self._descriptions))
+        os.replace(tmp_path, path)
+
+    def lookup(self, system: str, code: str, service_date: Any = None) -> Optional[Dict[str, Any]]:
+        """The version of a code in effect on service_date (default today), or None"""
+        on = encode_date(service_date)
+        try:
+            key = _code_key(system, code)
+        except ValueError:
+            return None
+        index = self._effective_index(key, on)
+        return self._entry(index) if index is not None else None
+
+    def versions(self, system: str, code: str) -> List[Dict[str, Any]]:
+        """Every version of a code, oldest first"""
+        try:
+            key = _code_key(system, code)
+        except ValueError:
+            return []
+        start = bisect.bisect_left(self._keys, key)
+        end = start
+        while end < self.rows and self._keys[end] == key:
+            end += 1
+        return [self._entry(index) for index in range(start, end)]
+
+    def validate(self, system: str, code: str, service_date: Any = None,
+                 suggestions: int = 5) -> Dict[str, Any]:
+        """
+        Check a code for a claim: status is 'valid', 'unknown' (not in the
+        code set), 'inactive' (not in effect on service_date) or
+        'not_billable' (an ICD-10-CM category header; its billable leaves are
+        offered as suggestions). 'entry' carries the canonical code and
+        description whenever the code exists.
+        """
+        on = encode_date(service_date)
+        try:
+            system = normalize_system(system)
+            key = _code_key(system, code)
+        except ValueError:
+            return {'status': UNKNOWN, 'message': f"{code!r} is not a valid code", 'entry': None}
+
+        index = self._effective_index(key, on)
+        if index is None:
+            history = self.versions(system, code)
+            if not history:
+                return {'status': UNKNOWN, 'message': f"{code} is not in the {system} code set", 'entry': None}
+            latest = history[-1]
+            if latest['termination_date'] and format_date(on) > latest['termination_date']:
+                window = f"terminated {latest['termination_date']}"
+            else:
+                window = f"effective {latest['effective_date']}"
+            return {
+                'status': INACTIVE,
+                'message': f"{latest['code']} is not effective on {format_date(on)} ({window})",
+                'entry': latest
+            }
+
+        entry = self._entry(index)
+        if not entry['billable']:
+            leaves = self.billable_leaves(system, code, service_date=on, limit=suggestions)
+            return {
+                'status': NOT_BILLABLE,
+                'message': f"{entry['code']} is not billable; code to a more specific subcode",
+                'entry': entry,
+                'suggestions': [leaf['code'] for leaf in leaves]
+            }
+        return {'status': VALID, 'message': None, 'entry': entry}
+
+    def description(self, system: str, code: str, service_date: Any = None) -> Optional[str]:
+        """Canonical description of a code on service_date, or None"""
+        entry = self.lookup(system, code, service_date)
+        return entry['description'] if entry else None
+
+    def prefix(self, system: str, prefix: str, service_date: Any = None, limit: Optional[int] = 50,
+               billable_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Codes starting with prefix (e.g. 'E11', '992') in effect on
+        service_date, in code order. Invalid dates raise ValueError; an
+        invalid code or prefix just matches nothing.
+        """
+        on = encode_date(service_date)
+        try:
+            system_id = CODE_SYSTEMS[normalize_system(system)]
+            prefix = normalize_code(prefix)
+            low, high = _key(system_id, prefix), _key(system_id, prefix, pad=0xFF)
+        except ValueError:
+            return []
+
+        keys = self._keys
+        records = self._records
+        results = []
+        index = bisect.bisect_left(keys, low)
+        end = bisect.bisect_right(keys, high, index)
+        while index < end and (limit is None or len(results) < limit):
+            key = keys[index]
+            # One match per code: the version in effect on the date
+            match = None
+            while index < end and keys[index] == key:
+                base = index * RECORD_FIELDS
+                if records[base] <= on <= records[base + 1]:
+                    match = index
+                index += 1
+            if match is not None and (not billable_only or records[match * RECORD_FIELDS + 4] & FLAG_BILLABLE):
+                results.append(self._entry(match))
+        return results
+
+    def billable_leaves(self, system: str, code: str, service_date: Any = None,
+                        limit: Optional[int] = 50) -> List[Dict[str, Any]]:
+        """Billable codes at or below code (e.g. 'E11.6' -> E11.61x, E11.62x, ...)"""
+        return self.prefix(system, code, service_date=service_date, limit=limit, billable_only=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'systems': self._metadata.get('systems', {}),
+            'index_bytes': (8 + 4 * RECORD_FIELDS) * self.rows,
+            'description_bytes': len(self._descriptions),
+            'memory_mapped': self._mmap is not None,
+            'source': self.source
+        }
+
+    def close(self):
+        if self._mmap is not None:
+            self._keys.release()
+            self._records.release()
+            self._descriptions.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _effective_index(self, key: int, on: int) -> Optional[int]:
+        """Row of the latest version of key in effect on the date"""
+        keys = self._keys
+        records = self._records
+        index = bisect.bisect_left(keys, key)
+        match = None
+        while index < self.rows and keys[index] == key:
+            base = index * RECORD_FIELDS
+            if records[base] <= on <= records[base + 1]:
+                match = index
+            index += 1
+        return match
+
+    def _entry(self, index: int) -> Dict[str, Any]:
+        system_id, code = _decode_key(self._keys[index])
+        system = _SYSTEM_NAMES[system_id]
+        base = index * RECORD_FIELDS
+        effective, termination, offset, length, flags = self._records[base:base + RECORD_FIELDS]
+        return {
+            'system': system,
+            'code': format_code(system, code),
+            'description': bytes(self._descriptions[offset:offset + length]).decode('utf-8'),
+            'billable': bool(flags & FLAG_BILLABLE),
+            'effective_date': format_date(effective) if effective else None,
+            'termination_date': format_date(termination)
+        }
+
+
+_code_sets: Optional[CodeSetIndex] = None
+_code_sets_lock = threading.Lock()
+_code_sets_loaded = False
+
+
+def get_code_sets() -> Optional[CodeSetIndex]:
+    """
+    Return the process-wide code-set index from CODE_SETS_PATH (a snapshot
+    from save() is memory-mapped; a .csv is parsed), or None when unset
+    """
+    global _code_sets, _code_sets_loaded
+    if _code_sets_loaded:
+        return _code_sets
+
+    with _code_sets_lock:
+        if not _code_sets_loaded:
+            path = os.environ.get('CODE_SETS_PATH')
+            if path:
+                try:
+                    _code_sets = CodeSetIndex.from_csv(path) if path.endswith('.csv') else CodeSetIndex.open(path)
+                    logger.info(f"Loaded code sets: {_code_sets.get_stats()}")
+                except Exception as e:
+                    logger.error(f"Could not load code sets from {path}: {str(e)}")
+            _code_sets_loaded = True
+    return _code_sets
@@ -0,0 +1,251 @@
+# Database Connection Pool - Muni AI RCM Platform
+# Module-level Postgres pool that survives warm Lambda invocations
+
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Pools live at module scope so a warm Lambda container reuses them
+_pools: Dict[tuple, 'ConnectionPool'] = {}
+_pools_lock = threading.Lock()
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes available within the wait timeout"""
+    pass
+
+
+class _PooledConnection:
+    """Bookkeeping wrapper around a raw psycopg2 connection"""
+
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread-safe Postgres connection pool with:
+    - Warm reuse of idle connections across invocations
+    - Health checks on connections that sat idle too long
+    - Max-lifetime recycling
+    - Reconnect-on-failure for broken connections
+    - Hit/miss/wait-time metrics
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 2,
+                 max_lifetime_seconds: float = 1800.0,
+                 health_check_after_seconds: float = 30.0,
+                 wait_timeout_seconds: float = 10.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.health_check_after_seconds = health_check_after_seconds
+        self.wait_timeout_seconds = wait_timeout_seconds
+
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'health_check_failures': 0,
+            'recycled': 0,
+            'discarded': 0
+        }
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of the block.
+        Broken connections are discarded instead of returned to the pool.
+        """
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.conn
+        except Exception as e:
+            # psycopg2 is already loaded once a connection exists
+            import psycopg2
+            if isinstance(e, psycopg2.Error):
+                broken = self._is_broken(pooled.conn)
+            raise
+        finally:
+            # Never hand back a connection with an open transaction;
+            # rollback is a client-side no-op when nothing is pending
+            if not broken:
+                self._safe_rollback(pooled)
+            self._release(pooled, discard=broken or bool(pooled.conn.closed))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return a snapshot of pool metrics"""
+        with self._cond:
+            metrics = dict(self._metrics)
+            metrics['idle'] = len(self._idle)
+            metrics['in_use'] = self._in_use
+        requests = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / requests if requests else 0.0
+        return metrics
+
+    def close_all(self):
+        """Close every idle connection (in-use connections close on release)"""
+        with self._cond:
+            while self._idle:
+                self._close(self._idle.popleft())
+
+    def _acquire(self) -> _PooledConnection:
+        deadline = None
+        wait_started = None
+
+        with self._cond:
+            while True:
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if self._is_expired(pooled):
+                        self._metrics['recycled'] += 1
+                        self._close(pooled)
+                        continue
+                    self._in_use += 1
+                    self._record_wait(wait_started)
+                    break
+                else:
+                    pooled = None
+
+                if pooled:
+                    break
+
+                if self._in_use < self.max_size:
+                    # Reserve the slot, connect outside the lock
+                    self._in_use += 1
+                    self._record_wait(wait_started)
+                    break
+
+                if deadline is None:
+                    wait_started = time.monotonic()
+                    deadline = wait_started + self.wait_timeout_seconds
+                    self._metrics['waits'] += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record_wait(wait_started)
+                    raise PoolExhaustedError(
+                        f"No database connection available after {self.wait_timeout_seconds}s"
+                    )
+                self._cond.wait(remaining)
+
+        if pooled and self._is_healthy(pooled):
+            with self._cond:
+                self._metrics['hits'] += 1
+            return pooled
+
+        if pooled:
+            with self._cond:
+                self._metrics['health_check_failures'] += 1
+            self._close(pooled)
+
+        # Reconnect: either the pool had nothing idle or the idle one was dead
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._metrics['misses'] += 1
+        return _PooledConnection(conn)
+
+    def _release(self, pooled: _PooledConnection, discard: bool = False):
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._is_expired(pooled):
+                self._metrics['discarded' if discard else 'recycled'] += 1
+                self._close(pooled)
+            else:
+                pooled.last_used_at = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    def _record_wait(self, wait_started: Optional[float]):
+        if wait_started is not None:
+            self._metrics['wait_time_ms'] += (time.monotonic() - wait_started) * 1000
+
+    def _is_expired(self, pooled: _PooledConnection) -> bool:
+        return time.monotonic() - pooled.created_at > self.max_lifetime_seconds
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """Cheap checks first; only ping connections that sat idle for a while"""
+        conn = pooled.conn
+        if conn.closed:
+            return False
+
+        if time.monotonic() - pooled.last_used_at < self.health_check_after_seconds:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {str(e)}")
+            return False
+
+    def _is_broken(self, conn) -> bool:
+        if conn.closed:
+            return True
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return False
+        except Exception:
+            return True
+
+    def _safe_rollback(self, pooled: _PooledConnection):
+        try:
+            if not pooled.conn.closed:
+                pooled.conn.rollback()
+        except Exception as e:
+            logger.warning(f"Rollback on pooled connection failed: {str(e)}")
+
+    def _close(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+
+def get_pool(key: tuple, connect: Callable[[], Any], **pool_options) -> ConnectionPool:
+    """
+    Return the module-level pool for `key`, creating it on first use.
+    Subsequent warm invocations get the same pool and its idle connections.
+    """
+    pool = _pools.get(key)
+    if pool:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if not pool:
+            pool = ConnectionPool(connect, **pool_options)
+            _pools[key] = pool
+        return pool
+
+
+def get_all_pool_metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every pool in this process, keyed by application name"""
+    return {str(key[-1]): pool.get_metrics() for key, pool in list(_pools.items())}
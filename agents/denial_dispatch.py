@@ -0,0 +1,340 @@
+# Denial Dispatch - Muni AI RCM Platform
+# Size-bounded batching of denials from ERAParserAgent to DenialClassifierAgent
+
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional
+
+from aws_clients import get_client
+from throttle import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+EVENT_SOURCE = 'muni.rcm.era-parser'
+BATCH_DETAIL_TYPE = 'DenialBatch'
+
+# EventBridge entries and SQS messages are both capped at 256KB; leave room for the envelope
+MAX_MESSAGE_BYTES = 240 * 1024
+# PutEvents and SendMessageBatch both take at most 10 entries and 256KB per call
+MAX_ENTRIES_PER_CALL = 10
+MAX_CALL_BYTES = 256 * 1024
+SEND_ATTEMPTS = 3
+# Undrained batches the in-memory transport keeps before dropping the oldest
+MEMORY_QUEUE_MAX_BATCHES = int(os.environ.get('DENIAL_DISPATCH_MEMORY_MAX_BATCHES', '1000'))
+
+
+def to_denial_data(denial: Dict[str, Any]) -> Dict[str, Any]:
+    """ERA denial record -> DenialClassifierAgent `denialData`"""
+    adjustment_codes = denial.get('adjustment_codes') or []
+    return {
+        'claimId': denial.get('claim_id'),
+        'denialReason': denial.get('denial_reason') or 'Unspecified',
+        'denialCode': ' '.join(adjustment_codes),
+        'denialDate': denial.get('denial_date'),
+        'payerName': denial.get('payer_name'),
+        'claimDetails': {'totalAmount': denial.get('denied_amount', 0.00)}
+    }
+
+
+def unwrap_batch_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the ways a denial batch can arrive - an EventBridge event, an
+    SQS event (each record a batch, possibly an EventBridge envelope) or a
+    direct {'denials': [...]} invoke - into one {'denials': [...]} event.
+    Anything else is returned unchanged.
+    
+    For SQS and EventBridge the result also carries `source` and the
+    `recordIds` of every delivered message, plus `denialRecordIds` mapping
+    each denial to the message it came from, so the consumer can report
+    exactly which messages to redeliver. Unparseable SQS bodies are listed
+    in `failedRecordIds`.
+    """
+    if isinstance(event.get('Records'), list) and event['Records'] and 'body' in event['Records'][0]:
+        denials, batch_ids, record_ids, denial_record_ids, failed_record_ids = [], [], [], [], []
+        for record in event['Records']:
+            record_id = record.get('messageId')
+            record_ids.append(record_id)
+            try:
+                message = json.loads(record['body'])
+                message = message.get('detail', message)
+                record_denials = message.get('denials', [])
+                if not isinstance(record_denials, list):
+                    raise ValueError("denials is not a list")
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Unreadable denial batch message {record_id}: {str(e)}")
+                failed_record_ids.append(record_id)
+                continue
+            denials.extend(record_denials)
+            denial_record_ids.extend([record_id] * len(record_denials))
+            batch_ids.append(message.get('batchId'))
+        return {
+            'denials': denials,
+            'batchIds': batch_ids,
+            'source': 'sqs',
+            'recordIds': record_ids,
+            'denialRecordIds': denial_record_ids,
+            'failedRecordIds': failed_record_ids
+        }
+
+    if event.get('detail-type') == BATCH_DETAIL_TYPE and isinstance(event.get('detail'), dict):
+        detail = event['detail']
+        denials = detail.get('denials', [])
+        return {
+            'denials': denials,
+            'batchIds': [detail.get('batchId')],
+            'source': 'eventbridge',
+            'recordIds': [event.get('id')],
+            'denialRecordIds': [event.get('id')] * len(denials) if isinstance(denials, list) else [],
+            'failedRecordIds': []
+        }
+
+    return event
+
+
+def failed_record_ids(batch_event: Dict[str, Any], results: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """
+    Message ids from an unwrapped batch event that must be redelivered: those
+    that could not be read plus those with any unsuccessful denial. Without
+    per-item results (the invocation failed as a whole) every message failed.
+    """
+    if results is None:
+        return list(batch_event.get('recordIds', []))
+    failed = set(batch_event.get('failedRecordIds', []))
+    record_ids = batch_event.get('denialRecordIds', [])
+    for item in results:
+        if not item.get('success') and item['index'] < len(record_ids):
+            failed.add(record_ids[item['index']])
+    return [record_id for record_id in batch_event.get('recordIds', []) if record_id in failed]
+
+
+def _chunk_bodies(messages: List[Dict[str, Any]]) -> List[List[str]]:
+    """Serialize messages and group them into per-call chunks within the entry and size limits"""
+    chunks: List[List[str]] = []
+    size = 0
+    for message in messages:
+        body = json.dumps(message, default=str)
+        if not chunks or len(chunks[-1]) >= MAX_ENTRIES_PER_CALL or size + len(body) > MAX_CALL_BYTES:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(body)
+        size += len(body)
+    return chunks
+
+
+class EventBridgeTransport:
+    """One PutEvents entry per batch; a DenialClassifierAgent rule matches BATCH_DETAIL_TYPE"""
+
+    def __init__(self, bus_name: str = 'default', region: Optional[str] = None):
+        self.bus_name = bus_name
+        self.region = region
+
+    def send(self, messages: List[Dict[str, Any]]):
+        events = get_client('events', self.region)
+        for bodies in _chunk_bodies(messages):
+            entries = [{
+                'Source': EVENT_SOURCE,
+                'DetailType': BATCH_DETAIL_TYPE,
+                'Detail': body,
+                'EventBusName': self.bus_name
+            } for body in bodies]
+
+            for attempt in range(SEND_ATTEMPTS):
+                response = events.put_events(Entries=entries)
+                if not response.get('FailedEntryCount'):
+                    break
+                # Results are positional; resend only the entries that failed
+                entries = [entry for entry, result in zip(entries, response['Entries']) if result.get('ErrorCode')]
+                if attempt + 1 < SEND_ATTEMPTS:
+                    time.sleep(backoff_delay(attempt))
+            else:
+                raise Exception(f"EventBridge rejected {len(entries)} denial batch events")
+
+
+class SQSTransport:
+    """One SQS message per batch, sent ten at a time with SendMessageBatch"""
+
+    def __init__(self, queue_url: str, region: Optional[str] = None):
+        self.queue_url = queue_url
+        self.region = region
+
+    def send(self, messages: List[Dict[str, Any]]):
+        sqs = get_client('sqs', self.region)
+        for bodies in _chunk_bodies(messages):
+            entries = [{'Id': str(index), 'MessageBody': body} for index, body in enumerate(bodies)]
+
+            for attempt in range(SEND_ATTEMPTS):
+                response = sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+                failed = {item['Id'] for item in response.get('Failed', [])}
+                if not failed:
+                    break
+                entries = [entry for entry in entries if entry['Id'] in failed]
+                if attempt + 1 < SEND_ATTEMPTS:
+                    time.sleep(backoff_delay(attempt))
+            else:
+                raise Exception(f"SQS rejected {len(entries)} denial batch messages")
+
+
+class InMemoryQueueTransport:
+    """
+    Local stand-in for EventBridge/SQS. Batches land on a process-wide queue
+    for tests and scripts to drain; with a consumer, each batch is handed to
+    it directly as an SQS-shaped event (e.g. DenialClassifierAgent's handler).
+    The queue is bounded so a warm container nobody drains does not grow
+    without limit: once full, the oldest batch is dropped.
+    """
+
+    def __init__(self, consumer: Optional[Callable[[Dict[str, Any], Any], Any]] = None):
+        self.queue: 'queue.Queue[Dict[str, Any]]' = _memory_queue
+        self.consumer = consumer
+
+    def send(self, messages: List[Dict[str, Any]]):
+        for message in messages:
+            if self.consumer:
+                self.consumer({'Records': [{'body': json.dumps(message, default=str)}]}, None)
+            else:
+                self._put(message)
+
+    def _put(self, message: Dict[str, Any]):
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                logger.warning(f"In-memory denial queue full; dropped undrained batch {dropped.get('batchId')}")
+
+    def drain(self) -> List[Dict[str, Any]]:
+        messages = []
+        while True:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                return messages
+
+
+_memory_queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=MEMORY_QUEUE_MAX_BATCHES)
+
+
+class DenialBatchDispatcher:
+    """
+    Groups denials into batches for DenialClassifierAgent so one invocation
+    classifies many denials with shared connections. A batch is sent when it
+    reaches max_batch_size denials or max_batch_bytes of JSON; close() sends
+    whatever is left.
+
+    There is no time bound: ERAParserAgent adds the denials only once the
+    ERA is committed, so nothing is sent for a load that rolls back, and
+    they all arrive at once.
+    Send failures are logged and counted rather than raised - the denials
+    are already persisted with the ERA - and the affected claim IDs are
+    reported by close() for replay.
+    """
+
+    def __init__(self, transport, max_batch_size: int = 25,
+                 max_batch_bytes: int = MAX_MESSAGE_BYTES, context: Optional[Dict[str, Any]] = None):
+        self.transport = transport
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_bytes = max_batch_bytes
+        self.context = context or {}
+
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {
+            'denials': 0,
+            'batches': 0,
+            'flush_reasons': {'size': 0, 'bytes': 0, 'final': 0},
+            'failed_batches': 0,
+            'failed_claim_ids': []
+        }
+
+    def add(self, denial: Dict[str, Any]):
+        denial_data = to_denial_data(denial)
+        size = len(json.dumps(denial_data, default=str)) + 2
+
+        with self._lock:
+            if self._pending and self._pending_bytes + size > self.max_batch_bytes:
+                self._flush_locked('bytes')
+
+            self._pending.append(denial_data)
+            self._pending_bytes += size
+            self._metrics['denials'] += 1
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush_locked('size')
+
+    def flush(self, reason: str = 'final'):
+        with self._lock:
+            if self._pending:
+                self._flush_locked(reason)
+
+    def close(self) -> Dict[str, Any]:
+        """Send the remaining batch and return dispatch metrics"""
+        self.flush('final')
+        return self.get_metrics()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['flush_reasons'] = dict(self._metrics['flush_reasons'])
+            metrics['failed_claim_ids'] = list(self._metrics['failed_claim_ids'])
+        return metrics
+
+    def _flush_locked(self, reason: str):
+        batch, self._pending = self._pending, []
+        self._pending_bytes = 0
+
+        message = {
+            'batchId': str(uuid.uuid4()),
+            'createdAt': datetime.utcnow().isoformat(),
+            **self.context,
+            'denials': batch
+        }
+        try:
+            self.transport.send([message])
+            self._metrics['batches'] += 1
+            self._metrics['flush_reasons'][reason] += 1
+        except Exception as e:
+            logger.error(f"Failed to dispatch denial batch of {len(batch)}: {str(e)}")
+            self._metrics['failed_batches'] += 1
+            self._metrics['failed_claim_ids'].extend(item['claimId'] for item in batch)
+
+
+def create_denial_dispatcher(development_mode: bool = False,
+                             context: Optional[Dict[str, Any]] = None) -> Optional[DenialBatchDispatcher]:
+    """
+    Dispatcher for DENIAL_DISPATCH_TRANSPORT (eventbridge | sqs | memory | none).
+    Development mode never sends to AWS: only the in-memory queue, when
+    explicitly configured, is used.
+    """
+    transport_name = os.environ.get('DENIAL_DISPATCH_TRANSPORT', 'none').lower()
+    if development_mode and transport_name != 'memory':
+        return None
+
+    if transport_name == 'eventbridge':
+        transport = EventBridgeTransport(os.environ.get('DENIAL_DISPATCH_EVENT_BUS', 'default'))
+    elif transport_name == 'sqs':
+        queue_url = os.environ.get('DENIAL_DISPATCH_QUEUE_URL')
+        if not queue_url:
+            logger.warning("DENIAL_DISPATCH_QUEUE_URL not set; denial dispatch disabled")
+            return None
+        transport = SQSTransport(queue_url)
+    elif transport_name == 'memory':
+        transport = InMemoryQueueTransport()
+    else:
+        return None
+
+    return DenialBatchDispatcher(
+        transport,
+        max_batch_size=int(os.environ.get('DENIAL_BATCH_MAX_SIZE', '25')),
+        context=context
+    )
@@ -0,0 +1,266 @@
+# Fee Schedule - Muni AI RCM Platform
+# Compact payer/CPT/modifier/locality allowed-amount index with O(1) lookup
+
+import os
+import csv
+import json
+import mmap
+import struct
+import threading
+import logging
+from array import array
+from functools import lru_cache
+from typing import Dict, Any, Optional, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = '*'
+SNAPSHOT_MAGIC = b'MUNIFS01'
+SNAPSHOT_HEADER = struct.Struct('<8sQQQ')  # magic, capacity, rows, metadata length
+
+# Key layout (63 bits, stored +1 so 0 marks an empty slot):
+# procedure (26 bits, base-36 of 5 chars) | modifier (11) | payer index (16) | locality index (10)
+PROCEDURE_BITS, MODIFIER_BITS, PAYER_BITS, LOCALITY_BITS = 26, 11, 16, 10
+MAX_PAYERS = (1 << PAYER_BITS) - 1
+MAX_LOCALITIES = (1 << LOCALITY_BITS) - 1
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+_MAX_LOAD_FACTOR = 0.5
+
+
+# Code vocabularies are small (~10k procedures), so encodings are memoized
+@lru_cache(maxsize=65536)
+def encode_procedure(code: str) -> int:
+    """CPT/HCPCS code (5 alphanumerics, e.g. 99214, J1100, 0001F) -> 26-bit int"""
+    code = code.strip().upper()
+    if len(code) != 5 or not code.isalnum():
+        raise ValueError(f"Invalid procedure code: {code!r}")
+    return int(code, 36)
+
+
+@lru_cache(maxsize=4096)
+def encode_modifier(modifier: Optional[str]) -> int:
+    """Two-character modifier -> 11-bit int; 0 means no modifier"""
+    modifier = (modifier or '').strip().upper()
+    if not modifier:
+        return 0
+    if len(modifier) != 2 or not modifier.isalnum():
+        raise ValueError(f"Invalid modifier: {modifier!r}")
+    return int(modifier, 36) + 1
+
+
+class FeeSchedule:
+    """
+    Allowed amounts keyed on (payer, procedure, modifier, locality), held in
+    two parallel arrays forming an open-addressing hash table: 16 bytes per
+    slot instead of a Python dict entry per row, and O(1) lookups.
+
+    Build from rows or CSV, or open a snapshot written by save(); snapshots
+    are memory-mapped, so a warm container shares pages and pays no parse cost.
+    Missing modifier/locality/payer combinations fall back to wildcard rows.
+    """
+
+    def __init__(self, keys, amounts, payers: List[str], localities: List[str],
+                 rows: int, source: str = 'memory', _mmap: Optional[mmap.mmap] = None):
+        self._keys = keys
+        self._amounts = amounts
+        self._capacity = len(keys)
+        self._shift = 64 - (self._capacity.bit_length() - 1)
+        self._payer_index = {payer: index for index, payer in enumerate(payers)}
+        self._locality_index = {locality: index for index, locality in enumerate(localities)}
+        self._payers = payers
+        self._localities = localities
+        self._mmap = _mmap
+        self.rows = rows
+        self.source = source
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str, str, float]], source: str = 'memory') -> 'FeeSchedule':
+        """Build from (payer_id, procedure_code, modifier, locality, allowed_amount); blanks mean any"""
+        payers = [WILDCARD]
+        localities = [WILDCARD]
+        payer_index = {WILDCARD: 0}
+        locality_index = {WILDCARD: 0}
+        entries: Dict[int, float] = {}
+        skipped = 0
+
+        for payer_id, procedure_code, modifier, locality, amount in rows:
+            payer_id = (payer_id or WILDCARD).strip().upper() or WILDCARD
+            locality = (locality or WILDCARD).strip().upper() or WILDCARD
+            try:
+                procedure = encode_procedure(procedure_code)
+                modifier_code = encode_modifier(modifier)
+                amount = float(amount)
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+
+            if payer_id not in payer_index:
+                if len(payers) > MAX_PAYERS:
+                    raise ValueError(f"Fee schedule has more than {MAX_PAYERS} payers")
+                payer_index[payer_id] = len(payers)
+                payers.append(payer_id)
+            if locality not in locality_index:
+                if len(localities) > MAX_LOCALITIES:
+                    raise ValueError(f"Fee schedule has more than {MAX_LOCALITIES} localities")
+                locality_index[locality] = len(localities)
+                localities.append(locality)
+
+            # Later rows for the same key win
+            entries[cls._pack(procedure, modifier_code, payer_index[payer_id], locality_index[locality])] = amount
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} invalid fee schedule rows from {source}")
+
+        capacity = 16
+        while capacity * _MAX_LOAD_FACTOR < len(entries):
+            capacity *= 2
+        keys = array('Q', bytes(8 * capacity))
+        amounts = array('d', bytes(8 * capacity))
+        shift = 64 - (capacity.bit_length() - 1)
+        mask = capacity - 1
+
+        for key, amount in entries.items():
+            slot = ((key * _HASH_MULTIPLIER) & _MASK64) >> shift
+            while keys[slot]:
+                slot = (slot + 1) & mask
+            keys[slot] = key
+            amounts[slot] = amount
+
+        return cls(keys, amounts, payers, localities, len(entries), source)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'FeeSchedule':
+        """
+        Load a CSV with payer_id, procedure_code, modifier, locality and
+        allowed_amount columns (modifier/locality may be blank)
+        """
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            return cls.from_rows((
+                (row.get('payer_id'), row.get('procedure_code'), row.get('modifier'),
+                 row.get('locality'), row.get('allowed_amount'))
+                for row in reader
+            ), source=path)
+
+    @classmethod
+    def open(cls, path: str) -> 'FeeSchedule':
+        """Memory-map a snapshot written by save()"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, capacity, rows, metadata_length = SNAPSHOT_HEADER.unpack_from(mapped, 0)
+        if magic != SNAPSHOT_MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a fee schedule snapshot")
+
+        offset = SNAPSHOT_HEADER.size
+        metadata = json.loads(mapped[offset:offset + metadata_length].decode('utf-8'))
+        offset += metadata_length + (-metadata_length % 8)
+
+        view = memoryview(mapped)
+        keys = view[offset:offset + 8 * capacity].cast('Q')
+        amounts = view[offset + 8 * capacity:offset + 16 * capacity].cast('d')
+        return cls(keys, amounts, metadata['payers'], metadata['localities'], rows,
+                   source=path, _mmap=mapped)
+
+    def save(self, path: str):
+        """Write a snapshot that open() can memory-map"""
+        metadata = json.dumps({'payers': self._payers, 'localities': self._localities}).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self._capacity, self.rows, len(metadata)))
+            f.write(metadata)
+            f.write(b'\0' * (-len(metadata) % 8))
+            f.write(array('Q', self._keys).tobytes())
+            f.write(array('d', self._amounts).tobytes())
+        os.replace(tmp_path, path)
+
+    def lookup(self, payer_id: str, procedure_code: str, modifier: Optional[str] = None,
+               locality: Optional[str] = None) -> Optional[float]:
+        """
+        Allowed amount for one unit, trying the exact row first, then no
+        modifier, then any locality, then the wildcard payer. None if unpriced.
+        """
+        try:
+            procedure = encode_procedure(procedure_code)
+            modifier_code = encode_modifier(modifier)
+        except (ValueError, AttributeError):
+            return None
+
+        payer = self._payer_index.get((payer_id or '').strip().upper())
+        locality_code = self._locality_index.get((locality or '').strip().upper(), 0)
+
+        for payer_code in ((payer, 0) if payer else (0,)):
+            for modifier_option in ((modifier_code, 0) if modifier_code else (0,)):
+                for locality_option in ((locality_code, 0) if locality_code else (0,)):
+                    amount = self._get(self._pack(procedure, modifier_option, payer_code, locality_option))
+                    if amount is not None:
+                        return amount
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'capacity': self._capacity,
+            'load_factor': round(self.rows / self._capacity, 3),
+            'payers': len(self._payers) - 1,
+            'localities': len(self._localities) - 1,
+            'index_bytes': 16 * self._capacity,
+            'memory_mapped': self._mmap is not None,
+            'source': self.source
+        }
+
+    def close(self):
+        if self._mmap is not None:
+            self._keys.release()
+            self._amounts.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _get(self, key: int) -> Optional[float]:
+        keys = self._keys
+        mask = self._capacity - 1
+        slot = ((key * _HASH_MULTIPLIER) & _MASK64) >> self._shift
+        while True:
+            stored = keys[slot]
+            if stored == key:
+                return self._amounts[slot]
+            if not stored:
+                return None
+            slot = (slot + 1) & mask
+
+    @staticmethod
+    def _pack(procedure: int, modifier: int, payer: int, locality: int) -> int:
+        return ((((procedure << MODIFIER_BITS | modifier) << PAYER_BITS | payer) << LOCALITY_BITS) | locality) + 1
+
+
+_schedule: Optional[FeeSchedule] = None
+_schedule_lock = threading.Lock()
+_schedule_loaded = False
+
+
+def get_fee_schedule() -> Optional[FeeSchedule]:
+    """
+    Return the process-wide fee schedule from FEE_SCHEDULE_PATH (a snapshot
+    from save() is memory-mapped; a .csv is parsed), or None when unset
+    """
+    global _schedule, _schedule_loaded
+    if _schedule_loaded:
+        return _schedule
+
+    with _schedule_lock:
+        if not _schedule_loaded:
+            path = os.environ.get('FEE_SCHEDULE_PATH')
+            if path:
+                try:
+                    _schedule = FeeSchedule.from_csv(path) if path.endswith('.csv') else FeeSchedule.open(path)
+                    logger.info(f"Loaded fee schedule: {_schedule.get_stats()}")
+                except Exception as e:
+                    logger.error(f"Could not load fee schedule from {path}: {str(e)}")
+            _schedule_loaded = True
+    return _schedule
@@ -0,0 +1,265 @@
+# LLM Response Cache - Muni AI RCM Platform
+# Two-tier (in-process LRU + shared persistent store) cache for Bedrock responses
+
+import json
+import re
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so prompts differing only in formatting share a key"""
+    return _WHITESPACE.sub(' ', prompt).strip()
+
+
+def make_cache_key(model_id: str, prompt: str, generation_config: Dict[str, Any]) -> str:
+    """Stable key over model id, normalized prompt and generation config"""
+    digest = hashlib.sha256()
+    digest.update(model_id.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(json.dumps(generation_config, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(normalize_prompt(prompt).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SQLiteResponseStore:
+    """
+    Local persistent tier. On Lambda the database file lives in /tmp and
+    survives for the lifetime of the container.
+    """
+
+    def __init__(self, path: str, max_rows: int = 10000):
+        import sqlite3
+        
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_id TEXT,
+                response_text TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_response_cache(created_at)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response_text, expires_at FROM llm_response_cache WHERE cache_key = ?",
+                (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, key: str, model_id: str, value: str, expires_at: float) -> int:
+        """Store a response; returns the number of rows evicted"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache VALUES (?, ?, ?, ?, ?)",
+                (key, model_id, value, now, expires_at)
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,)
+            ).rowcount
+            evicted += self._conn.execute("""
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache
+                    ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_rows,)).rowcount
+        return evicted
+
+
+class PostgresResponseStore:
+    """Shared persistent tier backed by the llm_response_cache table"""
+
+    def __init__(self, connection_factory: Callable, max_rows: int = 100000,
+                 evict_every: int = 100):
+        self._connection_factory = connection_factory
+        self.max_rows = max_rows
+        self.evict_every = evict_every
+        self._puts = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._connection_factory() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT response_text, EXTRACT(EPOCH FROM expires_at)
+                    FROM llm_response_cache WHERE cache_key = %s
+                """, (key,))
+                row = cur.fetchone()
+        return (row[0], float(row[1])) if row else None
+
+    def put(self, key: str, model_id: str, value: str, expires_at: float) -> int:
+        self._puts += 1
+        evicted = 0
+        with self._connection_factory() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO llm_response_cache (cache_key, model_id, response_text, created_at, expires_at)
+                    VALUES (%s, %s, %s, NOW(), TO_TIMESTAMP(%s))
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        response_text = EXCLUDED.response_text,
+                        created_at = EXCLUDED.created_at,
+                        expires_at = EXCLUDED.expires_at
+                """, (key, model_id, value, expires_at))
+
+                # Amortize eviction instead of paying for it on every write
+                if self._puts % self.evict_every == 0:
+                    cur.execute("DELETE FROM llm_response_cache WHERE expires_at <= NOW()")
+                    evicted = cur.rowcount
+                    cur.execute("""
+                        DELETE FROM llm_response_cache WHERE cache_key IN (
+                            SELECT cache_key FROM llm_response_cache
+                            ORDER BY created_at DESC OFFSET %s
+                        )
+                    """, (self.max_rows,))
+                    evicted += cur.rowcount
+            conn.commit()
+        return evicted
+
+
+class LLMResponseCache:
+    """
+    Response cache for LLM calls:
+    - In-process LRU tier bounded by max_entries (microsecond hits on warm containers)
+    - Optional persistent tier shared across containers (SQLite or Postgres)
+    - Per-entry TTLs and hit/miss metrics per tier
+    Persistent-tier failures are logged and treated as misses.
+    """
+
+    def __init__(self, store=None, max_entries: int = 256, ttl_seconds: float = 86400.0):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {
+            'memory_hits': 0,
+            'store_hits': 0,
+            'misses': 0,
+            'puts': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'store_errors': 0
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._metrics['memory_hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._metrics['expirations'] += 1
+
+        if self.store is not None:
+            try:
+                stored = self.store.get(key)
+            except Exception as e:
+                logger.warning(f"LLM cache store lookup failed: {str(e)}")
+                stored = None
+                self._count('store_errors')
+
+            if stored and stored[1] > now:
+                self._remember(key, stored[0], stored[1])
+                self._count('store_hits')
+                return stored[0]
+
+        self._count('misses')
+        return None
+
+    def put(self, key: str, value: str, model_id: str = '', ttl_seconds: Optional[float] = None):
+        expires_at = time.time() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        self._remember(key, value, expires_at)
+        self._count('puts')
+
+        if self.store is not None:
+            try:
+                evicted = self.store.put(key, model_id, value, expires_at)
+                self._count('evictions', evicted)
+            except Exception as e:
+                logger.warning(f"LLM cache store write failed: {str(e)}")
+                self._count('store_errors')
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['memory_entries'] = len(self._entries)
+        lookups = metrics['memory_hits'] + metrics['store_hits'] + metrics['misses']
+        hits = metrics['memory_hits'] + metrics['store_hits']
+        metrics['hit_rate'] = hits / lookups if lookups else 0.0
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache(backend: str = 'memory', connection_factory: Optional[Callable] = None,
+                  **options) -> Optional[LLMResponseCache]:
+    """
+    Return the process-wide LLM cache, creating it on first use.
+    backend: 'memory', 'sqlite', 'postgres' or 'none'
+    """
+    global _cache
+
+    if backend == 'none':
+        return None
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            store = None
+            if backend == 'sqlite':
+                store = SQLiteResponseStore(
+                    options.get('sqlite_path', '/tmp/muni-rcm-llm-cache.sqlite3'),
+                    max_rows=options.get('max_rows', 10000)
+                )
+            elif backend == 'postgres':
+                if connection_factory is None:
+                    raise ValueError("Postgres LLM cache requires a connection factory")
+                store = PostgresResponseStore(connection_factory, max_rows=options.get('max_rows', 100000))
+
+            _cache = LLMResponseCache(
+                store,
+                max_entries=options.get('max_entries', 256),
+                ttl_seconds=options.get('ttl_seconds', 86400.0)
+            )
+        return _cache
@@ -0,0 +1,52 @@
+# LLM JSON Extraction - Muni AI RCM Platform
+# Single-pass extraction of the JSON object embedded in a model response
+
+import re
+import json
+from typing import Dict, Any, Optional
+
+_decoder = json.JSONDecoder()
+# A '{' that can open an object: followed by a key, '}' or the end of the text.
+# Prose braces such as "{placeholder}" never reach the decoder.
+_OBJECT_START = re.compile(r'\{(?=\s*(?:["}]|\Z))')
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    Return the first top-level JSON object in text, ignoring code fences,
+    leading chatter and anything after the object (including prose with
+    braces). Each '{' that can open an object is decoded in place with
+    raw_decode; when a candidate fails partway through, scanning resumes
+    where the decoder stopped, so a truncated answer is never rescanned and
+    its nested objects are not returned in its place. Empty objects ("{}" in
+    prose) are only returned when nothing else - not even a malformed
+    answer - was found.
+    """
+    if not isinstance(text, str):
+        raise ValueError("No valid JSON found in response")
+
+    empty: Optional[Dict[str, Any]] = None
+    malformed = False
+    match = _OBJECT_START.search(text)
+    while match:
+        position = match.start()
+        try:
+            value, end = _decoder.raw_decode(text, position)
+        except json.JSONDecodeError as e:
+            # An object that broke partway through (truncated or invalid)
+            malformed = True
+            resume = max(e.pos, position + 1)
+        except RecursionError:
+            malformed = True
+            break
+        else:
+            if value:
+                return value
+            if empty is None:
+                empty = value
+            resume = end
+        match = _OBJECT_START.search(text, resume)
+
+    if empty is not None and not malformed:
+        return empty
+    raise ValueError("No valid JSON found in response")
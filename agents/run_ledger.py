@@ -0,0 +1,228 @@
+# Agent Run Ledger - Muni AI RCM Platform
+# Buffers agent_runs records in memory and writes them in batched upserts
+
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# One ledger per agent process, reused across warm invocations
+_ledgers: Dict[str, 'RunLedger'] = {}
+_ledgers_lock = threading.Lock()
+
+# Columns written by the ledger, in VALUES order
+LEDGER_COLUMNS = (
+    'run_id', 'agent_name', 'agent_version', 'input_data', 'output_data',
+    'error_message', 'status', 'start_time', 'end_time', 'execution_time_ms',
+    'created_at', 'updated_at'
+)
+
+# Later writes for the same run only fill in what they know; input_data and
+# start_time come from the first write and are never overwritten
+UPSERT_SQL = f"""
+    INSERT INTO agent_runs ({', '.join(LEDGER_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (run_id) DO UPDATE SET
+        output_data = COALESCE(EXCLUDED.output_data, agent_runs.output_data),
+        error_message = COALESCE(EXCLUDED.error_message, agent_runs.error_message),
+        status = EXCLUDED.status,
+        end_time = COALESCE(EXCLUDED.end_time, agent_runs.end_time),
+        execution_time_ms = COALESCE(EXCLUDED.execution_time_ms, agent_runs.execution_time_ms),
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+class RunLedger:
+    """
+    In-memory run ledger for the agent_runs table.
+
+    Start, completion and error events for the same run are merged in memory,
+    so a run that finishes before the next flush costs one row in one
+    multi-row INSERT ... ON CONFLICT (run_id) DO UPDATE statement.
+    JSON encoding of input/output payloads is deferred to flush time;
+    payloads the agent already encoded (EncodedJSON) are written as-is.
+    """
+
+    def __init__(self, connection_factory: Callable, agent_name: str, agent_version: str,
+                 flush_interval_seconds: float = 5.0, max_buffered_runs: int = 1000):
+        self._connection_factory = connection_factory
+        self.agent_name = agent_name
+        self.agent_version = agent_version
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffered_runs = max_buffered_runs
+
+        self._buffer: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        self._metrics = {
+            'runs_recorded': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'flush_failures': 0,
+            'runs_dropped': 0
+        }
+
+    def record_start(self, run_id: str, input_data: Dict[str, Any], start_time: datetime):
+        """Buffer the start of a run"""
+        self._merge(run_id, {
+            'input_data': input_data,
+            'status': 'running',
+            'start_time': start_time,
+            'created_at': start_time,
+            'updated_at': start_time
+        })
+        with self._lock:
+            self._metrics['runs_recorded'] += 1
+
+    def record_completion(self, run_id: str, output_data: Any,
+                          end_time: datetime, execution_time_ms: int):
+        """Buffer a successful run completion"""
+        self._merge(run_id, {
+            'output_data': output_data,
+            'status': 'completed',
+            'end_time': end_time,
+            'execution_time_ms': execution_time_ms,
+            'updated_at': end_time
+        })
+
+    def record_error(self, run_id: str, error_message: str,
+                     end_time: datetime, execution_time_ms: int):
+        """Buffer a failed run"""
+        self._merge(run_id, {
+            'error_message': error_message,
+            'status': 'failed',
+            'end_time': end_time,
+            'execution_time_ms': execution_time_ms,
+            'updated_at': end_time
+        })
+
+    def flush(self) -> int:
+        """
+        Write all buffered runs in a single upsert statement.
+        Returns the number of rows written; failed batches are re-buffered.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                batch = self._buffer
+                self._buffer = OrderedDict()
+
+            rows = [self._to_row(run_id, record) for run_id, record in batch.items()]
+
+            try:
+                from psycopg2.extras import execute_values
+
+                with self._connection_factory() as conn:
+                    with conn.cursor() as cur:
+                        execute_values(cur, UPSERT_SQL, rows, page_size=len(rows))
+                    conn.commit()
+            except Exception as e:
+                logger.warning(f"Failed to flush {len(rows)} agent runs: {str(e)}")
+                self._requeue(batch)
+                with self._lock:
+                    self._metrics['flush_failures'] += 1
+                return 0
+
+            with self._lock:
+                self._metrics['flushes'] += 1
+                self._metrics['rows_written'] += len(rows)
+            return len(rows)
+
+    def start_background_flusher(self):
+        """Start a daemon thread that flushes every flush_interval_seconds"""
+        with self._lock:
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name='run-ledger-flusher', daemon=True
+            )
+            self._flusher.start()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return a snapshot of ledger metrics"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['buffered_runs'] = len(self._buffer)
+        return metrics
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Background run ledger flush failed: {str(e)}")
+
+    def _merge(self, run_id: str, fields: Dict[str, Any]):
+        with self._lock:
+            record = self._buffer.get(run_id)
+            if record is None:
+                self._buffer[run_id] = fields
+            else:
+                record.update(fields)
+
+            if len(self._buffer) >= self.max_buffered_runs:
+                self._wakeup.set()
+
+    def _requeue(self, batch: 'OrderedDict[str, Dict[str, Any]]'):
+        """Put a failed batch back in front of anything buffered since"""
+        with self._lock:
+            for run_id, record in self._buffer.items():
+                if run_id in batch:
+                    batch[run_id].update(record)
+                else:
+                    batch[run_id] = record
+            self._buffer = batch
+
+            while len(self._buffer) > self.max_buffered_runs:
+                self._buffer.popitem(last=False)
+                self._metrics['runs_dropped'] += 1
+
+    def _to_row(self, run_id: str, record: Dict[str, Any]) -> tuple:
+        input_data = record.get('input_data')
+        output_data = record.get('output_data')
+
+        return (
+            run_id,
+            self.agent_name,
+            self.agent_version,
+            # input_data is NOT NULL; a placeholder only reaches the table when the
+            # start was already flushed, in which case ON CONFLICT keeps the original
+            self._encode(input_data) if input_data is not None else '{}',
+            self._encode(output_data) if output_data is not None else None,
+            record.get('error_message'),
+            record.get('status', 'running'),
+            record.get('start_time'),
+            record.get('end_time'),
+            record.get('execution_time_ms'),
+            record.get('created_at', record.get('updated_at')),
+            record.get('updated_at')
+        )
+
+    def _encode(self, payload: Any) -> str:
+        return dumps(payload)
+
+
+def get_run_ledger(agent_name: str, agent_version: str, connection_factory: Callable,
+                   **ledger_options) -> RunLedger:
+    """Return the module-level ledger for an agent, creating it on first use"""
+    ledger = _ledgers.get(agent_name)
+    if ledger:
+        return ledger
+
+    with _ledgers_lock:
+        ledger = _ledgers.get(agent_name)
+        if not ledger:
+            ledger = RunLedger(connection_factory, agent_name, agent_version, **ledger_options)
+            _ledgers[agent_name] = ledger
+        return ledger
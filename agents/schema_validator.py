@@ -0,0 +1,313 @@
+# Schema Validator - Muni AI RCM Platform
+# Compiles the JSON-schema API contracts in /schemas into plain Python validators
+
+import os
+import re
+import json
+import threading
+import logging
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_DIR = os.environ.get(
+    'SCHEMA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schemas')
+)
+
+# enforce: contract violations fail validation; report: logged only; off: not checked
+VALIDATION_MODES = ('enforce', 'report', 'off')
+
+# Keywords that only document the contract
+ANNOTATIONS = {'$schema', '$id', '$comment', 'title', 'description', 'default', 'examples', 'definitions'}
+
+FORMATS = {
+    'date': r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$',
+    'date-time': r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])[Tt ]([01]\d|2[0-3]):[0-5]\d:[0-5]\d(\.\d+)?([Zz]|[+-]\d{2}:\d{2})?$',
+    'uri': r'^[A-Za-z][A-Za-z0-9+.\-]*:\S+$'
+}
+
+TYPE_CHECKS = {
+    'string': 'isinstance({v}, str)',
+    'integer': '(isinstance({v}, int) and not isinstance({v}, bool))',
+    'number': '(isinstance({v}, (int, float)) and not isinstance({v}, bool))',
+    'boolean': 'isinstance({v}, bool)',
+    'object': 'isinstance({v}, dict)',
+    'array': 'isinstance({v}, list)',
+    'null': '{v} is None'
+}
+
+STRING_KEYWORDS = ('pattern', 'format', 'minLength', 'maxLength')
+NUMBER_KEYWORDS = ('minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum')
+OBJECT_KEYWORDS = ('properties', 'required', 'additionalProperties')
+ARRAY_KEYWORDS = ('items', 'minItems', 'maxItems')
+SUPPORTED = (
+    {'type', 'enum', '$ref'} | set(STRING_KEYWORDS) | set(NUMBER_KEYWORDS) | set(OBJECT_KEYWORDS) | set(ARRAY_KEYWORDS)
+)
+
+_MISSING = object()
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+def _index(path: str, index: int) -> str:
+    return f"{path}[{index}]"
+
+
+def _error(path: str, message: str) -> str:
+    return f"{path or 'input'}: {message}"
+
+
+class CompiledValidator:
+    """
+    A schema compiled to straight-line Python. Calling it returns every
+    contract violation as 'path: message' strings (empty when valid) in a
+    single pass; no schema is walked at validation time.
+    """
+
+    def __init__(self, name: str, source: str, function: Callable[[Any, List[str], str], None]):
+        self.name = name
+        self.source = source
+        self._function = function
+
+    def __call__(self, value: Any, path: str = '') -> List[str]:
+        errors: List[str] = []
+        self._function(value, errors, path)
+        return errors
+
+
+class _SchemaCompiler:
+    """Emits one Python function per schema; $refs are inlined (the contracts are not recursive)"""
+
+    def __init__(self, root: Dict[str, Any]):
+        self.root = root
+        self.lines: List[str] = []
+        self.constants: Dict[str, Any] = {}
+        self._counter = 0
+        self._ref_stack: List[str] = []
+
+    def compile(self, schema: Dict[str, Any], name: str) -> CompiledValidator:
+        self.lines = ['def validate(value, errors, path):']
+        self._node(schema, 'value', 'path', 1)
+        self.lines.append('    return None')
+        source = '\n'.join(self.lines) + '\n'
+
+        namespace = dict(self.constants, _MISSING=_MISSING, _join=_join, _index=_index, _error=_error)
+        exec(compile(source, f'<schema {name}>', 'exec'), namespace)
+        return CompiledValidator(name, source, namespace['validate'])
+
+    def _name(self, prefix: str) -> str:
+        self._counter += 1
+        return f'{prefix}{self._counter}'
+
+    def _constant(self, value: Any) -> str:
+        name = self._name('_c')
+        self.constants[name] = value
+        return name
+
+    def _emit(self, indent: int, line: str):
+        self.lines.append('    ' * indent + line)
+
+    def _fail(self, indent: int, path: str, message: str):
+        self._emit(indent, f'errors.append(_error({path}, {message!r}))')
+
+    def _resolve(self, ref: str) -> Dict[str, Any]:
+        if not ref.startswith('#'):
+            raise Exception(f"Unsupported $ref (only local references): {ref}")
+        node: Any = self.root
+        for part in ref[1:].split('/')[1:]:
+            node = node[part.replace('~1', '/').replace('~0', '~')]
+        return node
+
+    def _node(self, schema: Dict[str, Any], var: str, path: str, indent: int):
+        unsupported = set(schema) - SUPPORTED - ANNOTATIONS
+        if unsupported:
+            raise Exception(f"Unsupported schema keywords: {', '.join(sorted(unsupported))}")
+
+        if '$ref' in schema:
+            ref = schema['$ref']
+            if ref in self._ref_stack:
+                raise Exception(f"Recursive $ref is not supported: {ref}")
+            self._ref_stack.append(ref)
+            self._node(self._resolve(ref), var, path, indent)
+            self._ref_stack.pop()
+            return
+
+        types = schema.get('type')
+        if isinstance(types, str):
+            types = [types]
+
+        if types:
+            check = ' or '.join(TYPE_CHECKS[t].format(v=var) for t in types)
+            self._emit(indent, f'if not ({check}):')
+            self._fail(indent + 1, path, f"expected {' or '.join(types)}")
+            self._emit(indent, 'else:')
+            indent += 1
+            self._emit(indent, 'pass')
+
+        if 'enum' in schema:
+            values = schema['enum']
+            hashable = all(isinstance(item, (str, int, float, bool, type(None))) for item in values)
+            scalar = types and not set(types) & {'object', 'array'}
+            constant = self._constant(frozenset(values) if hashable and scalar else tuple(values))
+            self._emit(indent, f'if {var} not in {constant}:')
+            self._fail(indent + 1, path, f"must be one of {', '.join(map(str, values))}")
+
+        self._guarded(schema, types, 'string', STRING_KEYWORDS, self._string, var, path, indent)
+        self._guarded(schema, types, ('integer', 'number'), NUMBER_KEYWORDS, self._number, var, path, indent)
+        self._guarded(schema, types, 'object', OBJECT_KEYWORDS, self._object, var, path, indent)
+        self._guarded(schema, types, 'array', ARRAY_KEYWORDS, self._array, var, path, indent)
+
+    def _guarded(self, schema, types, kind, keywords, emit, var, path, indent):
+        """Keywords apply only to values of their type; skip the isinstance when `type` already checked it"""
+        if not any(keyword in schema for keyword in keywords):
+            return
+        kinds = (kind,) if isinstance(kind, str) else kind
+        if types and set(types) <= set(kinds):
+            emit(schema, var, path, indent)
+            return
+        check = ' or '.join(TYPE_CHECKS[k].format(v=var) for k in kinds)
+        self._emit(indent, f'if {check}:')
+        emit(schema, var, path, indent + 1)
+
+    def _string(self, schema, var, path, indent):
+        self._emit(indent, 'pass')
+        if 'minLength' in schema:
+            self._emit(indent, f"if len({var}) < {int(schema['minLength'])}:")
+            self._fail(indent + 1, path, f"must be at least {schema['minLength']} characters")
+        if 'maxLength' in schema:
+            self._emit(indent, f"if len({var}) > {int(schema['maxLength'])}:")
+            self._fail(indent + 1, path, f"must be at most {schema['maxLength']} characters")
+        if 'pattern' in schema:
+            regex = self._constant(re.compile(schema['pattern']))
+            self._emit(indent, f'if {regex}.search({var}) is None:')
+            self._fail(indent + 1, path, f"does not match {schema['pattern']}")
+        if schema.get('format') in FORMATS:
+            regex = self._constant(re.compile(FORMATS[schema['format']]))
+            self._emit(indent, f'if {regex}.match({var}) is None:')
+            self._fail(indent + 1, path, f"is not a valid {schema['format']}")
+
+    def _number(self, schema, var, path, indent):
+        self._emit(indent, 'pass')
+        for keyword, operator, message in (('minimum', '<', 'must be >='), ('maximum', '>', 'must be <='),
+                                           ('exclusiveMinimum', '<=', 'must be >'),
+                                           ('exclusiveMaximum', '>=', 'must be <')):
+            if keyword in schema:
+                self._emit(indent, f'if {var} {operator} {schema[keyword]!r}:')
+                self._fail(indent + 1, path, f'{message} {schema[keyword]}')
+
+    def _object(self, schema, var, path, indent):
+        self._emit(indent, 'pass')
+        properties = schema.get('properties', {})
+        required = schema.get('required', [])
+
+        for name in required:
+            if name not in properties:
+                self._emit(indent, f'if {name!r} not in {var}:')
+                self._fail(indent + 1, f'_join({path}, {name!r})', 'is required')
+
+        for name, subschema in properties.items():
+            child = self._name('v')
+            child_path = f'_join({path}, {name!r})'
+            self._emit(indent, f'{child} = {var}.get({name!r}, _MISSING)')
+            if name in required:
+                self._emit(indent, f'if {child} is _MISSING:')
+                self._fail(indent + 1, child_path, 'is required')
+                self._emit(indent, 'else:')
+            else:
+                self._emit(indent, f'if {child} is not _MISSING:')
+            self._emit(indent + 1, 'pass')
+            self._node(subschema, child, child_path, indent + 1)
+
+        if schema.get('additionalProperties') is False:
+            known = self._constant(frozenset(properties))
+            key = self._name('k')
+            self._emit(indent, f'for {key} in {var}:')
+            self._emit(indent + 1, f'if {key} not in {known}:')
+            self._fail(indent + 2, f'_join({path}, str({key}))', 'is not an allowed property')
+        elif isinstance(schema.get('additionalProperties'), dict):
+            raise Exception("Unsupported schema keywords: additionalProperties (schema form)")
+
+    def _array(self, schema, var, path, indent):
+        self._emit(indent, 'pass')
+        if 'minItems' in schema:
+            self._emit(indent, f"if len({var}) < {int(schema['minItems'])}:")
+            self._fail(indent + 1, path, f"must have at least {schema['minItems']} item(s)")
+        if 'maxItems' in schema:
+            self._emit(indent, f"if len({var}) > {int(schema['maxItems'])}:")
+            self._fail(indent + 1, path, f"must have at most {schema['maxItems']} item(s)")
+        if isinstance(schema.get('items'), dict):
+            index, item = self._name('i'), self._name('item')
+            self._emit(indent, f'for {index}, {item} in enumerate({var}):')
+            self._emit(indent + 1, 'pass')
+            self._node(schema['items'], item, f'_index({path}, {index})', indent + 1)
+        elif 'items' in schema:
+            raise Exception("Unsupported schema keywords: items (tuple form)")
+
+
+def compile_validator(schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None,
+                      name: str = 'schema') -> CompiledValidator:
+    """Compile a (sub)schema; $refs resolve against root (default: the schema itself)"""
+    return _SchemaCompiler(root if root is not None else schema).compile(schema, name)
+
+
+def load_schema(schema_name: str) -> Dict[str, Any]:
+    """Load schemas/<schema_name>.json"""
+    with open(os.path.join(SCHEMA_DIR, f'{schema_name}.json'), 'r', encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+_validators: Dict[Tuple[str, str], Optional[CompiledValidator]] = {}
+_validators_lock = threading.Lock()
+
+
+def get_input_validator(schema_name: str, pointer: str = '/input') -> Optional[CompiledValidator]:
+    """
+    Compiled validator for the part of schemas/<schema_name>.json at pointer
+    (default: the request contract). Compiled once per process; None when
+    the schema is not deployed alongside the agent.
+    """
+    key = (schema_name, pointer)
+    if key in _validators:
+        return _validators[key]
+
+    with _validators_lock:
+        if key not in _validators:
+            try:
+                root = load_schema(schema_name)
+            except FileNotFoundError:
+                logger.warning(f"Schema {schema_name}.json not found in {SCHEMA_DIR}; contract validation disabled")
+                _validators[key] = None
+            else:
+                schema = _SchemaCompiler(root)._resolve('#' + pointer)
+                _validators[key] = compile_validator(schema, root, f'{schema_name}#{pointer}')
+    return _validators[key]
+
+
+def get_validation_mode() -> str:
+    """SCHEMA_VALIDATION (enforce | report | off), default enforce"""
+    mode = os.environ.get('SCHEMA_VALIDATION', 'enforce').lower()
+    return mode if mode in VALIDATION_MODES else 'enforce'
+
+
+def check_contract(validator: Optional[CompiledValidator], value: Any, path: str = '') -> Optional[str]:
+    """
+    Validate against a compiled contract and return every violation as one
+    message, or None. In report mode violations are logged and None is returned.
+    """
+    if validator is None:
+        return None
+    mode = get_validation_mode()
+    if mode == 'off':
+        return None
+
+    errors = validator(value, path)
+    if not errors:
+        return None
+
+    message = f"Invalid request ({len(errors)} contract violation{'s' if len(errors) != 1 else ''}): " + '; '.join(errors)
+    if mode == 'report':
+        logger.warning(f"{validator.name}: {message}")
+        return None
+    return message
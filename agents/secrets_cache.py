@@ -0,0 +1,200 @@
+# Secrets Cache - Muni AI RCM Platform
+# Process-wide Secrets Manager cache with TTL, refresh-ahead and rotation-aware invalidation
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, Callable
+
+from aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Postgres SQLSTATEs for rejected credentials
+DB_AUTH_SQLSTATES = {'28000', '28P01'}
+
+
+def is_db_auth_error(error: Exception) -> bool:
+    """True when a database connect failed because the credentials were rejected"""
+    if getattr(error, 'pgcode', None) in DB_AUTH_SQLSTATES:
+        return True
+    # psycopg2 raises OperationalError without a pgcode for failed connects
+    return 'authentication failed' in str(error).lower()
+
+
+class _SecretEntry:
+    __slots__ = ('value', 'version_id', 'parsed', 'expires_at', 'refreshing')
+
+    def __init__(self, value: str, version_id: Optional[str], expires_at: float):
+        self.value = value
+        self.version_id = version_id
+        self.parsed = None
+        self.expires_at = expires_at
+        self.refreshing = False
+
+
+class SecretsCache:
+    """
+    Secrets Manager cache shared by every agent in the process:
+    - Values are served from memory for ttl_seconds
+    - Reads inside the refresh_ahead window trigger one background refresh,
+      so the hot path never waits on Secrets Manager
+    - invalidate() drops a secret after an auth failure (rotation); the next
+      read fetches the new version
+    - If Secrets Manager is unavailable, the last value is served for up to
+      max_stale_seconds past expiry
+    """
+
+    def __init__(self, client_factory: Optional[Callable] = None, ttl_seconds: float = 300.0,
+                 refresh_ahead_seconds: float = 60.0, max_stale_seconds: float = 300.0):
+        self._client_factory = client_factory or (lambda: get_client('secretsmanager'))
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, ttl_seconds)
+        self.max_stale_seconds = max_stale_seconds
+
+        self._entries: Dict[str, _SecretEntry] = {}
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+            'fetches': 0,
+            'background_refreshes': 0,
+            'refresh_failures': 0,
+            'stale_served': 0,
+            'invalidations': 0,
+            'rotations_detected': 0
+        }
+
+    def get_secret(self, secret_id: str) -> str:
+        """Return the SecretString for a secret"""
+        return self._get_entry(secret_id).value
+
+    def get_json(self, secret_id: str) -> Dict[str, Any]:
+        """Return a JSON secret as a dict (parsed once per version)"""
+        entry = self._get_entry(secret_id)
+        if entry.parsed is None:
+            entry.parsed = json.loads(entry.value)
+        return entry.parsed
+
+    def invalidate(self, secret_id: str):
+        """Forget a secret, e.g. after its credentials were rejected"""
+        with self._lock:
+            if self._entries.pop(secret_id, None) is not None:
+                self._metrics['invalidations'] += 1
+        logger.info(f"Invalidated cached secret {secret_id}")
+
+    def call_with_secret(self, secret_id: str, fn: Callable[[Dict[str, Any]], Any],
+                         is_auth_error: Callable[[Exception], bool]):
+        """
+        Call fn with the JSON secret; if it fails with an auth error the secret
+        may have been rotated, so invalidate it and retry once with a fresh copy
+        """
+        try:
+            return fn(self.get_json(secret_id))
+        except Exception as e:
+            if not is_auth_error(e):
+                raise
+            logger.warning(f"Credentials from {secret_id} rejected; refetching after possible rotation")
+            self.invalidate(secret_id)
+            return fn(self.get_json(secret_id))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['cached_secrets'] = len(self._entries)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / lookups if lookups else 0.0
+        return metrics
+
+    def _get_entry(self, secret_id: str) -> _SecretEntry:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(secret_id)
+            if entry and now < entry.expires_at:
+                self._metrics['hits'] += 1
+                refresh = (now >= entry.expires_at - self.refresh_ahead_seconds
+                           and not entry.refreshing)
+                if refresh:
+                    entry.refreshing = True
+            else:
+                refresh = False
+                entry = None
+            fetch_lock = self._fetch_locks.setdefault(secret_id, threading.Lock())
+
+        if entry:
+            if refresh:
+                threading.Thread(
+                    target=self._background_refresh, args=(secret_id,),
+                    name='secrets-refresh', daemon=True
+                ).start()
+            return entry
+
+        # Single flight: concurrent misses for one secret share a fetch
+        with fetch_lock:
+            with self._lock:
+                current = self._entries.get(secret_id)
+                if current and time.monotonic() < current.expires_at:
+                    self._metrics['hits'] += 1
+                    return current
+                self._metrics['misses'] += 1
+
+            try:
+                return self._fetch(secret_id)
+            except Exception as e:
+                if current and time.monotonic() < current.expires_at + self.max_stale_seconds:
+                    logger.warning(f"Secrets Manager unavailable, serving stale {secret_id}: {str(e)}")
+                    with self._lock:
+                        self._metrics['stale_served'] += 1
+                    return current
+                raise
+
+    def _fetch(self, secret_id: str) -> _SecretEntry:
+        response = self._client_factory().get_secret_value(SecretId=secret_id)
+        entry = _SecretEntry(
+            response['SecretString'],
+            response.get('VersionId'),
+            time.monotonic() + self.ttl_seconds
+        )
+
+        with self._lock:
+            self._metrics['fetches'] += 1
+            previous = self._entries.get(secret_id)
+            if previous and previous.version_id and previous.version_id != entry.version_id:
+                self._metrics['rotations_detected'] += 1
+                logger.info(f"Secret {secret_id} rotated to version {entry.version_id}")
+            self._entries[secret_id] = entry
+        return entry
+
+    def _background_refresh(self, secret_id: str):
+        try:
+            self._fetch(secret_id)
+            with self._lock:
+                self._metrics['background_refreshes'] += 1
+        except Exception as e:
+            logger.warning(f"Background refresh of {secret_id} failed: {str(e)}")
+            with self._lock:
+                self._metrics['refresh_failures'] += 1
+                entry = self._entries.get(secret_id)
+                if entry:
+                    entry.refreshing = False
+
+
+_cache: Optional[SecretsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_secrets_cache() -> SecretsCache:
+    """Return the process-wide secrets cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SecretsCache(
+                    ttl_seconds=float(os.environ.get('SECRETS_CACHE_TTL_SECONDS', '300')),
+                    refresh_ahead_seconds=float(os.environ.get('SECRETS_REFRESH_AHEAD_SECONDS', '60')),
+                    max_stale_seconds=float(os.environ.get('SECRETS_MAX_STALE_SECONDS', '300'))
+                )
+    return _cache
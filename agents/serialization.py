@@ -0,0 +1,123 @@
+# Serialization - Muni AI RCM Platform
+# JSON encoding for agent responses and run payloads: encode once, reuse the text
+
+import os
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+
+_orjson = None
+_orjson_options = 0
+
+
+class EncodedJSON:
+    """
+    A value that has already been encoded. dumps() returns its text as-is and
+    encode_object() splices it into an enclosing object, so a large result is
+    encoded once and the same text serves the response body and the run ledger.
+    """
+
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __repr__(self) -> str:
+        return f"EncodedJSON({len(self.text)} chars)"
+
+
+def _default(value: Any) -> Any:
+    """Types outside JSON: the same output whichever backend is active"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, EncodedJSON):
+        return json.loads(value.text)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, 'tolist'):
+        # NumPy scalars and arrays
+        return value.tolist()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _get_orjson():
+    """orjson when installed and selected by SERIALIZATION_BACKEND, else None (imported on first use)"""
+    global _orjson, _orjson_options
+    if _orjson is None:
+        backend = os.environ.get('SERIALIZATION_BACKEND', 'auto').lower()
+        _orjson = False
+        if backend != 'stdlib':
+            try:
+                import orjson
+                _orjson = orjson
+                _orjson_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            except ImportError:
+                if backend == 'orjson':
+                    logger.warning("SERIALIZATION_BACKEND=orjson but orjson is not installed; using json")
+    return _orjson or None
+
+
+def get_backend() -> str:
+    """Name of the active JSON backend"""
+    return 'orjson' if _get_orjson() else 'stdlib'
+
+
+def dumps(value: Any) -> str:
+    """Encode to compact JSON text; an EncodedJSON is returned unchanged"""
+    if isinstance(value, EncodedJSON):
+        return value.text
+
+    orjson = _get_orjson()
+    if orjson:
+        try:
+            return orjson.dumps(value, default=_default, option=_orjson_options).decode('utf-8')
+        except TypeError:
+            # e.g. integers beyond 64 bits or mixed-type keys; the stdlib encoder handles these
+            pass
+    return json.dumps(value, default=_default, separators=(',', ':'))
+
+
+def encode(value: Any) -> EncodedJSON:
+    """Encode once, for reuse wherever the same value is written"""
+    return value if isinstance(value, EncodedJSON) else EncodedJSON(dumps(value))
+
+
+def encode_object(fields: Dict[str, Any]) -> str:
+    """
+    Encode a JSON object whose member values may already be EncodedJSON -
+    e.g. a response envelope around an encoded result - without re-encoding them
+    """
+    if not any(isinstance(value, EncodedJSON) for value in fields.values()):
+        return dumps(fields)
+    return '{' + ','.join(
+        f"{json.dumps(str(key))}:{dumps(value)}" for key, value in fields.items()
+    ) + '}'
+
+
+def loads(text: Any) -> Any:
+    """Decode JSON text or bytes"""
+    if isinstance(text, EncodedJSON):
+        text = text.text
+    orjson = _get_orjson()
+    if orjson:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def reset_backend(backend: Optional[str] = None):
+    """Re-select the backend (after changing SERIALIZATION_BACKEND, e.g. in benchmarks)"""
+    global _orjson
+    if backend is not None:
+        os.environ['SERIALIZATION_BACKEND'] = backend
+    _orjson = None
@@ -0,0 +1,102 @@
+# Adaptive Throttling - Muni AI RCM Platform
+# Concurrency limiting and jittered backoff for fan-out to rate-limited services
+
+import random
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# AWS error codes that mean "slow down" rather than "this request is bad"
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+    'RequestLimitExceeded'
+}
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """True for botocore ClientErrors carrying a throttling error code"""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+    return False
+
+
+def backoff_delay(attempt: int, base_seconds: float = 0.5, max_seconds: float = 20.0) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(max_seconds, base_seconds * (2 ** attempt)))
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit for calls to a throttled backend:
+    - Additive increase: +1 slot after `increase_after` consecutive successes
+    - Multiplicative decrease: limit * decrease_factor on every throttle
+    Callers hold a slot for the duration of one backend call.
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 increase_after: int = 5, decrease_factor: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase_after = increase_after
+        self.decrease_factor = decrease_factor
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+        self._metrics = {
+            'calls': 0,
+            'throttles': 0,
+            'peak_in_flight': 0,
+            'min_limit_reached': int(self._limit)
+        }
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def slot(self):
+        """Block until a slot is free, then hold it"""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+            self._metrics['calls'] += 1
+            self._metrics['peak_in_flight'] = max(self._metrics['peak_in_flight'], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def record_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1)
+                self._successes = 0
+                self._condition.notify()
+
+    def record_throttle(self):
+        with self._condition:
+            self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+            self._successes = 0
+            self._metrics['throttles'] += 1
+            self._metrics['min_limit_reached'] = min(self._metrics['min_limit_reached'], int(self._limit))
+        logger.info(f"Backend throttled; concurrency limit now {int(self._limit)}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics['limit'] = int(self._limit)
+            metrics['in_flight'] = self._in_flight
+        return metrics
@@ -0,0 +1,123 @@
+# X12 Segment Reader - Muni AI RCM Platform
+# Streaming tokenizer shared by the 835/270/271 parsers
+
+import logging
+from typing import Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# The ISA header is fixed width: 106 characters including the segment terminator
+ISA_LENGTH = 106
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# A UTF-8 byte order mark (decoded as latin-1) and whitespace may precede the ISA
+LEADING_NOISE = '\ufeff\xef\xbb\xbf \r\n\t'
+
+
+class X12Delimiters(NamedTuple):
+    element: str
+    component: str
+    repetition: str
+    segment: str
+
+
+class X12FormatError(ValueError):
+    """Raised when the input is not a well-formed X12 interchange"""
+    pass
+
+
+def detect_delimiters(isa_header: str) -> X12Delimiters:
+    """
+    Read delimiters from the fixed-width ISA header:
+    element separator at position 3, repetition separator in ISA11,
+    component separator in ISA16 and the segment terminator right after it
+    """
+    if len(isa_header) < ISA_LENGTH or not isa_header.startswith('ISA'):
+        raise X12FormatError("Interchange does not start with a complete ISA header")
+
+    return X12Delimiters(
+        element=isa_header[3],
+        component=isa_header[104],
+        repetition=isa_header[82],
+        segment=isa_header[105]
+    )
+
+
+class X12SegmentReader:
+    """
+    Iterate X12 segments from a file-like object (local file, S3 StreamingBody,
+    or in-memory buffer) holding at most one read chunk plus one partial segment.
+    Each segment is yielded as a list of elements, segment id first.
+    """
+
+    def __init__(self, stream, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._pending = ''
+        self.delimiters: Optional[X12Delimiters] = None
+        self.segment_count = 0
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[List[str]]:
+        self._read_header()
+        element_sep = self.delimiters.element
+        terminator = self.delimiters.segment
+
+        buffer = self._pending
+        self._pending = ''
+
+        while True:
+            segments = buffer.split(terminator)
+            # The last piece is an incomplete segment (or empty) - carry it over
+            buffer = segments.pop()
+
+            for raw in segments:
+                raw = raw.strip()
+                if raw:
+                    self.segment_count += 1
+                    yield raw.split(element_sep)
+
+            chunk = self._read_chunk()
+            if not chunk:
+                break
+            buffer += chunk
+
+        trailing = buffer.strip()
+        if trailing:
+            logger.warning("X12 stream ended with an unterminated segment")
+            self.segment_count += 1
+            yield trailing.split(element_sep)
+
+    def split_components(self, element: str) -> List[str]:
+        """Split a composite element (e.g. SVC01 'HC:99214:25')"""
+        return element.split(self.delimiters.component)
+
+    def split_repetitions(self, element: str) -> List[str]:
+        """Split a repeated element (e.g. 271 EB03 '30^1^98')"""
+        repetition = self.delimiters.repetition
+        if repetition not in element:
+            return [element] if element else []
+        return [value for value in element.split(repetition) if value]
+
+    def _read_header(self):
+        header = ''
+        while len(header.lstrip(LEADING_NOISE)) < ISA_LENGTH:
+            chunk = self._read_chunk()
+            if not chunk:
+                break
+            header += chunk
+
+        header = header.lstrip(LEADING_NOISE)
+        self.delimiters = detect_delimiters(header[:ISA_LENGTH])
+        self._pending = header
+
+    def _read_chunk(self) -> str:
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            return ''
+        self.bytes_read += len(chunk)
+        # X12 basic/extended character sets are single-byte, so chunk
+        # boundaries can never split a character
+        if isinstance(chunk, bytes):
+            return chunk.decode('latin-1')
+        return chunk
@@ -263,10 +263,23 @@ CREATE TABLE IF NOT EXISTS eligibility_checks (
     claimmd_transaction_id VARCHAR(100),
     raw_response JSONB,
     
+    -- 271 response cache (see agents/EligibilityAgent/eligibility_cache.py)
+    cache_key VARCHAR(64),
+    payer_id VARCHAR(50),
+    date_of_service DATE,
+    expires_at TIMESTAMPTZ,
+    
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Databases created before the 271 cache columns existed
+ALTER TABLE eligibility_checks
+    ADD COLUMN IF NOT EXISTS cache_key VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS payer_id VARCHAR(50),
+    ADD COLUMN IF NOT EXISTS date_of_service DATE,
+    ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ;
+
 -- Remittance advice (ERA/835) table
 CREATE TABLE IF NOT EXISTS remittance_advice (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -367,6 +380,15 @@ CREATE TABLE IF NOT EXISTS appeals (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- LLM response cache shared by agents (see agents/llm_cache.py)
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    model_id VARCHAR(100),
+    response_text TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
 -- Audit log table
 CREATE TABLE IF NOT EXISTS audit_logs (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -406,6 +428,14 @@ CREATE INDEX idx_agent_runs_agent_name ON agent_runs(agent_name);
 CREATE INDEX idx_agent_runs_status ON agent_runs(status);
 CREATE INDEX idx_agent_runs_needs_review ON agent_runs(needs_human_review);
 
+CREATE INDEX IF NOT EXISTS idx_eligibility_checks_cache_key ON eligibility_checks(cache_key, expires_at);
+
+-- One analysis per claim: DenialClassifierAgent upserts ON CONFLICT (claim_id)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_denials_claim_id ON denials(claim_id);
+
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at ON llm_response_cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_created_at ON llm_response_cache(created_at);
+
 CREATE INDEX idx_workflow_states_current_step ON workflow_states(current_step);
 CREATE INDEX idx_workflow_states_assigned_to ON workflow_states(assigned_to);
 CREATE INDEX idx_workflow_states_blocked ON workflow_states(is_blocked);
@@ -1,10 +1,13 @@
 import * as cdk from 'aws-cdk-lib';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as iam from 'aws-cdk-lib/aws-iam';
+import * as apigatewayv2 from 'aws-cdk-lib/aws-apigatewayv2';
 import * as ec2 from 'aws-cdk-lib/aws-ec2';
 import * as rds from 'aws-cdk-lib/aws-rds';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import * as logs from 'aws-cdk-lib/aws-logs';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
 import { Construct } from 'constructs';
 
 interface AgentsStackProps extends cdk.StackProps {
@@ -81,12 +84,29 @@ export class AgentsStack extends cdk.Stack {
       },
     });
 
+    // Denial batches from ERAParserAgent to DenialClassifierAgent. Messages whose
+    // denials keep failing are moved to the dead-letter queue for replay.
+    const denialBatchDeadLetterQueue = new sqs.Queue(this, 'DenialBatchDeadLetterQueue', {
+      retentionPeriod: cdk.Duration.days(14),
+      encryption: sqs.QueueEncryption.SQS_MANAGED,
+    });
+    const denialBatchQueue = new sqs.Queue(this, 'DenialBatchQueue', {
+      // At least six times the DenialClassifierAgent timeout, as Lambda recommends
+      visibilityTimeout: cdk.Duration.minutes(30),
+      retentionPeriod: cdk.Duration.days(4),
+      encryption: sqs.QueueEncryption.SQS_MANAGED,
+      deadLetterQueue: {
+        queue: denialBatchDeadLetterQueue,
+        maxReceiveCount: 5,
+      },
+    });
+
     // Create agent functions
     this.createCodingAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment);
-    this.createERAParserAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment);
+    this.createERAParserAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment, denialBatchQueue);
     this.createSubmitClaimAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment);
     this.createEligibilityAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment);
-    this.createDenialClassifierAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment);
+    this.createDenialClassifierAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment, denialBatchQueue);
     this.createAppealLetterAgent(props, baseAgentRole, lambdaSecurityGroup, commonEnvironment);
 
     // Output function ARNs
@@ -97,6 +117,12 @@ export class AgentsStack extends cdk.Stack {
         exportName: `MuniRcm-${name}Arn`,
       });
     });
+
+    new cdk.CfnOutput(this, 'DenialBatchDeadLetterQueueUrl', {
+      value: denialBatchDeadLetterQueue.queueUrl,
+      description: 'Denial batches DenialClassifierAgent could not process',
+      exportName: 'MuniRcm-DenialBatchDeadLetterQueueUrl',
+    });
   }
 
   private createCodingAgent(
@@ -187,7 +213,8 @@ export class AgentsStack extends cdk.Stack {
     props: AgentsStackProps,
     baseRole: iam.Role,
     securityGroup: ec2.ISecurityGroup,
-    environment: Record<string, string>
+    environment: Record<string, string>,
+    denialBatchQueue: sqs.Queue
   ) {
     // Additional permissions for EventBridge (to trigger other agents)
     const eraParserRole = new iam.Role(this, 'ERAParserAgentRole', {
@@ -248,6 +275,8 @@ export class AgentsStack extends cdk.Stack {
         ],
       })
     );
+    // Denials are sent to DenialClassifierAgent once the ERA is committed
+    denialBatchQueue.grantSendMessages(eraParserRole);
 
     this.agentFunctions.ERAParserAgent = new lambda.Function(this, 'ERAParserAgent', {
       runtime: lambda.Runtime.PYTHON_3_10,
@@ -259,7 +288,11 @@ export class AgentsStack extends cdk.Stack {
       vpc: props.vpc,
       vpcSubnets: { subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS },
       securityGroups: [securityGroup],
-      environment,
+      environment: {
+        ...environment,
+        DENIAL_DISPATCH_TRANSPORT: 'sqs',
+        DENIAL_DISPATCH_QUEUE_URL: denialBatchQueue.queueUrl,
+      },
       logRetention: logs.RetentionDays.ONE_MONTH,
       description: 'Parse 835 ERA files and extract payment/denial information',
     });
@@ -313,7 +346,8 @@ export class AgentsStack extends cdk.Stack {
     props: AgentsStackProps,
     baseRole: iam.Role,
     securityGroup: ec2.ISecurityGroup,
-    environment: Record<string, string>
+    environment: Record<string, string>,
+    denialBatchQueue: sqs.Queue
   ) {
     // Denial Classifier needs Bedrock access for AI analysis
     const denialClassifierRole = new iam.Role(this, 'DenialClassifierAgentRole', {
@@ -390,6 +424,16 @@ export class AgentsStack extends cdk.Stack {
       logRetention: logs.RetentionDays.ONE_MONTH,
       description: 'AI-powered denial classification and analysis',
     });
+
+    // 20 messages of up to 25 denials (DENIAL_BATCH_MAX_SIZE) stay within the
+    // agent's 500-denial batch limit; failed messages are reported individually
+    this.agentFunctions.DenialClassifierAgent.addEventSource(
+      new lambdaEventSources.SqsEventSource(denialBatchQueue, {
+        batchSize: 20,
+        maxBatchingWindow: cdk.Duration.seconds(5),
+        reportBatchItemFailures: true,
+      })
+    );
   }
 
   private createAppealLetterAgent(
@@ -451,6 +495,7 @@ export class AgentsStack extends cdk.Stack {
         effect: iam.Effect.ALLOW,
         actions: [
           'bedrock:InvokeModel',
+          'bedrock:InvokeModelWithResponseStream',
         ],
         resources: [
           `arn:aws:bedrock:${this.region}::foundation-model/amazon.nova-pro-v1:0`,
@@ -459,6 +504,58 @@ export class AgentsStack extends cdk.Stack {
       })
     );
 
+    // WebSocket API the UI connects to for streamed appeal letters. Any message
+    // on the $default route is answered with the caller's connection ID, which
+    // the UI passes to the agent as stream.connectionId.
+    const letterStreamApi = new apigatewayv2.CfnApi(this, 'AppealLetterStreamApi', {
+      name: 'muni-rcm-appeal-letter-stream',
+      protocolType: 'WEBSOCKET',
+      routeSelectionExpression: '$request.body.action',
+    });
+    const connectionIdIntegration = new apigatewayv2.CfnIntegration(this, 'AppealLetterStreamConnectionId', {
+      apiId: letterStreamApi.ref,
+      integrationType: 'MOCK',
+      requestTemplates: { '$default': '{"statusCode": 200}' },
+      templateSelectionExpression: '\\$default',
+    });
+    new apigatewayv2.CfnIntegrationResponse(this, 'AppealLetterStreamConnectionIdResponse', {
+      apiId: letterStreamApi.ref,
+      integrationId: connectionIdIntegration.ref,
+      integrationResponseKey: '$default',
+      responseTemplates: { '$default': '{"connectionId": "$context.connectionId"}' },
+      templateSelectionExpression: '\\$default',
+    });
+    const connectionIdRoute = new apigatewayv2.CfnRoute(this, 'AppealLetterStreamDefaultRoute', {
+      apiId: letterStreamApi.ref,
+      routeKey: '$default',
+      target: `integrations/${connectionIdIntegration.ref}`,
+      routeResponseSelectionExpression: '$default',
+    });
+    new apigatewayv2.CfnRouteResponse(this, 'AppealLetterStreamDefaultRouteResponse', {
+      apiId: letterStreamApi.ref,
+      routeId: connectionIdRoute.ref,
+      routeResponseKey: '$default',
+    });
+    const letterStreamStage = new apigatewayv2.CfnStage(this, 'AppealLetterStreamStage', {
+      apiId: letterStreamApi.ref,
+      stageName: 'prod',
+      autoDeploy: true,
+    });
+    letterStreamStage.addDependency(connectionIdRoute);
+
+    // Streamed appeal letters are posted only to connections on that API
+    appealLetterRole.addToPolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          'execute-api:ManageConnections',
+        ],
+        resources: [
+          `arn:aws:execute-api:${this.region}:${this.account}:${letterStreamApi.ref}/${letterStreamStage.stageName}/POST/@connections/*`,
+        ],
+      })
+    );
+
     this.agentFunctions.AppealLetterAgent = new lambda.Function(this, 'AppealLetterAgent', {
       runtime: lambda.Runtime.PYTHON_3_10,
       handler: 'handler.lambda_handler',
@@ -469,9 +566,18 @@ export class AgentsStack extends cdk.Stack {
       vpc: props.vpc,
       vpcSubnets: { subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS },
       securityGroups: [securityGroup],
-      environment,
+      environment: {
+        ...environment,
+        APPEAL_STREAM_ENDPOINT: `https://${letterStreamApi.ref}.execute-api.${this.region}.amazonaws.com/${letterStreamStage.stageName}`,
+      },
       logRetention: logs.RetentionDays.ONE_MONTH,
       description: 'AI-powered appeal letter generation',
     });
+
+    new cdk.CfnOutput(this, 'AppealLetterStreamUrl', {
+      value: `wss://${letterStreamApi.ref}.execute-api.${this.region}.amazonaws.com/${letterStreamStage.stageName}`,
+      description: 'WebSocket URL the UI connects to for streamed appeal letters',
+      exportName: 'MuniRcm-AppealLetterStreamUrl',
+    });
   }
 }
\ No newline at end of file
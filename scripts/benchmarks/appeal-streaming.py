@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark streamed vs buffered appeal letter generation.
+
+Runs AppealLetterAgent.execute_production_mode against a fake Bedrock
+runtime that emits a letter chunk by chunk with a per-chunk delay (the
+buffered InvokeModel call returns only after the whole letter has been
+generated), and delivers the streamed letter to a fake WebSocket client.
+Reports time-to-first-text for the user and total time for both paths, and
+checks the streamed text matches the buffered letter. A fuzz pass checks the
+incremental formatter against _format_appeal_letter over random chunkings.
+
+Usage: python scripts/benchmarks/appeal-streaming.py [--chunks 150] [--chunk-ms 20]
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(AGENTS_DIR)
+
+os.environ['LLM_CACHE_BACKEND'] = 'none'
+
+LETTER_LINES = [
+    "Here is the appeal letter you requested:",
+    "```",
+    "Dear Claims Review Department,",
+    "",
+    "RE: Appeal for Claim #CLM-BENCH-001",
+    "Patient: John Doe",
+    "Denial Code: CO-50",
+    "",
+    "We are writing to appeal the denial of the above claim for services rendered on 2024-01-15.",
+    "The documented history, examination and diagnostic results establish medical necessity.",
+    "",
+    "Sincerely,",
+    "Medical Billing Department",
+    "```",
+    "Note: review the letter before sending."
+]
+
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location(
+        'appeal_letter_handler', os.path.join(AGENTS_DIR, 'AppealLetterAgent', 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def model_chunks(text: str, count: int):
+    """Split text into roughly count token-like chunks at random boundaries"""
+    rng = random.Random(11)
+    cuts = sorted(rng.sample(range(1, len(text)), min(count - 1, len(text) - 1)))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+class FakeBedrock:
+    """Generates the letter at chunk_ms per chunk, streamed or all at once"""
+
+    def __init__(self, chunks, chunk_ms: float):
+        self.chunks = chunks
+        self.chunk_s = chunk_ms / 1000
+
+    def invoke_model(self, modelId, body):
+        time.sleep(self.chunk_s * len(self.chunks))
+        payload = json.dumps({'results': [{'outputText': ''.join(self.chunks)}]}).encode('utf-8')
+        return {'body': io.BytesIO(payload)}
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        def events():
+            for chunk in self.chunks:
+                time.sleep(self.chunk_s)
+                yield {'chunk': {'bytes': json.dumps({'outputText': chunk}).encode('utf-8')}}
+        return {'body': events()}
+
+
+class FakeConnections:
+    """apigatewaymanagementapi client that records when each message arrived"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.messages = []
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.messages.append((time.perf_counter() - self.started, json.loads(Data)))
+
+
+@contextlib.contextmanager
+def no_database():
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            pass
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            pass
+
+    yield Connection()
+
+
+def run(handler, bedrock: FakeBedrock, streamed: bool):
+    agent = handler.AppealLetterAgent()
+    agent.development_mode = False
+    agent.get_bedrock_client = lambda: bedrock
+    agent.get_db_connection = no_database
+    connections = FakeConnections()
+    # The handler's directory is on sys.path once it has been loaded
+    import letter_stream
+    letter_stream.get_client = lambda service, endpoint_url=None: connections
+
+    event = {'appealData': {'claimId': 'CLM-BENCH-001', 'denialReason': 'medical necessity'}}
+    if streamed:
+        handler.STREAM_ENDPOINT = 'https://ws.example.com/prod'
+        event['stream'] = {'connectionId': 'bench'}
+
+    start = time.perf_counter()
+    connections.started = start
+    result = agent.execute_production_mode(event)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    deltas = [(at, message) for at, message in connections.messages if message['type'] == 'delta']
+    first_ms = deltas[0][0] * 1000 if deltas else total_ms
+    streamed_text = ''.join(message['text'] for _, message in deltas)
+    return result, first_ms, total_ms, len(connections.messages), streamed_text
+
+
+def fuzz(handler, iterations: int) -> int:
+    formatter_agent = handler.AppealLetterAgent()
+    rng = random.Random(5)
+    pieces = LETTER_LINES + ['  ', '\t', 'Here', 'Not', 'This', '``', '  Note: indented', 'This letter is ready']
+    mismatches = 0
+    for _ in range(iterations):
+        text = '\n'.join(rng.choice(pieces) for _ in range(rng.randint(0, 10)))
+        if rng.random() < 0.3:
+            text = '\n ' + text + ' \n'
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 8))))
+        chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        streamed = ''.join(handler.AppealLetterStreamFormatter().format(chunks))
+        if streamed != formatter_agent._format_appeal_letter(text):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=150, help='Model chunks per letter')
+    parser.add_argument('--chunk-ms', type=float, default=20.0, help='Generation time per chunk')
+    parser.add_argument('--fuzz', type=int, default=20000, help='Random chunkings checked against the formatter')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    handler = load_handler()
+    chunks = model_chunks('\n'.join(LETTER_LINES), args.chunks)
+    bedrock = FakeBedrock(chunks, args.chunk_ms)
+
+    print(f"📊 Appeal letter generation: {len(chunks)} chunks at {args.chunk_ms:g} ms")
+    print("=" * 64)
+
+    buffered, buffered_first, buffered_total, _, _ = run(handler, bedrock, streamed=False)
+    streamed, streamed_first, streamed_total, messages, streamed_text = run(handler, bedrock, streamed=True)
+    matched = streamed['appeal_letter'] == buffered['appeal_letter'] == streamed_text
+    mismatches = fuzz(handler, args.fuzz)
+
+    print(f"  {'buffered':<9} first text {buffered_first:8.1f} ms   total {buffered_total:8.1f} ms")
+    print(f"  {'streamed':<9} first text {streamed_first:8.1f} ms   total {streamed_total:8.1f} ms   "
+          f"messages={messages}")
+    print(f"  first text {buffered_first / max(streamed_first, 1e-9):.0f}x sooner; "
+          f"letters {'match' if matched else 'DIFFER'}; fuzz mismatches {mismatches}/{args.fuzz}")
+
+    if args.json:
+        print(json.dumps({
+            'buffered': {'first_text_ms': round(buffered_first, 1), 'total_ms': round(buffered_total, 1)},
+            'streamed': {'first_text_ms': round(streamed_first, 1), 'total_ms': round(streamed_total, 1),
+                         'messages': messages, 'stream': streamed.get('stream')},
+            'letters_match': matched,
+            'fuzz_mismatches': mismatches
+        }, indent=2))
+    if not matched or mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark Claim MD batch submission against the local stub server.
+
+Submits synthetic claims twice: sequentially with a fresh connection per
+claim (the old requests.post path), then through ClaimMDClient with a
+keep-alive session and bounded in-flight concurrency. Reports throughput,
+latency percentiles, connections opened and retries.
+
+Usage: python scripts/benchmarks/claim-md-submit.py [--claims 500] [--in-flight 16] [--latency-ms 50] [--error-rate 0.05]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'SubmitClaimAgent'))
+
+import requests
+
+from claim_md_client import ClaimMDClient, latency_summary, idempotency_key
+from claim_md_stub import start_stub_server
+
+
+def synthetic_payload(index: int):
+    return {
+        'claim': {
+            'id': f'BENCH-{index:06d}',
+            'type': 'professional',
+            'service_date': '2024-01-15',
+            'patient': {'id': f'PAT-{index:06d}', 'first_name': 'Test', 'last_name': 'Patient'},
+            'provider': {'npi': '1234567890', 'name': 'Bench Clinic'},
+            'insurance': {'payer_id': '60054', 'member_id': f'M{index:08d}'},
+            'services': [
+                {'line_number': 1, 'procedure_code': '99214', 'units': 1, 'charge_amount': 150.0,
+                 'diagnosis_pointers': [1], 'place_of_service': '11'}
+            ],
+            'diagnoses': [{'pointer': 1, 'code': 'I10', 'code_type': 'ICD10'}]
+        },
+        'options': {'validate_only': False, 'test_mode': True, 'priority': 'normal'}
+    }
+
+
+def stub_stats(base_url: str):
+    return requests.get(f'{base_url}/stats', timeout=5).json()
+
+
+def run_sequential(base_url: str, payloads):
+    latencies = []
+    start = time.perf_counter()
+    for payload in payloads:
+        began = time.perf_counter()
+        # requests.post opens and closes a new connection every call
+        response = requests.post(
+            f'{base_url}/claims/submit', json=payload, timeout=30,
+            headers={'Idempotency-Key': idempotency_key(payload)}
+        )
+        response.status_code
+        latencies.append((time.perf_counter() - began) * 1000)
+    return time.perf_counter() - start, latencies
+
+
+def run_pooled(base_url: str, payloads, in_flight: int):
+    client = ClaimMDClient(base_url, 'bench-key', max_in_flight=in_flight,
+                           backoff_base_seconds=0.05, backoff_max_seconds=1.0)
+    start = time.perf_counter()
+    results = list(client.submit_many(enumerate(payloads)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed, results, client.get_metrics()
+
+
+def print_run(label: str, count: int, elapsed: float, latencies, connections: int, extra: str = ''):
+    summary = latency_summary(latencies)
+    print(f"  {label}")
+    print(f"    Throughput:   {count / elapsed:,.1f} claims/sec ({elapsed:.2f}s)")
+    print(f"    Latency ms:   p50 {summary['p50']}  p95 {summary['p95']}  p99 {summary['p99']}  max {summary['max']}")
+    print(f"    Connections:  {connections}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--claims', type=int, default=500)
+    parser.add_argument('--in-flight', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Stub mean latency')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='Stub 429/503 rate')
+    parser.add_argument('--skip-sequential', action='store_true')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    server = start_stub_server(latency_ms=args.latency_ms, error_rate=args.error_rate)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    report = {}
+
+    print(f"🚀 Submitting {args.claims} claims to stub at {base_url} "
+          f"(latency {args.latency_ms}ms, error rate {args.error_rate:.0%})")
+    print("=" * 60)
+
+    if not args.skip_sequential:
+        before = stub_stats(base_url)
+        payloads = [synthetic_payload(i) for i in range(args.claims)]
+        elapsed, latencies = run_sequential(base_url, payloads)
+        connections = stub_stats(base_url)['connections'] - before['connections'] - 1
+        print_run('Sequential, new connection per claim', args.claims, elapsed, latencies, connections)
+        report['sequential'] = {'elapsed_s': round(elapsed, 3), 'connections': connections,
+                                'latency_ms': latency_summary(latencies)}
+
+    before = stub_stats(base_url)
+    payloads = [synthetic_payload(args.claims + i) for i in range(args.claims)]
+    elapsed, results, metrics = run_pooled(base_url, payloads, args.in_flight)
+    after = stub_stats(base_url)
+    connections = after['connections'] - before['connections'] - 1
+    submitted = sum(1 for result in results if result['status'] == 'submitted')
+    print_run(f'Keep-alive session, {args.in_flight} in flight', args.claims, elapsed,
+              [result['latency_ms'] for result in results], connections,
+              f"\n    Submitted:    {submitted}/{args.claims} (retries {metrics['retries']}, "
+              f"failed {metrics['failed']}, duplicate keys replayed {after['idempotent_replays'] - before['idempotent_replays']})")
+    report['pooled'] = {'elapsed_s': round(elapsed, 3), 'connections': connections,
+                        'submitted': submitted, 'client_metrics': metrics}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Local stub of the Claim MD submission API for testing SubmitClaimAgent.
+
+Serves POST /claims/submit over keep-alive HTTP/1.1 with configurable latency
+and injected 429/503 errors, honours Idempotency-Key (replays the original
+response for a repeated key) and rejects claims without services with 422.
+GET /stats returns request, connection and duplicate counters.
+
+Usage: python scripts/benchmarks/claim_md_stub.py [--port 8089] [--latency-ms 50] [--error-rate 0.05]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Tuple
+
+
+class ClaimMDStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency_ms: float = 50.0,
+                 error_rate: float = 0.0, retry_after_seconds: float = 0.0):
+        super().__init__(address, ClaimMDStubHandler)
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.lock = threading.Lock()
+        self.responses: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self.stats = {
+            'requests': 0,
+            'connections': 0,
+            'accepted': 0,
+            'rejected': 0,
+            'injected_errors': 0,
+            'idempotent_replays': 0
+        }
+
+    def count(self, metric: str):
+        with self.lock:
+            self.stats[metric] += 1
+
+
+class ClaimMDStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.server.lock:
+                self._send(200, dict(self.server.stats))
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/claims/submit':
+            self._send(404, {'error': 'not found'})
+            return
+
+        server = self.server
+        server.count('requests')
+        key = self.headers.get('Idempotency-Key')
+
+        # Simulated processing time, +/- 50% jitter
+        time.sleep(server.latency_ms * random.uniform(0.5, 1.5) / 1000.0)
+
+        if random.random() < server.error_rate:
+            server.count('injected_errors')
+            status = random.choice((429, 503))
+            self._send(status, {'error': 'try again later'},
+                       {'Retry-After': str(server.retry_after_seconds)} if status == 429 else None)
+            return
+
+        with server.lock:
+            replay = server.responses.get(key) if key else None
+        if replay:
+            server.count('idempotent_replays')
+            self._send(*replay)
+            return
+
+        status, response = self._process(json.loads(body or b'{}'))
+        if key:
+            with server.lock:
+                server.responses.setdefault(key, (status, response))
+        self._send(status, response)
+
+    def _process(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        claim = payload.get('claim', {})
+        errors = []
+        if not claim.get('services'):
+            errors.append({'field': 'services', 'message': 'At least one service line is required'})
+        for service in claim.get('services', []):
+            if not service.get('procedure_code'):
+                errors.append({'field': f"services[{service.get('line_number')}].procedure_code",
+                               'message': 'Procedure code is required'})
+
+        if errors:
+            self.server.count('rejected')
+            return 422, {'errors': errors}
+
+        self.server.count('accepted')
+        submission_id = uuid.uuid4().hex[:12]
+        return 200, {
+            'batch_id': f'BATCH-{submission_id[:6]}',
+            'claim_id': f'CMD-{claim.get("id")}',
+            'tracking_number': f'TRK-{submission_id}',
+            'validation_status': 'passed',
+            'submission_id': submission_id
+        }
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server(port: int = 0, **options) -> ClaimMDStubServer:
+    """Start the stub on a background thread; port 0 picks a free port"""
+    server = ClaimMDStubServer(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, name='claim-md-stub', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Mean response latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 429/503 responses')
+    args = parser.parse_args()
+
+    server = ClaimMDStubServer(('127.0.0.1', args.port), latency_ms=args.latency_ms,
+                               error_rate=args.error_rate)
+    print(f"🩺 Claim MD stub listening on http://127.0.0.1:{args.port} "
+          f"(latency {args.latency_ms}ms, error rate {args.error_rate:.0%})")
+    print(f"   Point the agent at it with CLAIM_MD_API_URL=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local mock clearinghouse for EligibilityAgent 270/271 testing.
+
+Serves POST /eligibility/270 over keep-alive HTTP/1.1: reads the 270
+interchange, answers every subscriber loop (matched by TRN trace number) in a
+single 271, and simulates latency of a fixed per-interchange cost plus a
+per-subscriber cost. Injected 503s exercise client retries.
+GET /stats returns request, connection and subscriber counters.
+
+Usage: python scripts/benchmarks/clearinghouse_stub.py [--port 8090] [--latency-ms 200] [--per-subscriber-ms 1]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BENCH_DIR)
+sys.path.append(os.path.join(BENCH_DIR, '..', '..', 'agents'))
+
+from synthetic_x12 import build_271
+from x12_segments import X12SegmentReader
+
+
+def read_270(body: bytes) -> Tuple[Dict[str, str], List[Dict[str, str]], int]:
+    """Payer, subscriber inquiries and ISA13 control number of a 270 interchange"""
+    payer = {}
+    subscribers = []
+    control_number = 0
+    for segment in X12SegmentReader(io.BytesIO(body)):
+        segment_id = segment[0]
+        if segment_id == 'ISA':
+            control_number = int(segment[13]) if len(segment) > 13 and segment[13].isdigit() else 0
+        elif segment_id == 'NM1' and segment[1] == 'PR':
+            payer = {'name': segment[3], 'id': segment[9] if len(segment) > 9 else ''}
+        elif segment_id == 'TRN':
+            subscribers.append({'trace_number': segment[2]})
+        elif segment_id == 'NM1' and segment[1] == 'IL' and subscribers:
+            subscribers[-1].update({
+                'last_name': segment[3],
+                'first_name': segment[4] if len(segment) > 4 else '',
+                'member_id': segment[9] if len(segment) > 9 else ''
+            })
+    return payer, subscribers, control_number
+
+
+class ClearinghouseStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency_ms: float = 200.0,
+                 per_subscriber_ms: float = 1.0, error_rate: float = 0.0):
+        super().__init__(address, ClearinghouseStubHandler)
+        self.latency_ms = latency_ms
+        self.per_subscriber_ms = per_subscriber_ms
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'connections': 0,
+            'interchanges': 0,
+            'subscribers': 0,
+            'injected_errors': 0
+        }
+
+    def count(self, metric: str, amount: int = 1):
+        with self.lock:
+            self.stats[metric] += amount
+
+
+class ClearinghouseStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.server.lock:
+                self._send(200, json.dumps(self.server.stats).encode(), 'application/json')
+        else:
+            self._send(404, b'not found', 'text/plain')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/eligibility/270':
+            self._send(404, b'not found', 'text/plain')
+            return
+
+        server = self.server
+        server.count('requests')
+
+        if random.random() < server.error_rate:
+            server.count('injected_errors')
+            self._send(503, b'clearinghouse busy', 'text/plain')
+            return
+
+        try:
+            payer, subscribers, control_number = read_270(body)
+        except ValueError as e:
+            self._send(400, str(e).encode(), 'text/plain')
+            return
+
+        time.sleep((server.latency_ms + server.per_subscriber_ms * len(subscribers)) / 1000.0)
+        server.count('interchanges')
+        server.count('subscribers', len(subscribers))
+        response = build_271(subscribers, payer=payer, control_number=control_number)
+        self._send(200, response.encode('latin-1'), 'application/edi-x12')
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server(port: int = 0, **options) -> ClearinghouseStubServer:
+    """Start the stub on a background thread; port 0 picks a free port"""
+    server = ClearinghouseStubServer(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, name='clearinghouse-stub', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Fixed cost per interchange')
+    parser.add_argument('--per-subscriber-ms', type=float, default=1.0, help='Added cost per subscriber')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 503 responses')
+    args = parser.parse_args()
+
+    server = ClearinghouseStubServer(('127.0.0.1', args.port), latency_ms=args.latency_ms,
+                                     per_subscriber_ms=args.per_subscriber_ms, error_rate=args.error_rate)
+    print(f"🩺 Clearinghouse stub listening on http://127.0.0.1:{args.port} "
+          f"({args.latency_ms}ms + {args.per_subscriber_ms}ms/subscriber, error rate {args.error_rate:.0%})")
+    print(f"   Point the agent at it with ELIGIBILITY_CLEARINGHOUSE_URL=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CPT/HCPCS/ICD-10-CM code-set index.
+
+Generates code sets shaped like the annual releases (~10k CPT, ~7k HCPCS
+Level II, ~75k ICD-10-CM with non-billable category headers, revised and
+deleted codes), then reports build time, snapshot size, cold-start load (a
+fresh interpreter importing code_sets and memory-mapping the snapshot)
+against parsing the CSV, and ns/op for exact lookups, validation, prefix
+and billable-leaf searches. Every sampled lookup on the mapped snapshot is
+checked against a dict built from the same rows. Finally runs CodingAgent's
+code-set check over simulated model output with paraphrased descriptions
+and invented codes.
+
+Usage: python scripts/benchmarks/code-set-index.py [--icd 75000] [--lookups 200000]
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import logging
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(AGENTS_DIR)
+
+os.environ['LLM_CACHE_BACKEND'] = 'none'
+
+from code_sets import CodeSetIndex, format_code, normalize_code
+
+RELEASE_DATE = '2015-10-01'
+REVISION_DATE = '2023-01-01'
+SERVICE_DATE = '2024-03-15'
+WORDS = ['acute', 'chronic', 'left', 'right', 'bilateral', 'unspecified', 'with', 'without', 'complication',
+         'fracture', 'infection', 'neoplasm', 'disorder', 'injury', 'encounter', 'subsequent', 'initial',
+         'procedure', 'repair', 'excision', 'office', 'visit', 'established', 'patient', 'moderate']
+
+# Stdlib imports (json, csv, datetime, logging) are already paid for by base_agent
+COLD_LOAD = """
+import sys, time
+sys.path.append({agents!r})
+import code_sets
+start = time.perf_counter()
+index = code_sets.get_code_sets()
+index.lookup('ICD10CM', {code!r}, {date!r})
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def description(rng) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))).capitalize()
+
+
+def synthetic_rows(icd_count: int, cpt_count: int, hcpcs_count: int, seed: int = 5):
+    """(code_system, code, description, billable, effective_date, termination_date) rows"""
+    rng = random.Random(seed)
+    rows = []
+
+    for code in rng.sample(range(10000, 100000), cpt_count):
+        text = description(rng)
+        roll = rng.random()
+        if roll < 0.03:
+            # Description revised at the 2023 release
+            rows.append(('CPT', str(code), text, True, None, '2022-12-31'))
+            rows.append(('CPT', str(code), description(rng), True, REVISION_DATE, None))
+        elif roll < 0.04:
+            rows.append(('CPT', str(code), text, True, None, '2020-12-31'))
+        else:
+            rows.append(('CPT', str(code), text, True, None, None))
+
+    letters = 'ABCEGHJKLMQV'
+    for code in rng.sample(range(len(letters) * 10000), hcpcs_count):
+        rows.append(('HCPCS', f'{letters[code // 10000]}{code % 10000:04d}', description(rng), True, None, None))
+
+    categories = [f'{letter}{number:02d}' for letter in string.ascii_uppercase if letter != 'U' for number in range(100)]
+    rng.shuffle(categories)
+    icd = 0
+    for category in categories:
+        if icd >= icd_count:
+            break
+        if rng.random() < 0.2:
+            rows.append(('ICD10CM', category, description(rng), True, RELEASE_DATE, None))
+            icd += 1
+            continue
+        rows.append(('ICD10CM', category, description(rng), False, RELEASE_DATE, None))
+        icd += 1
+        for sub in rng.sample('0123456789', rng.randint(3, 10)):
+            subcategory = f'{category}{sub}'
+            if rng.random() < 0.5:
+                rows.append(('ICD10CM', subcategory, description(rng), True, RELEASE_DATE, None))
+                icd += 1
+                continue
+            rows.append(('ICD10CM', subcategory, description(rng), False, RELEASE_DATE, None))
+            icd += 1
+            for leaf in rng.sample('0123456789X', rng.randint(3, 11)):
+                code = f'{subcategory}{leaf}'
+                if category[0] in 'STVWXY' and rng.random() < 0.8:
+                    # Injury and external-cause codes: initial/subsequent/sequela 7th character
+                    rows.append(('ICD10CM', code, description(rng), False, RELEASE_DATE, None))
+                    rows.extend(('ICD10CM', f'{code}X{extension}', description(rng), True, RELEASE_DATE, None)
+                                for extension in 'ADS')
+                    icd += 4
+                else:
+                    rows.append(('ICD10CM', code, description(rng), True, RELEASE_DATE, None))
+                    icd += 1
+    return rows
+
+
+def write_csv(path: str, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['code_system', 'code', 'description', 'billable', 'effective_date', 'termination_date'])
+        for system, code, text, billable, effective, termination in rows:
+            writer.writerow([system, code, text, int(billable), effective or '', termination or ''])
+
+
+def expected_entries(rows):
+    """{(system, normalized code): (description, billable)} in effect on SERVICE_DATE"""
+    reference = {}
+    for system, code, text, billable, effective, termination in rows:
+        if (effective or '0000') <= SERVICE_DATE <= (termination or '9999'):
+            reference[(system, normalize_code(code))] = (text, billable)
+    return reference
+
+
+def ns_per_op(fn, probes, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for probe in probes:
+            fn(*probe)
+        best = min(best, time.perf_counter() - start)
+    return best / len(probes) * 1e9
+
+
+def cold_load_ms(path: str, code: str, runs: int = 5) -> float:
+    env = dict(os.environ, CODE_SETS_PATH=path)
+    script = COLD_LOAD.format(agents=os.path.abspath(AGENTS_DIR), code=code, date=SERVICE_DATE)
+    samples = [float(subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True,
+                                    check=True).stdout) for _ in range(runs)]
+    return sorted(samples)[len(samples) // 2]
+
+
+def load_coding_handler():
+    sys.path.append(os.path.join(AGENTS_DIR, 'CodingAgent'))
+    spec = importlib.util.spec_from_file_location('coding_handler', os.path.join(AGENTS_DIR, 'CodingAgent', 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def coding_check(rows, encounters: int):
+    """Run simulated model output through CodingAgent's text-mode code-set screen"""
+    logging.disable(logging.WARNING)
+    handler = load_coding_handler()
+    agent = handler.CodingAgent()
+    rng = random.Random(9)
+    reference = expected_entries(rows)
+    cpt = [(code, text) for (system, code), (text, _) in reference.items() if system == 'CPT']
+    icd = [(format_code('ICD10CM', code), text) for (system, code), (text, billable) in reference.items()
+           if system == 'ICD10CM' and billable]
+
+    totals = {'codes': 0, 'paraphrased': 0, 'invented': 0, 'replaced': 0, 'rejected': 0, 'wrong': 0}
+    service_date = handler.encode_date(SERVICE_DATE)
+    start = time.perf_counter()
+    for _ in range(encounters):
+        result = {'success': True, 'cpt_codes': [], 'icd_codes': []}
+        invented = set()
+        for name, pool in (('cpt_codes', cpt), ('icd_codes', icd)):
+            for code, text in rng.sample(pool, 3):
+                if rng.random() < 0.05:
+                    code = f'{rng.randint(0, 9)}{code[1:]}' if name == 'cpt_codes' else f'{code[:-1]}Y'
+                    if (('CPT' if name == 'cpt_codes' else 'ICD10CM'), normalize_code(code)) not in reference:
+                        invented.add(code)
+                if rng.random() < 0.3:
+                    text = f'{text} (paraphrased)'
+                    totals['paraphrased'] += 1
+                result[name].append({'code': code, 'description': text, 'confidence': 0.9})
+        totals['codes'] += 6
+        totals['invented'] += len(invented)
+        agent._screen_code_sets(result, service_date)
+        stats = result.get('code_sets', {})
+        totals['replaced'] += stats.get('descriptions_replaced', 0)
+        totals['rejected'] += stats.get('rejected', 0)
+        for name, system in (('cpt_codes', 'CPT'), ('icd_codes', 'ICD10CM')):
+            for entry in result[name]:
+                if reference.get((system, normalize_code(entry['code'])), (None,))[0] != entry['description']:
+                    totals['wrong'] += 1
+        totals['wrong'] += len(invented) - sum(1 for item in result.get('malformed_entries', [])
+                                                if item['entry']['code'] in invented)
+    totals['us_per_encounter'] = round((time.perf_counter() - start) / encounters * 1e6, 1)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--icd', type=int, default=75000, help='ICD-10-CM codes, headers included')
+    parser.add_argument('--cpt', type=int, default=10000)
+    parser.add_argument('--hcpcs', type=int, default=7000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--encounters', type=int, default=5000, help='Simulated encounters for the CodingAgent check')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.icd, args.cpt, args.hcpcs)
+    reference = expected_entries(rows)
+    report = {}
+    print(f"📚 Code-set index: {len(rows):,} rows ({args.cpt:,} CPT, {args.hcpcs:,} HCPCS, ~{args.icd:,} ICD-10-CM)")
+    print("=" * 72)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'code_sets.csv')
+        snapshot_path = os.path.join(tmp, 'code_sets.bin')
+        write_csv(csv_path, rows)
+
+        start = time.perf_counter()
+        index = CodeSetIndex.from_csv(csv_path)
+        build_s = time.perf_counter() - start
+        index.save(snapshot_path)
+        stats = index.get_stats()
+        size = os.path.getsize(snapshot_path)
+
+        probe_code = next(code for (system, code) in reference if system == 'ICD10CM')
+        mmap_ms = cold_load_ms(snapshot_path, probe_code)
+        csv_ms = cold_load_ms(csv_path, probe_code, runs=3)
+        print(f"  Build (CSV):    {build_s:.2f}s, {stats['rows']:,} rows")
+        print(f"  Snapshot:       {size / 1e6:.2f} MB ({stats['index_bytes'] / 1e6:.2f} MB index, "
+              f"{stats['description_bytes'] / 1e6:.2f} MB descriptions; CSV {os.path.getsize(csv_path) / 1e6:.2f} MB)")
+        print(f"  Cold load:      mmap snapshot {mmap_ms:.2f} ms vs CSV parse {csv_ms:.1f} ms "
+              f"(new interpreter, get_code_sets() + first lookup)")
+
+        mapped = CodeSetIndex.open(snapshot_path)
+        rng = random.Random(3)
+        known = list(reference)
+        probes = [(system, format_code(system, code), SERVICE_DATE)
+                  for system, code in (rng.choice(known) for _ in range(args.lookups))]
+        misses = [(system, f'{code[:-1]}Z', SERVICE_DATE) for system, code, _ in probes[:args.lookups // 10]]
+        prefixes = [(system, code[:rng.randint(2, 4)], SERVICE_DATE) for system, code, _ in probes[:args.lookups // 20]]
+        categories = [('ICD10CM', code[:3], SERVICE_DATE) for system, code, _ in probes[:args.lookups // 20]
+                      if system == 'ICD10CM']
+
+        timings = {
+            'lookup_ns': ns_per_op(mapped.lookup, probes),
+            'lookup_miss_ns': ns_per_op(mapped.lookup, misses),
+            'validate_ns': ns_per_op(mapped.validate, probes),
+            'prefix_10_ns': ns_per_op(lambda system, prefix, on: mapped.prefix(system, prefix, on, limit=10), prefixes),
+            'billable_leaves_ns': ns_per_op(lambda system, code, on: mapped.billable_leaves(system, code, on, limit=10),
+                                            categories),
+            'in_memory_lookup_ns': ns_per_op(index.lookup, probes)
+        }
+        print(f"  Lookup:         {timings['lookup_ns']:,.0f} ns/op mmap ({timings['in_memory_lookup_ns']:,.0f} "
+              f"in memory), miss {timings['lookup_miss_ns']:,.0f} ns/op")
+        print(f"  Validate:       {timings['validate_ns']:,.0f} ns/op")
+        print(f"  Prefix (≤10):   {timings['prefix_10_ns']:,.0f} ns/op, billable leaves of a category "
+              f"{timings['billable_leaves_ns']:,.0f} ns/op")
+
+        for system, code in known[::7]:
+            entry = mapped.lookup(system, code, SERVICE_DATE)
+            expected = reference[(system, code)]
+            if entry is None or (entry['description'], entry['billable']) != expected:
+                failures += 1
+        for system, prefix, on in prefixes[:500]:
+            expected = sorted(code for (ref_system, code) in reference
+                              if ref_system == system and code.startswith(normalize_code(prefix)))
+            found = [normalize_code(entry['code']) for entry in mapped.prefix(system, prefix, on, limit=None)]
+            failures += found != expected
+        print(f"  Correctness:    {failures} mismatches against the source rows")
+
+        report['index'] = dict(rows=stats['rows'], build_s=round(build_s, 3), snapshot_bytes=size,
+                               cold_load_mmap_ms=round(mmap_ms, 2), cold_load_csv_ms=round(csv_ms, 1),
+                               mismatches=failures, **{name: round(value) for name, value in timings.items()})
+
+        os.environ['CODE_SETS_PATH'] = snapshot_path
+        coding = coding_check(rows, args.encounters)
+        print(f"  CodingAgent:    {coding['codes']:,} codes, {coding['replaced']:,} descriptions replaced "
+              f"({coding['paraphrased']:,} paraphrased), {coding['rejected']} rejected ({coding['invented']} invented), "
+              f"{coding['wrong']} wrong; {coding['us_per_encounter']} µs/encounter")
+        report['coding'] = coding
+        failures += coding['wrong']
+        mapped.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
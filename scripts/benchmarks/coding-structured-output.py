@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Benchmark CodingAgent structured output against the free-text JSON prompt.
+
+Codes a set of synthetic encounters in both CODING_OUTPUT_MODE settings
+against a simulated Nova Pro. The simulated model makes the same kinds of
+mistakes at the same rates in both modes: output cut off at max tokens, JSON syntax
+slips, a malformed code entry, or a prose answer. In text mode, truncation
+and syntax slips lose the whole response. In structured mode the tool input
+is always well-formed JSON, and a truncated or invalid list is re-requested on
+its own. Reports the parse-failure rate, the share sent to manual review,
+invalid codes that got through, and tokens/calls per encounter (estimated at
+4 characters per token, prompts and tool schema included).
+
+Usage: python scripts/benchmarks/coding-structured-output.py [--encounters 2000]
+"""
+
+import argparse
+import copy
+import importlib.util
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, '..', '..')
+AGENTS_DIR = os.path.join(REPO_DIR, 'agents')
+sys.path.append(AGENTS_DIR)
+
+os.environ['LLM_CACHE_BACKEND'] = 'none'
+
+CPT = [('99213', 'Office visit, established patient, low complexity'),
+       ('99214', 'Office visit, established patient, moderate complexity'),
+       ('93000', 'Electrocardiogram with interpretation'), ('36415', 'Venipuncture'),
+       ('80053', 'Comprehensive metabolic panel'), ('G0439', 'Annual wellness visit, subsequent')]
+ICD = [('I10', 'Essential hypertension'), ('E11.9', 'Type 2 diabetes mellitus without complications'),
+       ('E78.5', 'Hyperlipidemia, unspecified'), ('Z00.00', 'General adult medical examination'),
+       ('R07.9', 'Chest pain, unspecified')]
+MALFORMED_ENTRIES = [
+    {'code': '9921', 'description': 'Office visit', 'confidence': 0.9},
+    {'code': 'i10', 'description': 'Hypertension', 'confidence': 0.9},
+    {'code': '99214', 'description': 'Office visit', 'confidence': 92},
+    {'code': 'E11.9', 'confidence': 0.9}
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('coding_handler', os.path.join(AGENTS_DIR, 'CodingAgent', 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def encounters(count: int):
+    with open(os.path.join(REPO_DIR, 'scripts', 'test-payloads', 'coding-agent-test.json')) as handle:
+        base = json.load(handle)
+    rng = random.Random(23)
+    for index in range(count):
+        encounter = copy.deepcopy(base)
+        encounter['encounterData']['id'] = f'ENC-{index:05d}'
+        encounter['claimId'] = f'CLM-{index:05d}'
+        encounter['chartNotes'] = ' '.join([base['chartNotes']] * rng.randint(1, 3))
+        yield encounter
+
+
+class SimulatedNova:
+    """
+    Bedrock runtime stand-in. Each call draws one outcome from a seeded RNG
+    at the configured rates; repair calls come back valid at repair_rate.
+    """
+
+    def __init__(self, args, seed: int):
+        self.args = args
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _codes(self):
+        cpt = [{'code': code, 'description': text, 'confidence': round(self.rng.uniform(0.86, 0.98), 2),
+                'reasoning': 'Supported by documentation'} for code, text in self.rng.sample(CPT, 2)]
+        icd = [{'code': code, 'description': text, 'confidence': round(self.rng.uniform(0.86, 0.98), 2),
+                'reasoning': 'Documented and managed'} for code, text in self.rng.sample(ICD, 2)]
+        return cpt, icd
+
+    def _outcome(self):
+        draw = self.rng.random()
+        for name in ('truncated', 'syntax', 'malformed_entry', 'prose'):
+            rate = getattr(self.args, f'{name}_rate')
+            if draw < rate:
+                return name
+            draw -= rate
+        return 'clean'
+
+    def _count(self, prompt_text: str, output_text: str):
+        self.calls += 1
+        self.input_tokens += estimate_tokens(prompt_text)
+        self.output_tokens += estimate_tokens(output_text)
+
+    def invoke_model(self, modelId, body):
+        prompt = json.loads(body)['inputText']
+        cpt, icd = self._codes()
+        outcome = self._outcome()
+        if outcome == 'malformed_entry':
+            cpt[-1] = self.rng.choice(MALFORMED_ENTRIES)
+        result = {'success': True, 'cpt_codes': cpt, 'icd_codes': icd,
+                  'coding_notes': 'Codes supported by the note', 'documentation_gaps': []}
+        text = f"```json\n{json.dumps(result, indent=4)}\n```"
+        if outcome == 'truncated':
+            text = text[:int(len(text) * self.rng.uniform(0.4, 0.9))]
+        elif outcome == 'syntax':
+            text = text.replace('"Codes supported by the note"', '"Codes supported by the note",', 1)
+        elif outcome == 'prose':
+            text = 'Based on the documentation, the visit supports 99214 with I10 as the primary diagnosis.'
+        self._count(prompt, text)
+        payload = json.dumps({'results': [{'outputText': text}]}).encode('utf-8')
+        return {'body': io.BytesIO(payload)}
+
+    def converse(self, modelId, messages, inferenceConfig, toolConfig):
+        prompt = messages[0]['content'][0]['text']
+        tool_spec = toolConfig['tools'][0]['toolSpec']
+        requested = list(tool_spec['inputSchema']['json']['properties'])
+        repair = 'coding_notes' not in requested
+        cpt, icd = self._codes()
+        outcome = 'clean' if repair and self.rng.random() < self.args.repair_rate else self._outcome()
+
+        output = {'cpt_codes': cpt, 'icd_codes': icd, 'coding_notes': 'Codes supported by the note',
+                  'documentation_gaps': []}
+        output = {name: output[name] for name in requested}
+        if repair:
+            # Corrections cover the malformed entries only
+            output = {name: output[name][:1] for name in output}
+        if outcome == 'truncated':
+            # Generation stopped before the last list was written
+            output.pop(requested[-1] if not repair else requested[0])
+        elif outcome in ('malformed_entry', 'syntax'):
+            # The service parses tool input, so a syntax slip surfaces as a bad entry
+            name = self.rng.choice([name for name in requested if name.endswith('_codes')])
+            output[name] = output[name][:1] + [self.rng.choice(MALFORMED_ENTRIES)]
+
+        if outcome == 'prose':
+            content = [{'text': 'The visit supports 99214 with I10 as the primary diagnosis.'}]
+            output_text = content[0]['text']
+        else:
+            content = [{'toolUse': {'toolUseId': f'tool-{self.calls}', 'name': tool_spec['name'], 'input': output}}]
+            output_text = json.dumps(output)
+        self._count(prompt + json.dumps(tool_spec), output_text)
+        return {
+            'output': {'message': {'role': 'assistant', 'content': content}},
+            'stopReason': 'tool_use',
+            'usage': {'inputTokens': estimate_tokens(prompt + json.dumps(tool_spec)),
+                      'outputTokens': estimate_tokens(output_text),
+                      'totalTokens': estimate_tokens(prompt + json.dumps(tool_spec)) + estimate_tokens(output_text)}
+        }
+
+
+def run(handler, mode: str, args):
+    handler.OUTPUT_MODE = mode
+    nova = SimulatedNova(args, seed=41)
+    agent = handler.CodingAgent()
+    agent.development_mode = False
+    agent.get_bedrock_client = lambda: nova
+
+    stats = {'encounters': 0, 'parse_failures': 0, 'requires_review': 0, 'invalid_codes_accepted': 0, 'repairs': 0}
+    for encounter in encounters(args.encounters):
+        result = agent._code_encounter(encounter)
+        stats['encounters'] += 1
+        stats['parse_failures'] += not result.get('success')
+        stats['requires_review'] += bool(result.get('requires_review'))
+        stats['repairs'] += result.get('output', {}).get('repairs', 0)
+        for name, validate in handler.CODE_ENTRY_VALIDATORS.items():
+            stats['invalid_codes_accepted'] += sum(1 for entry in result.get(name, []) if validate(entry))
+
+    count = stats['encounters']
+    return dict(
+        stats,
+        parse_failure_rate=round(stats['parse_failures'] / count, 4),
+        review_rate=round(stats['requires_review'] / count, 4),
+        calls_per_encounter=round(nova.calls / count, 3),
+        input_tokens_per_encounter=round(nova.input_tokens / count, 1),
+        output_tokens_per_encounter=round(nova.output_tokens / count, 1)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--encounters', type=int, default=2000)
+    parser.add_argument('--truncated-rate', type=float, default=0.03, help='Output cut off at max tokens')
+    parser.add_argument('--syntax-rate', type=float, default=0.03, help='JSON syntax slip (e.g. trailing comma)')
+    parser.add_argument('--malformed-entry-rate', type=float, default=0.08, help='One invalid code entry')
+    parser.add_argument('--prose-rate', type=float, default=0.01, help='Prose answer instead of JSON / tool call')
+    parser.add_argument('--repair-rate', type=float, default=0.9, help='Repair calls that come back valid')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    # Expected parse failures would otherwise be logged per encounter
+    logging.disable(logging.ERROR)
+    handler = load_handler()
+    print(f"📊 CodingAgent output modes, {args.encounters:,} simulated encounters")
+    print("=" * 84)
+    print(f"  {'mode':<11} {'parse fail':>10} {'review':>8} {'bad codes':>10} {'calls':>7} "
+          f"{'in tok':>8} {'out tok':>8} {'repairs':>8}")
+
+    report = {}
+    for mode in ('text', 'structured'):
+        stats = report[mode] = run(handler, mode, args)
+        print(f"  {mode:<11} {stats['parse_failure_rate']:>10.2%} {stats['review_rate']:>8.2%} "
+              f"{stats['invalid_codes_accepted']:>10} {stats['calls_per_encounter']:>7.2f} "
+              f"{stats['input_tokens_per_encounter']:>8.0f} {stats['output_tokens_per_encounter']:>8.0f} "
+              f"{stats['repairs']:>8}")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start import cost of each agent handler against its budget.
+
+Imports every handler in a fresh interpreter under `python -X importtime`,
+reports the median import time, the handler's heaviest imports, and any
+production-only dependency (boto3, psycopg2, requests, ...) that leaked into
+the import path. Exits non-zero when an agent is over budget or leaks one.
+
+Usage: python scripts/benchmarks/cold-start.py [--runs 5] [--agent CodingAgent] [--mode production]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, Any, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', '..', 'agents'))
+BUDGET_PATH = os.path.join(BENCH_DIR, 'cold-start-budget.json')
+
+# Runs in the child interpreter: time the handler import, then list loaded modules
+PROBE = """
+import json, sys, time
+sys.path[:0] = [{agents_dir!r}, {agent_dir!r}]
+start = time.perf_counter()
+import handler
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{'import_ms': elapsed_ms, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr: str, root: str = 'handler') -> List[Tuple[str, int]]:
+    """Direct imports of `root` with cumulative microseconds from -X importtime output"""
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Children are printed (indented two spaces per level) before their parent
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == root:
+                return [(child, us) for child_depth, child, us in pending if child_depth == 1]
+            pending = []
+        else:
+            pending.append((depth, name.strip(), int(cumulative)))
+    return []
+
+
+def measure(agent: str, mode: str) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env['DEVELOPMENT_MODE'] = 'true' if mode == 'development' else 'false'
+    # Outside Lambda the agents never pre-warm clients; simulate the init phase on request
+    env.pop('AWS_LAMBDA_FUNCTION_NAME', None)
+    if mode == 'production':
+        env['AWS_LAMBDA_FUNCTION_NAME'] = f'cold-start-{agent}'
+
+    probe = PROBE.format(agents_dir=AGENTS_DIR, agent_dir=os.path.join(AGENTS_DIR, agent))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        capture_output=True, text=True, env=env, cwd=AGENTS_DIR
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{agent} failed to import:\n{result.stderr[-2000:]}")
+
+    probe_output = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'import_ms': probe_output['import_ms'],
+        'modules': set(probe_output['modules']),
+        'handler_imports': parse_importtime(result.stderr)
+    }
+
+
+def main():
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per agent')
+    parser.add_argument('--agent', action='append', help='Only measure this agent (repeatable)')
+    parser.add_argument('--mode', choices=['development', 'production'], default='development',
+                        help='production simulates a Lambda init phase with client pre-warming')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    agents = args.agent or list(budget['agents'])
+    forbidden = set(budget.get('forbidden_modules', []))
+    report = {}
+    failures = []
+
+    for agent in agents:
+        runs = [measure(agent, args.mode) for _ in range(args.runs)]
+        median_ms = statistics.median(run['import_ms'] for run in runs)
+        heaviest = sorted(runs[-1]['handler_imports'], key=lambda item: -item[1])[:5]
+        leaked = sorted(forbidden & runs[-1]['modules']) if args.mode == 'development' else []
+        agent_budget = budget['agents'].get(agent)
+
+        over_budget = agent_budget is not None and median_ms > agent_budget
+        if over_budget or leaked:
+            failures.append(agent)
+
+        report[agent] = {
+            'median_import_ms': round(median_ms, 1),
+            'budget_ms': agent_budget,
+            'within_budget': not over_budget,
+            'leaked_modules': leaked,
+            'heaviest_imports': [{'module': name, 'cumulative_ms': round(us / 1000, 1)}
+                                 for name, us in heaviest]
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"🧊 Cold-start import times ({args.mode} mode, median of {args.runs})")
+        print("=" * 60)
+        for agent, result in report.items():
+            status = '✅' if agent not in failures else '❌'
+            print(f"{status} {agent:<24} {result['median_import_ms']:>7.1f} ms"
+                  f"  (budget {result['budget_ms']} ms)")
+            for item in result['heaviest_imports']:
+                print(f"     {item['module']:<30} {item['cumulative_ms']:>7.1f} ms")
+            if result['leaked_modules']:
+                print(f"     ⚠️  production-only modules imported: {', '.join(result['leaked_modules'])}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark ERA -> DenialClassifierAgent fan-out: one invocation per denial vs batches.
+
+Parses a synthetic 835, routes it with ERAClaimRouter and classifies every
+denial two ways: one DenialClassifierAgent invocation per denial (its own
+database round trip each), and DenialBatchDispatcher batches delivered through
+the in-memory queue transport (one invocation, one transaction per batch,
+LLM escalations in parallel). Invocation, database and Nova Pro latencies are
+simulated with sleeps; a share of denials carry free-text reasons only so
+they escalate to the LLM. Checks both paths classify every denial the same.
+
+Usage: python scripts/benchmarks/denial-fanout.py [--claims 2000] [--batch-size 25] [--llm-ms 300]
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'ERAParserAgent'))
+
+from denial_dispatch import DenialBatchDispatcher, InMemoryQueueTransport, to_denial_data, unwrap_batch_event
+from era_router import ERAClaimRouter, DENIAL
+from synthetic_x12 import write_835
+from x12_835 import ERA835Parser
+
+FREE_TEXT_REASONS = [
+    'Payer states records do not support the level of service billed',
+    'Claim returned - see attached letter regarding prior authorization',
+    'Service not covered under member plan per payer correspondence'
+]
+
+
+class SimulatedLatency:
+    """Sleep-based stand-ins for the Lambda invoke, the denials upsert and Nova Pro"""
+
+    def __init__(self, invoke_ms: float, db_ms: float, llm_ms: float):
+        self.invoke_s = invoke_ms / 1000
+        self.db_s = db_ms / 1000
+        self.llm_s = llm_ms / 1000
+        self.invocations = 0
+        self.db_round_trips = 0
+        self.llm_calls = 0
+
+    def invoke(self):
+        self.invocations += 1
+        time.sleep(self.invoke_s)
+
+    @contextlib.contextmanager
+    def connection(self):
+        latency = self
+
+        class Cursor:
+            # What psycopg2.extras.execute_values needs: it mogrifies rows locally
+            # and sends each page as one statement
+            rowcount = 0
+
+            def __init__(self, connection):
+                self.connection = connection
+                self._rows = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def mogrify(self, template, args):
+                self._rows += 1
+                return repr(tuple(args)).encode('utf-8')
+
+            def execute(self, sql, params=None):
+                latency.db_round_trips += 1
+                self.rowcount, self._rows = self._rows, 0
+                time.sleep(latency.db_s)
+
+        class Connection:
+            encoding = 'UTF8'
+
+            def cursor(self):
+                return Cursor(self)
+
+            def commit(self):
+                pass
+
+        yield Connection()
+
+    def nova(self, prompt: str, **kwargs) -> str:
+        self.llm_calls += 1
+        time.sleep(self.llm_s)
+        return json.dumps({
+            'category': 'medical_necessity',
+            'suggested_action': 'appeal_with_documentation',
+            'appeal_likelihood': 0.6,
+            'confidence': 0.7,
+            'prevention_tips': ['Attach supporting documentation']
+        })
+
+
+def synthetic_denials(claims: int, free_text_rate: float):
+    buffer = io.StringIO()
+    write_835(buffer, claims)
+    era = ERA835Parser(io.BytesIO(buffer.getvalue().encode('latin-1')))
+    denials = []
+    router = ERAClaimRouter(era.header)
+    router.add_sink(DENIAL, denials.append)
+    router.run(era.claims())
+
+    rng = random.Random(17)
+    for denial in denials:
+        if rng.random() < free_text_rate:
+            denial['adjustment_codes'] = []
+            denial['denial_reason'] = rng.choice(FREE_TEXT_REASONS)
+    return denials
+
+
+def make_agent(latency: SimulatedLatency):
+    # Loaded by path: ERAParserAgent's handler module is also named `handler`
+    spec = importlib.util.spec_from_file_location(
+        'denial_classifier_handler', os.path.join(AGENTS_DIR, 'DenialClassifierAgent', 'handler.py'))
+    handler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(handler)
+    agent = handler.DenialClassifierAgent()
+    agent.get_db_connection = latency.connection
+    agent.invoke_nova_pro = latency.nova
+    agent.get_bedrock_client = lambda: None
+    return agent
+
+
+def per_denial(agent, latency: SimulatedLatency, denials):
+    results = {}
+    for denial in denials:
+        latency.invoke()
+        result = agent.execute_production_mode({'denialData': to_denial_data(denial)})
+        results[result['claim_id']] = result['denial_category']
+    return results
+
+
+def batched(agent, latency: SimulatedLatency, denials, batch_size: int):
+    results = {}
+
+    def consumer(event, context):
+        latency.invoke()
+        batch = agent.execute_production_mode(unwrap_batch_event(event))
+        for item in batch['results']:
+            results[item['claim_id']] = item['result']['denial_category']
+
+    dispatcher = DenialBatchDispatcher(InMemoryQueueTransport(consumer), max_batch_size=batch_size)
+    for denial in denials:
+        dispatcher.add(denial)
+    return results, dispatcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--claims', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument('--free-text-rate', type=float, default=0.2, help='Share of denials escalated to the LLM')
+    parser.add_argument('--invoke-ms', type=float, default=15.0)
+    parser.add_argument('--db-ms', type=float, default=3.0)
+    parser.add_argument('--llm-ms', type=float, default=300.0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    denials = synthetic_denials(args.claims, args.free_text_rate)
+    print(f"📊 Denial fan-out: {len(denials):,} denials from {args.claims:,} claims")
+    print("=" * 60)
+
+    report = {'denials': len(denials)}
+    outcomes = {}
+    for label in ('per_denial', 'batched'):
+        latency = SimulatedLatency(args.invoke_ms, args.db_ms, args.llm_ms)
+        agent = make_agent(latency)
+        start = time.perf_counter()
+        if label == 'per_denial':
+            outcomes[label] = per_denial(agent, latency, denials)
+            batches = len(denials)
+        else:
+            outcomes[label], metrics = batched(agent, latency, denials, args.batch_size)
+            batches = metrics['batches']
+        elapsed = time.perf_counter() - start
+
+        report[label] = {
+            'elapsed_s': round(elapsed, 3),
+            'invocations': latency.invocations,
+            'db_round_trips': latency.db_round_trips,
+            'llm_calls': latency.llm_calls,
+            'messages': batches
+        }
+        print(f"  {label:<11} {elapsed:8.2f} s  {len(denials) / elapsed:8.0f} denials/s  "
+              f"invocations={latency.invocations} db={latency.db_round_trips} llm={latency.llm_calls}")
+
+    speedup = report['per_denial']['elapsed_s'] / max(report['batched']['elapsed_s'], 1e-9)
+    matched = outcomes['per_denial'] == outcomes['batched']
+    report['speedup'] = round(speedup, 1)
+    report['classifications_match'] = matched
+    print(f"  batched is {speedup:.1f}x faster; classifications {'match' if matched else 'DIFFER'}")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if not matched:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch eligibility sweeps against the local mock clearinghouse.
+
+Generates a next-day schedule of synthetic patients spread across payers and
+verifies it twice: one 270 per patient submitted sequentially (the
+single-inquiry path), then packed into one 270 interchange per payer with
+concurrent submission and streaming 271 parsing. Reports patients/sec,
+interchanges sent and the status mix.
+
+Usage: python scripts/benchmarks/eligibility-batch.py [--patients 5000] [--payers 8] [--concurrency 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'EligibilityAgent'))
+
+from clearinghouse_stub import start_stub_server
+from eligibility_batch import ClearinghouseClient, check_eligibility_batch, group_inquiries
+
+PROVIDER = {'npi': '1234567890', 'name': 'Bench Clinic'}
+
+
+def synthetic_patients(count: int, payers: int):
+    return [{
+        'patientId': f'PAT-{index:06d}',
+        'serviceType': 'office_visit',
+        'insuranceInfo': {
+            'memberId': f'M{index:09d}',
+            'firstName': 'TEST',
+            'lastName': f'PATIENT{index}',
+            'dateOfBirth': '1980-01-01',
+            'payerId': f'PAYER{index % payers:02d}',
+            'payerName': f'SYNTHETIC PLAN {index % payers}'
+        }
+    } for index in range(count)]
+
+
+def run_sweep(client: ClearinghouseClient, patients, concurrency: int, per_interchange: int):
+    groups = group_inquiries(patients, PROVIDER, 'office_visit', '2024-01-16')
+    start = time.perf_counter()
+    results = list(check_eligibility_batch(groups, client.submit_270, concurrency, per_interchange))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--payers', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=4, help='Interchanges in flight')
+    parser.add_argument('--per-interchange', type=int, default=500, help='Subscribers per 270 interchange')
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Stub cost per interchange')
+    parser.add_argument('--per-subscriber-ms', type=float, default=1.0, help='Stub cost per subscriber')
+    parser.add_argument('--single-sample', type=int, default=100,
+                        help='Patients sent one 270 at a time for the baseline (0 to skip)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    server = start_stub_server(latency_ms=args.latency_ms, per_subscriber_ms=args.per_subscriber_ms)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    client = ClearinghouseClient(base_url, 'bench-key', max_in_flight=args.concurrency)
+    patients = synthetic_patients(args.patients, args.payers)
+    report = {}
+
+    print(f"🚀 Verifying {args.patients:,} patients across {args.payers} payers "
+          f"(stub {args.latency_ms}ms + {args.per_subscriber_ms}ms/subscriber)")
+    print("=" * 60)
+
+    if args.single_sample:
+        sample = patients[:args.single_sample]
+        elapsed, _ = run_sweep(client, sample, 1, 1)
+        rate = len(sample) / elapsed
+        print("  One 270 per patient, sequential")
+        print(f"    Throughput:    {rate:,.1f} patients/sec ({len(sample)} sampled in {elapsed:.2f}s)")
+        print(f"    Projected:     {args.patients / rate:,.1f}s for {args.patients:,} patients")
+        report['single'] = {'patients': len(sample), 'elapsed_s': round(elapsed, 3),
+                            'patients_per_second': round(rate, 1)}
+
+    elapsed, results = run_sweep(client, patients, args.concurrency, args.per_interchange)
+    statuses = Counter(result['eligibility_status'] for result in results)
+    interchanges = sum(-(-len(group) // args.per_interchange)
+                       for group in group_inquiries(patients, PROVIDER, 'office_visit', '2024-01-16').values())
+    print(f"  Batched 270s, {args.concurrency} interchanges in flight")
+    print(f"    Throughput:    {len(results) / elapsed:,.1f} patients/sec ({elapsed:.2f}s)")
+    print(f"    Interchanges:  {interchanges} (up to {args.per_interchange} subscribers each)")
+    print(f"    Results:       {len(results):,}/{args.patients:,} - " +
+          ', '.join(f"{status} {count}" for status, count in statuses.most_common()))
+    report['batch'] = {'patients': len(results), 'elapsed_s': round(elapsed, 3),
+                       'patients_per_second': round(len(results) / elapsed, 1),
+                       'interchanges': interchanges, 'statuses': dict(statuses)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
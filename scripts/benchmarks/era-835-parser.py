@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming X12 835 parser used by ERAParserAgent.
+
+Generates a synthetic 835 remittance (100MB by default), streams it through
+ERA835Parser and reports segments/sec, claims/sec and peak RSS.
+
+Usage: python scripts/benchmarks/era-835-parser.py [--size-mb 100] [--keep]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'ERAParserAgent'))
+
+from synthetic_x12 import write_835_of_size
+from x12_835 import ERA835Parser
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=100.0, help='Synthetic 835 size in MB')
+    parser.add_argument('--chunk-kb', type=int, default=64, help='Read chunk size in KB')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated file')
+    args = parser.parse_args()
+
+    handle = tempfile.NamedTemporaryFile('w', suffix='.835', delete=False)
+    print(f"📝 Generating {args.size_mb:.0f}MB synthetic 835 at {handle.name}...")
+    with handle:
+        claim_count = write_835_of_size(handle, int(args.size_mb * 1024 * 1024))
+    file_size = os.path.getsize(handle.name)
+    rss_before = peak_rss_mb()
+
+    try:
+        print(f"🚀 Parsing {claim_count:,} claims ({file_size / 1024 / 1024:.1f}MB)...")
+        start = time.perf_counter()
+        with open(handle.name, 'rb') as stream:
+            era = ERA835Parser(stream, chunk_size=args.chunk_kb * 1024)
+            paid = 0.0
+            for claim in era.claims():
+                paid += claim['paid_amount']
+        elapsed = time.perf_counter() - start
+
+        print("=" * 60)
+        print(f"  Segments:        {era.segment_count:,}")
+        print(f"  Claims:          {era.claim_count:,}")
+        print(f"  Elapsed:         {elapsed:.2f}s")
+        print(f"  Segments/sec:    {era.segment_count / elapsed:,.0f}")
+        print(f"  Claims/sec:      {era.claim_count / elapsed:,.0f}")
+        print(f"  Throughput:      {file_size / 1024 / 1024 / elapsed:.1f} MB/s")
+        print(f"  Peak RSS:        {peak_rss_mb():.1f} MB (before parse: {rss_before:.1f} MB)")
+        print(f"  Total paid:      ${paid:,.2f}")
+    finally:
+        if not args.keep:
+            os.unlink(handle.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark ERA summary and reconciliation analytics: dict loops vs columns.
+
+Parses a synthetic 835 (100k claims by default) with ERA835Parser, then
+computes the ERA summary, reconciliation totals and per-CARC breakdown two
+ways: the dict-loop approach (separate payment/denial scans plus sum() over
+lists of dicts) and ERAClaimColumns (one append per claim while routing,
+then vectorized passes - NumPy when installed, array loops otherwise).
+Checks that every variant produces the same figures.
+
+Usage: python scripts/benchmarks/era-analytics.py [--claims 100000] [--repeat 5]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'ERAParserAgent'))
+
+import era_columns
+from era_columns import ERAClaimColumns
+from synthetic_x12 import write_835
+from x12_835 import ERA835Parser
+
+
+def dict_loop_analytics(claims, total_payment):
+    """Payments/denials extracted by separate scans, totals and CARCs summed over dicts"""
+    payments = [claim for claim in claims if claim.get('status') == 'paid' and claim.get('paid_amount', 0) > 0]
+    denials = [claim for claim in claims if claim.get('status') == 'denied' or claim.get('denial_reason')]
+    denied_ids = {claim['claim_id'] for claim in denials}
+
+    total_paid = sum(payment['paid_amount'] for payment in payments)
+    charged = sum(claim['charged_amount'] for claim in claims)
+    paid = sum(claim['paid_amount'] for claim in claims)
+    allowed = [claim['allowed_amount'] for claim in claims if claim.get('allowed_amount') is not None]
+
+    carc = defaultdict(lambda: {'adjustment_amount': 0.0, 'claims': set()})
+    for claim in claims:
+        for adjustment in claim.get('adjustments') or ():
+            entry = carc[f"{adjustment['group_code']}-{adjustment['reason_code']}"]
+            entry['adjustment_amount'] += adjustment['amount']
+            entry['claims'].add(claim['claim_id'])
+
+    return {
+        'total_payments': len(payments),
+        'total_denials': len(denials),
+        'total_paid_amount': round(total_paid, 2),
+        'denial_rate': len(denials) / max(len(payments) + len(denials), 1) * 100,
+        'total_charged': round(charged, 2),
+        'total_allowed': round(sum(allowed), 2),
+        'total_patient_responsibility': round(sum(claim['patient_responsibility'] for claim in claims), 2),
+        'total_contractual_adjustment': round(sum(claim['contractual_adjustment'] for claim in claims), 2),
+        'unreconciled_amount': round(total_payment - paid, 2),
+        'carc': {code: (round(entry['adjustment_amount'], 2), len(entry['claims']),
+                        len(entry['claims'] & denied_ids)) for code, entry in carc.items()}
+    }
+
+
+def columnar_analytics(columns: ERAClaimColumns, total_payment):
+    summary = columns.summary(total_payment)
+    reconciliation = summary['reconciliation']
+    return {
+        'total_payments': summary['total_payments'],
+        'total_denials': summary['total_denials'],
+        'total_paid_amount': summary['total_paid_amount'],
+        'denial_rate': summary['denial_rate'],
+        'total_charged': reconciliation['total_charged'],
+        'total_allowed': reconciliation['total_allowed'],
+        'total_patient_responsibility': reconciliation['total_patient_responsibility'],
+        'total_contractual_adjustment': reconciliation['total_contractual_adjustment'],
+        'unreconciled_amount': reconciliation['unreconciled_amount'],
+        'carc': {item['code']: (item['adjustment_amount'], item['claims'], item['denied_claims'])
+                 for item in columns.carc_breakdown()}
+    }
+
+
+def best_of(repeat: int, fn, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--claims', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    buffer = io.StringIO()
+    write_835(buffer, args.claims)
+    era = ERA835Parser(io.BytesIO(buffer.getvalue().encode('latin-1')))
+    claims = list(era.claims())
+    total_payment = era.header['total_payment']
+    adjustments = sum(len(claim['adjustments']) for claim in claims)
+
+    print(f"📊 ERA analytics over {len(claims):,} claims / {adjustments:,} CAS adjustments")
+    print("=" * 60)
+
+    loop_s, expected = best_of(args.repeat, dict_loop_analytics, claims, total_payment)
+    build_s, columns = best_of(args.repeat, ERAClaimColumns.from_claims, claims)
+    report = {'claims': len(claims), 'dict_loop_ms': round(loop_s * 1000, 2),
+              'column_build_ms': round(build_s * 1000, 2)}
+    print(f"  dict loops              {loop_s * 1000:8.1f} ms")
+    print(f"  column build (routing)  {build_s * 1000:8.1f} ms  (paid once while claims stream)")
+
+    variants = [('array loops', False)]
+    if era_columns._get_numpy() is not None:
+        variants.insert(0, ('numpy', True))
+    else:
+        print("  numpy                   skipped (not installed)")
+
+    for label, use_numpy in variants:
+        saved = era_columns._numpy
+        if not use_numpy:
+            era_columns._numpy = False
+        elapsed, result = best_of(args.repeat, columnar_analytics, columns, total_payment)
+        era_columns._numpy = saved
+
+        mismatched = sorted(key for key in expected if expected[key] != result[key])
+        print(f"  columns, {label:<14} {elapsed * 1000:8.1f} ms  ({loop_s / elapsed:.1f}x vs dict loops"
+              f"{', MISMATCH: ' + ', '.join(mismatched) if mismatched else ''})")
+        report[f"columns_{label.replace(' ', '_')}_ms"] = round(elapsed * 1000, 2)
+        if mismatched:
+            report['mismatched'] = mismatched
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if report.get('mismatched'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fee-schedule index and the schedule-wide patient estimator.
+
+Generates a synthetic payer fee schedule (payers x procedures x modifiers x
+localities), then reports build time, snapshot save/open time, index size
+against an equivalent dict, and lookup ns/op. Finally estimates patient
+responsibility for a full day's schedule in one call, vectorized (NumPy, when
+installed) against the line-by-line path, and checks they agree exactly.
+
+Usage: python scripts/benchmarks/fee-schedule.py [--rows 500000] [--encounters 5000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'EligibilityAgent'))
+
+import patient_estimates
+from fee_schedule import FeeSchedule
+
+MODIFIERS = ['', '25', '26', 'TC', '59']
+LOCALITIES = ['', '01', '02', '05', '18', '26', '99']
+
+
+def synthetic_rows(count: int, payers: int, seed: int = 7):
+    rng = random.Random(seed)
+    per_payer = max(1, count // payers)
+    procedures = max(1, per_payer // (len(MODIFIERS) * len(LOCALITIES)) + 1)
+    codes = [f'{10000 + index * 7:05d}' for index in range(procedures)]
+    rows = []
+    for payer in range(payers):
+        for code in codes:
+            for modifier in MODIFIERS:
+                for locality in LOCALITIES:
+                    if len(rows) >= count:
+                        return rows, codes
+                    rows.append((f'PAYER{payer:03d}', code, modifier, locality, round(rng.uniform(20, 4000), 2)))
+    return rows, codes
+
+
+def time_lookups(fn, probes, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for probe in probes:
+            fn(*probe)
+        best = min(best, time.perf_counter() - start)
+    return best / len(probes) * 1e9
+
+
+def synthetic_day(count: int, payers: int, codes, seed: int = 11):
+    rng = random.Random(seed)
+    encounters = []
+    for index in range(count):
+        lines = [{'code': rng.choice(codes), 'modifier': rng.choice(MODIFIERS), 'units': rng.choice([1, 1, 1, 2])}
+                 for _ in range(rng.randint(1, 4))]
+        encounters.append({
+            'payer_id': f'PAYER{rng.randrange(payers):03d}',
+            'service_type': rng.choice(['office_visit', 'specialist', 'imaging']),
+            'locality': rng.choice(LOCALITIES[1:]),
+            'procedures': lines,
+            'eligibility': {
+                'copay': {'office_visit': rng.choice([0.0, 25.0, 40.0])},
+                'deductible': {'remaining': rng.choice([0.0, 150.0, 750.0, 2500.0])},
+                'coinsurance': rng.choice([0.0, 10.0, 20.0, 30.0]),
+                'out_of_pocket_max': {'remaining': rng.choice([300.0, 1500.0, 6000.0])}
+            }
+        })
+    return encounters
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def time_estimates(encounters, schedule, vectorize: bool, repeat: int = 3):
+    patient_estimates.VECTORIZE_MIN_LINES = 0 if vectorize else float('inf')
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = patient_estimates.estimate_encounters(encounters, schedule)
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--payers', type=int, default=40)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--encounters', type=int, default=5000, help="Encounters in the day's schedule")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    rows, codes = synthetic_rows(args.rows, args.payers)
+    report = {}
+    print(f"💲 Fee schedule: {len(rows):,} rows, {args.payers} payers, {len(codes):,} procedures")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    schedule = FeeSchedule.from_rows(rows)
+    build_s = time.perf_counter() - start
+
+    tracemalloc.start()
+    as_dict = {(payer, code, modifier, locality): amount for payer, code, modifier, locality, amount in rows}
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'fees.bin')
+        start = time.perf_counter()
+        schedule.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        mapped = FeeSchedule.open(path)
+        open_s = time.perf_counter() - start
+
+        rng = random.Random(3)
+        probes = [rows[rng.randrange(len(rows))][:4] for _ in range(args.lookups)]
+        dict_ns = time_lookups(lambda *key: as_dict.get(key), probes)
+        index_ns = time_lookups(schedule.lookup, probes)
+        mapped_ns = time_lookups(mapped.lookup, probes)
+        assert all(mapped.lookup(*row[:4]) == row[4] for row in rows[::97])
+        stats = schedule.get_stats()
+
+        print(f"  Build:          {build_s:.2f}s  ({stats['capacity']:,} slots, load {stats['load_factor']})")
+        print(f"  Snapshot:       save {save_s * 1000:.1f} ms, mmap open {open_s * 1000:.2f} ms")
+        print(f"  Memory:         index {stats['index_bytes'] / 1e6:.1f} MB vs dict {dict_bytes / 1e6:.1f} MB")
+        print(f"  Lookup:         index {index_ns:,.0f} ns/op, mmap {mapped_ns:,.0f} ns/op, "
+              f"dict {dict_ns:,.0f} ns/op (no fallback, no key normalization)")
+        report['index'] = {'rows': len(rows), 'build_s': round(build_s, 3), 'save_ms': round(save_s * 1000, 1),
+                           'open_ms': round(open_s * 1000, 3), 'index_bytes': stats['index_bytes'],
+                           'dict_bytes': dict_bytes, 'lookup_ns': round(index_ns), 'mmap_lookup_ns': round(mapped_ns),
+                           'dict_lookup_ns': round(dict_ns)}
+
+        encounters = synthetic_day(args.encounters, args.payers, codes)
+        lines = sum(len(encounter['procedures']) for encounter in encounters)
+        scalar_s, scalar = time_estimates(encounters, mapped, vectorize=False)
+        print(f"  Estimate day:   {args.encounters:,} encounters / {lines:,} lines")
+        print(f"    line-by-line  {scalar_s * 1000:.1f} ms")
+        report['estimate'] = {'encounters': args.encounters, 'lines': lines, 'scalar_ms': round(scalar_s * 1000, 2)}
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            print("    vectorized    skipped (numpy not installed)")
+        else:
+            vector_s, vector = time_estimates(encounters, mapped, vectorize=True)
+            mismatches = sum(1 for left, right in zip(scalar, vector) if left != right)
+            print(f"    vectorized    {vector_s * 1000:.1f} ms  ({mismatches} estimates differ from line-by-line)")
+
+            # Benefit rules alone, without pricing and result assembly
+            columns = patient_estimates._price_lines(encounters, mapped)
+            rules_scalar = min(timed(patient_estimates._apply_benefits, columns) for _ in range(3))
+            rules_vector = min(timed(patient_estimates._apply_benefits_numpy, numpy, columns) for _ in range(3))
+            print(f"    benefit rules {rules_scalar * 1000:.1f} ms line-by-line, {rules_vector * 1000:.1f} ms vectorized")
+            report['estimate'].update({'vectorized_ms': round(vector_s * 1000, 2), 'mismatches': mismatches,
+                                       'rules_scalar_ms': round(rules_scalar * 1000, 2),
+                                       'rules_vectorized_ms': round(rules_vector * 1000, 2)})
+        mapped.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
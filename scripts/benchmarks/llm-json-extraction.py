@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Benchmark and fuzz JSON extraction from LLM responses.
+
+Runs a corpus of model outputs seen from Nova Pro coding and denial prompts
+(code fences, leading chatter, trailing prose with braces, prompt-template
+echoes, truncation) through the previous three-attempt extract_json_from_text
+and the single-pass llm_json.extract_json_object, reporting which cases each
+gets right and the time per call. A fuzz pass wraps random JSON objects in
+random chatter, fences and brace-bearing prose and checks the object comes
+back unchanged; truncated objects must raise rather than return a fragment.
+
+Usage: python scripts/benchmarks/llm-json-extraction.py [--iterations 5000] [--fuzz 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, '..', '..', 'agents'))
+
+from llm_json import extract_json_object
+
+CODING = {
+    'success': True,
+    'cpt_codes': [{'code': '99214', 'description': 'Office visit, established patient', 'confidence': 0.92,
+                   'modifiers': [], 'units': 1}],
+    'icd_codes': [{'code': 'I10', 'description': 'Essential hypertension', 'confidence': 0.95, 'primary': True}],
+    'coding_notes': 'Level of service supported by {history, exam, MDM}',
+    'documentation_gaps': []
+}
+CRASHED = 'crashed'
+DENIAL = {
+    'category': 'medical_necessity',
+    'suggested_action': 'appeal_with_documentation',
+    'appeal_likelihood': 0.6,
+    'confidence': 0.8,
+    'prevention_tips': ['Attach clinical notes']
+}
+
+
+def corpus():
+    """(name, response text, expected object or None when extraction must fail)"""
+    coding = json.dumps(CODING, indent=2)
+    denial = json.dumps(DENIAL, indent=4)
+    fenced_reasoning = dict(DENIAL, reasoning='Output wrapped in ```json fences {as requested}')
+    return [
+        ('bare', json.dumps(CODING), CODING),
+        ('fenced', f"```json\n{coding}\n```", CODING),
+        ('fence no language', f"```\n{denial}\n```", DENIAL),
+        ('leading chatter', f"Here is the coding analysis:\n\n{coding}", CODING),
+        ('chatter and fence', f"Sure! Based on the documentation:\n```json\n{coding}\n```\nLet me know.", CODING),
+        ('trailing prose with braces',
+         f"{denial}\n\nNote: the {{category}} field uses the payer's {{CARC}} mapping.", DENIAL),
+        ('brace placeholder before', f"Filling in the {{template}} below:\n{denial}", DENIAL),
+        ('empty object in prose', f"Instead of {{}} I return the full analysis: {denial}", DENIAL),
+        ('template echo',
+         'The format is {"category": <category>, "confidence": <0-1>}.\n' + f"```json\n{denial}\n```", DENIAL),
+        ('two objects', f"{denial}\nAlternative: {json.dumps(CODING)}", DENIAL),
+        ('inline one line', f"Result: {json.dumps(DENIAL)} (high confidence)", DENIAL),
+        ('fence inside string', f"Result:\n{json.dumps(fenced_reasoning, indent=2)}", fenced_reasoning),
+        ('truncated', coding[:len(coding) // 2], None),
+        ('truncated with nested', 'Analysis:\n{"denial": {"category": "eligibility"}, "confidence": 0.', None),
+        ('no json', 'I cannot determine the codes from this encounter.', None),
+        ('trailing comma', '{"category": "coding_error", "confidence": 0.7,}', None),
+        ('many prose braces', '{placeholder} ' * 2000 + json.dumps(DENIAL), DENIAL),
+        ('runaway nesting', '{"a": ' * 5000, None)
+    ]
+
+
+def legacy_extract(text: str):
+    """BaseAgent.extract_json_from_text before the single-pass scanner"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        lines = text.split('\n')
+        json_lines = []
+        in_json = False
+
+        for line in lines:
+            if '```json' in line.lower() or '```' in line and in_json:
+                in_json = not in_json
+                continue
+            if in_json or (line.strip().startswith('{') and line.strip().endswith('}')):
+                json_lines.append(line)
+
+        if json_lines:
+            try:
+                return json.loads('\n'.join(json_lines))
+            except json.JSONDecodeError:
+                pass
+
+        start_brace = text.find('{')
+        end_brace = text.rfind('}')
+
+        if start_brace != -1 and end_brace != -1:
+            try:
+                return json.loads(text[start_brace:end_brace + 1])
+            except json.JSONDecodeError:
+                pass
+
+        raise ValueError("No valid JSON found in response")
+
+
+def outcome(extract, text):
+    """Extracted object, None for a ValueError, CRASHED for any other exception"""
+    try:
+        return extract(text)
+    except ValueError:
+        return None
+    except Exception:
+        return CRASHED
+
+
+def per_call_us(extract, text, iterations: int) -> float:
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            outcome(extract, text)
+        best = min(best, time.perf_counter() - start)
+    return best / iterations * 1e6
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(6 if depth < 3 else 4)
+    if kind == 0:
+        return rng.randint(-1000, 1000)
+    if kind == 1:
+        return round(rng.random(), 3)
+    if kind == 2:
+        return ''.join(rng.choice(string.ascii_letters + ' {}[]"\\:,`\n') for _ in range(rng.randint(0, 12)))
+    if kind == 3:
+        return rng.choice([True, False, None])
+    if kind == 4:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+    return random_object(rng, depth + 1)
+
+
+def random_object(rng, depth=0):
+    return {f'k{index}': random_value(rng, depth) for index in range(rng.randint(1, 4))}
+
+
+def fuzz(iterations: int):
+    rng = random.Random(3)
+    chatter = ['Here is the JSON:', 'Sure!', 'Analysis complete.', 'Using the {schema} provided,',
+               'Braces like {} are placeholders.', 'Fields: {category, confidence}', '']
+    trailer = ['', 'Let me know if you need anything else.', 'Note: {confidence} is 0-1.', '}', '```', '{"partial":']
+    failures = []
+    for _ in range(iterations):
+        value = random_object(rng)
+        body = json.dumps(value, indent=rng.choice([None, 2]))
+        if rng.random() < 0.5:
+            body = f"```{rng.choice(['json', 'JSON', ''])}\n{body}\n```"
+        text = '\n'.join([rng.choice(chatter), body, rng.choice(trailer)])
+        if outcome(extract_json_object, text) != value:
+            failures.append(text)
+
+        truncated = json.dumps({'outer': value, 'tail': 'x'})
+        truncated = f"{rng.choice(chatter)}\n{truncated[:rng.randint(1, len(truncated) - 1)]}"
+        if outcome(extract_json_object, truncated) is not None:
+            failures.append(truncated)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--fuzz', type=int, default=20000)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    print(f"📊 LLM JSON extraction ({args.iterations:,} calls per case, µs per call)")
+    print("=" * 72)
+    print(f"  {'case':<28} {'legacy':>8} {'':>3} {'single-pass':>11} {'':>3}")
+
+    report = {'cases': {}}
+    correct = {'legacy': 0, 'single_pass': 0}
+    for name, text, expected in corpus():
+        row = {}
+        marks = []
+        for label, extract in (('legacy', legacy_extract), ('single_pass', extract_json_object)):
+            ok = outcome(extract, text) == expected
+            correct[label] += ok
+            row[label] = {'correct': ok, 'us': round(per_call_us(extract, text, args.iterations), 2)}
+            marks.append(f"{row[label]['us']:>{8 if label == 'legacy' else 11}.2f} {'✅' if ok else '❌':>2}")
+        report['cases'][name] = row
+        print(f"  {name:<28} {'  '.join(marks)}")
+
+    total = len(report['cases'])
+    print(f"  correct: legacy {correct['legacy']}/{total}, single-pass {correct['single_pass']}/{total}")
+
+    failures = fuzz(args.fuzz)
+    report.update(correct=correct, fuzz_cases=args.fuzz * 2, fuzz_failures=len(failures))
+    print(f"  fuzz: {len(failures)} failures in {args.fuzz * 2:,} generated responses")
+    for text in failures[:3]:
+        print(f"      {text!r}")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if failures or correct['single_pass'] != total:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Benchmark NCCI PTP/MUE scrubbing of a full day's claims.
+
+Generates a practitioner PTP table (column 1 / column 2 pairs with modifier
+indicators, deleted and re-added edits) and MUE limits over a CPT/HCPCS
+vocabulary, and a day of claims - a third of them billing a pair from the
+PTP table, some with modifiers or extra units. Reports index build time, snapshot size and open time,
+memory against an equivalent dict, ns per pair lookup, and batch scrub
+throughput (claims/s, lines/s) on the memory-mapped snapshot, with and
+without auto-applied modifiers, against scanning the table per claim.
+Every claim's findings are checked against the same rules evaluated over a
+plain dict of the rows.
+
+Usage: python scripts/benchmarks/ncci-scrub.py [--pairs 1000000] [--claims 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'SubmitClaimAgent'))
+
+import ncci_edits
+from ncci_edits import NCCIEdits, scrub_claim
+from fee_schedule import encode_procedure
+from code_sets import encode_date
+
+SERVICE_DATE = '2024-03-15'
+MODIFIERS = [[], [], [], ['59'], ['25'], ['RT'], ['LT'], ['XU'], ['26']]
+
+
+def synthetic_tables(pairs: int, codes: int, seed: int = 13):
+    """PTP rows (setting, column1, column2, effective, deletion, indicator), MUE rows and the code vocabulary"""
+    rng = random.Random(seed)
+    vocabulary = [f'{code:05d}' for code in rng.sample(range(10000, 99999), codes - codes // 10)]
+    vocabulary += [f'{letter}{code:04d}' for letter, code in
+                   ((rng.choice('AEGJLQ'), rng.randrange(10000)) for _ in range(codes // 10))]
+    vocabulary = sorted(set(vocabulary))
+
+    ptp_rows = []
+    seen = set()
+    while len(ptp_rows) < pairs:
+        column1, column2 = rng.sample(vocabulary, 2)
+        if (column1, column2) in seen:
+            continue
+        seen.add((column1, column2))
+        indicator = rng.choices([0, 1, 9], weights=[10, 88, 2])[0]
+        roll = rng.random()
+        if roll < 0.03:
+            # Deleted and re-added with a different indicator
+            ptp_rows.append(('practitioner', column1, column2, '2012-01-01', '2017-12-31', 1 - min(indicator, 1)))
+            ptp_rows.append(('practitioner', column1, column2, '2018-01-01', '*', indicator))
+        elif roll < 0.06:
+            ptp_rows.append(('practitioner', column1, column2, '2010-04-01', '2021-12-31', indicator))
+        else:
+            ptp_rows.append(('practitioner', column1, column2, '2008-01-01', '', indicator))
+
+    mue_rows = [('practitioner', code, rng.choice([1, 1, 2, 3, 4, 6, 10, 99]), rng.choice([1, 2, 2, 3]))
+                for code in vocabulary if rng.random() < 0.9]
+    return ptp_rows, mue_rows, vocabulary
+
+
+def synthetic_claims(count: int, ptp_rows, vocabulary, seed: int = 17):
+    rng = random.Random(seed)
+    common = rng.sample(vocabulary, min(len(vocabulary), 2000))
+    claims = []
+    for index in range(count):
+        codes = rng.sample(common, rng.choice([1, 1, 2, 2, 3, 3, 4, 5, 6, 8, 12]))
+        if rng.random() < 0.35:
+            # Procedures commonly billed together
+            _, column1, column2, _, _, _ = rng.choice(ptp_rows)
+            codes[:2] = [column1, column2]
+        services = [{'procedureCode': code, 'units': 1 if rng.random() < 0.92 else rng.choice([2, 3, 4]),
+                     'modifiers': list(rng.choice(MODIFIERS))} for code in codes]
+        claims.append({'claimId': f'CLM-{index:06d}', 'claimType': 'professional', 'serviceDate': SERVICE_DATE,
+                       'services': services})
+    return claims
+
+
+class DictEdits:
+    """The same rows in a dict of lists, answering the lookups scrub_claim makes on NCCIEdits"""
+
+    def __init__(self, ptp_rows, mue_rows):
+        self.ptp = {}
+        for setting, column1, column2, effective, deletion, indicator in ptp_rows:
+            key = (ncci_edits.SETTINGS[setting], encode_procedure(column1), encode_procedure(column2))
+            self.ptp.setdefault(key, []).append((encode_date(effective), encode_date(deletion.strip(' *') or None,
+                                                                                     default=ncci_edits.OPEN_ENDED),
+                                                 int(indicator)))
+        self.mue = {ncci_edits._pack(ncci_edits.KIND_MUE, ncci_edits.SETTINGS[setting], encode_procedure(code), 0):
+                    int(units) << 8 | int(mai) for setting, code, units, mai in mue_rows}
+
+    def _ptp_indicator(self, setting, column1, column2, on):
+        for effective, deletion, indicator in self.ptp.get((setting, column1, column2), ()):
+            if effective <= on <= deletion:
+                return indicator
+        return None
+
+    def _get(self, key, on):
+        return self.mue.get(key)
+
+
+class ScanEdits(DictEdits):
+    """Answers PTP lookups by scanning the rows, as a table-scan scrubber would"""
+
+    def __init__(self, ptp_rows, mue_rows):
+        super().__init__(ptp_rows, mue_rows)
+        self.rows = [(key, versions) for key, versions in self.ptp.items()]
+
+    def _ptp_indicator(self, setting, column1, column2, on):
+        for key, versions in self.rows:
+            if key == (setting, column1, column2):
+                for effective, deletion, indicator in versions:
+                    if effective <= on <= deletion:
+                        return indicator
+        return None
+
+
+def findings(report):
+    return sorted((issue['type'], issue['line'], issue.get('column1_line'), issue['severity'],
+                   issue.get('modifier_applied')) for issue in report['issues'])
+
+
+def scrub_all(claims, edits, auto_modifier=None):
+    start = time.perf_counter()
+    reports = [scrub_claim(claim, edits, auto_modifier)[1] for claim in claims]
+    return time.perf_counter() - start, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pairs', type=int, default=1000000, help='PTP column 1 / column 2 pairs')
+    parser.add_argument('--codes', type=int, default=12000, help='CPT/HCPCS vocabulary size')
+    parser.add_argument('--claims', type=int, default=20000, help="Claims in the day's batch")
+    parser.add_argument('--scan-claims', type=int, default=20, help='Claims scrubbed by table scan')
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    ptp_rows, mue_rows, vocabulary = synthetic_tables(args.pairs, args.codes)
+    claims = synthetic_claims(args.claims, ptp_rows, vocabulary)
+    lines = sum(len(claim['services']) for claim in claims)
+    report = {}
+    print(f"🧾 NCCI scrub: {len(ptp_rows):,} PTP rows, {len(mue_rows):,} MUEs, "
+          f"{args.claims:,} claims / {lines:,} lines")
+    print("=" * 72)
+
+    start = time.perf_counter()
+    index = NCCIEdits.from_rows(ptp_rows, mue_rows)
+    build_s = time.perf_counter() - start
+
+    tracemalloc.start()
+    reference = DictEdits(ptp_rows, mue_rows)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ncci.bin')
+        index.save(path)
+        start = time.perf_counter()
+        mapped = NCCIEdits.open(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        stats = mapped.get_stats()
+
+        rng = random.Random(5)
+        on = encode_date(SERVICE_DATE)
+        hits = [(0, encode_procedure(row[1]), encode_procedure(row[2]), on)
+                for row in (rng.choice(ptp_rows) for _ in range(args.lookups))]
+        misses = [(0, encode_procedure(rng.choice(vocabulary)), encode_procedure(rng.choice(vocabulary)), on)
+                  for _ in range(args.lookups)]
+        timings = {}
+        for label, probes in (('hit', hits), ('miss', misses)):
+            start = time.perf_counter()
+            for probe in probes:
+                mapped._ptp_indicator(*probe)
+            timings[label] = (time.perf_counter() - start) / len(probes) * 1e9
+
+        print(f"  Build:          {build_s:.2f}s  ({stats['capacity']:,} slots, load {stats['load_factor']})")
+        print(f"  Snapshot:       {os.path.getsize(path) / 1e6:.1f} MB, mmap open {open_ms:.2f} ms")
+        print(f"  Memory:         index {stats['index_bytes'] / 1e6:.1f} MB vs dict {dict_bytes / 1e6:.1f} MB")
+        print(f"  Pair lookup:    {timings['hit']:,.0f} ns/op hit, {timings['miss']:,.0f} ns/op miss")
+
+        flag_s, flagged = scrub_all(claims, mapped)
+        auto_s, fixed = scrub_all(claims, mapped, auto_modifier='59')
+        scan_claims = claims[:args.scan_claims]
+        scan_s, _ = scrub_all(scan_claims, ScanEdits(ptp_rows, mue_rows))
+        pairs = sum(item['pairs_checked'] for item in flagged)
+        print(f"  Scrub (flag):   {args.claims / flag_s:,.0f} claims/s, {lines / flag_s:,.0f} lines/s, "
+              f"{flag_s / args.claims * 1e6:.1f} µs/claim ({pairs:,} pairs)")
+        print(f"  Scrub (auto):   {args.claims / auto_s:,.0f} claims/s, {lines / auto_s:,.0f} lines/s "
+              f"(modifier 59 applied where allowed)")
+        print(f"  Table scan:     {len(scan_claims) / scan_s:,.1f} claims/s "
+              f"({scan_s / len(scan_claims) * args.claims / 3600:,.1f} h for the day)")
+
+        outcomes = {}
+        for label, reports in (('flag', flagged), ('auto', fixed)):
+            outcomes[label] = {status: sum(1 for item in reports if item['status'] == status)
+                               for status in ('clean', 'modified', 'blocked')}
+        issue_counts = {}
+        for item in flagged:
+            for issue in item['issues']:
+                name = f"{issue['type']}_{issue.get('modifier_indicator', issue.get('mai'))}"
+                issue_counts[name] = issue_counts.get(name, 0) + 1
+        print(f"  Outcomes:       flag {outcomes['flag']}, auto {outcomes['auto']}")
+        print(f"  Issues:         {issue_counts}")
+
+        for label, auto_modifier, reports in (('flag', None, flagged), ('auto', '59', fixed)):
+            for claim, item in zip(claims, reports):
+                expected = scrub_claim(claim, reference, auto_modifier)[1]
+                failures += findings(item) != findings(expected)
+        print(f"  Correctness:    {failures} claims differ from the dict reference")
+
+        report = {
+            'ptp_rows': len(ptp_rows), 'mue_rows': len(mue_rows), 'claims': args.claims, 'lines': lines,
+            'build_s': round(build_s, 2), 'snapshot_bytes': os.path.getsize(path), 'open_ms': round(open_ms, 3),
+            'index_bytes': stats['index_bytes'], 'dict_bytes': dict_bytes,
+            'lookup_hit_ns': round(timings['hit']), 'lookup_miss_ns': round(timings['miss']),
+            'claims_per_second': round(args.claims / flag_s), 'lines_per_second': round(lines / flag_s),
+            'auto_claims_per_second': round(args.claims / auto_s),
+            'scan_claims_per_second': round(len(scan_claims) / scan_s, 2),
+            'pairs_checked': pairs, 'outcomes': outcomes, 'issues': issue_counts, 'mismatches': failures
+        }
+        mapped.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark clinical-notes compression ahead of the coding and appeal prompts.
+
+Builds synthetic multi-page notes - an operative report followed by daily
+progress notes whose HPI/exam text is copied forward, with EHR boilerplate
+on every page - and runs CodingAgent (structured mode) and the appeal prompt
+with CLINICAL_NOTES_COMPRESSION off and on. Reports, per note size, the
+prompt input tokens, compression time and modelled Bedrock latency (fixed
+overhead plus per-input-token prefill plus generation), and checks that
+the diagnosis and procedure sections coding depends on survive intact.
+
+Usage: python scripts/benchmarks/notes-compression.py [--pages 1 4 12] [--budget 2000]
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(AGENTS_DIR)
+
+os.environ['LLM_CACHE_BACKEND'] = 'none'
+
+from clinical_notes import compress_notes, estimate_tokens
+
+OPERATIVE_REPORT = """OPERATIVE REPORT
+DATE OF SERVICE: 01/15/2024
+
+PREOPERATIVE DIAGNOSIS: Symptomatic cholelithiasis.
+POSTOPERATIVE DIAGNOSIS: Acute on chronic cholecystitis with cholelithiasis.
+PROCEDURE PERFORMED: Laparoscopic cholecystectomy with intraoperative cholangiogram.
+ANESTHESIA: General endotracheal.
+ESTIMATED BLOOD LOSS: 20 mL.
+SPECIMENS: Gallbladder to pathology.
+
+INDICATIONS:
+The patient is a 54-year-old female with six months of postprandial right upper quadrant pain and an ultrasound showing gallstones with wall thickening.
+
+DESCRIPTION OF PROCEDURE:
+The patient was brought to the operating room and placed supine. After induction of general anesthesia the abdomen was prepped and draped in the usual sterile fashion. A 12 mm Hasson trocar was placed at the umbilicus under direct vision. Three additional 5 mm ports were placed. The gallbladder was distended and inflamed with omental adhesions, which were taken down bluntly. The critical view of safety was obtained. A cholangiogram catheter was introduced through a ductotomy and the cholangiogram showed free flow into the duodenum with no filling defects. The cystic duct and artery were clipped and divided. The gallbladder was dissected off the liver bed with electrocautery and removed in a retrieval bag. Hemostasis was confirmed and the ports were removed under direct vision.
+
+COMPLICATIONS: None.
+"""
+
+PROGRESS_NOTE = """PROGRESS NOTE - POSTOPERATIVE DAY {day}
+
+HISTORY OF PRESENT ILLNESS:
+The patient is a 54-year-old female status post laparoscopic cholecystectomy with intraoperative cholangiogram for acute on chronic cholecystitis. The postoperative course has been complicated by nausea and poor oral intake requiring continued inpatient observation.
+{update}
+
+REVIEW OF SYSTEMS:
+Constitutional: Denies fever or chills. Gastrointestinal: Nausea improving, no vomiting. Respiratory: Denies shortness of breath. Cardiovascular: Denies chest pain or palpitations.
+
+MEDICATIONS:
+Acetaminophen 1000 mg every 8 hours. Ondansetron 4 mg IV every 6 hours as needed. Enoxaparin 40 mg subcutaneous daily. Pantoprazole 40 mg daily.
+
+PHYSICAL EXAM:
+VITALS: T 37.{temp} HR {hr} BP 124/78 RR 16 SpO2 97% RA
+ABD: Soft, appropriately tender at port sites, incisions clean dry and intact.
+EXT: No edema.
+
+ASSESSMENT AND PLAN:
+Acute on chronic cholecystitis status post laparoscopic cholecystectomy. {plan}
+
+Electronically signed by Dr. A. Surgeon, MD on 01/{date}/2024.
+This note was generated using voice recognition software. Please excuse any typographical errors.
+CONFIDENTIALITY NOTICE: This document contains protected health information intended only for the use of the individual named above.
+Page {page}
+"""
+
+UPDATES = ['Tolerated clear liquids overnight.', 'Advanced to a full liquid diet this morning.',
+           'Ambulating in the hallway without assistance.', 'Pain controlled on oral medication.']
+PLANS = ['Continue antiemetics and advance diet as tolerated.', 'Saline lock IV fluids.',
+         'Anticipate discharge tomorrow if tolerating diet.', 'Follow up in clinic in two weeks.']
+
+
+def synthetic_notes(pages: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    notes = [OPERATIVE_REPORT]
+    for day in range(1, pages):
+        notes.append(PROGRESS_NOTE.format(day=day, update=rng.choice(UPDATES), temp=rng.randint(0, 9),
+                                          hr=rng.randint(68, 96), plan=rng.choice(PLANS), date=15 + day, page=day + 1))
+    return '\n'.join(notes)
+
+
+def modelled_latency_ms(input_tokens: int, output_tokens: int, args) -> float:
+    return args.overhead_ms + input_tokens / 1000 * args.prefill_ms_per_1k + output_tokens * args.decode_ms_per_token
+
+
+class CountingNova:
+    """Converse stand-in that records prompt sizes and answers with a fixed coding"""
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def converse(self, modelId, messages, inferenceConfig, toolConfig):
+        tool_spec = toolConfig['tools'][0]['toolSpec']
+        output = {
+            'cpt_codes': [{'code': '47563', 'description': 'Laparoscopic cholecystectomy with cholangiography',
+                           'confidence': 0.95}],
+            'icd_codes': [{'code': 'K80.12', 'description': 'Calculus of gallbladder with acute and chronic '
+                                                            'cholecystitis', 'confidence': 0.92}],
+            'coding_notes': '', 'documentation_gaps': []
+        }
+        input_tokens = estimate_tokens(messages[0]['content'][0]['text'] + json.dumps(tool_spec))
+        output_tokens = estimate_tokens(json.dumps(output))
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return {
+            'output': {'message': {'role': 'assistant', 'content': [
+                {'toolUse': {'toolUseId': 'bench', 'name': tool_spec['name'], 'input': output}}]}},
+            'stopReason': 'tool_use',
+            'usage': {'inputTokens': input_tokens, 'outputTokens': output_tokens,
+                      'totalTokens': input_tokens + output_tokens}
+        }
+
+
+def load_handler(agent: str):
+    agent_dir = os.path.join(AGENTS_DIR, agent)
+    sys.path.append(agent_dir)
+    spec = importlib.util.spec_from_file_location(f'{agent}_handler', os.path.join(agent_dir, 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 4, 12])
+    parser.add_argument('--budget', type=int, default=2000, help='CODING_NOTES_TOKEN_BUDGET')
+    parser.add_argument('--overhead-ms', type=float, default=250.0)
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=120.0)
+    parser.add_argument('--decode-ms-per-token', type=float, default=12.0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    coding = load_handler('CodingAgent')
+    appeal = load_handler('AppealLetterAgent')
+    coding.OUTPUT_MODE = 'structured'
+    coding.NOTES_TOKEN_BUDGET = args.budget
+
+    print(f"📊 Clinical notes compression (coding budget {args.budget} tokens, appeal budget "
+          f"{appeal.NOTES_TOKEN_BUDGET})")
+    print("=" * 92)
+    print(f"  {'pages':>5} {'prompt':<7} {'notes tok':>9} {'→':>1} {'after':>6} {'prompt tok':>10} {'→':>1} "
+          f"{'after':>6} {'compress ms':>11} {'latency ms':>10} {'→':>1} {'after':>7}  kept")
+
+    report = []
+    for pages in args.pages:
+        notes = synthetic_notes(pages)
+        encounter = {'patientData': {'age': 54, 'gender': 'F'}, 'encounterData': {'id': f'ENC-{pages}'},
+                     'clinicalNotes': notes}
+
+        row = {'pages': pages}
+        for setting in ('off', 'on'):
+            os.environ['CLINICAL_NOTES_COMPRESSION'] = setting
+            nova = CountingNova()
+            agent = coding.CodingAgent()
+            agent.get_bedrock_client = lambda: nova
+            result = agent._code_encounter(encounter)
+            row[setting] = {
+                'notes_tokens': result['prompt']['tokens_after'],
+                'prompt_tokens': nova.input_tokens,
+                'compress_ms': result['prompt'].get('compress_ms', 0.0),
+                'latency_ms': round(modelled_latency_ms(nova.input_tokens, nova.output_tokens, args), 1)
+            }
+
+        compressed, metrics = compress_notes(notes, 'coding', args.budget)
+        kept = all(line.split(':', 1)[1].strip() in compressed for line in OPERATIVE_REPORT.splitlines()
+                   if line.startswith(('PREOPERATIVE DIAGNOSIS', 'POSTOPERATIVE DIAGNOSIS', 'PROCEDURE PERFORMED')))
+        appeal_notes, appeal_metrics = compress_notes(notes, 'appeal', appeal.NOTES_TOKEN_BUDGET)
+        appeal_prompt = appeal.AppealLetterAgent()._build_appeal_letter_prompt(
+            {'claimId': 'CLM-1', 'denialReason': 'medical necessity', 'clinicalNotes': notes}, appeal_notes)
+        full_prompt = appeal.AppealLetterAgent()._build_appeal_letter_prompt(
+            {'claimId': 'CLM-1', 'denialReason': 'medical necessity', 'clinicalNotes': notes})
+        row.update(coding_sections_kept=kept, duplicate_sentences=metrics['duplicate_sentences'],
+                   boilerplate_lines=metrics['boilerplate_lines'], omitted=metrics['omitted_sections'],
+                   appeal={'prompt_tokens': estimate_tokens(full_prompt),
+                           'prompt_tokens_after': estimate_tokens(appeal_prompt),
+                           'compress_ms': appeal_metrics['compress_ms']})
+        report.append(row)
+
+        off, on = row['off'], row['on']
+        print(f"  {pages:>5} {'coding':<7} {off['notes_tokens']:>9} {'':>1} {on['notes_tokens']:>6} "
+              f"{off['prompt_tokens']:>10} {'':>1} {on['prompt_tokens']:>6} {on['compress_ms']:>11.2f} "
+              f"{off['latency_ms']:>10.0f} {'':>1} {on['latency_ms']:>7.0f}  {'✅' if kept else '❌'}")
+        print(f"  {'':>5} {'appeal':<7} {appeal_metrics['tokens_before']:>9} {'':>1} "
+              f"{appeal_metrics['tokens_after']:>6} {row['appeal']['prompt_tokens']:>10} {'':>1} "
+              f"{row['appeal']['prompt_tokens_after']:>6} {appeal_metrics['compress_ms']:>11.2f}")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if not all(row['coding_sections_kept'] for row in report):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark agent response + run-ledger serialization: encode twice vs encode once.
+
+Builds two large agent results - an ERAParserAgent result for a synthetic
+835 (payments, denials and claim updates for every claim) and a CodingAgent
+batch of mock-coded encounters - and times what one invocation spends on
+JSON: the previous path (json.dumps of the response body, then json.dumps
+of the same result again for the ledger) against serialization.encode()
+once, reused for both, with the stdlib backend and with orjson when it is
+installed. Checks that every variant decodes to the same body.
+
+Usage: python scripts/benchmarks/response-serialization.py [--claims 20000] [--encounters 500] [--repeat 5]
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'ERAParserAgent'))
+
+os.environ.setdefault('DEVELOPMENT_MODE', 'true')
+
+import serialization
+from era_columns import ERAClaimColumns
+from era_router import ERAClaimRouter, PAYMENT, PARTIAL_PAYMENT, DENIAL, REVERSAL
+from synthetic_x12 import write_835
+from x12_835 import ERA835Parser
+
+
+def era_result(claims: int):
+    buffer = io.StringIO()
+    write_835(buffer, claims)
+    era = ERA835Parser(io.BytesIO(buffer.getvalue().encode('latin-1')))
+    payments, denials, reversals, claim_updates = [], [], [], []
+    columns = ERAClaimColumns()
+    router = ERAClaimRouter(era.header)
+    router.add_sink((PAYMENT, PARTIAL_PAYMENT), payments.append)
+    router.add_sink(DENIAL, denials.append)
+    router.add_sink(REVERSAL, reversals.append)
+    router.add_update_sink(claim_updates.append)
+    router.add_claim_sink(lambda claim, classification: columns.append(claim))
+    router.run(era.claims())
+    summary = columns.summary(era.header.get('total_payment'))
+    summary['carc_breakdown'] = columns.carc_breakdown(limit=20)
+    return {
+        'success': True,
+        'era_file_url': 's3://muni-rcm-era/bench.835',
+        'source': 'Claim.MD',
+        'payments': payments,
+        'denials': denials,
+        'reversals': reversals,
+        'claim_updates': claim_updates,
+        'summary': summary,
+        'timestamp': router.processed_at
+    }
+
+
+def coding_result(encounters: int):
+    # Loaded by path: ERAParserAgent's handler module is also named `handler`
+    spec = importlib.util.spec_from_file_location(
+        'coding_agent_handler', os.path.join(AGENTS_DIR, 'CodingAgent', 'handler.py'))
+    handler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(handler)
+    with open(os.path.join(BENCH_DIR, '..', 'test-payloads', 'coding-agent-test.json')) as handle:
+        encounter = json.load(handle)
+    batch = [dict(encounter, claimId=f'CLM-{index:06d}') for index in range(encounters)]
+    return handler.CodingAgent().execute_development_mode({'encounters': batch})
+
+
+def envelope(result):
+    return {'success': True, 'run_id': 'bench-run', 'agent': 'BenchAgent', 'execution_time_ms': 0, 'result': result}
+
+
+def encode_twice(result):
+    """Previous path: response body, then the ledger encodes the same result again"""
+    body = json.dumps(envelope(result))
+    ledger = json.dumps(result, default=str)
+    return body, ledger
+
+
+def encode_once(result):
+    encoded = serialization.encode(result)
+    body = serialization.encode_object(envelope(encoded))
+    ledger = serialization.dumps(encoded)
+    return body, ledger
+
+
+def best_of(repeat: int, fn, *args):
+    best = float('inf')
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--claims', type=int, default=20000)
+    parser.add_argument('--encounters', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    payloads = {
+        f'ERA, {args.claims:,} claims': era_result(args.claims),
+        f'coding batch, {args.encounters:,} encounters': coding_result(args.encounters)
+    }
+
+    backends = ['stdlib']
+    serialization.reset_backend('orjson')
+    if serialization.get_backend() == 'orjson':
+        backends.append('orjson')
+
+    report = {}
+    failed = False
+    print("📊 Response body + run ledger serialization (best of %d)" % args.repeat)
+    print("=" * 72)
+    for label, result in payloads.items():
+        baseline_s, (baseline_body, baseline_ledger) = best_of(args.repeat, encode_twice, result)
+        expected = (json.loads(baseline_body), json.loads(baseline_ledger))
+        print(f"  {label} ({len(baseline_body) / 1e6:.1f} MB body)")
+        print(f"    json.dumps twice       {baseline_s * 1000:8.1f} ms")
+        entry = {'body_bytes': len(baseline_body), 'encode_twice_ms': round(baseline_s * 1000, 2)}
+
+        for backend in backends:
+            serialization.reset_backend(backend)
+            elapsed, (body, ledger) = best_of(args.repeat, encode_once, result)
+            matches = (json.loads(body), json.loads(ledger)) == expected
+            failed = failed or not matches
+            print(f"    encode once, {backend:<9} {elapsed * 1000:8.1f} ms  ({baseline_s / elapsed:.1f}x"
+                  f"{'' if matches else ', OUTPUT DIFFERS'})")
+            entry[f'encode_once_{backend}_ms'] = round(elapsed * 1000, 2)
+        report[label] = entry
+
+    if len(backends) == 1:
+        print("  orjson not installed; stdlib backend only")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
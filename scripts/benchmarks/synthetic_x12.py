@@ -0,0 +1,236 @@
+"""
+Synthetic X12 generators for agent benchmarks.
+Produces structurally valid 835 remittances of arbitrary size without
+holding the whole interchange in memory, and 271 eligibility responses
+for a list of 270 subscribers.
+"""
+
+import io
+import random
+import zlib
+from typing import Dict, Iterator, List, TextIO
+
+ISA_835 = (
+    "ISA*00*          *00*          *ZZ*PAYERSENDER    *ZZ*MUNIRCM        "
+    "*240120*1200*^*00501*000000001*0*P*:~"
+)
+
+# (group, reason, share of charge) adjustment patterns seen on real remittances
+ADJUSTMENT_PATTERNS = [
+    [('CO', '45', 0.25)],
+    [('CO', '45', 0.20), ('PR', '2', 0.10)],
+    [('CO', '45', 0.15), ('PR', '1', 0.20)],
+    [('PR', '3', 0.05), ('CO', '45', 0.30)],
+]
+DENIAL_PATTERNS = [
+    [('CO', '50', 1.0)],
+    [('CO', '16', 1.0)],
+    [('CO', '197', 1.0)],
+    [('CO', '29', 1.0)],
+    [('PR', '27', 1.0)],
+]
+PROCEDURES = ['99213', '99214', '99215', '36415', '80053', '93000', '71046', '85025']
+
+
+def iter_835_segments(claim_count: int, denial_rate: float = 0.15, seed: int = 835,
+                      lines_per_claim: int = 2) -> Iterator[str]:
+    """Yield the segments of one 835 interchange, without terminators"""
+    rng = random.Random(seed)
+
+    yield ISA_835[:-1]
+    yield "GS*HP*PAYERSENDER*MUNIRCM*20240120*1200*1*X*005010X221A1"
+    yield "ST*835*0001*005010X221A1"
+    yield "BPR*I*0*C*ACH*CCP*01*999999999*DA*123456*1512345678**01*999988880*DA*98765*20240120"
+    yield "TRN*1*EFT123456789*1512345678"
+    yield "DTM*405*20240119"
+    yield "N1*PR*SYNTHETIC HEALTH PLAN"
+    yield "REF*2U*SYN001"
+    yield "N1*PE*DEMO MEDICAL GROUP*XX*1234567890"
+    yield "LX*1"
+
+    segment_count = 10
+    for index in range(claim_count):
+        denied = rng.random() < denial_rate
+        patterns = DENIAL_PATTERNS if denied else ADJUSTMENT_PATTERNS
+        pattern = patterns[rng.randrange(len(patterns))]
+
+        lines = []
+        for _ in range(lines_per_claim):
+            charge = round(rng.uniform(40, 400), 2)
+            lines.append((PROCEDURES[rng.randrange(len(PROCEDURES))], charge))
+        charged = round(sum(charge for _, charge in lines), 2)
+
+        patient_resp = round(sum(charged * share for group, _, share in pattern if group == 'PR'), 2)
+        adjusted = round(sum(charged * share for _, _, share in pattern), 2)
+        paid = 0.0 if denied else round(charged - adjusted, 2)
+
+        status = '4' if denied else '1'
+        yield f"CLP*CLM{index:09d}*{status}*{charged:.2f}*{paid:.2f}*{patient_resp:.2f}*12*PCN{index:09d}*11*1"
+        yield f"NM1*QC*1*DOE*JOHN****MI*MBR{index:08d}"
+        yield "DTM*232*20240115"
+        segment_count += 3
+
+        for code, charge in lines:
+            line_paid = 0.0 if denied else round(charge * (1 - sum(s for _, _, s in pattern)), 2)
+            yield f"SVC*HC:{code}*{charge:.2f}*{line_paid:.2f}**1"
+            yield "DTM*472*20240115"
+            for group, reason, share in pattern:
+                yield f"CAS*{group}*{reason}*{charge * share:.2f}"
+            allowed = 0.0 if denied else charge * (1 - sum(s for g, _, s in pattern if g == "CO"))
+            yield f"AMT*B6*{allowed:.2f}"
+            segment_count += 3 + len(pattern)
+
+    segment_count += 1
+    yield f"SE*{segment_count}*0001"
+    yield "GE*1*1"
+    yield "IEA*1*000000001"
+
+
+def write_835(handle: TextIO, claim_count: int, **options) -> int:
+    """Write an 835 interchange to `handle`; returns characters written"""
+    written = 0
+    buffer = []
+    for segment in iter_835_segments(claim_count, **options):
+        buffer.append(segment)
+        buffer.append("~\n")
+        if len(buffer) >= 2048:
+            chunk = ''.join(buffer)
+            handle.write(chunk)
+            written += len(chunk)
+            buffer = []
+    chunk = ''.join(buffer)
+    handle.write(chunk)
+    return written + len(chunk)
+
+
+def write_835_of_size(handle: TextIO, target_bytes: int, **options) -> int:
+    """Write an 835 of roughly `target_bytes`; returns the claim count used"""
+    # Calibrate bytes-per-claim on a small sample
+    sample = io.StringIO()
+    sample_claims = 200
+    sample_size = write_835(sample, sample_claims, **options)
+    claim_count = max(1, int(target_bytes / (sample_size / sample_claims)))
+    write_835(handle, claim_count, **options)
+    return claim_count
+
+
+ISA_271 = (
+    "ISA*00*          *00*          *ZZ*CLEARINGHOUSE  *ZZ*MUNIRCM        "
+    "*240120*1200*^*00501*{control:09d}*0*P*:"
+)
+
+
+def _eb(*elements) -> str:
+    return '*'.join(('EB',) + elements).rstrip('*')
+
+
+def _active_benefits(rng: random.Random, auth_required: bool) -> List[str]:
+    deductible = rng.choice((500, 1000, 1500, 3000))
+    oop = rng.choice((3000, 5000, 8000))
+    return [
+        "DTP*346*D8*20240101",
+        _eb('1', 'IND', '30^1^98^86^88', rng.choice(('PR', 'HM', 'EP', 'PS')), 'SYNTHETIC PLAN'),
+        _eb('C', 'IND', '30', '', '', '23', f"{deductible:.2f}", '', '', '', '', 'Y'),
+        _eb('C', 'IND', '30', '', '', '29', f"{rng.uniform(0, deductible):.2f}", '', '', '', '', 'Y'),
+        _eb('C', 'IND', '30', '', '', '23', f"{deductible * 2:.2f}", '', '', '', '', 'N'),
+        _eb('G', 'IND', '30', '', '', '23', f"{oop:.2f}", '', '', '', '', 'Y'),
+        _eb('G', 'IND', '30', '', '', '29', f"{rng.uniform(0, oop):.2f}", '', '', '', '', 'Y'),
+        _eb('B', 'IND', '98', '', '', '27', f"{rng.choice((20, 25, 30, 40)):.2f}", '', '', '', '', 'Y'),
+        _eb('B', 'IND', '86', '', '', '27', f"{rng.choice((100, 150, 250)):.2f}", '', '', '', '', 'Y'),
+        _eb('A', 'IND', '30', '', '', '23', '', rng.choice(('.1', '.2', '.3')), '', '', '', 'Y'),
+        _eb('1', 'IND', '4^2', '', '', '', '', '', '', '', 'Y' if auth_required else 'N'),
+        "MSG*SYNTHETIC BENEFITS FOR TESTING"
+    ]
+
+
+# Service types large payers itemize in a full 271 benefit response
+DETAIL_SERVICE_TYPES = [
+    '1', '2', '4', '5', '6', '7', '12', '13', '18', '20', '33', '35', '40', '42', '45', '47',
+    '48', '50', '51', '52', '53', '62', '65', '68', '73', '76', '78', '80', '81', '82', '86',
+    '88', '93', '98', 'A4', 'A6', 'A7', 'A8', 'AD', 'AE', 'AG', 'AI', 'AJ', 'AK', 'AL', 'BG',
+    'BH', 'MH', 'UC'
+]
+
+
+def _detailed_benefits(rng: random.Random) -> List[str]:
+    """Per-service-type benefit loops (in and out of network) as sent by large commercial payers"""
+    segments = []
+    for code in DETAIL_SERVICE_TYPES:
+        copay = rng.choice((0, 10, 25, 40, 75))
+        segments.extend([
+            _eb('1', 'IND', code, 'PR', 'SYNTHETIC PLAN'),
+            _eb('B', 'IND', code, 'PR', '', '27', f"{copay:.2f}", '', '', '', '', 'Y'),
+            _eb('B', 'IND', code, 'PR', '', '27', f"{copay * 2:.2f}", '', '', '', '', 'N'),
+            _eb('A', 'IND', code, 'PR', '', '27', '', '.2', '', '', '', 'Y'),
+            _eb('A', 'IND', code, 'PR', '', '27', '', '.4', '', '', '', 'N'),
+            "DTP*348*D8*20240101",
+            f"MSG*COPAY APPLIES TO {code} SERVICES RENDERED IN AN OFFICE SETTING",
+            "MSG*BENEFITS ARE SUBJECT TO MEDICAL NECESSITY REVIEW"
+        ])
+        if code in ('4', '62', 'A7', 'MH'):
+            segments.extend([
+                _eb('CB', 'IND', code, 'PR', '', '', '', '', '', '', 'Y', 'Y'),
+                "LS*2120",
+                "NM1*X3*2*SYNTHETIC UTILIZATION MANAGEMENT",
+                "PER*IC**TE*8005551212",
+                "LE*2120"
+            ])
+    return segments
+
+
+def iter_271_segments(subscribers: List[Dict[str, str]], payer: Dict[str, str] = None,
+                      control_number: int = 1, detailed: bool = False) -> Iterator[str]:
+    """
+    Yield the segments of one 271 answering `subscribers` (dicts with
+    trace_number, member_id, first_name, last_name). Outcomes are derived from
+    the member id so repeated runs agree: ~78% active (some needing prior
+    auth), ~12% inactive, ~10% rejected as not found. `detailed` adds the
+    per-service-type benefit loops (~400 segments per active subscriber).
+    """
+    payer = payer or {'id': 'SYN001', 'name': 'SYNTHETIC HEALTH PLAN'}
+
+    yield ISA_271.format(control=control_number)
+    yield f"GS*HB*CLEARINGHOUSE*MUNIRCM*20240120*1200*{control_number}*X*005010X279A1"
+    body = [
+        "ST*271*0001*005010X279A1",
+        f"BHT*0022*11*{control_number}*20240120*1200",
+        "HL*1**20*1",
+        f"NM1*PR*2*{payer.get('name') or 'PAYER'}*****PI*{payer.get('id') or ''}",
+        "HL*2*1*21*1",
+        "NM1*1P*2*DEMO MEDICAL GROUP*****XX*1234567890"
+    ]
+    yield from body
+    segment_count = len(body)
+
+    for position, subscriber in enumerate(subscribers):
+        member_id = subscriber.get('member_id') or ''
+        rng = random.Random(zlib.crc32(member_id.encode('utf-8')))
+        outcome = rng.random()
+
+        segments = [
+            f"HL*{position + 3}*2*22*0",
+            f"TRN*2*{subscriber.get('trace_number')}*9MUNIRCM",
+            f"NM1*IL*1*{subscriber.get('last_name') or ''}*{subscriber.get('first_name') or ''}****MI*{member_id}"
+        ]
+        if outcome < 0.10:
+            segments.append("AAA*Y**75*C")
+        elif outcome < 0.22:
+            segments.append("DTP*347*D8*20231231")
+            segments.append(_eb('6', 'IND', '30'))
+        else:
+            segments.append("REF*18*SYNPLAN01")
+            segments.extend(_active_benefits(rng, auth_required=outcome > 0.9))
+            if detailed:
+                segments.extend(_detailed_benefits(rng))
+
+        yield from segments
+        segment_count += len(segments)
+
+    yield f"SE*{segment_count + 1}*0001"
+    yield f"GE*1*{control_number}"
+    yield f"IEA*1*{control_number:09d}"
+
+
+def build_271(subscribers: List[Dict[str, str]], **options) -> str:
+    """Build a 271 interchange as text"""
+    return '~\n'.join(iter_271_segments(subscribers, **options)) + '~\n'
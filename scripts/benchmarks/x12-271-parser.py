@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the X12 271 eligibility parser used by EligibilityAgent.
+
+Builds a pool of synthetic 271 responses shaped like large commercial payer
+replies (full per-service-type benefit loops, in and out of network, MSG and
+2120 loops) and times EligibilityResponseParser on each, reporting parse time
+per response at p50/p95/p99 for single-subscriber, family and sweep-sized
+responses. Exits non-zero when --p95-budget-ms is given and exceeded.
+
+Usage: python scripts/benchmarks/x12-271-parser.py [--responses 200] [--repeat 5] [--p95-budget-ms 5]
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BENCH_DIR, '..', '..', 'agents')
+sys.path.append(BENCH_DIR)
+sys.path.append(AGENTS_DIR)
+sys.path.append(os.path.join(AGENTS_DIR, 'EligibilityAgent'))
+
+from synthetic_x12 import build_271
+from x12_271 import EligibilityResponseParser
+
+# (label, subscribers per response, detailed benefits, responses in the pool relative to --responses)
+SCENARIOS = [
+    ('single subscriber, full benefits', 1, True, 1.0),
+    ('family of 5, full benefits', 5, True, 1.0),
+    ('sweep response, 500 subscribers', 500, False, 0.1)
+]
+
+
+def percentile(ordered, percent: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    return ordered[max(0, math.ceil(percent / 100.0 * len(ordered)) - 1)]
+
+
+def build_pool(count: int, subscribers: int, detailed: bool):
+    pool = []
+    for response in range(count):
+        members = [{'trace_number': f'{response}-{index}', 'member_id': f'M{response:05d}{index:03d}',
+                    'first_name': 'TEST', 'last_name': 'PATIENT'} for index in range(subscribers)]
+        pool.append(build_271(members, control_number=response + 1, detailed=detailed).encode('latin-1'))
+    return pool
+
+
+def time_pool(pool, repeat: int):
+    samples = []
+    segments = 0
+    for _ in range(repeat):
+        for body in pool:
+            start = time.perf_counter()
+            parser = EligibilityResponseParser(io.BytesIO(body))
+            for _result in parser.results():
+                pass
+            samples.append((time.perf_counter() - start) * 1000)
+            segments += parser.segment_count
+    return sorted(samples), segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--responses', type=int, default=200, help='Distinct responses per scenario')
+    parser.add_argument('--repeat', type=int, default=5, help='Times each response is parsed')
+    parser.add_argument('--p95-budget-ms', type=float, help='Fail if single-subscriber p95 exceeds this')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = {}
+    print(f"⏱️  271 parse time per response ({args.repeat} passes)")
+    print("=" * 60)
+
+    for label, subscribers, detailed, share in SCENARIOS:
+        pool = build_pool(max(1, int(args.responses * share)), subscribers, detailed)
+        # Warm-up pass so imports and allocator growth are not measured
+        time_pool(pool[:10], 1)
+        samples, segments = time_pool(pool, args.repeat)
+        total_seconds = sum(samples) / 1000
+        avg_kb = sum(len(body) for body in pool) / len(pool) / 1024
+
+        result = {
+            'responses': len(pool),
+            'avg_size_kb': round(avg_kb, 1),
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            'segments_per_second': int(segments / total_seconds) if total_seconds else None
+        }
+        report[label] = result
+        print(f"  {label} ({result['responses']} responses, ~{result['avg_size_kb']}KB)")
+        print(f"    p50 {result['p50_ms']:.3f} ms   p95 {result['p95_ms']:.3f} ms   p99 {result['p99_ms']:.3f} ms"
+              f"   {result['segments_per_second']:,} segments/sec")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    single_p95 = report[SCENARIOS[0][0]]['p95_ms']
+    if args.p95_budget_ms is not None and single_p95 > args.p95_budget_ms:
+        print(f"❌ single-subscriber p95 {single_p95:.3f} ms exceeds budget {args.p95_budget_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
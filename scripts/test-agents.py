@@ -44,6 +44,7 @@ def test_coding_agent():
             "gender": "M"
         },
         "encounterData": {
+            "id": "ENC-TEST-001",
             "visitType": "Annual Physical",
             "dateOfService": "2024-01-15",
             "provider": "Dr. Jane Smith, MD"
@@ -101,7 +102,8 @@ def test_submit_claim_agent():
                 {
                     "procedureCode": "99214",
                     "chargeAmount": 200.00,
-                    "units": 1
+                    "units": 1,
+                    "serviceDate": "2024-01-15"
                 }
             ],
             "diagnosisCodes": ["I10", "Z00.00"]